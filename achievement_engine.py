@@ -0,0 +1,296 @@
+# utils/achievement_engine.py
+"""
+دستاوردها (achievements) با قوانین اعلانی ایندکس‌شده بر اساس نوع رویداد و معیار
+
+هر قانون فقط یک معیار و یک آستانه دارد. برای هر رویداد فقط معیارهایی که آن رویداد
+تغییر می‌دهد بررسی می‌شوند و در هر معیار قوانین به ترتیب آستانه مرتب‌اند، پس
+ارزیابی یک رویداد چند مقایسه در حافظه است. مقدار معیارها از کش است: سکه و قدرت
+از ایندکس‌های لیدربرد (با هر تغییر لیدربرد ارزیابی می‌شوند، پس هر مسیر تغییر سکه یا
+زرادخانه را پوشش می‌دهند)، بقیه از شمارنده‌های هر کاربر (از دیتابیس خوانده و بعد با
+رویدادها افزایش می‌یابند؛ در حالت چندپروسسی بعد از ACHIEVEMENT_STATS_MAX_AGE دوباره
+خوانده می‌شوند). باز شدن دستاوردها دسته‌ای با INSERT ... ON CONFLICT DO NOTHING
+نوشته می‌شود.
+
+backfill داده‌های قدیمی را به ترتیب user_id و در تکه‌های کوچک ارزیابی می‌کند و
+آخرین user_id پردازش‌شده را در جدول settings نگه می‌دارد تا بعد از ری‌استارت ادامه دهد.
+"""
+
+import asyncio
+import bisect
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, NamedTuple, Set, Tuple
+
+from database.db import db
+from config.settings import (
+    ACHIEVEMENT_CACHE_SIZE, ACHIEVEMENT_STATS_MAX_AGE, ACHIEVEMENT_BACKFILL_CHUNK, ACHIEVEMENT_FLUSH_MS
+)
+from utils.batch_writer import BatchWriter
+from utils.events import event_bus, Event, ATTACK, DONATE
+from utils.leaderboard_service import leaderboards, weapon_power
+from utils.logger import logger
+
+
+class Rule(NamedTuple):
+    achievement_id: str
+    title: str
+    metric: str
+    threshold: int
+
+
+RULES: Tuple[Rule, ...] = (
+    Rule("first_attack", "🩸 اولین حمله", "attacks", 1),
+    Rule("warmonger", "⚔️ جنگ‌افروز (100 حمله)", "attacks", 100),
+    Rule("veteran", "🎖️ کهنه‌سرباز (1,000 حمله)", "attacks", 1_000),
+    Rule("first_win", "🏆 اولین حمله پیروز", "wins", 1),
+    Rule("conqueror", "👑 فاتح (100 حمله پیروز)", "wins", 100),
+    Rule("looter", "💰 غارتگر (10,000 سکه غنیمت)", "loot", 10_000),
+    Rule("rich", "💎 ثروتمند (100,000 سکه)", "coins", 100_000),
+    Rule("millionaire", "🤑 میلیونر", "coins", 1_000_000),
+    Rule("arsenal", "🚀 زرادخانه قدرتمند (قدرت 5,000)", "power", 5_000),
+    Rule("patron", "🤝 حامی کلن (10,000 امتیاز کمک)", "donations", 10_000),
+)
+
+RULES_BY_ID: Dict[str, Rule] = {rule.achievement_id: rule for rule in RULES}
+
+# معیارهایی که هر نوع رویداد ممکن است عوض کند (سکه و قدرت از hook لیدربرد)
+EVENT_METRICS: Dict[str, Tuple[str, ...]] = {
+    ATTACK: ("attacks", "wins", "loot"),
+    DONATE: ("donations",),
+}
+
+# معیار -> قوانین مرتب بر اساس آستانه
+RULES_BY_METRIC: Dict[str, List[Rule]] = {}
+for _rule in sorted(RULES, key=lambda r: r.threshold):
+    RULES_BY_METRIC.setdefault(_rule.metric, []).append(_rule)
+THRESHOLDS: Dict[str, List[int]] = {
+    metric: [rule.threshold for rule in rules] for metric, rules in RULES_BY_METRIC.items()
+}
+
+# این معیارها از لیدربرد خوانده می‌شوند، بقیه در UserStats
+LEADERBOARD_METRICS = ("coins", "power")
+BACKFILL_KEY = "achievements_backfill"
+
+
+class Unlock(NamedTuple):
+    user_id: int
+    achievement_id: str
+    unlocked_at: float
+
+
+class UserStats:
+    __slots__ = ("attacks", "wins", "loot", "donations", "unlocked", "loaded_at")
+    
+    def __init__(self, attacks: int, wins: int, loot: int, donations: int, unlocked: Set[str]):
+        self.attacks = attacks
+        self.wins = wins
+        self.loot = loot
+        self.donations = donations
+        self.unlocked = unlocked
+        self.loaded_at = time.monotonic()
+
+
+def evaluate(values: Dict[str, int], unlocked: Set[str], metrics: Iterable[str]) -> List[Rule]:
+    """قوانینی از metrics که با مقادیر فعلی باز می‌شوند و هنوز باز نشده‌اند"""
+    fired = []
+    for metric in metrics:
+        rules = RULES_BY_METRIC.get(metric)
+        if not rules:
+            continue
+        # فقط قوانین با آستانه <= مقدار فعلی
+        for rule in rules[:bisect.bisect_right(THRESHOLDS[metric], values.get(metric, 0))]:
+            if rule.achievement_id not in unlocked:
+                fired.append(rule)
+    return fired
+
+
+class AchievementEngine:
+
+    def __init__(self):
+        self.users: "OrderedDict[int, UserStats]" = OrderedDict()  # LRU
+        self.recent: Dict[int, List[Rule]] = {}
+        self.writer = BatchWriter("achievements", self._flush, max_rows=500, interval_ms=ACHIEVEMENT_FLUSH_MS)
+        for event_type in EVENT_METRICS:
+            event_bus.subscribe(event_type, self.on_event)
+        leaderboards.subscribe(self.on_leaderboard)
+    
+    # ==================== کش ====================
+    
+    def stats(self, user_id: int) -> UserStats:
+        cached = self.users.get(user_id)
+        if cached is not None:
+            self.users.move_to_end(user_id)
+            # در حالت چندپروسسی حمله‌ها و کمک‌های worker های دیگر فقط با خواندن دوباره دیده می‌شوند
+            if not ACHIEVEMENT_STATS_MAX_AGE or time.monotonic() - cached.loaded_at <= ACHIEVEMENT_STATS_MAX_AGE:
+                return cached
+        
+        row = db.fetchone(
+            "SELECT COUNT(*) AS attacks, "
+            "    COALESCE(SUM(CASE WHEN winner_id = attacker_id THEN 1 ELSE 0 END), 0) AS wins, "
+            "    COALESCE(SUM(CASE WHEN winner_id = attacker_id THEN coins_won ELSE 0 END), 0) AS loot, "
+            "    (SELECT contribution_points FROM clan_members WHERE user_id = ?) AS donations "
+            "FROM battle_logs WHERE attacker_id = ?",
+            (user_id, user_id)
+        )
+        unlocked = {
+            r['achievement_id']
+            for r in db.fetchall("SELECT achievement_id FROM achievements WHERE user_id = ?", (user_id,))
+        }
+        if cached is not None:
+            unlocked |= cached.unlocked  # باز شده‌هایی که هنوز flush نشده‌اند
+        stats = UserStats(row['attacks'], row['wins'], row['loot'], row['donations'] or 0, unlocked)
+        self.users[user_id] = stats
+        if len(self.users) > ACHIEVEMENT_CACHE_SIZE:
+            self.users.popitem(last=False)
+        return stats
+    
+    def values(self, user_id: int, metrics: Iterable[str]) -> Dict[str, int]:
+        stats = self.stats(user_id)
+        return {
+            metric: leaderboards.score(metric, user_id) if metric in LEADERBOARD_METRICS else getattr(stats, metric)
+            for metric in metrics
+        }
+    
+    # ==================== رویدادها ====================
+    
+    def on_event(self, event: Event):
+        stats = self.stats(event.user_id)
+        if event.type == ATTACK:
+            stats.attacks += 1
+            if event.data.get("won"):
+                stats.wins += 1
+                stats.loot += event.data.get("coins", 0)
+        elif event.type == DONATE:
+            stats.donations += event.amount
+        
+        self._evaluate(event.user_id, stats, EVENT_METRICS[event.type])
+    
+    def on_leaderboard(self, metric: str, user_id: int):
+        """سکه یا قدرت کاربر عوض شد (هر مسیر: نبرد، بانک، بازار، جوایز، ادمین)"""
+        if metric not in LEADERBOARD_METRICS:
+            return
+        # بیشتر تغییرها زیر کمترین آستانه‌اند و آمار کاربر را بارگذاری نمی‌کنند
+        if leaderboards.score(metric, user_id) < THRESHOLDS[metric][0]:
+            return
+        self._evaluate(user_id, self.stats(user_id), (metric,))
+    
+    def _evaluate(self, user_id: int, stats: UserStats, metrics: Tuple[str, ...]):
+        fired = evaluate(self.values(user_id, metrics), stats.unlocked, metrics)
+        if not fired:
+            return
+        now = time.time()
+        for rule in fired:
+            stats.unlocked.add(rule.achievement_id)
+            self.writer.add(Unlock(user_id, rule.achievement_id, now))
+        self.recent.setdefault(user_id, []).extend(fired)
+    
+    def pop_recent(self, user_id: int) -> List[Rule]:
+        """دستاوردهای تازه برای اعلام در handler"""
+        return self.recent.pop(user_id, [])
+    
+    @staticmethod
+    def _flush(batch: List[Unlock]):
+        with db.get_cursor() as cursor:
+            cursor.executemany(
+                "INSERT INTO achievements (user_id, achievement_id, unlocked_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(user_id, achievement_id) DO NOTHING",
+                batch
+            )
+        logger.debug("Flushed %s achievement unlocks", len(batch))
+    
+    def progress(self, user_id: int) -> List[Tuple[Rule, int, bool]]:
+        """(قانون، مقدار فعلی، باز شده) برای همه قوانین"""
+        stats = self.stats(user_id)
+        values = self.values(user_id, RULES_BY_METRIC)
+        return [(rule, values[rule.metric], rule.achievement_id in stats.unlocked) for rule in RULES]
+    
+    # ==================== backfill ====================
+    
+    async def backfill(self, chunk_size: int = ACHIEVEMENT_BACKFILL_CHUNK) -> int:
+        """ارزیابی داده‌های قدیمی در تکه‌های chunk_size کاربری؛ تعداد دستاوردهای ثبت‌شده"""
+        row = db.fetchone("SELECT value FROM settings WHERE key = ?", (BACKFILL_KEY,))
+        if row is not None and row['value'] == "done":
+            return 0
+        last_user = int(row['value']) if row is not None and row['value'] else 0
+        
+        total = 0
+        started = time.perf_counter()
+        while True:
+            unlocks, last_user, done = self._backfill_chunk(last_user, chunk_size)
+            total += unlocks
+            if done:
+                break
+            await asyncio.sleep(0)  # بین تکه‌ها به handler ها نوبت بده
+        logger.info("Achievement backfill finished: %s unlocks in %.1fs", total, time.perf_counter() - started)
+        return total
+    
+    def _backfill_chunk(self, after: int, chunk_size: int) -> Tuple[int, int, bool]:
+        users = db.fetchall(
+            "SELECT user_id, coins FROM resources WHERE user_id > ? ORDER BY user_id LIMIT ?",
+            (after, chunk_size)
+        )
+        if not users:
+            db.execute(
+                "INSERT INTO settings (key, value) VALUES (?, 'done') "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (BACKFILL_KEY,)
+            )
+            return 0, after, True
+        
+        first, last = users[0]['user_id'], users[-1]['user_id']
+        values: Dict[int, Dict[str, int]] = {
+            row['user_id']: {"coins": row['coins'] or 0, "attacks": 0, "wins": 0, "loot": 0, "power": 0, "donations": 0}
+            for row in users
+        }
+        # هر معیار با یک اسکن بازه‌ای روی ایندکس user_id برای کل تکه
+        for row in db.fetchall(
+            "SELECT attacker_id, COUNT(*) AS attacks, "
+            "SUM(CASE WHEN winner_id = attacker_id THEN 1 ELSE 0 END) AS wins, "
+            "SUM(CASE WHEN winner_id = attacker_id THEN coins_won ELSE 0 END) AS loot "
+            "FROM battle_logs WHERE attacker_id BETWEEN ? AND ? GROUP BY attacker_id",
+            (first, last)
+        ):
+            if row['attacker_id'] in values:
+                values[row['attacker_id']].update(attacks=row['attacks'], wins=row['wins'], loot=row['loot'])
+        for row in db.fetchall(
+            "SELECT user_id, weapon_name, count FROM armory WHERE user_id BETWEEN ? AND ?", (first, last)
+        ):
+            if row['user_id'] in values:
+                values[row['user_id']]["power"] += weapon_power(row['weapon_name']) * row['count']
+        for row in db.fetchall(
+            "SELECT user_id, contribution_points FROM clan_members WHERE user_id BETWEEN ? AND ?", (first, last)
+        ):
+            if row['user_id'] in values:
+                values[row['user_id']]["donations"] = row['contribution_points'] or 0
+        
+        unlocked: Dict[int, Set[str]] = {}
+        for row in db.fetchall(
+            "SELECT user_id, achievement_id FROM achievements WHERE user_id BETWEEN ? AND ?", (first, last)
+        ):
+            unlocked.setdefault(row['user_id'], set()).add(row['achievement_id'])
+        
+        now = time.time()
+        rows = [
+            (user_id, rule.achievement_id, now)
+            for user_id, user_values in values.items()
+            for rule in evaluate(user_values, unlocked.get(user_id, set()), RULES_BY_METRIC)
+        ]
+        with db.get_cursor() as cursor:
+            cursor.executemany(
+                "INSERT INTO achievements (user_id, achievement_id, unlocked_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(user_id, achievement_id) DO NOTHING",
+                rows
+            )
+            cursor.execute(
+                "INSERT INTO settings (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (BACKFILL_KEY, str(last))
+            )
+        # کش کاربران این تکه دوباره خوانده شود تا دستاوردهای تازه را ببیند
+        for user_id in values:
+            self.users.pop(user_id, None)
+        return len(rows), last, False
+
+
+# نمونه سینگلتون
+achievements = AchievementEngine()
@@ -0,0 +1,32 @@
+# handlers/achievements.py
+"""
+دستاوردها: /achievements برای فهرست دستاوردها و پیشرفت، و متن اعلام دستاوردهای تازه
+"""
+
+from typing import List
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from database.models import add_user
+from utils.achievement_engine import achievements
+
+
+def unlock_lines(user_id: int) -> List[str]:
+    """خطوط اعلام دستاوردهایی که از آخرین فراخوانی باز شده‌اند"""
+    return [f"🏅 دستاورد جدید: {rule.title}" for rule in achievements.pop_recent(user_id)]
+
+
+async def achievements_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_user.id
+    add_user(user_id, update.effective_user.username)
+    progress = achievements.progress(user_id)
+    unlocked = sum(1 for _, _, done in progress if done)
+    lines = [f"🏅 <b>دستاوردها</b> ({unlocked}/{len(progress)})", ""]
+    for rule, value, done in progress:
+        if done:
+            lines.append(f"✅ {rule.title}")
+        else:
+            lines.append(f"🔒 {rule.title} — {min(value, rule.threshold):,}/{rule.threshold:,}")
+    achievements.pop_recent(user_id)
+    await update.message.reply_text("\n".join(lines), parse_mode="HTML")
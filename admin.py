@@ -4,6 +4,7 @@
 """
 
 import time
+import asyncio
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, CallbackQueryHandler, ConversationHandler, MessageHandler, filters
 from config.admin_config import SUPER_ADMIN_IDS, PERMISSIONS
@@ -11,6 +12,7 @@ from database.admin_db import get_admin_db
 from utils.logger import logger
 from utils.log_manager import get_log_manager
 from database.db import db
+from utils.leaderboard_service import leaderboards
 
 
 # States for conversations
@@ -47,6 +49,16 @@ def has_permission(user_id: int, permission: str) -> bool:
     return False
 
 
+def get_leader(metric: str):
+    """نفر اول یک معیار از لیدربرد در حافظه"""
+    top = leaderboards.top(metric, 1)
+    if not top:
+        return None
+    user_id, score = top[0]
+    row = db.fetchone("SELECT username FROM users WHERE user_id = ?", (user_id,))
+    return {"user_id": user_id, "username": row['username'] if row else None, metric: score}
+
+
 # ==================== صفحه اصلی Admin Panel ====================
 
 async def admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -189,11 +201,7 @@ async def show_user_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
     total_silver = db.fetchone("SELECT SUM(silver) as total FROM resources")['total'] or 0
     
     # ثروتمندترین کاربر
-    richest = db.fetchone(
-        "SELECT u.user_id, u.username, r.coins FROM users u "
-        "JOIN resources r ON u.user_id = r.user_id "
-        "ORDER BY r.coins DESC LIMIT 1"
-    )
+    richest = get_leader("coins")
     
     text = (
         "📊 <b>آمار کاربران</b>\n"
@@ -221,15 +229,20 @@ async def show_top_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
     
-    from database.db import db
-    
-    # 10 کاربر برتر از نظر سکه
-    top_users = db.fetchall(
-        "SELECT u.user_id, u.username, r.coins, r.iron, r.silver "
-        "FROM users u "
-        "JOIN resources r ON u.user_id = r.user_id "
-        "ORDER BY r.coins DESC LIMIT 10"
-    )
+    # 10 کاربر برتر از نظر سکه (ترتیب از لیدربرد در حافظه)
+    top_ids = [user_id for user_id, _ in leaderboards.top("coins", 10)]
+    top_users = []
+    if top_ids:
+        placeholders = ",".join("?" * len(top_ids))
+        rows = db.fetchall(
+            "SELECT u.user_id, u.username, r.coins, r.iron, r.silver "
+            "FROM users u "
+            "JOIN resources r ON u.user_id = r.user_id "
+            f"WHERE u.user_id IN ({placeholders})",
+            top_ids
+        )
+        by_id = {row['user_id']: row for row in rows}
+        top_users = [by_id[user_id] for user_id in top_ids if user_id in by_id]
     
     text = (
         "🏆 <b>کاربران برتر</b>\n"
@@ -317,7 +330,8 @@ async def show_system_status(update: Update, context: ContextTypes.DEFAULT_TYPE)
     from datetime import datetime
     
     # اطلاعات سیستم
-    cpu_percent = psutil.cpu_percent(interval=1)
+    # نمونه پایه در راه‌اندازی (utils/startup) گرفته شده؛ بدون بلاک کردن event loop
+    cpu_percent = psutil.cpu_percent(interval=None)
     memory = psutil.virtual_memory()
     disk = psutil.disk_usage('/')
     
@@ -337,12 +351,62 @@ async def show_system_status(update: Update, context: ContextTypes.DEFAULT_TYPE)
         f"🕐 <b>زمان:</b> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
     )
     
+    # پرهزینه‌ترین کوئری‌ها بر اساس زمان کل
+    from html import escape
+    from database.db import query_stats
+    top_queries = query_stats.top(5)
+    if top_queries:
+        text += "\n🐢 <b>پرهزینه‌ترین کوئری‌ها:</b>\n"
+        for fp, count, total, peak in top_queries:
+            short = fp if len(fp) <= 70 else fp[:67] + "..."
+            text += (
+                f"• <code>{escape(short)}</code>\n"
+                f"   {count:,}× | کل {total * 1000:,.0f}ms | حداکثر {peak * 1000:.1f}ms\n"
+            )
+    
     keyboard = [[InlineKeyboardButton("🔙 بازگشت", callback_data="admin_settings")]]
     reply_markup = InlineKeyboardMarkup(keyboard)
     
     await query.edit_message_text(text, reply_markup=reply_markup, parse_mode="HTML")
 
 
+async def show_performance(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """نمایش تأخیر handler ها، زمان DB و Bot API"""
+    query = update.callback_query
+    await query.answer()
+    
+    from utils.metrics import metrics
+    
+    rows = metrics.handler_summary()[:12]
+    uptime = int(time.time() - metrics.started_at)
+    
+    text = (
+        "⏱️ <b>عملکرد</b>\n"
+        "━━━━━━━━━━━━━━━━━━\n\n"
+        f"🕐 از {uptime // 3600} ساعت و {uptime % 3600 // 60} دقیقه پیش\n"
+        f"🗄️ کوئری‌ها: <code>{metrics.db_query_us.count:,}</code> | "
+        f"p95: <code>{metrics.db_query_us.percentile(0.95) / 1000:.2f}ms</code>\n\n"
+    )
+    if not rows:
+        text += "هنوز داده‌ای ثبت نشده است."
+    for name, hist, queries, db_ms, api_ms in rows:
+        errors = metrics.handler_errors.get(name, 0)
+        text += (
+            f"🔹 <code>{name}</code> × {hist.count:,}"
+            + (f" | ❌ {errors}" if errors else "") + "\n"
+            f"   p50 {hist.percentile(0.5) / 1000:.1f} | p95 {hist.percentile(0.95) / 1000:.1f} | "
+            f"p99 {hist.percentile(0.99) / 1000:.1f} ms\n"
+            f"   DB {queries:.1f} کوئری / {db_ms:.1f}ms | API {api_ms:.1f}ms\n"
+        )
+    
+    keyboard = [
+        [InlineKeyboardButton("🔄 بروزرسانی", callback_data="admin_performance")],
+        [InlineKeyboardButton("🔙 بازگشت", callback_data="admin_settings")]
+    ]
+    
+    await query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode="HTML")
+
+
 async def optimize_database(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """بهینه‌سازی دیتابیس"""
     query = update.callback_query
@@ -364,7 +428,7 @@ async def optimize_database(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
     except Exception as e:
         await query.answer(f"❌ خطا: {str(e)}", show_alert=True)
-        logger.error(f"Database optimization error: {e}")
+        logger.error("Database optimization error: %s", e)
 
 
 async def clear_cache(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -515,46 +579,23 @@ async def start_broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 async def process_broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """ارسال پیام به همه کاربران"""
+    """ثبت پیام همگانی در زمان‌بند (ارسال تکه‌تکه و قابل ادامه بعد از ری‌استارت)"""
+    from utils.broadcaster import schedule_broadcast
     message_text = update.message.text
     user_id = update.effective_user.id
     
-    # گرفتن لیست کاربران
-    users = db.fetchall("SELECT user_id FROM users")
-    
-    success_count = 0
-    fail_count = 0
-    
-    await update.message.reply_text(
-        f"⏳ در حال ارسال به {len(users)} کاربر...\n"
-        "لطفاً صبر کنید..."
-    )
-    
-    for user in users:
-        try:
-            await context.bot.send_message(
-                chat_id=user['user_id'],
-                text=f"📢 <b>پیام از ادمین:</b>\n\n{message_text}",
-                parse_mode="HTML"
-            )
-            success_count += 1
-        except Exception as e:
-            fail_count += 1
-            logger.debug(f"Failed to send to {user['user_id']}: {e}")
+    row = db.fetchone("SELECT COUNT(*) AS c FROM users")
+    schedule_broadcast(f"📢 <b>پیام از ادمین:</b>\n\n{message_text}", admin_id=user_id)
     
     # لاگ
     log_manager = get_log_manager()
     if log_manager:
-        await log_manager.log_admin_action(
-            user_id,
-            f"ارسال پیام همگانی: {success_count} موفق، {fail_count} ناموفق"
-        )
+        await log_manager.log_admin_action(user_id, f"ارسال پیام همگانی به {row['c']} کاربر")
     
     await update.message.reply_text(
-        f"✅ <b>ارسال کامل شد!</b>\n\n"
-        f"✅ موفق: {success_count}\n"
-        f"❌ ناموفق: {fail_count}\n\n"
-        f"برای بازگشت: /admin",
+        f"⏳ پیام برای {row['c']} کاربر در صف ارسال قرار گرفت.\n"
+        "نتیجه بعد از پایان ارسال برای شما فرستاده می‌شود.\n\n"
+        "برای بازگشت: /admin",
         parse_mode="HTML"
     )
     
@@ -616,6 +657,7 @@ async def process_broadcast_reward(update: Update, context: ContextTypes.DEFAULT
             "UPDATE resources SET coins = coins + ?",
             (amount,)
         )
+    leaderboards.invalidate()
     
     # ارسال پیام به کاربران
     success_count = 0
@@ -771,6 +813,12 @@ async def process_edit_amount(update: Update, context: ContextTypes.DEFAULT_TYPE
             )
             action = "تنظیم"
     
+    if edit_type == "coins":
+        if is_add:
+            leaderboards.adjust("coins", target_user, amount)
+        else:
+            leaderboards.set("coins", target_user, amount)
+    
     # لاگ
     log_manager = get_log_manager()
     if log_manager:
@@ -982,6 +1030,159 @@ async def admin_events_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.edit_message_text(text, reply_markup=reply_markup, parse_mode="HTML")
 
 
+async def show_spawn_boss(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """انتخاب نوع باس جهانی"""
+    from utils.raid_engine import raid_engine, BOSS_TYPES
+    query = update.callback_query
+    await query.answer()
+    
+    boss = raid_engine.active_boss()
+    keyboard = [
+        [InlineKeyboardButton(f"{name} ({hp:,} HP)", callback_data=f"admin_boss_{boss_type}")]
+        for boss_type, (name, hp, _, _) in BOSS_TYPES.items()
+    ]
+    keyboard.append([InlineKeyboardButton("🔙 بازگشت", callback_data="admin_events")])
+    
+    text = "👹 <b>فعال‌سازی باس جهانی</b>\n━━━━━━━━━━━━━━━━━━\n\n"
+    if boss:
+        text += f"⚠️ باس فعال: {boss.name} (❤️ {boss.hp:,})\n\n"
+    text += "🔹 نوع باس را انتخاب کنید:"
+    await query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode="HTML")
+
+
+async def spawn_boss(update: Update, context: ContextTypes.DEFAULT_TYPE, boss_type: str):
+    """ایجاد باس جهانی"""
+    from utils.raid_engine import raid_engine
+    query = update.callback_query
+    
+    boss = raid_engine.spawn(boss_type)
+    if boss is None:
+        await query.answer("❌ نوع باس نامعتبر است!", show_alert=True)
+        return
+    await query.answer("✅ باس فعال شد!")
+    keyboard = [[InlineKeyboardButton("🔙 بازگشت", callback_data="admin_events")]]
+    await query.edit_message_text(
+        f"👹 <b>{boss.name}</b> وارد میدان شد!\n❤️ {boss.max_hp:,} HP",
+        reply_markup=InlineKeyboardMarkup(keyboard), parse_mode="HTML"
+    )
+    logger.info("Admin %s spawned boss #%s (%s)", query.from_user.id, boss.boss_id, boss_type)
+
+
+async def show_create_tournament(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """انتخاب نوع تورنمنت"""
+    from utils.tournament_engine import tournaments, PRESETS
+    query = update.callback_query
+    await query.answer()
+    
+    keyboard = [
+        [InlineKeyboardButton(name, callback_data=f"admin_tournament_{preset}")]
+        for preset, (name, _, _) in PRESETS.items()
+    ]
+    keyboard.append([InlineKeyboardButton("🔙 بازگشت", callback_data="admin_events")])
+    
+    text = "🏆 <b>ایجاد تورنمنت</b>\n━━━━━━━━━━━━━━━━━━\n\n"
+    for tournament in tournaments.current():
+        state = "🟢" if tournament.status == "active" else "🕒"
+        text += f"{state} {tournament.name} — {len(tournament.standings):,} شرکت‌کننده\n"
+    text += "\n🔹 نوع تورنمنت را انتخاب کنید:"
+    await query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode="HTML")
+
+
+async def create_tournament(update: Update, context: ContextTypes.DEFAULT_TYPE, preset: str):
+    """ایجاد تورنمنت"""
+    from datetime import datetime
+    from utils.tournament_engine import tournaments
+    query = update.callback_query
+    
+    tournament = tournaments.create(preset)
+    if tournament is None:
+        await query.answer("❌ نوع تورنمنت نامعتبر است!", show_alert=True)
+        return
+    await query.answer("✅ تورنمنت ایجاد شد!")
+    keyboard = [[InlineKeyboardButton("🔙 بازگشت", callback_data="admin_events")]]
+    await query.edit_message_text(
+        f"🏆 <b>{tournament.name}</b> ایجاد شد!\n"
+        f"🕒 شروع: {datetime.fromtimestamp(tournament.start_time).strftime('%Y-%m-%d %H:%M')}\n"
+        f"🏁 پایان: {datetime.fromtimestamp(tournament.end_time).strftime('%Y-%m-%d %H:%M')}\n\n"
+        f"کاربران با /tournament ثبت‌نام می‌کنند.",
+        reply_markup=InlineKeyboardMarkup(keyboard), parse_mode="HTML"
+    )
+    logger.info("Admin %s created tournament #%s (%s)", query.from_user.id, tournament.tournament_id, preset)
+
+
+async def show_create_event(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """انتخاب نوع و زمان شروع رویداد زمان‌دار"""
+    from utils.timed_events import EVENT_TYPES
+    query = update.callback_query
+    await query.answer()
+    
+    keyboard = [
+        [
+            InlineKeyboardButton(f"▶️ {spec.title}", callback_data=f"admin_tevent_{event_type}_0"),
+            InlineKeyboardButton("🕒 1 ساعت دیگر", callback_data=f"admin_tevent_{event_type}_3600"),
+        ]
+        for event_type, spec in EVENT_TYPES.items()
+    ]
+    keyboard.append([InlineKeyboardButton("🔙 بازگشت", callback_data="admin_events")])
+    await query.edit_message_text(
+        "🎯 <b>ایجاد رویداد</b>\n━━━━━━━━━━━━━━━━━━\n\n"
+        "🔹 نوع رویداد و زمان شروع را انتخاب کنید:",
+        reply_markup=InlineKeyboardMarkup(keyboard), parse_mode="HTML"
+    )
+
+
+async def create_timed_event(update: Update, context: ContextTypes.DEFAULT_TYPE, event_type: str, delay: int):
+    """ایجاد رویداد زمان‌دار"""
+    from utils.timed_events import timed_events
+    query = update.callback_query
+    
+    event = timed_events.create(event_type, delay)
+    if event is None:
+        await query.answer("❌ نوع رویداد نامعتبر است!", show_alert=True)
+        return
+    await query.answer("✅ رویداد ایجاد شد!")
+    await show_active_events(update, context)
+    logger.info("Admin %s created timed event #%s (%s)", query.from_user.id, event.event_id, event_type)
+
+
+async def show_active_events(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """رویدادهای جاری و زمان‌بندی شده با دکمه پایان"""
+    from datetime import datetime
+    from utils.timed_events import timed_events
+    query = update.callback_query
+    
+    keyboard = []
+    text = "📋 <b>رویدادهای فعال</b>\n━━━━━━━━━━━━━━━━━━\n\n"
+    events = timed_events.current()
+    for event in events:
+        state = "🟢" if event.status == "active" else "🕒"
+        text += (
+            f"{state} #{event.event_id} {event.spec.title}\n"
+            f"   {datetime.fromtimestamp(event.start_time).strftime('%m-%d %H:%M')} تا "
+            f"{datetime.fromtimestamp(event.end_time).strftime('%m-%d %H:%M')}\n"
+        )
+        keyboard.append([InlineKeyboardButton(
+            f"❌ پایان #{event.event_id}", callback_data=f"admin_tevent_end_{event.event_id}"
+        )])
+    if not events:
+        text += "رویداد فعالی وجود ندارد."
+    keyboard.append([InlineKeyboardButton("🔙 بازگشت", callback_data="admin_events")])
+    await query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode="HTML")
+
+
+async def end_timed_event(update: Update, context: ContextTypes.DEFAULT_TYPE, event_id: int):
+    """پایان زودهنگام رویداد (جایزه‌ها توسط زمان‌بند پرداخت می‌شود)"""
+    from utils.timed_events import timed_events
+    query = update.callback_query
+    
+    if not timed_events.end_now(event_id):
+        await query.answer("❌ رویداد پیدا نشد!", show_alert=True)
+        return
+    await query.answer("✅ رویداد پایان یافت و جوایز پرداخت می‌شود.")
+    await show_active_events(update, context)
+    logger.info("Admin %s ended timed event #%s", query.from_user.id, event_id)
+
+
 # ==================== بخش آمار ====================
 
 async def admin_stats_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -1056,6 +1257,7 @@ async def admin_settings_menu(update: Update, context: ContextTypes.DEFAULT_TYPE
             InlineKeyboardButton("📍 تنظیم گروه لاگ", callback_data="admin_set_log_group")
         ],
         [
+            InlineKeyboardButton("⏱️ عملکرد", callback_data="admin_performance"),
             InlineKeyboardButton("⚙️ پیکربندی بات", callback_data="admin_bot_config")
         ],
         [
@@ -1139,8 +1341,8 @@ async def backup_now(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if backup_manager:
             await query.answer("⏳ در حال ایجاد بکاپ...", show_alert=False)
             
-            # ایجاد بکاپ
-            backup_file = backup_manager.create_backup()
+            # ایجاد بکاپ (در thread جدا تا event loop بلاک نشود)
+            backup_file = await asyncio.to_thread(backup_manager.create_backup)
             
             # ارسال به گروه لاگ
             log_manager = get_log_manager()
@@ -1159,7 +1361,7 @@ async def backup_now(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await query.answer("❌ سیستم بکاپ در دسترس نیست!", show_alert=True)
     except Exception as e:
         await query.answer(f"❌ خطا: {str(e)}", show_alert=True)
-        logger.error(f"Backup error: {e}")
+        logger.error("Backup error: %s", e)
     
     # بازگشت به منوی بکاپ
     await admin_backup_menu(update, context)
@@ -1233,7 +1435,7 @@ async def cleanup_old_backups(update: Update, context: ContextTypes.DEFAULT_TYPE
             await query.answer("❌ سیستم بکاپ در دسترس نیست!", show_alert=True)
     except Exception as e:
         await query.answer(f"❌ خطا: {str(e)}", show_alert=True)
-        logger.error(f"Cleanup error: {e}")
+        logger.error("Cleanup error: %s", e)
     
     # بازگشت به منوی بکاپ
     await admin_backup_menu(update, context)
@@ -1299,7 +1501,7 @@ async def send_backup_file(update: Update, context: ContextTypes.DEFAULT_TYPE):
             f"❌ خطا در ارسال بکاپ:\n<code>{str(e)}</code>",
             parse_mode="HTML"
         )
-        logger.error(f"Backup send error: {e}")
+        logger.error("Backup send error: %s", e)
 
 
 async def handle_user_edit_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -1343,6 +1545,12 @@ async def handle_user_edit_input(update: Update, context: ContextTypes.DEFAULT_T
                 )
                 action = "تنظیم"
         
+        if edit_type == "coins":
+            if is_add:
+                leaderboards.adjust("coins", target_user, amount)
+            else:
+                leaderboards.set("coins", target_user, amount)
+        
         # لاگ
         log_manager = get_log_manager()
         if log_manager:
@@ -1378,7 +1586,7 @@ async def handle_user_edit_input(update: Update, context: ContextTypes.DEFAULT_T
             f"❌ خطا در ویرایش:\n<code>{str(e)}</code>",
             parse_mode="HTML"
         )
-        logger.error(f"Edit error: {e}")
+        logger.error("Edit error: %s", e)
 
 
 # ==================== Handler اصلی Callbacks ====================
@@ -1653,7 +1861,7 @@ async def receive_group_id(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 parse_mode="HTML"
             )
         except Exception as e:
-            logger.error(f"Error setting up log group: {e}")
+            logger.error("Error setting up log group: %s", e)
             await update.message.reply_text(
                 f"⚠️ گروه تنظیم شد اما خطا در ایجاد Topic ها:\n\n"
                 f"<code>{str(e)}</code>\n\n"
@@ -1805,11 +2013,7 @@ async def show_war_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
     total_wars = total_wins + total_losses
     
     # بهترین جنگجو
-    best_warrior = db.fetchone(
-        "SELECT u.user_id, u.username, r.wins FROM users u "
-        "JOIN resources r ON u.user_id = r.user_id "
-        "ORDER BY r.wins DESC LIMIT 1"
-    )
+    best_warrior = get_leader("wins")
     
     text = (
         "⚔️ <b>آمار جنگ‌ها</b>\n"
@@ -1845,11 +2049,7 @@ async def show_economy_analysis(update: Update, context: ContextTypes.DEFAULT_TY
     avg_coins = db.fetchone("SELECT AVG(coins) as avg FROM resources")['avg'] or 0
     
     # ثروتمندترین کاربر
-    richest = db.fetchone(
-        "SELECT u.user_id, u.username, r.coins FROM users u "
-        "JOIN resources r ON u.user_id = r.user_id "
-        "ORDER BY r.coins DESC LIMIT 1"
-    )
+    richest = get_leader("coins")
     
     text = (
         "💰 <b>تحلیل اقتصادی</b>\n"
@@ -1928,7 +2128,8 @@ async def handle_user_management(update: Update, context: ContextTypes.DEFAULT_T
                 "CREATE TABLE IF NOT EXISTS banned_users (user_id INTEGER PRIMARY KEY, banned_at REAL, reason TEXT)"
             )
             cursor.execute(
-                "INSERT OR REPLACE INTO banned_users (user_id, banned_at, reason) VALUES (?, ?, ?)",
+                "INSERT INTO banned_users (user_id, banned_at, reason) VALUES (?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET banned_at=excluded.banned_at, reason=excluded.reason",
                 (target_user_id, time.time(), f"Banned by admin {admin_id}")
             )
         
@@ -2031,6 +2232,7 @@ async def confirm_delete_user(update: Update, context: ContextTypes.DEFAULT_TYPE
             cursor.execute("DELETE FROM resources WHERE user_id = ?", (target_user_id,))
             cursor.execute("DELETE FROM armory WHERE user_id = ?", (target_user_id,))
             cursor.execute("DELETE FROM armory_meta WHERE user_id = ?", (target_user_id,))
+        leaderboards.remove_user(target_user_id)
         
         log_manager = get_log_manager()
         if log_manager:
@@ -2135,6 +2337,8 @@ async def admin_callback_handler(update: Update, context: ContextTypes.DEFAULT_T
         await optimize_database(update, context)
     elif data == "admin_clear_cache":
         await clear_cache(update, context)
+    elif data == "admin_performance":
+        await show_performance(update, context)
     
     # ==================== بکاپ ====================
     elif data == "admin_backup_now":
@@ -2165,13 +2369,29 @@ async def admin_callback_handler(update: Update, context: ContextTypes.DEFAULT_T
         await show_economy_analysis(update, context)
     elif data == "admin_send_announcement":
         return await start_send_announcement(update, context)
+    elif data == "admin_spawn_boss":
+        await show_spawn_boss(update, context)
+    elif data.startswith("admin_boss_"):
+        await spawn_boss(update, context, data[len("admin_boss_"):])
+    elif data in ("admin_create_event", "admin_schedule_event"):
+        await show_create_event(update, context)
+    elif data in ("admin_active_events", "admin_end_event"):
+        await query.answer()
+        await show_active_events(update, context)
+    elif data.startswith("admin_tevent_end_"):
+        await end_timed_event(update, context, int(data[len("admin_tevent_end_"):]))
+    elif data.startswith("admin_tevent_"):
+        event_type, delay = data[len("admin_tevent_"):].rsplit("_", 1)
+        await create_timed_event(update, context, event_type, int(delay))
+    elif data == "admin_create_tournament":
+        await show_create_tournament(update, context)
+    elif data.startswith("admin_tournament_"):
+        await create_tournament(update, context, data[len("admin_tournament_"):])
     
     # باقی اپشن‌های موقت
     elif data in [
         "admin_economy_chart", "admin_set_discount",
-        "admin_create_event", "admin_active_events", "admin_spawn_boss",
-        "admin_create_tournament", "admin_schedule_event", "admin_event_rewards",
-        "admin_event_stats", "admin_end_event",
+        "admin_event_rewards", "admin_event_stats",
         "admin_activity_chart", "admin_leaderboard", "admin_clan_stats",
         "admin_popular_items", "admin_edit_messages", "admin_content", "admin_security",
         "admin_backup_download", "admin_backup_settings", "admin_backup_stats"
@@ -138,7 +138,7 @@ async def process_broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE):
             success_count += 1
         except Exception as e:
             fail_count += 1
-            logger.debug(f"Failed to send to {user['user_id']}: {e}")
+            logger.debug("Failed to send to %s: %s", user['user_id'], e)
     
     # لاگ
     log_manager = get_log_manager()
@@ -21,6 +21,9 @@ class AdminDatabase:
     
     def _ensure_tables(self):
         """ایجاد جداول مورد نیاز"""
+        if db.dialect != "sqlite":
+            # در Postgres این جداول بخشی از schema اصلی هستند
+            return
         with db.get_cursor() as cursor:
             # جدول ادمین‌ها
             cursor.execute("""
@@ -55,7 +58,7 @@ class AdminDatabase:
                 with open(self.SETTINGS_FILE, 'r', encoding='utf-8') as f:
                     self.settings = json.load(f)
             except Exception as e:
-                logger.error(f"Error loading admin settings: {e}")
+                logger.error("Error loading admin settings: %s", e)
                 self.settings = {}
         else:
             self.settings = {}
@@ -67,7 +70,7 @@ class AdminDatabase:
             with open(self.SETTINGS_FILE, 'w', encoding='utf-8') as f:
                 json.dump(self.settings, f, ensure_ascii=False, indent=2)
         except Exception as e:
-            logger.error(f"Error saving admin settings: {e}")
+            logger.error("Error saving admin settings: %s", e)
     
     # ==================== مدیریت ادمین‌ها ====================
     
@@ -76,13 +79,16 @@ class AdminDatabase:
         try:
             with db.get_cursor() as cursor:
                 cursor.execute("""
-                    INSERT OR REPLACE INTO admins (user_id, username, role, added_by)
+                    INSERT INTO admins (user_id, username, role, added_by)
                     VALUES (?, ?, ?, ?)
+                    ON CONFLICT(user_id) DO UPDATE SET
+                        username=excluded.username, role=excluded.role,
+                        added_by=excluded.added_by, is_active=1
                 """, (user_id, username, role, added_by))
-            logger.info(f"Admin added: {user_id} by {added_by}")
+            logger.info("Admin added: %s by %s", user_id, added_by)
             return True
         except Exception as e:
-            logger.error(f"Error adding admin: {e}")
+            logger.error("Error adding admin: %s", e)
             return False
     
     def remove_admin(self, user_id: int) -> bool:
@@ -90,10 +96,10 @@ class AdminDatabase:
         try:
             with db.get_cursor() as cursor:
                 cursor.execute("UPDATE admins SET is_active = 0 WHERE user_id = ?", (user_id,))
-            logger.info(f"Admin removed: {user_id}")
+            logger.info("Admin removed: %s", user_id)
             return True
         except Exception as e:
-            logger.error(f"Error removing admin: {e}")
+            logger.error("Error removing admin: %s", e)
             return False
     
     def get_all_admins(self) -> List[Dict]:
@@ -124,10 +130,10 @@ class AdminDatabase:
         try:
             self.settings['log_group_id'] = group_id
             self._save_settings()
-            logger.info(f"Log group set to: {group_id}")
+            logger.info("Log group set to: %s", group_id)
             return True
         except Exception as e:
-            logger.error(f"Error setting log group: {e}")
+            logger.error("Error setting log group: %s", e)
             return False
     
     def get_log_group(self) -> Optional[int]:
@@ -141,7 +147,7 @@ class AdminDatabase:
             self._save_settings()
             return True
         except Exception as e:
-            logger.error(f"Error setting maintenance mode: {e}")
+            logger.error("Error setting maintenance mode: %s", e)
             return False
     
     def is_maintenance_mode(self) -> bool:
@@ -159,7 +165,7 @@ class AdminDatabase:
             self._save_settings()
             return True
         except Exception as e:
-            logger.error(f"Error setting {key}: {e}")
+            logger.error("Error setting %s: %s", key, e)
             return False
     
     # ==================== لاگ عملیات ====================
@@ -173,7 +179,7 @@ class AdminDatabase:
                     VALUES (?, ?, ?, ?)
                 """, (admin_id, action, target, details))
         except Exception as e:
-            logger.error(f"Error logging admin action: {e}")
+            logger.error("Error logging admin action: %s", e)
     
     def get_admin_logs(self, limit: int = 50) -> List[Dict]:
         """دریافت لاگ‌های اخیر"""
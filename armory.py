@@ -40,7 +40,7 @@ async def view_armory(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         await update.message.reply_text(message, reply_markup=armory_markup)
     
-    logger.info(f"User {user_id} viewed armory ({total}/{capacity})")
+    logger.info("User %s viewed armory (%s/%s)", user_id, total, capacity)
 
 
 async def upgrade_armory(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -0,0 +1,627 @@
+# database/backends.py
+"""
+Backend های ذخیره‌سازی: SQLite (پیش‌فرض) و PostgreSQL (asyncpg با connection pool)
+
+SQL فقط یک بار و به شکل مشترک نوشته می‌شود: placeholder های ? ، UPSERT با
+ON CONFLICT ... DO UPDATE / DO NOTHING و UPDATE شرطی (WHERE coins >= ?). هر دو
+backend همین رشته‌ها را اجرا می‌کنند؛ Postgres فقط ? را به $n تبدیل می‌کند.
+
+تراکنش تودرتو (get_cursor داخل get_cursor در همان thread) در هر دو backend همان اتصال
+تراکنش بیرونی را با یک SAVEPOINT استفاده می‌کند: تغییرات نوشته نشده بیرونی را می‌بیند و
+خطای آن فقط کار خودش را برمی‌گرداند. tests/test_backends.py همین رفتار را روی هر دو اجرا می‌کند.
+"""
+
+import asyncio
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Iterable, List, Optional
+
+from config.settings import DB_PATH, DB_WAL, STORAGE_BACKEND, DATABASE_URL, PG_POOL_MIN, PG_POOL_MAX
+from utils.logger import logger
+
+_SQL_TOKENS = re.compile(r"'(?:[^']|'')*'|\?")
+_ROWS_RETURNED = re.compile(r"^\s*(SELECT|WITH|VALUES|EXPLAIN)\b|\bRETURNING\b", re.IGNORECASE)
+
+
+@lru_cache(maxsize=4096)
+def to_postgres(query: str) -> str:
+    """? -> $1, $2, ... (بدون دست زدن به ? داخل رشته‌های SQL)"""
+    counter = 0
+    
+    def replace(match):
+        nonlocal counter
+        if match.group(0) != "?":
+            return match.group(0)
+        counter += 1
+        return f"${counter}"
+    
+    return _SQL_TOKENS.sub(replace, query)
+
+
+class SQLiteBackend:
+    """یک اتصال برای هر thread (رفتار قبلی database.db)"""
+    
+    dialect = "sqlite"
+    
+    def __init__(self, path: str = DB_PATH):
+        self.path = path
+        self._local = threading.local()
+    
+    def connection(self) -> sqlite3.Connection:
+        if not hasattr(self._local, 'connection'):
+            self._local.connection = sqlite3.connect(self.path)
+            self._local.connection.row_factory = sqlite3.Row
+            if DB_WAL:
+                # چند پروسس worker همزمان می‌خوانند و یکی یکی می‌نویسند
+                self._local.connection.execute("PRAGMA journal_mode=WAL")
+                self._local.connection.execute("PRAGMA synchronous=NORMAL")
+            logger.debug("New database connection created for thread %s", threading.current_thread().name)
+        return self._local.connection
+    
+    @contextmanager
+    def transaction(self):
+        conn = self.connection()
+        depth = getattr(self._local, 'depth', 0)
+        savepoint = f"sp_{depth}"
+        if depth:
+            if not conn.in_transaction:
+                # بدون BEGIN صریح، RELEASE آخرین SAVEPOINT کار تراکنش بیرونی را commit می‌کند
+                conn.execute("BEGIN")
+            conn.execute(f"SAVEPOINT {savepoint}")
+        cursor = conn.cursor()
+        self._local.depth = depth + 1
+        try:
+            yield cursor
+            if depth:
+                conn.execute(f"RELEASE SAVEPOINT {savepoint}")
+            else:
+                conn.commit()
+        except Exception:
+            if depth:
+                conn.execute(f"ROLLBACK TO SAVEPOINT {savepoint}")
+                conn.execute(f"RELEASE SAVEPOINT {savepoint}")
+            else:
+                conn.rollback()
+            raise
+        finally:
+            self._local.depth = depth
+            cursor.close()
+    
+    def close(self):
+        if hasattr(self._local, 'connection'):
+            self._local.connection.close()
+            delattr(self._local, 'connection')
+
+
+async def _wait(awaitable):
+    # pool.acquire شیء قابل await برمی‌گرداند نه coroutine؛ run_coroutine_threadsafe فقط coroutine می‌پذیرد
+    return await awaitable
+
+
+class PostgresCursor:
+    """رابط شبیه sqlite3.Cursor روی یک اتصال asyncpg داخل تراکنش"""
+    
+    def __init__(self, backend: "PostgresBackend", conn):
+        self._backend = backend
+        self._conn = conn
+        self._rows: List[Any] = []
+        self._pos = 0
+        self.rowcount = -1
+    
+    def execute(self, query: str, params: Iterable[Any] = ()):
+        sql = to_postgres(query)
+        if _ROWS_RETURNED.search(sql):
+            self._rows = self._backend.run(self._conn.fetch(sql, *params))
+            self.rowcount = len(self._rows)
+        else:
+            status = self._backend.run(self._conn.execute(sql, *params))
+            # "UPDATE 3" / "INSERT 0 1" -> تعداد ردیف‌ها
+            self._rows = []
+            self.rowcount = int(status.rsplit(" ", 1)[-1]) if status and status[-1].isdigit() else -1
+        self._pos = 0
+        return self
+    
+    def executemany(self, query: str, seq_of_params: Iterable[Iterable[Any]]):
+        rows = [tuple(params) for params in seq_of_params]
+        if rows:
+            self._backend.run(self._conn.executemany(to_postgres(query), rows))
+        self._rows = []
+        self.rowcount = len(rows)
+        return self
+    
+    def fetchone(self):
+        if self._pos >= len(self._rows):
+            return None
+        row = self._rows[self._pos]
+        self._pos += 1
+        return row
+    
+    def fetchall(self) -> List[Any]:
+        rows = self._rows[self._pos:]
+        self._pos = len(self._rows)
+        return rows
+    
+    def __iter__(self):
+        return iter(self.fetchall())
+    
+    def close(self):
+        self._rows = []
+
+
+class PostgresBackend:
+    """asyncpg با pool روی یک event loop جدا (thread پس‌زمینه)
+    
+    لایه مدل sync است؛ هر فراخوانی روی loop این backend اجرا و thread فراخواننده تا
+    نتیجه منتظر می‌ماند (مثل اتصال SQLite که هم بلاک می‌کرد). handler های یک پروسس همه
+    روی یک thread هستند و یکی‌یکی به دیتابیس می‌رسند؛ سود Postgres بین پروسس‌هاست:
+    worker های SHARD_WORKERS به جای قفل نوشتن کل فایل SQLite فقط روی ردیف‌های مشترک
+    منتظر هم می‌مانند. هر thread (event loop، refresh های asyncio.to_thread) یک اتصال
+    از pool برمی‌دارد، پس pool کوچک کافی است.
+    """
+    
+    dialect = "postgres"
+    
+    def __init__(self, dsn: str = DATABASE_URL, min_size: int = PG_POOL_MIN, max_size: int = PG_POOL_MAX):
+        try:
+            import asyncpg
+        except ImportError as e:
+            raise RuntimeError("STORAGE_BACKEND=postgres needs the asyncpg package") from e
+        
+        self.dsn = dsn
+        self._local = threading.local()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="postgres-loop", daemon=True)
+        self._thread.start()
+        self._pool = self.run(self._create_pool(asyncpg, min_size, max_size))
+        logger.info("PostgreSQL pool ready (%s-%s connections)", min_size, max_size)
+    
+    async def _create_pool(self, asyncpg, min_size: int, max_size: int):
+        # pool باید داخل loop خود backend ساخته شود تا اتصال‌هایش به همان loop تعلق داشته باشند
+        return await asyncpg.create_pool(self.dsn, min_size=min_size, max_size=max_size)
+    
+    def run(self, awaitable):
+        return asyncio.run_coroutine_threadsafe(_wait(awaitable), self._loop).result()
+    
+    @contextmanager
+    def transaction(self):
+        outer = getattr(self._local, 'conn', None)
+        # تراکنش تودرتو روی اتصال بیرونی می‌ماند (asyncpg آن را SAVEPOINT می‌کند)، مثل SQLite
+        conn = outer if outer is not None else self.run(self._pool.acquire())
+        self._local.conn = conn
+        try:
+            tx = conn.transaction()
+            self.run(tx.start())
+            try:
+                yield PostgresCursor(self, conn)
+                self.run(tx.commit())
+            except Exception:
+                self.run(tx.rollback())
+                raise
+        finally:
+            self._local.conn = outer
+            if outer is None:
+                self.run(self._pool.release(conn))
+    
+    def init_schema(self):
+        with self.transaction() as cursor:
+            for statement in POSTGRES_SCHEMA:
+                cursor.execute(statement)
+    
+    def close(self):
+        if self._pool is not None:
+            self.run(self._pool.close())
+            self._pool = None
+
+
+# شناسه‌های تلگرام از 2^31 بزرگ‌ترند: BIGINT
+POSTGRES_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        user_id BIGINT PRIMARY KEY,
+        username TEXT,
+        factory_level INTEGER DEFAULT 1,
+        crafting_level INTEGER DEFAULT 1
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS resources (
+        user_id BIGINT PRIMARY KEY REFERENCES users(user_id),
+        iron BIGINT DEFAULT 0,
+        silver BIGINT DEFAULT 0,
+        coins BIGINT DEFAULT 0,
+        mining_started INTEGER DEFAULT 0,
+        last_iron DOUBLE PRECISION DEFAULT 0,
+        last_silver DOUBLE PRECISION DEFAULT 0,
+        last_daily DOUBLE PRECISION DEFAULT 0,
+        power BIGINT DEFAULT 0,
+        wins INTEGER DEFAULT 0,
+        losses INTEGER DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS armory (
+        user_id BIGINT REFERENCES users(user_id),
+        weapon_name TEXT,
+        count BIGINT DEFAULT 0,
+        PRIMARY KEY (user_id, weapon_name)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS armory_meta (
+        user_id BIGINT PRIMARY KEY REFERENCES users(user_id),
+        level INTEGER DEFAULT 1,
+        capacity BIGINT DEFAULT 5
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS bank (
+        user_id BIGINT PRIMARY KEY REFERENCES users(user_id),
+        balance BIGINT DEFAULT 0,
+        last_interest DOUBLE PRECISION DEFAULT 0,
+        loan BIGINT DEFAULT 0,
+        loan_date DOUBLE PRECISION DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS banned_users (
+        user_id BIGINT PRIMARY KEY,
+        banned_at DOUBLE PRECISION DEFAULT 0,
+        banned_by BIGINT DEFAULT NULL,
+        reason TEXT DEFAULT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS battle_logs (
+        id BIGSERIAL PRIMARY KEY,
+        attacker_id BIGINT NOT NULL,
+        defender_id BIGINT NOT NULL,
+        winner_id BIGINT NOT NULL,
+        attacker_power BIGINT,
+        defender_power BIGINT,
+        coins_won BIGINT DEFAULT 0,
+        timestamp DOUBLE PRECISION DEFAULT 0
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_battle_logs_attacker ON battle_logs (attacker_id)",
+    """
+    CREATE TABLE IF NOT EXISTS transfers (
+        id BIGSERIAL PRIMARY KEY,
+        sender_id BIGINT NOT NULL REFERENCES users(user_id),
+        receiver_id BIGINT NOT NULL REFERENCES users(user_id),
+        amount BIGINT NOT NULL,
+        date TEXT NOT NULL,
+        timestamp DOUBLE PRECISION NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_transfers_sender_date ON transfers (sender_id, date)",
+    """
+    CREATE TABLE IF NOT EXISTS revenge_used (
+        user_id BIGINT REFERENCES users(user_id),
+        battle_log_id BIGINT REFERENCES battle_logs(id),
+        PRIMARY KEY (user_id, battle_log_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS production_queue (
+        user_id BIGINT REFERENCES users(user_id),
+        weapon_name TEXT NOT NULL,
+        started_at DOUBLE PRECISION NOT NULL,
+        completed INTEGER DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS pvp_ratings (
+        user_id BIGINT PRIMARY KEY,
+        rating INTEGER DEFAULT 1000,
+        wins INTEGER DEFAULT 0,
+        losses INTEGER DEFAULT 0,
+        total_fights INTEGER DEFAULT 0,
+        updated_at DOUBLE PRECISION DEFAULT 0
+    )
+    """,
+    "ALTER TABLE pvp_ratings ADD COLUMN IF NOT EXISTS updated_at DOUBLE PRECISION DEFAULT 0",
+    "CREATE INDEX IF NOT EXISTS idx_pvp_ratings_updated ON pvp_ratings (updated_at)",
+    """
+    CREATE TABLE IF NOT EXISTS pvp_cooldowns (
+        user_id BIGINT PRIMARY KEY,
+        last_battle DOUBLE PRECISION DEFAULT 0,
+        shield_until DOUBLE PRECISION DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS admins (
+        user_id BIGINT PRIMARY KEY,
+        username TEXT,
+        role TEXT DEFAULT 'admin',
+        added_by BIGINT,
+        added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        is_active INTEGER DEFAULT 1
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS admin_logs (
+        id BIGSERIAL PRIMARY KEY,
+        admin_id BIGINT,
+        action TEXT,
+        target TEXT,
+        details TEXT,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS market_listings (
+        listing_id BIGSERIAL PRIMARY KEY,
+        seller_id BIGINT NOT NULL REFERENCES users(user_id),
+        buyer_id BIGINT REFERENCES users(user_id),
+        item_type TEXT NOT NULL,
+        item_name TEXT NOT NULL,
+        quantity INTEGER NOT NULL,
+        price BIGINT NOT NULL,
+        status TEXT DEFAULT 'active',
+        listed_at DOUBLE PRECISION NOT NULL,
+        sold_at DOUBLE PRECISION
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_market_active
+    ON market_listings (status, item_name, price, listing_id)
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS trade_offers (
+        offer_id BIGSERIAL PRIMARY KEY,
+        from_user BIGINT NOT NULL REFERENCES users(user_id),
+        to_user BIGINT NOT NULL REFERENCES users(user_id),
+        offer_items BYTEA NOT NULL,
+        request_items BYTEA NOT NULL,
+        status TEXT DEFAULT 'pending',
+        created_at DOUBLE PRECISION NOT NULL,
+        completed_at DOUBLE PRECISION
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_trade_pending ON trade_offers (status, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_trade_to ON trade_offers (to_user, status)",
+    "CREATE INDEX IF NOT EXISTS idx_trade_from ON trade_offers (from_user, status)",
+    """
+    CREATE TABLE IF NOT EXISTS bosses (
+        boss_id BIGSERIAL PRIMARY KEY,
+        boss_type TEXT NOT NULL,
+        name TEXT NOT NULL,
+        max_hp BIGINT NOT NULL,
+        current_hp BIGINT NOT NULL,
+        spawn_time DOUBLE PRECISION NOT NULL,
+        end_time DOUBLE PRECISION NOT NULL,
+        status TEXT DEFAULT 'active'
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS boss_participants (
+        boss_id BIGINT REFERENCES bosses(boss_id),
+        user_id BIGINT REFERENCES users(user_id),
+        damage_dealt BIGINT DEFAULT 0,
+        attacks INTEGER DEFAULT 0,
+        attacked_at DOUBLE PRECISION,
+        rewards_claimed INTEGER DEFAULT 0,
+        chat_id BIGINT,
+        PRIMARY KEY (boss_id, user_id)
+    )
+    """,
+    "ALTER TABLE boss_participants ADD COLUMN IF NOT EXISTS chat_id BIGINT",
+    "CREATE INDEX IF NOT EXISTS idx_boss_damage ON boss_participants (boss_id, damage_dealt)",
+    """
+    CREATE TABLE IF NOT EXISTS raid_cooldowns (
+        user_id BIGINT PRIMARY KEY REFERENCES users(user_id),
+        last_hit DOUBLE PRECISION DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS campaign_progress (
+        user_id BIGINT PRIMARY KEY REFERENCES users(user_id),
+        current_stage INTEGER DEFAULT 1,
+        completed_stages INTEGER DEFAULT 0,
+        total_stars INTEGER DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS stage_completions (
+        user_id BIGINT REFERENCES users(user_id),
+        stage_id INTEGER,
+        stars INTEGER DEFAULT 0,
+        completed_at DOUBLE PRECISION,
+        PRIMARY KEY (user_id, stage_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS clans (
+        clan_id BIGSERIAL PRIMARY KEY,
+        name TEXT UNIQUE NOT NULL,
+        leader_id BIGINT NOT NULL REFERENCES users(user_id),
+        description TEXT DEFAULT '',
+        points BIGINT DEFAULT 0,
+        treasury_coins BIGINT DEFAULT 0,
+        treasury_iron BIGINT DEFAULT 0,
+        treasury_silver BIGINT DEFAULT 0,
+        level INTEGER DEFAULT 1,
+        created_at DOUBLE PRECISION DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS clan_members (
+        user_id BIGINT PRIMARY KEY REFERENCES users(user_id),
+        clan_id BIGINT NOT NULL REFERENCES clans(clan_id),
+        role TEXT DEFAULT 'member',
+        joined_at TEXT DEFAULT '',
+        contribution_coins BIGINT DEFAULT 0,
+        contribution_iron BIGINT DEFAULT 0,
+        contribution_silver BIGINT DEFAULT 0,
+        contribution_points BIGINT DEFAULT 0
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_clan_members_contrib
+    ON clan_members (clan_id, contribution_points DESC, user_id)
+    """,
+    """
+    CREATE OR REPLACE FUNCTION clan_contribution() RETURNS trigger AS $$
+    BEGIN
+        UPDATE clans SET
+            treasury_coins = treasury_coins + NEW.contribution_coins - OLD.contribution_coins,
+            treasury_iron = treasury_iron + NEW.contribution_iron - OLD.contribution_iron,
+            treasury_silver = treasury_silver + NEW.contribution_silver - OLD.contribution_silver,
+            points = points + NEW.contribution_points - OLD.contribution_points
+        WHERE clan_id = NEW.clan_id;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS clan_contribution ON clan_members",
+    """
+    CREATE TRIGGER clan_contribution
+    AFTER UPDATE OF contribution_coins, contribution_iron, contribution_silver, contribution_points
+    ON clan_members
+    FOR EACH ROW EXECUTE FUNCTION clan_contribution()
+    """,
+    # بدون REFERENCES: تاریخچه جنگ بعد از منحل شدن کلن باقی می‌ماند
+    """
+    CREATE TABLE IF NOT EXISTS clan_wars (
+        war_id BIGSERIAL PRIMARY KEY,
+        attacker_id BIGINT NOT NULL,
+        defender_id BIGINT NOT NULL,
+        status TEXT DEFAULT 'active',
+        start_time DOUBLE PRECISION NOT NULL,
+        end_time DOUBLE PRECISION NOT NULL,
+        attacker_score BIGINT DEFAULT 0,
+        defender_score BIGINT DEFAULT 0,
+        winner_id BIGINT DEFAULT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_clan_wars_active ON clan_wars (status, end_time)",
+    """
+    CREATE TABLE IF NOT EXISTS clan_missions (
+        mission_id BIGSERIAL PRIMARY KEY,
+        clan_id BIGINT NOT NULL,
+        mission_type TEXT NOT NULL,
+        description TEXT NOT NULL,
+        target BIGINT NOT NULL,
+        progress BIGINT DEFAULT 0,
+        reward BIGINT NOT NULL,
+        completed INTEGER DEFAULT 0,
+        created_at DOUBLE PRECISION DEFAULT 0
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_clan_missions_active ON clan_missions (clan_id, completed)",
+    """
+    CREATE TABLE IF NOT EXISTS missions (
+        user_id BIGINT REFERENCES users(user_id),
+        mission_type TEXT,
+        target BIGINT,
+        progress BIGINT DEFAULT 0,
+        claimed INTEGER DEFAULT 0,
+        date TEXT,
+        PRIMARY KEY (user_id, date)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS achievements (
+        user_id BIGINT REFERENCES users(user_id),
+        achievement_id TEXT,
+        unlocked_at DOUBLE PRECISION DEFAULT 0,
+        PRIMARY KEY (user_id, achievement_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS tournaments (
+        tournament_id BIGSERIAL PRIMARY KEY,
+        name TEXT NOT NULL,
+        start_time DOUBLE PRECISION NOT NULL,
+        end_time DOUBLE PRECISION NOT NULL,
+        status TEXT DEFAULT 'active'
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_tournaments_status ON tournaments (status, end_time)",
+    """
+    CREATE TABLE IF NOT EXISTS tournament_participants (
+        tournament_id BIGINT REFERENCES tournaments(tournament_id),
+        user_id BIGINT REFERENCES users(user_id),
+        score BIGINT DEFAULT 0,
+        final_rank INTEGER DEFAULT NULL,
+        PRIMARY KEY (tournament_id, user_id)
+    )
+    """,
+    "ALTER TABLE tournament_participants ADD COLUMN IF NOT EXISTS final_rank INTEGER DEFAULT NULL",
+    """
+    CREATE TABLE IF NOT EXISTS settings (
+        key TEXT PRIMARY KEY,
+        value TEXT DEFAULT ''
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS events (
+        event_id BIGSERIAL PRIMARY KEY,
+        event_type TEXT NOT NULL,
+        start_time DOUBLE PRECISION NOT NULL,
+        end_time DOUBLE PRECISION NOT NULL,
+        status TEXT DEFAULT 'active'
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS event_participants (
+        event_id BIGINT REFERENCES events(event_id),
+        user_id BIGINT REFERENCES users(user_id),
+        score BIGINT DEFAULT 0,
+        rewards_claimed INTEGER DEFAULT 0,
+        PRIMARY KEY (event_id, user_id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_event_participants_score ON event_participants (event_id, score DESC, user_id)",
+    """
+    CREATE TABLE IF NOT EXISTS wheel_spins (
+        user_id BIGINT PRIMARY KEY REFERENCES users(user_id),
+        last_spin DOUBLE PRECISION DEFAULT 0,
+        total_spins INTEGER DEFAULT 0,
+        free_spins_used INTEGER DEFAULT 0,
+        last_free_spin_date TEXT DEFAULT '',
+        streak_days INTEGER DEFAULT 0,
+        last_streak_date TEXT DEFAULT '',
+        bonus_spins INTEGER DEFAULT 0
+    )
+    """,
+    "ALTER TABLE wheel_spins ADD COLUMN IF NOT EXISTS bonus_spins INTEGER DEFAULT 0",
+    """
+    CREATE TABLE IF NOT EXISTS wheel_history (
+        id BIGSERIAL PRIMARY KEY,
+        user_id BIGINT NOT NULL REFERENCES users(user_id),
+        reward_type TEXT NOT NULL,
+        reward_emoji TEXT NOT NULL,
+        reward_description TEXT NOT NULL,
+        timestamp DOUBLE PRECISION NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_wheel_history_user ON wheel_history (user_id, id)",
+    "CREATE INDEX IF NOT EXISTS idx_wheel_history_timestamp ON wheel_history (timestamp)",
+    """
+    CREATE TABLE IF NOT EXISTS scheduled_jobs (
+        job_id TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        next_run DOUBLE PRECISION NOT NULL,
+        repeat_seconds DOUBLE PRECISION DEFAULT 0,
+        misfire TEXT DEFAULT 'run',
+        payload TEXT DEFAULT '{}',
+        runs INTEGER DEFAULT 0,
+        failures INTEGER DEFAULT 0,
+        last_run DOUBLE PRECISION DEFAULT 0,
+        last_duration DOUBLE PRECISION DEFAULT 0
+    )
+    """,
+]
+
+
+def create_backend(name: Optional[str] = None):
+    name = (name or STORAGE_BACKEND).lower()
+    if name in ("postgres", "postgresql"):
+        return PostgresBackend()
+    if name != "sqlite":
+        raise ValueError(f"Unknown STORAGE_BACKEND: {name}")
+    return SQLiteBackend()
@@ -3,11 +3,12 @@
 مدیریت بکاپ خودکار دیتابیس
 """
 
-import os
-import shutil
 import asyncio
+import os
+import sqlite3
 from datetime import datetime
 from typing import Optional
+from utils.scheduler import scheduler, Job, MISFIRE_RUN
 from utils.logger import logger
 
 
@@ -16,7 +17,7 @@ class BackupManager:
         self.db_path = db_path
         self.backup_dir = backup_dir
         self.interval = interval  # به ثانیه
-        self.task: Optional[asyncio.Task] = None
+        self.job: Optional[Job] = None
         
         # ایجاد دایرکتوری بکاپ
         os.makedirs(backup_dir, exist_ok=True)
@@ -28,13 +29,19 @@ class BackupManager:
             backup_filename = f"backup_{timestamp}.db"
             backup_path = os.path.join(self.backup_dir, backup_filename)
             
-            # کپی فایل دیتابیس
-            shutil.copy2(self.db_path, backup_path)
+            # backup API از SQLite؛ محتوای WAL و نوشتن همزمان worker ها را هم پوشش می‌دهد
+            source = sqlite3.connect(self.db_path)
+            target = sqlite3.connect(backup_path)
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+                source.close()
             
-            logger.info(f"Backup created: {backup_path}")
+            logger.info("Backup created: %s", backup_path)
             return backup_path
         except Exception as e:
-            logger.error(f"Failed to create backup: {e}")
+            logger.error("Failed to create backup: %s", e)
             return None
     
     def cleanup_old_backups(self, keep_last: int = 10):
@@ -49,49 +56,46 @@ class BackupManager:
             for backup in backups[keep_last:]:
                 backup_path = os.path.join(self.backup_dir, backup)
                 os.remove(backup_path)
-                logger.info(f"Deleted old backup: {backup}")
+                logger.info("Deleted old backup: %s", backup)
         except Exception as e:
-            logger.error(f"Failed to cleanup backups: {e}")
+            logger.error("Failed to cleanup backups: %s", e)
     
-    async def auto_backup_loop(self):
-        """حلقه بکاپ خودکار"""
+    async def auto_backup(self, job: Job):
+        """یک نوبت بکاپ خودکار (کار تکراری زمان‌بند)"""
         from utils.log_manager import get_log_manager
         
-        logger.info(f"Auto backup started (interval: {self.interval}s)")
+        # ایجاد بکاپ (کپی کامل فایل؛ در thread جدا تا event loop بلاک نشود)
+        backup_path = await asyncio.to_thread(self.create_backup)
         
-        while True:
-            try:
-                await asyncio.sleep(self.interval)
-                
-                # ایجاد بکاپ
-                backup_path = self.create_backup()
-                
-                if backup_path:
-                    # پاک‌سازی بکاپ‌های قدیمی
-                    self.cleanup_old_backups(keep_last=10)
-                    
-                    # ارسال به گروه لاگ
-                    log_manager = get_log_manager()
-                    if log_manager:
-                        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                        caption = f"💾 بکاپ خودکار\n🕐 {timestamp}"
-                        await log_manager.send_backup(backup_path, caption)
-                    
-                    logger.info("Auto backup completed successfully")
-            except Exception as e:
-                logger.error(f"Error in auto backup loop: {e}")
+        if backup_path:
+            # پاک‌سازی بکاپ‌های قدیمی
+            self.cleanup_old_backups(keep_last=10)
+            
+            # ارسال به گروه لاگ
+            log_manager = get_log_manager()
+            if log_manager:
+                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                caption = f"💾 بکاپ خودکار\n🕐 {timestamp}"
+                await log_manager.send_backup(backup_path, caption)
+            
+            logger.info("Auto backup completed successfully")
     
     def start(self):
-        """شروع بکاپ خودکار"""
-        if self.task is None or self.task.done():
-            loop = asyncio.get_event_loop()
-            self.task = loop.create_task(self.auto_backup_loop())
-            logger.info("Backup manager started")
+        """شروع بکاپ خودکار
+        
+        نوبت بعدی در scheduled_jobs ذخیره می‌شود تا ری‌استارت‌های پشت سر هم بکاپ
+        را عقب نیندازند؛ نوبت جا مانده یک بار اجرا می‌شود.
+        """
+        if self.job is None:
+            scheduler.register("backup", self.auto_backup)
+            self.job = scheduler.every("backup", self.interval, kind="backup", misfire=MISFIRE_RUN, persistent=True)
+            logger.info("Backup manager started (interval: %ss)", self.interval)
     
     def stop(self):
         """توقف بکاپ خودکار"""
-        if self.task and not self.task.done():
-            self.task.cancel()
+        if self.job is not None:
+            scheduler.cancel("backup", persisted=False)
+            self.job = None
             logger.info("Backup manager stopped")
 
 
@@ -7,11 +7,10 @@ from telegram.ext import (
     MessageHandler,
     filters,
 )
-from datetime import datetime
-import os, json
-from threading import Lock
 from database.db import db
-from utils.logger import logger
+from database.models import transfer_coins, get_transferred_today
+from utils.locks import user_locks
+from utils.events import event_bus, TRANSFER
 
 # ------------------ تنظیمات ------------------
 MAX_DAILY_TRANSFER = 2000  # سقف روزانه
@@ -20,56 +19,13 @@ MAX_SINGLE_TRANSFER = 2000  # سقف هر تراکنش
 # مراحل گفت‌وگو
 ASK_AMOUNT, ASK_RECIPIENT, CONFIRM = range(3)
 
-# ------------------ Tracker انتقال روزانه ------------------
-_TRACK_FILE = os.path.join(os.path.dirname(__file__), "../data/transfer_log.json")
-_LOCK = Lock()
-os.makedirs(os.path.dirname(_TRACK_FILE), exist_ok=True)
-
-def _read_log():
-    if not os.path.exists(_TRACK_FILE):
-        return {}
-    try:
-        with open(_TRACK_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except:
-        return {}
-
-def _write_log(data):
-    with open(_TRACK_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-
-def get_transferred_today(user_id: int) -> int:
-    today = datetime.utcnow().strftime("%Y-%m-%d")
-    with _LOCK:
-        data = _read_log()
-        return data.get(str(user_id), {}).get(today, 0)
-
-def add_transfer(user_id: int, amount: int):
-    today = datetime.utcnow().strftime("%Y-%m-%d")
-    with _LOCK:
-        data = _read_log()
-        user_data = data.setdefault(str(user_id), {})
-        user_data[today] = user_data.get(today, 0) + amount
-        _write_log(data)
-
 # ------------------ توابع دیتابیس ------------------
+# مجموع انتقال روزانه از جدول transfers خوانده می‌شود (get_transferred_today در models)
 
 def get_user_by_tg_id(tg_id: int):
     result = db.fetchone("SELECT * FROM resources WHERE user_id = ?", (tg_id,))
     return result
 
-def add_coins(tg_id: int, amount: int):
-    db.execute("UPDATE resources SET coins = coins + ? WHERE user_id = ?", (amount, tg_id))
-    logger.debug(f"Added {amount} coins to user {tg_id}")
-
-def remove_coins(tg_id: int, amount: int):
-    user = db.fetchone("SELECT coins FROM resources WHERE user_id = ?", (tg_id,))
-    if not user or user["coins"] < amount:
-        return False
-    db.execute("UPDATE resources SET coins = coins - ? WHERE user_id = ?", (amount, tg_id))
-    logger.debug(f"Removed {amount} coins from user {tg_id}")
-    return True
-
 # ------------------ منوی بانک ------------------
 
 async def bank_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -181,12 +137,15 @@ async def do_transfer(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await query.edit_message_text("❌ کاربر یافت نشد.")
         return ConversationHandler.END
 
-    if not remove_coins(sender_id, amount):
-        await query.edit_message_text("💸 موجودی کافی نیست.")
-        return ConversationHandler.END
-
-    add_coins(recipient_id, amount)
-    add_transfer(sender_id, amount)
+    # کسر شرطی، واریز و ثبت در transfers (با بررسی سقف روزانه) در یک تراکنش
+    async with user_locks.hold(sender_id, recipient_id):
+        if not transfer_coins(sender_id, recipient_id, amount, daily_limit=MAX_DAILY_TRANSFER):
+            if get_transferred_today(sender_id) + amount > MAX_DAILY_TRANSFER:
+                await query.edit_message_text(f"🚫 سقف روزانه ({MAX_DAILY_TRANSFER}) پر شده است.")
+            else:
+                await query.edit_message_text("💸 موجودی کافی نیست.")
+            return ConversationHandler.END
+    event_bus.publish(TRANSFER, sender_id, amount, to_user=recipient_id)
 
     await query.edit_message_text("✅ انتقال با موفقیت انجام شد.")
     try:
@@ -0,0 +1,94 @@
+# utils/batch_writer.py
+"""
+نوشتن دسته‌ای (batched) در دیتابیس
+"""
+
+import time
+from typing import Any, Callable, List, Optional
+
+from utils.scheduler import scheduler, Job
+from utils.logger import logger
+
+_writers: List["BatchWriter"] = []
+
+
+class BatchWriter:
+    """بافر کردن رکوردها در حافظه و flush هر N رکورد یا هر T میلی‌ثانیه
+    
+    flush_fn لیست رکوردهای بافر شده را می‌گیرد و باید همه را در یک
+    تراکنش (با executemany) بنویسد. در صورت خطا رکوردها برای تلاش بعدی
+    به بافر برمی‌گردند. flush زمان‌دار یک کار یک‌باره در زمان‌بند مرکزی است که فقط
+    وقتی بافر خالی نیست وجود دارد.
+    """
+    
+    def __init__(self, name: str, flush_fn: Callable[[List[Any]], None],
+                 max_rows: int = 100, interval_ms: int = 1000, max_pending: int = 50000):
+        self.name = name
+        self.max_rows = max_rows
+        self.interval = interval_ms / 1000
+        self.max_pending = max_pending
+        self.job: Optional[Job] = None
+        self.total_flushed = 0
+        self._flush_fn = flush_fn
+        self._buffer: List[Any] = []
+        _writers.append(self)
+    
+    def __len__(self) -> int:
+        return len(self._buffer)
+    
+    def add(self, item: Any):
+        """افزودن یک رکورد به بافر"""
+        self._buffer.append(item)
+        self._ensure_job()
+        if len(self._buffer) >= self.max_rows:
+            self.flush()
+    
+    def flush(self) -> int:
+        """نوشتن همه رکوردهای بافر شده؛ تعداد نوشته‌شده را برمی‌گرداند"""
+        if not self._buffer:
+            return 0
+        
+        batch, self._buffer = self._buffer, []
+        try:
+            self._flush_fn(batch)
+        except Exception as e:
+            logger.error("Batch writer '%s' flush failed (%s rows): %s", self.name, len(batch), e)
+            self._buffer[:0] = batch
+            overflow = len(self._buffer) - self.max_pending
+            if overflow > 0:
+                del self._buffer[:overflow]
+                logger.error("Batch writer '%s' dropped %s oldest rows", self.name, overflow)
+            return 0
+        
+        self.total_flushed += len(batch)
+        return len(batch)
+    
+    def _ensure_job(self):
+        if self.job is None:
+            self.job = scheduler.at(
+                f"batch_writer:{self.name}", time.time() + self.interval, self._flush_job, name="batch_writer"
+            )
+    
+    def _flush_job(self, job: Job) -> Optional[float]:
+        self.flush()
+        if self._buffer:
+            return self.interval  # flush ناموفق؛ نوبت بعد دوباره
+        self.job = None
+        return None
+    
+    def stop(self):
+        """توقف flush زمان‌دار و نوشتن باقی‌مانده بافر"""
+        if self.job is not None:
+            scheduler.cancel(self.job.job_id, persisted=False)
+            self.job = None
+        self.flush()
+
+
+def stop_all_writers() -> int:
+    """توقف همه writer ها در خاموش شدن؛ تعداد رکوردهای flush شده را برمی‌گرداند"""
+    flushed = 0
+    for writer in _writers:
+        before = writer.total_flushed
+        writer.stop()
+        flushed += writer.total_flushed - before
+    return flushed
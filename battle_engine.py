@@ -0,0 +1,135 @@
+# utils/battle_engine.py
+"""
+محاسبات نبرد (بدون وابستگی به تلگرام و دیتابیس)
+"""
+
+import random
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from config.weapons import WEAPON_STATS
+
+STEAL_RATIO = 0.08
+VARIANCE = (0.9, 1.1)
+MAX_DEFENSE_LOSS = 2  # حداکثر تلفات هر پدافند در یک نبرد
+
+
+class BattleOutcome(NamedTuple):
+    final_attack: int
+    final_defense: int
+    damage: int
+    stolen: int
+    weapon_losses: Dict[str, int]
+    
+    @property
+    def attacker_won(self) -> bool:
+        return self.damage > 0 and self.stolen > 0
+
+
+class BattleEngine:
+    """محاسبه نتیجه نبرد با RNG قابل تزریق
+    
+    با یک random.Random با seed ثابت نتیجه‌ها تکرارپذیر هستند.
+    """
+    
+    def __init__(self, weapon_stats: Dict[str, Dict[str, int]] = WEAPON_STATS,
+                 steal_ratio: float = STEAL_RATIO, rng: Optional[random.Random] = None):
+        self.weapon_stats = weapon_stats
+        self.steal_ratio = steal_ratio
+        self.rng = rng or random.Random()
+    
+    def attack_power(self, weapon: str) -> int:
+        return self.weapon_stats.get(weapon, {}).get("attack", 0)
+    
+    def armory_power(self, armory: Sequence[Tuple[str, int]]) -> Tuple[int, int]:
+        """مجموع (حمله، دفاع) یک زرادخانه"""
+        atk = 0
+        dfs = 0
+        for name, qty in armory:
+            stats = self.weapon_stats.get(name)
+            if not stats:
+                continue
+            atk += stats.get("attack", 0) * qty
+            dfs += stats.get("defense", 0) * qty
+        return int(atk), int(dfs)
+    
+    def resolve(self, missile: str, defender_armory: Sequence[Tuple[str, int]],
+                defender_balance: int) -> BattleOutcome:
+        """نتیجه حمله با یک موشک به زرادخانه مدافع"""
+        atk_power = self.attack_power(missile)
+        _, def_power = self.armory_power(defender_armory)
+        
+        final_atk = int(atk_power * self.rng.uniform(*VARIANCE))
+        final_def = int(def_power * self.rng.uniform(*VARIANCE))
+        damage = max(0, final_atk - final_def)
+        stolen = min(defender_balance, max(0, int(damage * self.steal_ratio)))
+        
+        weapon_losses: Dict[str, int] = {}
+        if damage > 0:
+            for name, qty in defender_armory:
+                stats = self.weapon_stats.get(name)
+                if not stats or stats.get("defense", 0) <= 0 or qty <= 0:
+                    continue
+                loss = self.rng.randint(0, min(MAX_DEFENSE_LOSS, qty))
+                if loss > 0:
+                    weapon_losses[name] = weapon_losses.get(name, 0) + loss
+        
+        return BattleOutcome(final_atk, final_def, damage, stolen, weapon_losses)
+    
+    def simulate_batch(self, missiles: Sequence[str], defense_counts, balances, seed: Optional[int] = None):
+        """شبیه‌سازی برداری تعداد زیادی نبرد با NumPy
+        
+        missiles: نام موشک هر نبرد (طول n)
+        defense_counts: آرایه (n, k) تعداد هر پدافند به ترتیب defense_names()
+        balances: موجودی سکه مدافع در هر نبرد (طول n)
+        
+        خروجی دیکشنری آرایه‌ها: final_attack, final_defense, damage, stolen, losses, attacker_won
+        """
+        import numpy as np
+        
+        rng = np.random.default_rng(seed)
+        defense_counts = np.asarray(defense_counts, dtype=np.int64)
+        balances = np.asarray(balances, dtype=np.int64)
+        n = len(missiles)
+        
+        attack_lookup = {name: stats.get("attack", 0) for name, stats in self.weapon_stats.items()}
+        atk_power = np.fromiter((attack_lookup.get(m, 0) for m in missiles), dtype=np.int64, count=n)
+        defense_values = np.array(
+            [self.weapon_stats[name]["defense"] for name in self.defense_names()], dtype=np.int64
+        )
+        def_power = defense_counts @ defense_values
+        
+        final_atk = (atk_power * rng.uniform(*VARIANCE, size=n)).astype(np.int64)
+        final_def = (def_power * rng.uniform(*VARIANCE, size=n)).astype(np.int64)
+        damage = np.maximum(0, final_atk - final_def)
+        stolen = np.minimum(balances, (damage * self.steal_ratio).astype(np.int64))
+        
+        max_loss = np.minimum(MAX_DEFENSE_LOSS, defense_counts)
+        losses = rng.integers(0, max_loss + 1)
+        losses[damage == 0] = 0
+        
+        return {
+            "final_attack": final_atk,
+            "final_defense": final_def,
+            "damage": damage,
+            "stolen": stolen,
+            "losses": losses,
+            "attacker_won": (damage > 0) & (stolen > 0),
+        }
+    
+    def defense_names(self) -> List[str]:
+        """ترتیب ستون‌های defense_counts در simulate_batch"""
+        return [name for name, stats in self.weapon_stats.items() if stats.get("defense", 0) > 0]
+    
+    def sample_defense_counts(self, n: int, max_count: int = 10, density: float = 0.3, seed: Optional[int] = None):
+        """نمونه‌برداری تصادفی زرادخانه پدافندی برای شبیه‌سازی"""
+        import numpy as np
+        
+        rng = np.random.default_rng(seed)
+        k = len(self.defense_names())
+        counts = rng.integers(0, max_count + 1, size=(n, k))
+        counts[rng.random((n, k)) > density] = 0
+        return counts
+
+
+# نمونه پیش‌فرض برای هندلرها
+battle_engine = BattleEngine()
@@ -0,0 +1,104 @@
+# database/battle_log.py
+"""
+ثبت نتایج نبردها در battle_logs و بروزرسانی آمار برد/باخت
+"""
+
+import time
+from typing import Dict, List, NamedTuple
+
+from database.db import db
+from config.settings import BATTLE_LOG_BATCH_SIZE, BATTLE_LOG_FLUSH_MS
+from utils.batch_writer import BatchWriter
+from utils.clan_war_engine import clan_wars
+from utils.tournament_engine import tournaments
+from utils.leaderboard_service import leaderboards
+from utils.pvp_rating import rating_engine, DEFAULT_RATING, MIN_RATING
+from utils.logger import logger
+
+
+class BattleRecord(NamedTuple):
+    attacker_id: int
+    defender_id: int
+    winner_id: int
+    attacker_power: int
+    defender_power: int
+    coins_won: int
+    timestamp: float
+    attacker_rating_delta: int
+    defender_rating_delta: int
+
+
+def _flush_battles(batch: List[BattleRecord]):
+    """نوشتن یک دسته نبرد + برد/باخت‌ها و امتیازها در یک تراکنش"""
+    stats: Dict[int, List[int]] = {}
+    deltas: Dict[int, int] = {}
+    now = time.time()
+    for record in batch:
+        loser_id = record.defender_id if record.winner_id == record.attacker_id else record.attacker_id
+        stats.setdefault(record.winner_id, [0, 0])[0] += 1
+        stats.setdefault(loser_id, [0, 0])[1] += 1
+        # تغییر امتیاز افزایشی است تا flush worker های دیگر بازنویسی نشود
+        deltas[record.attacker_id] = deltas.get(record.attacker_id, 0) + record.attacker_rating_delta
+        deltas[record.defender_id] = deltas.get(record.defender_id, 0) + record.defender_rating_delta
+    
+    with db.get_cursor() as cursor:
+        cursor.executemany(
+            "INSERT INTO battle_logs "
+            "(attacker_id, defender_id, winner_id, attacker_power, defender_power, coins_won, timestamp) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [record[:7] for record in batch]
+        )
+        cursor.executemany(
+            "UPDATE resources SET wins = wins + ?, losses = losses + ? WHERE user_id = ?",
+            [(wins, losses, user_id) for user_id, (wins, losses) in stats.items()]
+        )
+        cursor.executemany(
+            """
+            INSERT INTO pvp_ratings (user_id, rating, wins, losses, total_fights, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET
+                rating = CASE WHEN pvp_ratings.rating + ? < ? THEN ? ELSE pvp_ratings.rating + ? END,
+                wins = pvp_ratings.wins + excluded.wins,
+                losses = pvp_ratings.losses + excluded.losses,
+                total_fights = pvp_ratings.total_fights + excluded.total_fights,
+                updated_at = excluded.updated_at
+            """,
+            [
+                (user_id, max(MIN_RATING, DEFAULT_RATING + deltas[user_id]), wins, losses, wins + losses, now,
+                 deltas[user_id], MIN_RATING, MIN_RATING, deltas[user_id])
+                for user_id, (wins, losses) in stats.items()
+            ]
+        )
+    
+    rating_engine.flushed({
+        user_id: (deltas[user_id], wins + losses) for user_id, (wins, losses) in stats.items()
+    })
+    for user_id, (wins, losses) in stats.items():
+        leaderboards.adjust("wins", user_id, wins)
+    
+    logger.debug("Flushed %s battles for %s users", len(batch), len(stats))
+
+
+battle_log_writer = BatchWriter(
+    "battle_logs",
+    _flush_battles,
+    max_rows=BATTLE_LOG_BATCH_SIZE,
+    interval_ms=BATTLE_LOG_FLUSH_MS
+)
+
+
+def record_battle(attacker_id: int, defender_id: int, winner_id: int,
+                  attacker_power: int, defender_power: int, coins_won: int,
+                  attacker_rating_delta: int, defender_rating_delta: int):
+    """ثبت نتیجه یک نبرد (نوشتن دسته‌ای و با تاخیر)
+    
+    تغییر امتیازها (نه مقدار نهایی) همراه همین دسته به امتیاز ذخیره شده اضافه می‌شوند.
+    """
+    now = time.time()
+    battle_log_writer.add(BattleRecord(
+        attacker_id, defender_id, winner_id,
+        attacker_power, defender_power, coins_won, now,
+        attacker_rating_delta, defender_rating_delta
+    ))
+    clan_wars.on_battle(attacker_id, defender_id, winner_id, now)
+    tournaments.on_battle(attacker_id, defender_id, winner_id, now)
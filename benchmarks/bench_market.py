@@ -0,0 +1,109 @@
+"""
+بنچمارک دفتر سفارش بازار (utils/order_book.py) روی دیتابیس موقت
+
+اجرا از ریشه پروژه:
+    python benchmarks/bench_market.py --listings 100000 --buys 20000
+"""
+
+import argparse
+import heapq
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+WEAPONS = ["💥 نور", "💥 سومار", "🎯 شهاب", "⚡ فتاح", "🪖 مرصاد", "🧱 تاد", "🪖 S-400"]
+
+
+def seed(listings: int, sellers: int, buyers: int, rng: random.Random):
+    from database.db import db, init_database
+    
+    init_database()
+    users = sellers + buyers
+    now = time.time()
+    with db.get_cursor() as cursor:
+        cursor.executemany(
+            "INSERT INTO users (user_id, username) VALUES (?, ?)",
+            ((uid, f"user{uid}") for uid in range(1, users + 1))
+        )
+        cursor.executemany(
+            "INSERT INTO resources (user_id, coins) VALUES (?, ?)",
+            ((uid, 10 ** 12 if uid > sellers else 0) for uid in range(1, users + 1))
+        )
+        cursor.executemany(
+            "INSERT INTO armory_meta (user_id, level, capacity) VALUES (?, ?, ?)",
+            ((uid, 1, 10 ** 9) for uid in range(1, users + 1))
+        )
+        cursor.executemany(
+            "INSERT INTO market_listings (seller_id, item_type, item_name, quantity, price, status, listed_at) "
+            "VALUES (?, 'weapon', ?, ?, ?, 'active', ?)",
+            ((rng.randint(1, sellers), rng.choice(WEAPONS), rng.randint(1, 10), rng.randint(50, 500), now + i)
+             for i in range(listings))
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--listings", type=int, default=100_000)
+    parser.add_argument("--sellers", type=int, default=10_000)
+    parser.add_argument("--buyers", type=int, default=1_000)
+    parser.add_argument("--buys", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    
+    workdir = tempfile.mkdtemp(prefix="bench-market-")
+    # مسیر دیتابیس هنگام import تنظیمات خوانده می‌شود
+    os.environ["DB_PATH"] = os.path.join(workdir, "users.db")
+    os.environ.setdefault("LOG_FILE", "")
+    os.environ.setdefault("METRICS_ENABLED", "0")
+    
+    from utils.logger import logger
+    from utils.order_book import market
+    
+    logger.setLevel("WARNING")
+    rng = random.Random(args.seed)
+    
+    start = time.perf_counter()
+    seed(args.listings, args.sellers, args.buyers, rng)
+    print(f"seed {args.listings:,} listings: {time.perf_counter() - start:.2f}s")
+    
+    start = time.perf_counter()
+    market.load()
+    print(f"load order books: {(time.perf_counter() - start) * 1000:.1f}ms")
+    
+    # فقط تطبیق در حافظه (بدون تسویه): برداشتن و برگرداندن آگهی‌ها
+    start = time.perf_counter()
+    for _ in range(args.buys):
+        book = market.books[rng.choice(WEAPONS)]
+        fills, popped = market._match(book, 0, rng.randint(1, 20), None)
+        for entry in popped:
+            heapq.heappush(book.heap, entry)
+    elapsed = time.perf_counter() - start
+    print(f"match only:        {args.buys / elapsed:12,.0f} orders/s  {elapsed / args.buys * 1e6:8.1f} µs/order")
+    
+    start = time.perf_counter()
+    for _ in range(100):
+        market.depth(rng.choice(WEAPONS), 5)
+    print(f"depth(5):          {(time.perf_counter() - start) / 100 * 1e6:8.1f} µs")
+    
+    # خرید کامل با تسویه در دیتابیس؛ هر خرید چند آگهی را کامل و حداکثر یکی را جزئی پر می‌کند
+    fills = 0
+    statuses = {}
+    start = time.perf_counter()
+    for _ in range(args.buys):
+        buyer = args.sellers + rng.randint(1, args.buyers)
+        before = len(market.listings)
+        result = market.buy(buyer, rng.choice(WEAPONS), rng.randint(1, 20))
+        statuses[result.status] = statuses.get(result.status, 0) + 1
+        fills += before - len(market.listings) + (1 if result.status == "ok" else 0)
+    elapsed = time.perf_counter() - start
+    print(f"buy + settle:      {args.buys / elapsed:12,.0f} orders/s  {elapsed / args.buys * 1e6:8.1f} µs/order")
+    print(f"                   {fills / elapsed:12,.0f} matches/s (~{fills:,} listing fills)  {statuses}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""
+بنچمارک لایه مدل دیتابیس (database/models.py) روی دیتابیس مصنوعی
+
+برای هر اندازه یک users.db موقت با کاربر، منابع و زرادخانه ساخته می‌شود و هر تابع
+جداگانه زمان‌گیری می‌شود. نتیجه به صورت JSON در benchmarks/results/<commit>.json ذخیره
+می‌شود تا منحنی مقیاس‌پذیری و پسرفت‌ها بین کامیت‌ها قابل مقایسه باشد.
+
+اجرا از ریشه پروژه:
+    python benchmarks/bench_models.py --sizes 10000,100000,1000000
+    python benchmarks/bench_models.py --sizes 10000 --compare benchmarks/results/abc1234.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+sys.path.insert(0, ROOT)
+
+SEED_WEAPONS = ["💥 نور", "💥 سومار", "🎯 شهاب", "⚡ فتاح", "🪖 مرصاد", "🧱 تاد", "🪖 S-400"]
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    samples = sorted(samples)
+    n = len(samples)
+    return {
+        "n": n,
+        "mean_us": round(sum(samples) / n * 1e6, 2),
+        "p50_us": round(samples[n // 2] * 1e6, 2),
+        "p95_us": round(samples[min(n - 1, int(n * 0.95))] * 1e6, 2),
+        "min_us": round(samples[0] * 1e6, 2),
+    }
+
+
+# ==================== Worker (یک اندازه در هر پروسس) ====================
+
+def seed_database(size: int, rng: random.Random):
+    """پر کردن دیتابیس با executemany در یک تراکنش"""
+    from database.db import db, init_database
+    
+    init_database()
+    now = time.time()
+    with db.get_cursor() as cursor:
+        cursor.executemany(
+            "INSERT INTO users (user_id, username) VALUES (?, ?)",
+            ((uid, f"user{uid}") for uid in range(1, size + 1))
+        )
+        cursor.executemany(
+            "INSERT INTO resources (user_id, iron, silver, coins, mining_started, last_iron, last_silver, "
+            "last_daily, wins, losses) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            ((uid, rng.randrange(500), rng.randrange(200), rng.randrange(100_000),
+              1 if rng.random() < 0.1 else 0, now, now, 0, rng.randrange(50), rng.randrange(50))
+             for uid in range(1, size + 1))
+        )
+        cursor.executemany(
+            "INSERT INTO armory_meta (user_id, level, capacity) VALUES (?, ?, ?)",
+            ((uid, 1, 1000) for uid in range(1, size + 1))
+        )
+        cursor.executemany(
+            "INSERT OR IGNORE INTO armory (user_id, weapon_name, count) VALUES (?, ?, ?)",
+            ((uid, weapon, rng.randint(1, 20))
+             for uid in range(1, size + 1)
+             for weapon in rng.sample(SEED_WEAPONS, rng.randint(1, 4)))
+        )
+
+
+def build_cases(size: int, rng: random.Random) -> List[Tuple[str, Callable[[], object], int]]:
+    """(نام، تابع بدون آرگومان، تعداد تکرار)"""
+    from database import models
+    from database.db import db
+    from utils.leaderboard_service import leaderboards
+    
+    def uid() -> int:
+        return rng.randint(1, size)
+    
+    new_ids = iter(range(size + 1, size + 10_000_000))
+    heavy = max(3, min(50, 2_000_000 // size))
+    
+    def admin_totals():
+        db.fetchone("SELECT COUNT(*) as count FROM users")
+        db.fetchone("SELECT SUM(coins) as total FROM resources")
+        db.fetchone("SELECT SUM(iron) as total FROM resources")
+        db.fetchone("SELECT SUM(silver) as total FROM resources")
+        db.fetchone("SELECT SUM(wins) as total FROM resources")
+        db.fetchone("SELECT SUM(losses) as total FROM resources")
+    
+    return [
+        ("user_exists", lambda: models.user_exists(uid()), 0),
+        ("add_user(new)", lambda: models.add_user(next(new_ids), "bench"), 0),
+        ("add_user(existing)", lambda: models.add_user(uid(), "bench"), 0),
+        ("get_resources", lambda: models.get_resources(uid()), 0),
+        ("get_user_money", lambda: models.get_user_money(uid()), 0),
+        ("update_user_money", lambda: models.update_user_money(uid(), 10), 0),
+        ("transfer_coins", lambda: models.transfer_coins(uid(), uid(), 1), 0),
+        ("add_resources", lambda: models.add_resources(uid(), iron=1, silver=1), 0),
+        ("start_mining", lambda: models.start_mining(uid()), 0),
+        ("is_mining_active", lambda: models.is_mining_active(uid()), 0),
+        ("update_mining_times", lambda: models.update_mining_times(uid(), time.time(), time.time()), 0),
+        ("get_last_daily", lambda: models.get_last_daily(uid()), 0),
+        ("claim_daily_reward", lambda: models.claim_daily_reward(uid(), 500), 0),
+        ("get_armory_meta", lambda: models.get_armory_meta(uid()), 0),
+        ("set_armory_meta", lambda: models.set_armory_meta(uid(), 1, 1000), 0),
+        ("get_armory_count", lambda: models.get_armory_count(uid()), 0),
+        ("get_armory_list", lambda: models.get_armory_list(uid()), 0),
+        ("add_weapon", lambda: models.add_weapon(uid(), rng.choice(SEED_WEAPONS), 1), 0),
+        ("apply_armory_deltas(10)", lambda: models.apply_armory_deltas(
+            {(uid(), rng.choice(SEED_WEAPONS)): 1 for _ in range(10)}), 0),
+        ("purchase_weapon", lambda: models.purchase_weapon(uid(), "💥 نور", 1, 60), 0),
+        ("upgrade_armory", lambda: models.upgrade_armory(uid()), 0),
+        ("get_mining_users", models.get_mining_users, heavy),
+        ("admin_totals", admin_totals, heavy),
+        ("admin_top10_by_coins", lambda: db.fetchall(
+            "SELECT user_id, coins FROM resources ORDER BY coins DESC LIMIT 10"), heavy),
+        ("leaderboards.load", leaderboards.load, max(3, heavy // 5)),
+    ]
+
+
+def run_worker(size: int, repeat: int, seed: int) -> Dict:
+    from utils.logger import logger
+    from utils.leaderboard_service import leaderboards
+    
+    logger.setLevel("WARNING")
+    rng = random.Random(seed)
+    
+    start = time.perf_counter()
+    seed_database(size, rng)
+    seed_seconds = time.perf_counter() - start
+    # ایندکس لیدربرد یک بار ساخته شود تا hook های مدل هزینه بارگذاری نداشته باشند
+    leaderboards.load()
+    
+    functions = {}
+    for name, fn, n in build_cases(size, rng):
+        fn()  # warm-up
+        samples = []
+        for _ in range(n or repeat):
+            t0 = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - t0)
+        functions[name] = summarize(samples)
+        print(f"  {name:<26} p50 {functions[name]['p50_us']:>12.1f} µs", file=sys.stderr)
+    
+    return {
+        "seed_s": round(seed_seconds, 2),
+        "db_bytes": os.path.getsize(os.environ["DB_PATH"]),
+        "functions": functions,
+    }
+
+
+# ==================== Driver ====================
+
+def print_scaling(results: Dict):
+    sizes = list(results["sizes"])
+    names = list(next(iter(results["sizes"].values()))["functions"])
+    print(f"\n{'p50 (µs)':<28}" + "".join(f"{int(s):>14,}" for s in sizes))
+    for name in names:
+        row = "".join(f"{results['sizes'][s]['functions'][name]['p50_us']:>14.1f}" for s in sizes)
+        print(f"{name:<28}{row}")
+
+
+def print_comparison(results: Dict, baseline_path: str):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\ncompare with {baseline.get('commit')} (p50 ratio, >1 = slower)")
+    for size, data in results["sizes"].items():
+        old = baseline["sizes"].get(size)
+        if not old:
+            continue
+        print(f"  size {int(size):,}")
+        for name, stats in data["functions"].items():
+            before = old["functions"].get(name)
+            if before and before["p50_us"]:
+                ratio = stats["p50_us"] / before["p50_us"]
+                flag = "  <-- regression" if ratio > 1.2 else ""
+                print(f"    {name:<26} {before['p50_us']:>10.1f} -> {stats['p50_us']:>10.1f} µs  x{ratio:.2f}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="تعداد کاربران، جدا شده با کاما")
+    parser.add_argument("--repeat", type=int, default=2000, help="تکرار برای توابع تک‌کاربره")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="مسیر فایل JSON (پیش‌فرض: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="فایل JSON یک اجرای قبلی برای مقایسه")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.repeat, args.seed)))
+        return
+    
+    commit = git_revision()
+    results = {
+        "commit": commit,
+        "timestamp": int(time.time()),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "machine": platform.machine(),
+        "repeat": args.repeat,
+        "sizes": {},
+    }
+    for size in (int(s) for s in args.sizes.split(",")):
+        print(f"size {size:,}", file=sys.stderr)
+        with tempfile.TemporaryDirectory(prefix="bench-models-") as workdir:
+            # هر اندازه در پروسس جدا اجرا می‌شود چون مسیر دیتابیس هنگام import خوانده می‌شود
+            env = dict(os.environ, DB_PATH=os.path.join(workdir, "users.db"))
+            output = subprocess.check_output(
+                [sys.executable, os.path.abspath(__file__), "--worker", str(size),
+                 "--repeat", str(args.repeat), "--seed", str(args.seed)],
+                env=env, cwd=workdir
+            )
+        results["sizes"][str(size)] = json.loads(output.decode().strip().splitlines()[-1])
+    
+    output_path = args.output or os.path.join(RESULTS_DIR, f"{commit}.json")
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    
+    print_scaling(results)
+    if args.compare:
+        print_comparison(results, args.compare)
+    print(f"\nsaved {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+بنچمارک رتبه‌بندی PvP در حافظه
+
+اجرا از ریشه پروژه:
+    python benchmarks/bench_pvp_rating.py --players 1000000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.ranked_index import RankedIndex  # noqa: E402
+
+
+def timed(label: str, fn, repeat: int):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {repeat:>8} ops  {elapsed / repeat * 1e6:10.2f} µs/op")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    
+    rng = random.Random(args.seed)
+    
+    start = time.perf_counter()
+    index = RankedIndex((user_id, int(rng.gauss(1000, 200))) for user_id in range(args.players))
+    print(f"build {args.players:,} players: {time.perf_counter() - start:.2f}s")
+    
+    user_ids = [rng.randrange(args.players) for _ in range(args.queries)]
+    it = iter(user_ids * 3)
+    
+    timed("rank(user)", lambda: index.rank(next(it)), args.queries)
+    timed("top(100)", lambda: index.top(100), 1_000)
+    timed("rating update", lambda: index.add(next(it), rng.randint(-20, 20)), args.queries)
+    timed("page(offset, 20)", lambda: index.page(rng.randrange(args.players), 20), args.queries)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+سرور جایگزین Bot API تلگرام برای تست بار (نیاز به aiohttp)
+
+فقط متدهایی که بات استفاده می‌کند پیاده‌سازی شده‌اند؛ بقیه متدها True برمی‌گردانند.
+"""
+
+import asyncio
+import itertools
+import json
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+BOT_USER = {"id": 100000, "is_bot": True, "first_name": "LoadBot", "username": "load_test_bot"}
+
+
+def _chat(chat_id: int) -> Dict[str, Any]:
+    if chat_id > 0:
+        return {"id": chat_id, "type": "private", "first_name": f"u{chat_id}"}
+    return {"id": chat_id, "type": "supergroup", "title": "load", "is_forum": True}
+
+
+def _parse_value(value: str) -> Any:
+    # PTB اشیای تودرتو و اعداد را به صورت JSON ارسال می‌کند
+    try:
+        return json.loads(value)
+    except (TypeError, ValueError):
+        return value
+
+
+class FakeBotAPI:
+    """Bot API محلی با صف آپدیت برای getUpdates"""
+    
+    def __init__(self, token: str = "123456:LOADTEST"):
+        self.token = token
+        self.updates: asyncio.Queue = asyncio.Queue()
+        self.calls: Counter = Counter()
+        self.enqueued_at: Dict[int, float] = {}
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._topic_ids = itertools.count(2)
+        self._runner: Optional[web.AppRunner] = None
+        self.port: Optional[int] = None
+        
+        self.app = web.Application(client_max_size=64 * 1024 * 1024)
+        self.app.router.add_route("*", "/bot{token}/{method}", self._dispatch)
+        self.methods = {
+            "getMe": self.get_me,
+            "getUpdates": self.get_updates,
+            "sendMessage": self.send_message,
+            "editMessageText": self.edit_message_text,
+            "answerCallbackQuery": self.answer_callback_query,
+            "createForumTopic": self.create_forum_topic,
+            "sendDocument": self.send_document,
+        }
+    
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/bot"
+    
+    async def start(self, host: str = "127.0.0.1", port: int = 0):
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+    
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+    
+    def enqueue(self, update: Dict[str, Any]) -> int:
+        """افزودن آپدیت به صف getUpdates (update_id اختصاص داده می‌شود)"""
+        update_id = next(self._update_ids)
+        update["update_id"] = update_id
+        self.enqueued_at[update_id] = time.perf_counter()
+        self.updates.put_nowait(update)
+        return update_id
+    
+    def next_message_id(self) -> int:
+        return next(self._message_ids)
+    
+    async def _dispatch(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        if request.match_info["token"] != self.token:
+            return web.json_response({"ok": False, "error_code": 401, "description": "Unauthorized"}, status=401)
+        
+        params = {key: _parse_value(value) if isinstance(value, str) else value
+                  for key, value in (await request.post()).items()}
+        self.calls[method] += 1
+        handler = self.methods.get(method)
+        result = await handler(params) if handler else True
+        return web.json_response({"ok": True, "result": result})
+    
+    def _message(self, chat_id: int, **fields) -> Dict[str, Any]:
+        message = {
+            "message_id": self.next_message_id(),
+            "date": int(time.time()),
+            "chat": _chat(int(chat_id)),
+            "from": BOT_USER,
+        }
+        message.update({k: v for k, v in fields.items() if v is not None})
+        return message
+    
+    async def get_me(self, params):
+        return BOT_USER
+    
+    async def get_updates(self, params) -> List[Dict[str, Any]]:
+        limit = int(params.get("limit") or 100)
+        timeout = min(float(params.get("timeout") or 0), 1.0)
+        batch = []
+        if self.updates.empty() and timeout > 0:
+            try:
+                batch.append(await asyncio.wait_for(self.updates.get(), timeout))
+            except asyncio.TimeoutError:
+                return []
+        while len(batch) < limit and not self.updates.empty():
+            batch.append(self.updates.get_nowait())
+        return batch
+    
+    async def send_message(self, params):
+        return self._message(params["chat_id"], text=str(params.get("text", "")),
+                             message_thread_id=params.get("message_thread_id"))
+    
+    async def edit_message_text(self, params):
+        if "inline_message_id" in params:
+            return True
+        message = self._message(params["chat_id"], text=str(params.get("text", "")))
+        message["message_id"] = int(params["message_id"])
+        message["edit_date"] = int(time.time())
+        return message
+    
+    async def answer_callback_query(self, params):
+        return True
+    
+    async def create_forum_topic(self, params):
+        return {"message_thread_id": next(self._topic_ids), "name": params.get("name", ""), "icon_color": 7322096}
+    
+    async def send_document(self, params):
+        document = params.get("document")
+        message = self._message(params["chat_id"], caption=params.get("caption"))
+        message["document"] = {
+            "file_id": f"doc{message['message_id']}",
+            "file_unique_id": f"udoc{message['message_id']}",
+            "file_name": getattr(document, "filename", None) or "file",
+        }
+        return message
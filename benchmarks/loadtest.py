@@ -0,0 +1,328 @@
+"""
+تست بار بات با سرور جایگزین Bot API (نیاز به aiohttp)
+
+ترکیبی واقعی از /start، خرید از فروشگاه، معدن، انتقال بانکی، حمله در گروه و کلیک‌های
+پنل ادمین روی Application واقعی اجرا می‌شود و تأخیر handler و آپدیت در ثانیه گزارش می‌شود.
+
+اجرا از ریشه پروژه:
+    python benchmarks/loadtest.py --updates 20000 --users 500 --concurrency 1
+    python benchmarks/loadtest.py --rate 300 --mix attack=5,shop=1
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+import warnings
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_bot_api import BOT_USER, FakeBotAPI  # noqa: E402
+
+GROUP_CHAT_ID = -1001000000001
+LOG_GROUP_ID = -1001000000002
+
+DEFAULT_MIX = "start=1,browse=2,shop=3,mining=3,bank=1,attack=3,admin=1"
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class TrafficGenerator:
+    """ساخت آپدیت‌های تلگرام برای سناریوهای مختلف (مراحل هر سناریو پشت سر هم)"""
+    
+    def __init__(self, api: FakeBotAPI, user_ids: List[int], admin_id: int, seed: int):
+        self.api = api
+        self.user_ids = user_ids
+        self.admin_id = admin_id
+        self.rng = random.Random(seed)
+        self.scenarios: Dict[str, Callable[[int], List[dict]]] = {
+            "start": self.start,
+            "browse": self.browse,
+            "shop": self.shop,
+            "mining": self.mining,
+            "bank": self.bank,
+            "attack": self.attack,
+            "admin": self.admin,
+        }
+    
+    def _user(self, user_id: int) -> dict:
+        return {"id": user_id, "is_bot": False, "first_name": f"u{user_id}", "username": f"user{user_id}"}
+    
+    def message(self, user_id: int, text: str, chat_id: int = None, reply_to: int = None) -> dict:
+        chat_id = chat_id or user_id
+        chat = {"id": user_id, "type": "private", "first_name": f"u{user_id}"} if chat_id > 0 else \
+            {"id": chat_id, "type": "supergroup", "title": "load"}
+        message = {
+            "message_id": self.api.next_message_id(),
+            "date": int(time.time()),
+            "chat": chat,
+            "from": self._user(user_id),
+            "text": text,
+        }
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        if reply_to:
+            message["reply_to_message"] = {
+                "message_id": self.api.next_message_id(),
+                "date": int(time.time()),
+                "chat": chat,
+                "from": self._user(reply_to),
+                "text": "...",
+            }
+        return {"message": message}
+    
+    def callback(self, user_id: int, data: str) -> dict:
+        return {"callback_query": {
+            "id": str(self.api.next_message_id()),
+            "from": self._user(user_id),
+            "chat_instance": str(user_id),
+            "data": data,
+            "message": {
+                "message_id": self.api.next_message_id(),
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private", "first_name": f"u{user_id}"},
+                "from": BOT_USER,
+                "text": "menu",
+            },
+        }}
+    
+    def start(self, user_id: int) -> List[dict]:
+        return [self.message(user_id, "/start")]
+    
+    def browse(self, user_id: int) -> List[dict]:
+        return [
+            self.message(user_id, "👤 پروفایل من"),
+            self.message(user_id, "🧰 زرادخانه"),
+            self.message(user_id, "مشاهده زرادخانه"),
+            self.message(user_id, "🏅 لیدربرد"),
+            self.callback(user_id, self.rng.choice(["lb_coins", "lb_wins", "lb_power", "lb_rating"])),
+            self.message(user_id, "🎁 جایزه روزانه"),
+        ]
+    
+    def shop(self, user_id: int) -> List[dict]:
+        category, weapon = self.rng.choice([
+            ("💥 کروز", "💥 نور"), ("💥 کروز", "💥 سومار"), ("🎯 بالستیک", "🎯 شهاب"),
+        ])
+        return [
+            self.message(user_id, "🏪 فروشگاه"),
+            self.message(user_id, "🚀 موشک"),
+            self.message(user_id, category),
+            self.message(user_id, weapon),
+            self.message(user_id, str(self.rng.randint(1, 3))),
+        ]
+    
+    def mining(self, user_id: int) -> List[dict]:
+        return [
+            self.message(user_id, "⛏️ معدن"),
+            self.message(user_id, "⛏️ ورود به معدن"),
+            self.message(user_id, "💎 فروش منابع"),
+            self.message(user_id, "🛠️ فروش آهن"),
+            self.message(user_id, "1"),
+        ]
+    
+    def bank(self, user_id: int) -> List[dict]:
+        recipient = self.rng.choice(self.user_ids)
+        return [
+            self.callback(user_id, "bank_menu"),
+            self.callback(user_id, "bank_transfer"),
+            self.message(user_id, str(self.rng.randint(1, 50))),
+            self.message(user_id, str(recipient)),
+            self.callback(user_id, "confirm_transfer_yes"),
+        ]
+    
+    def attack(self, user_id: int) -> List[dict]:
+        target = self.rng.choice(self.user_ids)
+        while target == user_id:
+            target = self.rng.choice(self.user_ids)
+        missile = self.rng.choice(["نور", "💥 نور", "قدر", "شهاب"])
+        return [self.message(user_id, f"حمله {missile}", chat_id=GROUP_CHAT_ID, reply_to=target)]
+    
+    def admin(self, user_id: int) -> List[dict]:
+        admin_id = self.admin_id
+        return [self.message(admin_id, "/admin")] + [
+            self.callback(admin_id, data) for data in
+            ("admin_users", "admin_top_users", "admin_stats", "admin_stats_today",
+             "admin_settings", "admin_performance", "admin_back")
+        ]
+    
+    def flows(self, mix: Dict[str, int]):
+        """تولید بی‌پایان سناریوها بر اساس وزن‌ها"""
+        names = list(mix)
+        weights = [mix[name] for name in names]
+        while True:
+            name = self.rng.choices(names, weights)[0]
+            yield name, self.scenarios[name](self.rng.choice(self.user_ids))
+
+
+def parse_mix(text: str) -> Dict[str, int]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = int(weight or 1)
+    return mix
+
+
+def seed_database(user_ids: List[int], admin_id: int):
+    from database.db import init_database
+    from database.models import add_user, update_user_money, apply_armory_deltas, set_armory_meta
+    
+    init_database()
+    deltas = {}
+    for user_id in user_ids + [admin_id]:
+        add_user(user_id, f"user{user_id}")
+        update_user_money(user_id, 1_000_000)
+        # ظرفیت بالا تا خرید از فروشگاه هم مسیر کامل را طی کند
+        set_armory_meta(user_id, 1, 1_000_000)
+        deltas[(user_id, "💥 نور")] = 10_000
+        deltas[(user_id, "💥 قدر")] = 10_000
+        deltas[(user_id, "🎯 شهاب")] = 10_000
+        deltas[(user_id, "🪖 مرصاد")] = 20
+    apply_armory_deltas(deltas)
+
+
+async def run(args):
+    from telegram.ext import Application, ApplicationBuilder
+    from telegram.warnings import PTBUserWarning
+    from handlers.registry import register_handlers
+    from utils.instrumentation import InstrumentedRequest
+    from utils.metrics import metrics
+    from config.admin_config import SUPER_ADMIN_IDS
+    from database.battle_log import battle_log_writer
+    import handlers.war
+    import utils.log_manager as log_manager_module
+    
+    warnings.filterwarnings("ignore", category=PTBUserWarning)
+    handler_times: List[float] = []
+    end_to_end: List[float] = []
+    api = FakeBotAPI()
+    done = asyncio.Event()
+    
+    class TimedApplication(Application):
+        async def process_update(self, update):
+            start = time.perf_counter()
+            try:
+                await super().process_update(update)
+            finally:
+                now = time.perf_counter()
+                handler_times.append(now - start)
+                enqueued = api.enqueued_at.pop(update.update_id, None)
+                if enqueued is not None:
+                    end_to_end.append(now - enqueued)
+                if len(handler_times) >= args.updates:
+                    done.set()
+    
+    if not args.cooldown:
+        handlers.war.ATTACK_COOLDOWN = 0
+    
+    admin_id = SUPER_ADMIN_IDS[0]
+    user_ids = list(range(1_000_000, 1_000_000 + args.users))
+    seed_database(user_ids, admin_id)
+    
+    await api.start()
+    application = (
+        ApplicationBuilder()
+        .application_class(TimedApplication)
+        .token(api.token)
+        .base_url(api.base_url)
+        .request(InstrumentedRequest(connection_pool_size=max(8, args.concurrency * 2)))
+        .concurrent_updates(args.concurrency if args.concurrency > 1 else False)
+        .build()
+    )
+    register_handlers(application)
+    
+    log_manager_module.TOPICS_FILE = os.path.join(args.workdir, "log_topics.json")
+    log_manager = log_manager_module.init_log_manager(application.bot, LOG_GROUP_ID)
+    
+    await application.initialize()
+    await log_manager.ensure_topics()
+    await application.start()
+    await application.updater.start_polling(poll_interval=0, timeout=1)
+    
+    generator = TrafficGenerator(api, user_ids, admin_id, args.seed)
+    scenario_counts: Dict[str, int] = {}
+    flows = generator.flows(parse_mix(args.mix))
+    enqueued = 0
+    start = time.perf_counter()
+    while enqueued < args.updates:
+        name, steps = next(flows)
+        steps = steps[:args.updates - enqueued]
+        scenario_counts[name] = scenario_counts.get(name, 0) + 1
+        for update in steps:
+            api.enqueue(update)
+        enqueued += len(steps)
+        if args.rate:
+            # پخش یکنواخت آپدیت‌ها در زمان
+            delay = start + enqueued / args.rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        elif enqueued % 1000 < len(steps):
+            await asyncio.sleep(0)
+    
+    try:
+        await asyncio.wait_for(done.wait(), args.timeout)
+    except asyncio.TimeoutError:
+        print(f"timeout: processed {len(handler_times)}/{args.updates} updates")
+    elapsed = time.perf_counter() - start
+    
+    await application.updater.stop()
+    await application.stop()
+    await application.shutdown()
+    battle_log_writer.stop()
+    await api.stop()
+    
+    handler_times.sort()
+    end_to_end.sort()
+    processed = len(handler_times)
+    print(f"\nscenarios: {dict(sorted(scenario_counts.items()))}")
+    print(f"api calls: {dict(api.calls.most_common())}")
+    print(f"\nupdates: {processed:,} in {elapsed:.2f}s -> {processed / elapsed:,.0f} updates/s "
+          f"(concurrency={args.concurrency}, rate={args.rate or 'max'})")
+    for label, values in (("handler", handler_times), ("end-to-end", end_to_end)):
+        print(f"{label:<11} p50 {percentile(values, 50) * 1000:8.2f} ms   "
+              f"p95 {percentile(values, 95) * 1000:8.2f} ms   "
+              f"p99 {percentile(values, 99) * 1000:8.2f} ms   "
+              f"max {(values[-1] if values else 0) * 1000:8.2f} ms")
+    
+    print(f"\n{'handler':<34}{'calls':>8}{'p50 ms':>9}{'p99 ms':>9}{'queries':>9}{'db ms':>8}{'api ms':>8}")
+    for name, hist, queries, db_ms, api_ms in metrics.handler_summary():
+        print(f"{name:<34}{hist.count:>8}{hist.percentile(0.5) / 1000:>9.2f}{hist.percentile(0.99) / 1000:>9.2f}"
+              f"{queries:>9.1f}{db_ms:>8.2f}{api_ms:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=10_000, help="تعداد کل آپدیت‌ها")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--rate", type=float, default=0, help="آپدیت در ثانیه (0 = حداکثر)")
+    parser.add_argument("--concurrency", type=int, default=1, help="concurrent_updates در Application")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="وزن سناریوها، مثل attack=5,shop=1")
+    parser.add_argument("--cooldown", action="store_true", help="فعال ماندن cooldown حمله")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+    
+    args.workdir = tempfile.mkdtemp(prefix="loadtest-")
+    # دیتابیس موقت باید قبل از import ماژول‌های پروژه تنظیم شود
+    os.environ["DB_PATH"] = os.path.join(args.workdir, "users.db")
+    
+    from utils.logger import logger
+    logger.setLevel(args.log_level)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    
+    print(f"workdir: {args.workdir}")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
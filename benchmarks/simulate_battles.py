@@ -0,0 +1,59 @@
+"""
+شبیه‌سازی آفلاین نبردها برای تنظیم WEAPON_STATS و قیمت‌ها (نیاز به numpy)
+
+اجرا از ریشه پروژه:
+    python benchmarks/simulate_battles.py --battles 1000000 --seed 1
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from utils.battle_engine import BattleEngine  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--battles", type=int, default=1_000_000, help="تعداد نبرد برای هر موشک")
+    parser.add_argument("--max-count", type=int, default=10, help="حداکثر تعداد هر پدافند")
+    parser.add_argument("--density", type=float, default=0.3, help="احتمال داشتن هر پدافند")
+    parser.add_argument("--balance", type=int, default=5000, help="موجودی مدافع")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    
+    try:
+        from handlers.shop import PRICES
+    except ImportError:
+        PRICES = {}
+    
+    engine = BattleEngine()
+    defense_counts = engine.sample_defense_counts(
+        args.battles, max_count=args.max_count, density=args.density, seed=args.seed
+    )
+    balances = np.full(args.battles, args.balance)
+    missiles = [name for name, stats in engine.weapon_stats.items() if stats.get("attack", 0) > 0]
+    
+    print(f"{'missile':<16}{'price':>8}{'win %':>9}{'avg loot':>11}{'loot/price':>12}{'def losses':>12}")
+    start = time.perf_counter()
+    for missile in missiles:
+        result = engine.simulate_batch([missile] * args.battles, defense_counts, balances, seed=args.seed)
+        price = PRICES.get(missile)
+        avg_loot = result["stolen"].mean()
+        ratio = f"{avg_loot / price:.3f}" if price else "-"
+        print(
+            f"{missile:<16}{price or '-':>8}{result['attacker_won'].mean() * 100:>8.1f}%"
+            f"{avg_loot:>11.1f}{ratio:>12}{result['losses'].sum(axis=1).mean():>12.2f}"
+        )
+    
+    elapsed = time.perf_counter() - start
+    total = args.battles * len(missiles)
+    print(f"\n{total:,} battles in {elapsed:.2f}s ({total / elapsed:,.0f} battles/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# utils/broadcaster.py
+"""
+پیام همگانی به صورت کار persistent زمان‌بند
+
+هر نوبت BROADCAST_CHUNK کاربر بعد از آخرین user_id (keyset) را می‌فرستد و cursor را در
+payload کار نگه می‌دارد؛ پس handler ادمین منتظر ارسال به همه نمی‌ماند و بعد از ری‌استارت
+ارسال از همان‌جا ادامه پیدا می‌کند.
+"""
+
+import time
+from typing import Optional
+
+from database.db import db
+from config.settings import BROADCAST_CHUNK, BROADCAST_PAUSE
+from utils.scheduler import scheduler, Job
+from utils.logger import logger
+
+BROADCAST_KIND = "broadcast"
+
+
+def schedule_broadcast(text: str, admin_id: Optional[int] = None, delay: float = 0.0) -> str:
+    """ثبت پیام همگانی؛ شناسه کار را برمی‌گرداند"""
+    job_id = f"broadcast:{time.time_ns()}"
+    scheduler.at(
+        job_id, time.time() + delay, kind=BROADCAST_KIND, persistent=True,
+        payload={"text": text, "admin_id": admin_id, "after": 0, "sent": 0, "failed": 0}
+    )
+    return job_id
+
+
+async def _broadcast_job(job: Job) -> Optional[float]:
+    payload = job.payload
+    users = db.fetchall(
+        "SELECT user_id FROM users WHERE user_id > ? ORDER BY user_id LIMIT ?",
+        (payload["after"], BROADCAST_CHUNK)
+    )
+    for user in users:
+        try:
+            await scheduler.bot.send_message(chat_id=user['user_id'], text=payload["text"], parse_mode="HTML")
+            payload["sent"] += 1
+        except Exception as e:
+            payload["failed"] += 1
+            logger.debug("Failed to send to %s: %s", user['user_id'], e)
+        payload["after"] = user['user_id']
+    
+    if len(users) == BROADCAST_CHUNK:
+        return BROADCAST_PAUSE  # تکه بعدی
+    
+    logger.info("Broadcast %s finished: %s sent, %s failed", job.job_id, payload["sent"], payload["failed"])
+    if payload.get("admin_id"):
+        try:
+            await scheduler.bot.send_message(
+                payload["admin_id"],
+                f"✅ <b>ارسال کامل شد!</b>\n\n✅ موفق: {payload['sent']}\n❌ ناموفق: {payload['failed']}",
+                parse_mode="HTML"
+            )
+        except Exception as e:
+            logger.warning("Could not report broadcast result to %s: %s", payload["admin_id"], e)
+    return None
+
+
+scheduler.register(BROADCAST_KIND, _broadcast_job)
@@ -0,0 +1,290 @@
+# handlers/clan.py
+"""
+کلن (فقط پیوی):
+    👥 کلن / /clan           صفحه کلن یا راهنمای ساخت و عضویت
+    /newclan <نام>            ساخت کلن
+    /joinclan <نام>           عضویت در کلن
+    /donate <سکه|آهن|نقره> <تعداد>   کمک به خزانه کلن
+    /clanwar <نام>            اعلام جنگ به کلن دیگر (فقط رهبر)
+"""
+
+import time
+from html import escape
+from typing import List, Optional, Tuple
+
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import ContextTypes, CallbackQueryHandler
+
+from database.models import add_user
+from config.settings import CLAN_CREATE_COST, CLAN_MEMBERS_PAGE
+from handlers.leaderboard import _get_usernames
+from utils.clan_service import clan_service, Member, NAME_MIN, NAME_MAX
+from utils.clan_war_engine import clan_wars, War
+from utils.mission_engine import missions
+from utils.events import event_bus, DONATE
+from handlers.achievements import unlock_lines
+from handlers.missions import format_clan_mission
+from utils.locks import serialized_per_user, user_locks
+from utils.logger import logger
+
+RESOURCES = {
+    "سکه": "coins", "coin": "coins", "coins": "coins",
+    "آهن": "iron", "iron": "iron",
+    "نقره": "silver", "silver": "silver",
+}
+
+ROLE_ICONS = {"leader": "👑", "member": "👤"}
+
+ERRORS = {
+    "name": f"❌ نام کلن باید بین {NAME_MIN} تا {NAME_MAX} کاراکتر باشد.",
+    "member": "❌ شما عضو یک کلن هستید. اول از آن خارج شوید.",
+    "coins": f"❌ برای ساخت کلن به {CLAN_CREATE_COST:,} سکه نیاز دارید.",
+    "taken": "❌ این نام قبلا انتخاب شده است.",
+    "not_found": "❌ کلنی با این نام پیدا نشد.",
+    "not_member": "❌ شما عضو هیچ کلنی نیستید.",
+    "funds": "❌ موجودی کافی ندارید.",
+    "invalid": "❌ فرمت: <code>/donate سکه 1000</code> (سکه، آهن یا نقره)",
+    "not_leader": "❌ فقط رهبر کلن می‌تواند اعلام جنگ کند.",
+    "self": "❌ نمی‌توانید به کلن خودتان اعلام جنگ کنید.",
+    "busy": "❌ یکی از دو کلن در حال حاضر در جنگ است.",
+    "error": "⚠️ خطا، دوباره تلاش کنید.",
+}
+
+
+async def _private(update: Update) -> bool:
+    return update.effective_chat.type == "private"
+
+
+def _display_name(user_id: int, usernames: dict) -> str:
+    return f"@{usernames[user_id]}" if usernames.get(user_id) else f"User {user_id}"
+
+
+def format_war(war: War, clan_id: int) -> str:
+    ours, theirs = war.scores()
+    if clan_id != war.attacker_id:
+        ours, theirs = theirs, ours
+    hours, rest = divmod(max(0, int(war.end_time - time.time())), 3600)
+    return (
+        f"⚔️ جنگ با {escape(clan_service.name(war.opponent(clan_id)))}: "
+        f"<code>{ours:,}</code> - <code>{theirs:,}</code> (⏳ {hours} ساعت و {rest // 60} دقیقه)"
+    )
+
+
+def _clan_markup(clan_id: int) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([
+        [
+            InlineKeyboardButton("👥 اعضا", callback_data=f"clan_members_{clan_id}"),
+            InlineKeyboardButton("🏆 رتبه‌بندی کلن‌ها", callback_data="clan_top"),
+        ],
+        [InlineKeyboardButton("🚪 خروج از کلن", callback_data="clan_leave")],
+    ])
+
+
+async def show_clan_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_user.id
+    add_user(user_id, update.effective_user.username)
+    
+    clan = clan_service.clan_of(user_id)
+    if clan is None:
+        text = (
+            "👥 <b>کلن</b>\n\n"
+            "شما عضو هیچ کلنی نیستید.\n\n"
+            f"🏗️ ساخت کلن ({CLAN_CREATE_COST:,} سکه): <code>/newclan نام</code>\n"
+            "🤝 عضویت: <code>/joinclan نام</code>"
+        )
+        markup = InlineKeyboardMarkup([[InlineKeyboardButton("🏆 رتبه‌بندی کلن‌ها", callback_data="clan_top")]])
+        await update.message.reply_text(text, reply_markup=markup, parse_mode="HTML")
+        return
+    
+    rank = clan_service.rank(clan['clan_id'])
+    text = (
+        f"👥 <b>{escape(clan['name'])}</b>\n"
+        "━━━━━━━━━━━━━━━━━━\n"
+        f"🏆 امتیاز: <code>{clan['points']:,}</code> (رتبه {rank or '-'})\n"
+        f"👤 اعضا: {clan_service.member_count(clan['clan_id']):,}\n"
+        f"💰 خزانه: {clan['treasury_coins']:,} سکه | "
+        f"🔩 {clan['treasury_iron']:,} آهن | ⚪ {clan['treasury_silver']:,} نقره\n\n"
+        f"{ROLE_ICONS.get(clan['role'], '👤')} امتیاز کمک شما: <code>{clan['contribution_points']:,}</code>\n\n"
+        "💝 کمک به خزانه: <code>/donate سکه 1000</code>\n\n"
+        f"{format_clan_mission(clan['clan_id'])}"
+    )
+    war = clan_wars.war_of(clan['clan_id'])
+    if war is not None:
+        text += "\n\n" + format_war(war, clan['clan_id'])
+    elif clan['role'] == 'leader':
+        text += "\n⚔️ اعلام جنگ: <code>/clanwar نام‌کلن</code>"
+    await update.message.reply_text(text, reply_markup=_clan_markup(clan['clan_id']), parse_mode="HTML")
+
+
+@serialized_per_user
+async def new_clan_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not await _private(update):
+        return
+    user_id = update.effective_user.id
+    add_user(user_id, update.effective_user.username)
+    if not context.args:
+        await update.message.reply_text("❌ فرمت: <code>/newclan نام</code>", parse_mode="HTML")
+        return
+    
+    status, clan_id = clan_service.create(user_id, " ".join(context.args))
+    if status != "ok":
+        await update.message.reply_text(ERRORS.get(status, ERRORS["error"]))
+        return
+    clan_wars.member_changed(user_id, clan_id)
+    missions.member_changed(user_id)
+    await show_clan_menu(update, context)
+
+
+@serialized_per_user
+async def join_clan_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not await _private(update):
+        return
+    user_id = update.effective_user.id
+    add_user(user_id, update.effective_user.username)
+    if not context.args:
+        await update.message.reply_text("❌ فرمت: <code>/joinclan نام</code>", parse_mode="HTML")
+        return
+    
+    status, clan_id = clan_service.join(user_id, " ".join(context.args))
+    if status != "ok":
+        await update.message.reply_text(ERRORS.get(status, ERRORS["error"]))
+        return
+    clan_wars.member_changed(user_id, clan_id)
+    missions.member_changed(user_id)
+    await show_clan_menu(update, context)
+
+
+@serialized_per_user
+async def donate_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not await _private(update):
+        return
+    args = context.args or []
+    resource = RESOURCES.get(args[0].casefold()) if len(args) == 2 else None
+    if resource is None or not args[1].isdigit():
+        await update.message.reply_text(ERRORS["invalid"], parse_mode="HTML")
+        return
+    
+    amount = int(args[1])
+    status, points = clan_service.donate(update.effective_user.id, resource, amount)
+    if status != "ok":
+        await update.message.reply_text(ERRORS.get(status, ERRORS["error"]), parse_mode="HTML")
+        return
+    event_bus.publish(DONATE, update.effective_user.id, points, resource=resource, quantity=amount)
+    lines = [f"💝 {amount:,} {args[0]} به خزانه کلن اهدا شد. (+{points:,} امتیاز)"]
+    lines += unlock_lines(update.effective_user.id)
+    await update.message.reply_text("\n".join(lines))
+
+
+@serialized_per_user
+async def clan_war_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not await _private(update):
+        return
+    user_id = update.effective_user.id
+    if not context.args:
+        await update.message.reply_text("❌ فرمت: <code>/clanwar نام‌کلن</code>", parse_mode="HTML")
+        return
+    
+    clan = clan_service.clan_of(user_id)
+    if clan is None or clan['role'] != 'leader':
+        await update.message.reply_text(ERRORS["not_member" if clan is None else "not_leader"])
+        return
+    target = clan_service.find(" ".join(context.args))
+    if target is None:
+        await update.message.reply_text(ERRORS["not_found"])
+        return
+    
+    status, war = clan_wars.declare(clan['clan_id'], target['clan_id'])
+    if status != "ok":
+        await update.message.reply_text(ERRORS.get(status, ERRORS["error"]))
+        return
+    await update.message.reply_text(f"⚔️ جنگ اعلام شد!\n{format_war(war, clan['clan_id'])}", parse_mode="HTML")
+    try:
+        await context.bot.send_message(
+            target['leader_id'],
+            f"🚨 کلن {escape(clan['name'])} به کلن شما اعلام جنگ کرد!\n{format_war(war, target['clan_id'])}",
+            parse_mode="HTML"
+        )
+    except Exception as e:
+        logger.warning("Could not notify clan leader %s about war #%s: %s", target['leader_id'], war.war_id, e)
+
+
+def format_members(clan_id: int, members: List[Member], page_start: int) -> str:
+    usernames = _get_usernames(member.user_id for member in members)
+    lines = [f"👥 <b>اعضای {escape(clan_service.name(clan_id))}</b>", ""]
+    for i, member in enumerate(members, start=page_start):
+        icon = ROLE_ICONS.get(member.role, "👤")
+        lines.append(f"{i}. {icon} {_display_name(member.user_id, usernames)} — <code>{member.points:,}</code>")
+    if not members:
+        lines.append("—")
+    return "\n".join(lines)
+
+
+def _parse_cursor(parts: List[str]) -> Tuple[Optional[Tuple[int, int]], int]:
+    """clan_members_<id>[_<امتیاز>_<user_id>_<شماره اولین ردیف>]"""
+    if len(parts) < 3:
+        return None, 1
+    return (int(parts[0]), int(parts[1])), int(parts[2])
+
+
+async def show_members(query, clan_id: int, after: Optional[Tuple[int, int]], page_start: int):
+    members = clan_service.members_page(clan_id, after, CLAN_MEMBERS_PAGE + 1)
+    has_next = len(members) > CLAN_MEMBERS_PAGE
+    members = members[:CLAN_MEMBERS_PAGE]
+    
+    buttons = []
+    if has_next:
+        last = members[-1]
+        buttons.append(InlineKeyboardButton(
+            "▶️ بعدی",
+            callback_data=f"clan_members_{clan_id}_{last.points}_{last.user_id}_{page_start + len(members)}"
+        ))
+    if after is not None:
+        buttons.append(InlineKeyboardButton("⏮️ اول", callback_data=f"clan_members_{clan_id}"))
+    markup = InlineKeyboardMarkup([buttons]) if buttons else None
+    await query.edit_message_text(format_members(clan_id, members, page_start), reply_markup=markup, parse_mode="HTML")
+
+
+async def show_top_clans(query):
+    top = clan_service.top(10)
+    lines = ["🏆 <b>برترین کلن‌ها</b>", ""]
+    for i, (_, name, points) in enumerate(top, start=1):
+        lines.append(f"{i}. {escape(name)} — <code>{points:,}</code>")
+    if not top:
+        lines.append("هنوز کلنی ساخته نشده است.")
+    await query.edit_message_text("\n".join(lines), parse_mode="HTML")
+
+
+async def clan_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    user_id = query.from_user.id
+    data = query.data
+    
+    if data == "clan_top":
+        await show_top_clans(query)
+    elif data.startswith("clan_members_"):
+        clan_id, *rest = data[len("clan_members_"):].split("_")
+        after, page_start = _parse_cursor(rest)
+        await show_members(query, int(clan_id), after, page_start)
+    elif data == "clan_leave":
+        markup = InlineKeyboardMarkup([[
+            InlineKeyboardButton("✅ بله، خارج شو", callback_data="clan_leave_confirm"),
+        ]])
+        await query.edit_message_text("⚠️ از کلن خارج می‌شوید؟", reply_markup=markup)
+    elif data == "clan_leave_confirm":
+        async with user_locks.hold(user_id):
+            status, clan_id = clan_service.leave(user_id)
+        clan_wars.member_changed(user_id, None)
+        missions.member_changed(user_id)
+        if status == "not_member":
+            await query.edit_message_text(ERRORS["not_member"])
+        elif status == "disbanded":
+            await query.edit_message_text("🚪 از کلن خارج شدید و کلن منحل شد.")
+        else:
+            await query.edit_message_text("🚪 از کلن خارج شدید.")
+        logger.info("User %s left clan #%s (%s)", user_id, clan_id, status)
+
+
+clan_callback_handler = CallbackQueryHandler(
+    clan_callback, pattern=r"^clan_(top|leave|leave_confirm|members_\d+(_-?\d+_\d+_\d+)?)$"
+)
@@ -0,0 +1,271 @@
+# utils/clan_service.py
+"""
+کلن‌ها: ساخت، عضویت، کمک به خزانه، رتبه‌بندی و فهرست اعضا
+
+کمک هر عضو فقط یک UPDATE روی clan_members است؛ تریگر clan_contribution همان
+تفاوت را در همان دستور به خزانه و امتیاز کلن اضافه می‌کند. رتبه‌بندی کلن‌ها بر اساس
+امتیاز از یک RankedIndex افزایشی خوانده می‌شود و فهرست اعضا با صفحه‌بندی keyset
+روی ایندکس (clan_id, contribution_points DESC, user_id) ساخته می‌شود.
+"""
+
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from database.db import db, Rollback
+from config.settings import (
+    CLAN_CREATE_COST, CLAN_MEMBERS_PAGE, CLAN_RANKING_MAX_AGE,
+    IRON_SELL_PRICE, SILVER_SELL_PRICE
+)
+from utils.ranked_index import RankedIndex
+from utils.leaderboard_service import leaderboards
+from utils.scheduler import scheduler
+from utils.logger import logger
+
+# امتیاز کلن برای هر واحد کمک (هم‌ارز سکه)
+DONATION_POINTS: Dict[str, int] = {
+    "coins": 1,
+    "iron": IRON_SELL_PRICE,
+    "silver": SILVER_SELL_PRICE,
+}
+
+NAME_MIN, NAME_MAX = 3, 24
+
+
+class Member(NamedTuple):
+    user_id: int
+    role: str
+    points: int
+
+
+class _Rollback(Rollback):
+    """لغو تراکنش وقتی درخواست همزمان شرط را بعد از بررسی اولیه عوض کرده باشد"""
+    
+    def __init__(self, status: str):
+        super().__init__(status)
+        self.status = status
+
+
+class ClanService:
+    """رتبه‌بندی کلن‌ها در حافظه و عملیات عضویت/کمک روی دیتابیس"""
+    
+    def __init__(self):
+        self.ranking = RankedIndex()
+        self.names: Dict[int, str] = {}
+        self.member_counts: Dict[int, int] = {}
+        self.loaded = False
+        self.loaded_at = 0.0
+    
+    def load(self):
+        rows = db.fetchall("SELECT clan_id, name, points FROM clans")
+        self.ranking = RankedIndex((row['clan_id'], row['points'] or 0) for row in rows)
+        self.names = {row['clan_id']: row['name'] for row in rows}
+        self.member_counts = {
+            row['clan_id']: row['members']
+            for row in db.fetchall("SELECT clan_id, COUNT(*) AS members FROM clan_members GROUP BY clan_id")
+        }
+        self.loaded = True
+        self.loaded_at = time.monotonic()
+        logger.info("Clan ranking loaded: %s clans", len(rows))
+    
+    def _ensure_loaded(self):
+        if not self.loaded:
+            self.load()
+    
+    def _count(self, clan_id: int, delta: int):
+        if self.loaded:
+            self.member_counts[clan_id] = self.member_counts.get(clan_id, 0) + delta
+    
+    # ==================== خواندن ====================
+    
+    def clan_of(self, user_id: int):
+        """ردیف کلن کاربر به همراه نقش و کمک‌های او یا None"""
+        return db.fetchone(
+            """
+            SELECT c.clan_id, c.name, c.leader_id, c.description, c.points, c.level,
+                   c.treasury_coins, c.treasury_iron, c.treasury_silver,
+                   m.role, m.contribution_points
+            FROM clan_members m JOIN clans c ON c.clan_id = m.clan_id
+            WHERE m.user_id = ?
+            """,
+            (user_id,)
+        )
+    
+    def find(self, name: str):
+        return db.fetchone("SELECT clan_id, name, leader_id FROM clans WHERE name = ?", (" ".join(name.split()),))
+    
+    def top(self, n: int = 10) -> List[Tuple[int, str, int]]:
+        """(clan_id, نام، امتیاز) برترین کلن‌ها"""
+        self._ensure_loaded()
+        return [(clan_id, self.names.get(clan_id, "?"), int(points)) for clan_id, points in self.ranking.top(n)]
+    
+    def name(self, clan_id: int) -> str:
+        self._ensure_loaded()
+        return self.names.get(clan_id, "?")
+    
+    def rank(self, clan_id: int) -> Optional[int]:
+        self._ensure_loaded()
+        return self.ranking.rank(clan_id)
+    
+    def member_count(self, clan_id: int) -> int:
+        self._ensure_loaded()
+        return self.member_counts.get(clan_id, 0)
+    
+    def members_page(self, clan_id: int, after: Optional[Tuple[int, int]] = None,
+                     limit: int = CLAN_MEMBERS_PAGE) -> List[Member]:
+        """اعضا به ترتیب امتیاز کمک؛ after = (امتیاز، user_id) آخرین ردیف صفحه قبل"""
+        if after is None:
+            rows = db.fetchall(
+                "SELECT user_id, role, contribution_points FROM clan_members WHERE clan_id = ? "
+                "ORDER BY contribution_points DESC, user_id LIMIT ?",
+                (clan_id, limit)
+            )
+        else:
+            points, user_id = after
+            rows = db.fetchall(
+                "SELECT user_id, role, contribution_points FROM clan_members "
+                "WHERE clan_id = ? AND (contribution_points < ? OR (contribution_points = ? AND user_id > ?)) "
+                "ORDER BY contribution_points DESC, user_id LIMIT ?",
+                (clan_id, points, points, user_id, limit)
+            )
+        return [Member(row['user_id'], row['role'], row['contribution_points']) for row in rows]
+    
+    # ==================== عضویت ====================
+    
+    def create(self, user_id: int, name: str) -> Tuple[str, Optional[int]]:
+        """ساخت کلن با پرداخت CLAN_CREATE_COST؛ سازنده رهبر کلن می‌شود"""
+        name = " ".join(name.split())
+        if not NAME_MIN <= len(name) <= NAME_MAX:
+            return "name", None
+        if self.clan_of(user_id) is not None:
+            return "member", None
+        
+        now = time.time()
+        try:
+            with db.get_cursor() as cursor:
+                cursor.execute(
+                    "UPDATE resources SET coins = coins - ? WHERE user_id = ? AND coins >= ? "
+                    "AND NOT EXISTS (SELECT 1 FROM clans WHERE name = ?)",
+                    (CLAN_CREATE_COST, user_id, CLAN_CREATE_COST, name)
+                )
+                if cursor.rowcount == 0:
+                    taken = cursor.execute("SELECT 1 FROM clans WHERE name = ?", (name,)).fetchone()
+                    return ("taken" if taken else "coins"), None
+                row = cursor.execute(
+                    "INSERT INTO clans (name, leader_id, created_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(name) DO NOTHING RETURNING clan_id",
+                    (name, user_id, now)
+                ).fetchone()
+                if row is None:
+                    raise _Rollback("taken")
+                cursor.execute(
+                    "INSERT INTO clan_members (user_id, clan_id, role, joined_at) VALUES (?, ?, 'leader', ?) "
+                    "ON CONFLICT(user_id) DO NOTHING",
+                    (user_id, row['clan_id'], time.strftime("%Y-%m-%d"))
+                )
+                if cursor.rowcount == 0:
+                    raise _Rollback("member")
+        except _Rollback as e:
+            return e.status, None
+        
+        clan_id = row['clan_id']
+        leaderboards.adjust("coins", user_id, -CLAN_CREATE_COST)
+        if self.loaded:
+            self.ranking.set(clan_id, 0)
+            self.names[clan_id] = name
+            self.member_counts[clan_id] = 1
+        logger.info("User %s created clan #%s (%s)", user_id, clan_id, name)
+        return "ok", clan_id
+    
+    def join(self, user_id: int, name: str) -> Tuple[str, Optional[int]]:
+        clan = self.find(name)
+        if clan is None:
+            return "not_found", None
+        with db.get_cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO clan_members (user_id, clan_id, role, joined_at) VALUES (?, ?, 'member', ?) "
+                "ON CONFLICT(user_id) DO NOTHING",
+                (user_id, clan['clan_id'], time.strftime("%Y-%m-%d"))
+            )
+            if cursor.rowcount == 0:
+                return "member", None
+        self._count(clan['clan_id'], 1)
+        return "ok", clan['clan_id']
+    
+    def leave(self, user_id: int) -> Tuple[str, Optional[int]]:
+        """خروج از کلن؛ رهبری به بیشترین کمک‌کننده می‌رسد و کلن خالی حذف می‌شود"""
+        with db.get_cursor() as cursor:
+            member = cursor.execute(
+                "DELETE FROM clan_members WHERE user_id = ? RETURNING clan_id, role", (user_id,)
+            ).fetchone()
+            if member is None:
+                return "not_member", None
+            clan_id = member['clan_id']
+            disbanded = False
+            if member['role'] == 'leader':
+                heir = cursor.execute(
+                    "SELECT user_id FROM clan_members WHERE clan_id = ? "
+                    "ORDER BY contribution_points DESC, user_id LIMIT 1",
+                    (clan_id,)
+                ).fetchone()
+                if heir is None:
+                    cursor.execute("DELETE FROM clans WHERE clan_id = ?", (clan_id,))
+                    disbanded = True
+                else:
+                    cursor.execute("UPDATE clan_members SET role = 'leader' WHERE user_id = ?", (heir['user_id'],))
+                    cursor.execute("UPDATE clans SET leader_id = ? WHERE clan_id = ?", (heir['user_id'], clan_id))
+        
+        if disbanded:
+            if self.loaded:
+                self.ranking.remove(clan_id)
+                self.names.pop(clan_id, None)
+                self.member_counts.pop(clan_id, None)
+            logger.info("Clan #%s disbanded by its last member %s", clan_id, user_id)
+            return "disbanded", clan_id
+        self._count(clan_id, -1)
+        return "ok", clan_id
+    
+    # ==================== کمک به خزانه ====================
+    
+    def donate(self, user_id: int, resource: str, amount: int) -> Tuple[str, int]:
+        """برداشت از منابع کاربر و ثبت کمک؛ (وضعیت، امتیاز افزوده شده به کلن)"""
+        if resource not in DONATION_POINTS or amount <= 0:
+            return "invalid", 0
+        points = amount * DONATION_POINTS[resource]
+        try:
+            with db.get_cursor() as cursor:
+                cursor.execute(
+                    f"UPDATE resources SET {resource} = {resource} - ? WHERE user_id = ? AND {resource} >= ? "
+                    "AND EXISTS (SELECT 1 FROM clan_members WHERE user_id = ?)",
+                    (amount, user_id, amount, user_id)
+                )
+                if cursor.rowcount == 0:
+                    member = cursor.execute("SELECT 1 FROM clan_members WHERE user_id = ?", (user_id,)).fetchone()
+                    return ("funds" if member else "not_member"), 0
+                # تریگر clan_contribution خزانه و امتیاز کلن را در همین دستور بروز می‌کند
+                row = cursor.execute(
+                    f"UPDATE clan_members SET contribution_{resource} = contribution_{resource} + ?, "
+                    "contribution_points = contribution_points + ? WHERE user_id = ? RETURNING clan_id",
+                    (amount, points, user_id)
+                ).fetchone()
+                if row is None:
+                    raise _Rollback("not_member")
+        except _Rollback as e:
+            return e.status, 0
+        
+        if resource == "coins":
+            leaderboards.adjust("coins", user_id, -amount)
+        if self.loaded:
+            self.ranking.add(row['clan_id'], points)
+        return "ok", points
+    
+    def adjust(self, clan_id: int, points: int):
+        """امتیازی که بیرون از کمک اعضا به کلن داده شده (مثل برد جنگ) بعد از commit"""
+        if self.loaded and points and clan_id in self.ranking:
+            self.ranking.add(clan_id, points)
+
+
+# نمونه سینگلتون
+clan_service = ClanService()
+
+# امتیاز و اعضای کلن‌ها در worker های دیگر
+scheduler.reload_every("clan_ranking_reload", CLAN_RANKING_MAX_AGE, clan_service)
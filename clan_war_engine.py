@@ -0,0 +1,315 @@
+# utils/clan_war_engine.py
+"""
+جنگ کلن‌ها (clan_wars) با امتیازدهی از جریان نبردها
+
+هر نبرد بین اعضای دو کلن در حال جنگ (و داخل بازه start_time تا end_time) فقط
+شمارنده‌های حافظه را زیاد می‌کند و BatchWriter مجموع هر جنگ را با یک UPDATE
+می‌نویسد. پایان هر جنگ یک کار یک‌باره در زمان‌بند مرکزی است و جنگ‌های فعال
+مرور نمی‌شوند. تسویه یک تراکنش است که
+با UPDATE شرطی status از active شروع می‌شود؛ اگر پروسس وسط آن بمیرد کل تراکنش
+برمی‌گردد و تسویه دوباره (و فقط یک بار) انجام می‌شود.
+"""
+
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from database.db import db
+from config.settings import (
+    CLAN_WAR_DURATION, CLAN_WAR_ATTACK_POINTS, CLAN_WAR_DEFENSE_POINTS,
+    CLAN_WAR_WIN_POINTS, CLAN_WAR_REWARD, CLAN_WAR_FLUSH_MS,
+    CLAN_WAR_SETTLE_DELAY, CLAN_WAR_MAX_AGE
+)
+from utils.batch_writer import BatchWriter
+from utils.clan_service import clan_service
+from utils.scheduler import scheduler, Job
+from utils.logger import logger
+
+
+class War:
+    __slots__ = ("war_id", "attacker_id", "defender_id", "start_time", "end_time",
+                 "attacker_score", "defender_score", "pending_attacker", "pending_defender")
+    
+    def __init__(self, war_id: int, attacker_id: int, defender_id: int, start_time: float, end_time: float,
+                 attacker_score: int = 0, defender_score: int = 0):
+        self.war_id = war_id
+        self.attacker_id = attacker_id
+        self.defender_id = defender_id
+        self.start_time = start_time
+        self.end_time = end_time
+        self.attacker_score = attacker_score  # آخرین مقدار flush شده
+        self.defender_score = defender_score
+        self.pending_attacker = 0  # امتیازهای این پروسس که هنوز نوشته نشده‌اند
+        self.pending_defender = 0
+    
+    def scores(self) -> Tuple[int, int]:
+        return self.attacker_score + self.pending_attacker, self.defender_score + self.pending_defender
+    
+    def opponent(self, clan_id: int) -> int:
+        return self.defender_id if clan_id == self.attacker_id else self.attacker_id
+
+
+class ScoreEvent(NamedTuple):
+    war_id: int
+    attacker_points: int
+    defender_points: int
+
+
+class WarResult(NamedTuple):
+    war_id: int
+    attacker_id: int
+    defender_id: int
+    attacker_score: int
+    defender_score: int
+    winner_id: Optional[int]
+
+
+class ClanWarEngine:
+    """شمارش امتیاز در حافظه، flush دسته‌ای و تسویه جنگ‌ها در مهلتشان"""
+    
+    def __init__(self):
+        self.wars: Dict[int, War] = {}
+        self.by_clan: Dict[int, War] = {}
+        self.members: Dict[int, int] = {}  # user_id -> clan_id فقط برای کلن‌های در حال جنگ
+        self.loaded = False
+        self.loaded_at = 0.0
+        self.bot = None
+        self.scheduling = False  # فقط پروسس اصلی تسویه می‌کند
+        self.writer = BatchWriter("clan_war_scores", self._flush, max_rows=1000, interval_ms=CLAN_WAR_FLUSH_MS)
+    
+    def load(self):
+        rows = db.fetchall(
+            "SELECT war_id, attacker_id, defender_id, start_time, end_time, attacker_score, defender_score "
+            "FROM clan_wars WHERE status = 'active'"
+        )
+        wars = {}
+        for row in rows:
+            war = War(row['war_id'], row['attacker_id'], row['defender_id'], row['start_time'], row['end_time'],
+                      row['attacker_score'], row['defender_score'])
+            previous = self.wars.get(war.war_id)
+            if previous is not None:
+                war.pending_attacker = previous.pending_attacker
+                war.pending_defender = previous.pending_defender
+            wars[war.war_id] = war
+        
+        self.wars = wars
+        self.by_clan = {}
+        for war in wars.values():
+            self.by_clan[war.attacker_id] = war
+            self.by_clan[war.defender_id] = war
+        self.members = self._load_members(list(self.by_clan))
+        self.loaded = True
+        self.loaded_at = time.monotonic()
+        if self.scheduling:
+            # جنگ‌هایی که worker های دیگر اعلام کرده‌اند هم زمان‌بندی می‌شوند
+            for war in wars.values():
+                self._schedule(war)
+    
+    def _ensure_loaded(self):
+        if not self.loaded:
+            self.load()
+    
+    @staticmethod
+    def _load_members(clan_ids: List[int]) -> Dict[int, int]:
+        if not clan_ids:
+            return {}
+        placeholders = ", ".join("?" * len(clan_ids))
+        rows = db.fetchall(
+            f"SELECT user_id, clan_id FROM clan_members WHERE clan_id IN ({placeholders})", tuple(clan_ids)
+        )
+        return {row['user_id']: row['clan_id'] for row in rows}
+    
+    def member_changed(self, user_id: int, clan_id: Optional[int]):
+        """بعد از عضویت/خروج تا نبردهای همان لحظه درست حساب شوند"""
+        if clan_id is not None and clan_id in self.by_clan:
+            self.members[user_id] = clan_id
+        else:
+            self.members.pop(user_id, None)
+    
+    def war_of(self, clan_id: int) -> Optional[War]:
+        self._ensure_loaded()
+        return self.by_clan.get(clan_id)
+    
+    # ==================== اعلام جنگ ====================
+    
+    def declare(self, attacker_id: int, defender_id: int) -> Tuple[str, Optional[War]]:
+        if attacker_id == defender_id:
+            return "self", None
+        self._ensure_loaded()
+        if attacker_id in self.by_clan or defender_id in self.by_clan:
+            return "busy", None
+        
+        now = time.time()
+        end_time = now + CLAN_WAR_DURATION
+        with db.get_cursor() as cursor:
+            # بررسی دوباره در دیتابیس (جنگی که worker دیگر اعلام کرده)
+            row = cursor.execute(
+                "INSERT INTO clan_wars (attacker_id, defender_id, status, start_time, end_time) "
+                "SELECT ?, ?, 'active', ?, ? WHERE NOT EXISTS ("
+                "    SELECT 1 FROM clan_wars WHERE status = 'active' "
+                "    AND (attacker_id IN (?, ?) OR defender_id IN (?, ?))"
+                ") RETURNING war_id",
+                (attacker_id, defender_id, now, end_time, attacker_id, defender_id, attacker_id, defender_id)
+            ).fetchone()
+        if row is None:
+            self.load()
+            return "busy", None
+        
+        war = War(row['war_id'], attacker_id, defender_id, now, end_time)
+        self.wars[war.war_id] = war
+        self.by_clan[attacker_id] = war
+        self.by_clan[defender_id] = war
+        self.members.update(self._load_members([attacker_id, defender_id]))
+        if self.scheduling:
+            self._schedule(war)
+        logger.info("Clan war #%s declared: clan %s vs clan %s", war.war_id, attacker_id, defender_id)
+        return "ok", war
+    
+    # ==================== امتیاز از نبردها ====================
+    
+    def on_battle(self, attacker_id: int, defender_id: int, winner_id: int, timestamp: float):
+        """یک نبرد از جریان battle_logs؛ اگر بین دو کلن در حال جنگ باشد امتیاز می‌گیرد"""
+        self._ensure_loaded()
+        if not self.wars:
+            return
+        attacker_clan = self.members.get(attacker_id)
+        defender_clan = self.members.get(defender_id)
+        if attacker_clan is None or defender_clan is None or attacker_clan == defender_clan:
+            return
+        war = self.by_clan.get(attacker_clan)
+        if war is None or war.opponent(attacker_clan) != defender_clan:
+            return
+        if not war.start_time <= timestamp < war.end_time:
+            return
+        
+        if winner_id == attacker_id:
+            clan_id, points = attacker_clan, CLAN_WAR_ATTACK_POINTS
+        else:
+            clan_id, points = defender_clan, CLAN_WAR_DEFENSE_POINTS
+        if clan_id == war.attacker_id:
+            war.pending_attacker += points
+            self.writer.add(ScoreEvent(war.war_id, points, 0))
+        else:
+            war.pending_defender += points
+            self.writer.add(ScoreEvent(war.war_id, 0, points))
+    
+    def _flush(self, batch: List[ScoreEvent]):
+        """یک UPDATE افزایشی برای هر جنگ؛ امتیاز جنگ‌های تمام شده دور ریخته می‌شود"""
+        totals: Dict[int, List[int]] = {}
+        for event in batch:
+            entry = totals.setdefault(event.war_id, [0, 0])
+            entry[0] += event.attacker_points
+            entry[1] += event.defender_points
+        
+        flushed: Dict[int, Optional[Tuple[int, int]]] = {}
+        with db.get_cursor() as cursor:
+            for war_id, (attacker_points, defender_points) in totals.items():
+                row = cursor.execute(
+                    "UPDATE clan_wars SET attacker_score = attacker_score + ?, defender_score = defender_score + ? "
+                    "WHERE war_id = ? AND status = 'active' RETURNING attacker_score, defender_score",
+                    (attacker_points, defender_points, war_id)
+                ).fetchone()
+                flushed[war_id] = (row['attacker_score'], row['defender_score']) if row else None
+        
+        # حالت حافظه فقط بعد از commit تغییر می‌کند
+        for war_id, scores in flushed.items():
+            war = self.wars.get(war_id)
+            if war is None:
+                continue
+            attacker_points, defender_points = totals[war_id]
+            war.pending_attacker = max(0, war.pending_attacker - attacker_points)
+            war.pending_defender = max(0, war.pending_defender - defender_points)
+            if scores is not None:
+                war.attacker_score, war.defender_score = scores
+        logger.debug("Flushed %s clan war score events for %s wars", len(batch), len(totals))
+    
+    # ==================== تسویه ====================
+    
+    def settle(self, war_id: int) -> Optional[WarResult]:
+        """پایان جنگ و پاداش برنده؛ فقط تراکنشی که status را از active عوض کند پاداش می‌دهد"""
+        self.writer.flush()
+        with db.get_cursor() as cursor:
+            row = cursor.execute(
+                "UPDATE clan_wars SET status = 'finished', winner_id = CASE "
+                "    WHEN attacker_score > defender_score THEN attacker_id "
+                "    WHEN defender_score > attacker_score THEN defender_id "
+                "    ELSE NULL END "
+                "WHERE war_id = ? AND status = 'active' "
+                "RETURNING attacker_id, defender_id, attacker_score, defender_score, winner_id",
+                (war_id,)
+            ).fetchone()
+            if row is not None and row['winner_id'] is not None:
+                cursor.execute(
+                    "UPDATE clans SET points = points + ?, treasury_coins = treasury_coins + ? WHERE clan_id = ?",
+                    (CLAN_WAR_WIN_POINTS, CLAN_WAR_REWARD, row['winner_id'])
+                )
+        
+        war = self.wars.pop(war_id, None)
+        if war is not None:
+            for clan_id in (war.attacker_id, war.defender_id):
+                if self.by_clan.get(clan_id) is war:
+                    del self.by_clan[clan_id]
+            self.members = {user_id: clan_id for user_id, clan_id in self.members.items() if clan_id in self.by_clan}
+        if row is None:
+            # قبلا (در پروسس دیگر یا قبل از ری‌استارت) تسویه شده است
+            return None
+        
+        result = WarResult(war_id, row['attacker_id'], row['defender_id'],
+                           row['attacker_score'], row['defender_score'], row['winner_id'])
+        if result.winner_id is not None:
+            clan_service.adjust(result.winner_id, CLAN_WAR_WIN_POINTS)
+        logger.info("Clan war #%s settled: %s-%s, winner %s",
+                    war_id, result.attacker_score, result.defender_score, result.winner_id)
+        return result
+    
+    # ==================== زمان‌بندی تسویه ====================
+    
+    def start(self, bot=None):
+        self.bot = bot
+        self.scheduling = True
+        self.load()
+        logger.info("Clan war settlement scheduled for %s active wars.", len(self.wars))
+    
+    def stop(self):
+        self.scheduling = False
+        for war_id in list(self.wars):
+            scheduler.cancel(f"clan_war:{war_id}", persisted=False)
+    
+    def _schedule(self, war: War):
+        scheduler.at(
+            f"clan_war:{war.war_id}", war.end_time + CLAN_WAR_SETTLE_DELAY, self._settle_job,
+            payload={"war_id": war.war_id}, name="clan_war_settle", settlement=True
+        )
+    
+    async def _settle_job(self, job: Job):
+        war_id = job.payload["war_id"]
+        if war_id not in self.wars:
+            return  # قبلا تسویه شده
+        # خطا به زمان‌بند می‌رسد و تسویه بعد از SCHEDULER_RETRY_DELAY تکرار می‌شود
+        result = self.settle(war_id)
+        if result is not None:
+            await self._announce(result)
+    
+    async def _announce(self, result: WarResult):
+        if self.bot is None:
+            return
+        names = {clan_id: clan_service.name(clan_id) for clan_id in (result.attacker_id, result.defender_id)}
+        winner = f"🏆 برنده: {names[result.winner_id]}" if result.winner_id else "🤝 نتیجه: مساوی"
+        text = (
+            f"⚔️ جنگ {names[result.attacker_id]} و {names[result.defender_id]} تمام شد!\n"
+            f"امتیاز: {result.attacker_score:,} - {result.defender_score:,}\n{winner}"
+        )
+        rows = db.fetchall(
+            "SELECT leader_id FROM clans WHERE clan_id IN (?, ?)", (result.attacker_id, result.defender_id)
+        )
+        for row in rows:
+            try:
+                await self.bot.send_message(row['leader_id'], text)
+            except Exception as e:
+                logger.warning("Could not notify clan leader %s about war #%s: %s", row['leader_id'], result.war_id, e)
+
+
+# نمونه سینگلتون
+clan_wars = ClanWarEngine()
+
+# جنگ‌های اعلام شده در worker های دیگر (پروسس اصلی آن‌ها را زمان‌بندی هم می‌کند)
+scheduler.reload_every("clan_wars_reload", CLAN_WAR_MAX_AGE, clan_wars)
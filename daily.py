@@ -22,7 +22,7 @@ async def daily_reward(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 f"🎉 شما {DAILY_REWARD_COINS} سکه جایزه روزانه دریافت کردید!",
                 reply_markup=main_markup
             )
-            logger.info(f"User {user_id} claimed daily reward: +{DAILY_REWARD_COINS} coins")
+            logger.info("User %s claimed daily reward: +%s coins", user_id, DAILY_REWARD_COINS)
         else:
             await update.message.reply_text(
                 "❌ خطا در دریافت جایزه. لطفاً دوباره تلاش کنید.",
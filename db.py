@@ -1,10 +1,135 @@
+import re
 import sqlite3
 import threading
-from typing import Optional
+import time
+from typing import Dict, List, Optional, Tuple
 from contextlib import contextmanager
 
-from config.settings import DB_PATH
-from utils.logger import logger
+from config.settings import DB_PATH, SLOW_QUERY_MS
+from database.backends import create_backend
+from utils.logger import logger, get_logger
+from utils.metrics import metrics
+
+# کوئری‌های کند و خطاهای تراکنش؛ سطحش با LOG_LEVELS="db=..." جدا تنظیم می‌شود
+db_logger = get_logger("db")
+
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(query: str) -> str:
+    """شکل کلی کوئری بدون پارامتر و لیترال (IN (?, ?, ?) -> IN (?+))"""
+    text = _STRING_LITERAL.sub("?", query)
+    text = _NUMBER_LITERAL.sub("?", text)
+    text = _IN_LIST.sub("IN (?+)", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+class QueryStats:
+    """تعداد اجرا، زمان کل و حداکثر برای هر fingerprint + لاگ کوئری‌های کند"""
+    
+    SLOW_LOG_INTERVAL = 60  # حداکثر یک لاگ کند برای هر fingerprint در این بازه (ثانیه)
+    MAX_CACHED_QUERIES = 4096
+    
+    def __init__(self, slow_ms: float = SLOW_QUERY_MS):
+        self.slow_seconds = slow_ms / 1000
+        self.stats: Dict[str, List[float]] = {}  # fingerprint -> [count, total, max]
+        self._fingerprints: Dict[str, str] = {}
+        self._last_slow_log: Dict[str, float] = {}
+    
+    def fingerprint(self, query: str) -> str:
+        fp = self._fingerprints.get(query)
+        if fp is None:
+            fp = fingerprint(query)
+            # رشته‌های SQL معمولاً ثابت‌اند؛ کوئری‌های ساخته‌شده با f-string کش را پر نکنند
+            if len(self._fingerprints) < self.MAX_CACHED_QUERIES:
+                self._fingerprints[query] = fp
+        return fp
+    
+    def record(self, cursor: sqlite3.Cursor, query: str, params, seconds: float):
+        fp = self.fingerprint(query)
+        entry = self.stats.get(fp)
+        if entry is None:
+            self.stats[fp] = [1, seconds, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+            if seconds > entry[2]:
+                entry[2] = seconds
+        
+        if self.slow_seconds and seconds >= self.slow_seconds:
+            self._log_slow(cursor, fp, query, params, seconds)
+    
+    def _log_slow(self, cursor: sqlite3.Cursor, fp: str, query: str, params, seconds: float):
+        now = time.time()
+        if now - self._last_slow_log.get(fp, 0) < self.SLOW_LOG_INTERVAL:
+            return
+        self._last_slow_log[fp] = now
+        
+        plan = ""
+        # EXPLAIN QUERY PLAN فقط در SQLite
+        if params is not None and isinstance(cursor, sqlite3.Cursor):
+            try:
+                rows = cursor.connection.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+                plan = " | ".join(row[-1] for row in rows)
+            except sqlite3.Error as e:
+                plan = f"unavailable ({e})"
+        db_logger.warning("Slow query %.1fms: %s | plan: %s", seconds * 1000, fp, plan or "-")
+    
+    def top(self, n: int = 10) -> List[Tuple[str, int, float, float]]:
+        """(fingerprint، تعداد، زمان کل، حداکثر) به ترتیب زمان کل"""
+        rows = sorted(self.stats.items(), key=lambda item: item[1][1], reverse=True)[:n]
+        return [(fp, int(count), total, peak) for fp, (count, total, peak) in rows]
+    
+    def reset(self):
+        self.stats.clear()
+        self._last_slow_log.clear()
+
+
+query_stats = QueryStats()
+
+
+class InstrumentedCursor:
+    """cursor با ثبت زمان هر statement در metrics و آمار fingerprint"""
+    
+    __slots__ = ("_cursor",)
+    
+    def __init__(self, cursor: sqlite3.Cursor):
+        self._cursor = cursor
+    
+    def execute(self, query: str, params=()):
+        start = time.perf_counter()
+        try:
+            self._cursor.execute(query, params)
+            return self
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.record_db(elapsed)
+            query_stats.record(self._cursor, query, params, elapsed)
+    
+    def executemany(self, query: str, seq_of_params):
+        start = time.perf_counter()
+        try:
+            self._cursor.executemany(query, seq_of_params)
+            return self
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.record_db(elapsed)
+            # پارامترهای executemany معمولاً generator هستند و برای EXPLAIN قابل استفاده نیستند
+            query_stats.record(self._cursor, query, None, elapsed)
+    
+    def __iter__(self):
+        return iter(self._cursor)
+    
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class Rollback(Exception):
+    """لغو عمدی تراکنش وقتی شرط همزمانی برقرار نیست؛ get_cursor آن را خطای دیتابیس ثبت نمی‌کند"""
 
 
 class Database:
@@ -22,30 +147,29 @@ class Database:
     def __init__(self):
         if not hasattr(self, 'initialized'):
             self.db_path = DB_PATH
-            self._local = threading.local()
+            self.backend = create_backend()
+            self.dialect = self.backend.dialect
             self.initialized = True
-            logger.info(f"Database manager initialized with path: {self.db_path}")
-    
-    def get_connection(self) -> sqlite3.Connection:
-        if not hasattr(self._local, 'connection'):
-            self._local.connection = sqlite3.connect(self.db_path)
-            self._local.connection.row_factory = sqlite3.Row
-            logger.debug(f"New database connection created for thread {threading.current_thread().name}")
-        return self._local.connection
+            logger.info("Database manager initialized (%s): %s", self.dialect, self.db_path)
     
     @contextmanager
     def get_cursor(self):
-        conn = self.get_connection()
-        cursor = conn.cursor()
         try:
-            yield cursor
-            conn.commit()
+            with self.backend.transaction() as cursor:
+                if metrics.enabled:
+                    yield InstrumentedCursor(cursor)
+                    # زمان commit (خروج از transaction) به زمان DB handler اضافه می‌شود
+                    start = time.perf_counter()
+                else:
+                    yield cursor
+                    start = None
+            if start is not None:
+                metrics.record_db(time.perf_counter() - start, statements=0)
+        except Rollback:
+            raise
         except Exception as e:
-            conn.rollback()
-            logger.error(f"Database error: {e}")
+            db_logger.error("Database error: %s", e)
             raise
-        finally:
-            cursor.close()
     
     def execute(self, query: str, params: tuple = ()):
         with self.get_cursor() as cursor:
@@ -63,10 +187,8 @@ class Database:
             return cursor.fetchall()
     
     def close_all(self):
-        if hasattr(self._local, 'connection'):
-            self._local.connection.close()
-            delattr(self._local, 'connection')
-            logger.info("Database connections closed")
+        self.backend.close()
+        logger.info("Database connections closed")
 
 
 db = Database()
@@ -75,6 +197,11 @@ db = Database()
 def init_database():
     logger.info("Initializing database tables...")
     
+    if db.dialect == "postgres":
+        db.backend.init_schema()
+        logger.info("Database tables initialized successfully")
+        return
+    
     with db.get_cursor() as cursor:
         # جدول users
         cursor.execute("""
@@ -189,11 +316,40 @@ def init_database():
             contribution_coins INTEGER DEFAULT 0,
             contribution_iron INTEGER DEFAULT 0,
             contribution_silver INTEGER DEFAULT 0,
+            contribution_points INTEGER DEFAULT 0,
             FOREIGN KEY (user_id) REFERENCES users(user_id),
             FOREIGN KEY (clan_id) REFERENCES clans(clan_id)
         )
         """)
         
+        # Migration: امتیاز کل کمک هر عضو (مرتب‌سازی فهرست اعضا)
+        try:
+            cursor.execute("ALTER TABLE clan_members ADD COLUMN contribution_points INTEGER DEFAULT 0")
+            logger.info("Added contribution_points column to clan_members table")
+        except Exception:
+            pass
+        
+        # صفحه‌بندی keyset اعضای هر کلن بدون مرتب‌سازی و OFFSET
+        cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_clan_members_contrib
+        ON clan_members (clan_id, contribution_points DESC, user_id)
+        """)
+        
+        # کمک هر عضو در همان UPDATE به خزانه و امتیاز کلن اضافه می‌شود
+        cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS clan_contribution
+        AFTER UPDATE OF contribution_coins, contribution_iron, contribution_silver, contribution_points
+        ON clan_members
+        BEGIN
+            UPDATE clans SET
+                treasury_coins = treasury_coins + NEW.contribution_coins - OLD.contribution_coins,
+                treasury_iron = treasury_iron + NEW.contribution_iron - OLD.contribution_iron,
+                treasury_silver = treasury_silver + NEW.contribution_silver - OLD.contribution_silver,
+                points = points + NEW.contribution_points - OLD.contribution_points
+            WHERE clan_id = NEW.clan_id;
+        END
+        """)
+        
         cursor.execute("""
         CREATE TABLE IF NOT EXISTS clan_wars (
             war_id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -210,6 +366,9 @@ def init_database():
         )
         """)
         
+        # بارگذاری جنگ‌های فعال و بررسی درگیر نبودن کلن هنگام اعلام جنگ
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_clan_wars_active ON clan_wars (status, end_time)")
+        
         cursor.execute("""
         CREATE TABLE IF NOT EXISTS clan_missions (
             mission_id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -225,6 +384,9 @@ def init_database():
         )
         """)
         
+        # ماموریت فعال هر کلن
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_clan_missions_active ON clan_missions (clan_id, completed)")
+        
         cursor.execute("""
         CREATE TABLE IF NOT EXISTS bank (
             user_id INTEGER PRIMARY KEY,
@@ -245,10 +407,18 @@ def init_database():
             last_free_spin_date TEXT DEFAULT '',
             streak_days INTEGER DEFAULT 0,
             last_streak_date TEXT DEFAULT '',
+            bonus_spins INTEGER DEFAULT 0,
             FOREIGN KEY (user_id) REFERENCES users(user_id)
         )
         """)
         
+        # Migration: چرخش‌های جایزه (جدا از سهمیه رایگان روزانه)
+        try:
+            cursor.execute("ALTER TABLE wheel_spins ADD COLUMN bonus_spins INTEGER DEFAULT 0")
+            logger.info("Added bonus_spins column to wheel_spins table")
+        except Exception:
+            pass
+        
         cursor.execute("""
         CREATE TABLE IF NOT EXISTS wheel_history (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -261,6 +431,10 @@ def init_database():
         )
         """)
         
+        # آخرین جوایز هر کاربر و پاک‌سازی سوابق قدیمی
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_wheel_history_user ON wheel_history (user_id, id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_wheel_history_timestamp ON wheel_history (timestamp)")
+        
         cursor.execute("""
         CREATE TABLE IF NOT EXISTS missions (
             user_id INTEGER,
@@ -309,6 +483,9 @@ def init_database():
         )
         """)
         
+        # آمار حمله‌های هر کاربر برای دستاوردها
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_battle_logs_attacker ON battle_logs (attacker_id)")
+        
         cursor.execute("""
         CREATE TABLE IF NOT EXISTS pvp_ratings (
             user_id INTEGER PRIMARY KEY,
@@ -316,10 +493,20 @@ def init_database():
             wins INTEGER DEFAULT 0,
             losses INTEGER DEFAULT 0,
             total_fights INTEGER DEFAULT 0,
+            updated_at REAL DEFAULT 0,
             FOREIGN KEY (user_id) REFERENCES users(user_id)
         )
         """)
         
+        # Migration: زمان آخرین flush هر امتیاز (بارگذاری افزایشی رتبه‌بندی)
+        try:
+            cursor.execute("ALTER TABLE pvp_ratings ADD COLUMN updated_at REAL DEFAULT 0")
+            logger.info("Added updated_at column to pvp_ratings table")
+        except Exception:
+            pass
+        
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_pvp_ratings_updated ON pvp_ratings (updated_at)")
+        
         cursor.execute("""
         CREATE TABLE IF NOT EXISTS pvp_cooldowns (
             user_id INTEGER PRIMARY KEY,
@@ -344,12 +531,23 @@ def init_database():
             tournament_id INTEGER,
             user_id INTEGER,
             score INTEGER DEFAULT 0,
+            final_rank INTEGER DEFAULT NULL,
             PRIMARY KEY(tournament_id, user_id),
             FOREIGN KEY (tournament_id) REFERENCES tournaments(tournament_id),
             FOREIGN KEY (user_id) REFERENCES users(user_id)
         )
         """)
         
+        # Migration: رتبه نهایی هر شرکت‌کننده (ثبت در پایان تورنمنت)
+        try:
+            cursor.execute("ALTER TABLE tournament_participants ADD COLUMN final_rank INTEGER DEFAULT NULL")
+            logger.info("Added final_rank column to tournament_participants table")
+        except Exception:
+            pass
+        
+        # تورنمنت‌های در حال اجرا و زمان‌بندی شده
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_tournaments_status ON tournaments (status, end_time)")
+        
         cursor.execute("""
         CREATE TABLE IF NOT EXISTS revenge_used (
             user_id INTEGER,
@@ -383,6 +581,9 @@ def init_database():
         )
         """)
         
+        # سقف انتقال روزانه بانک: SUM روی همین ایندکس
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_transfers_sender_date ON transfers (sender_id, date)")
+        
         cursor.execute("""
         CREATE TABLE IF NOT EXISTS events (
             event_id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -405,6 +606,12 @@ def init_database():
         )
         """)
         
+        # نفرات برتر هر رویداد
+        cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_event_participants_score
+        ON event_participants (event_id, score DESC, user_id)
+        """)
+        
         cursor.execute("""
         CREATE TABLE IF NOT EXISTS market_listings (
             listing_id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -422,13 +629,19 @@ def init_database():
         )
         """)
         
+        # بارگذاری دفتر سفارش بازار با یک اسکن مرتب روی آگهی‌های فعال
+        cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_market_active
+        ON market_listings (status, item_name, price, listing_id)
+        """)
+        
         cursor.execute("""
         CREATE TABLE IF NOT EXISTS trade_offers (
             offer_id INTEGER PRIMARY KEY AUTOINCREMENT,
             from_user INTEGER NOT NULL,
             to_user INTEGER NOT NULL,
-            offer_items TEXT NOT NULL,
-            request_items TEXT NOT NULL,
+            offer_items BLOB NOT NULL,
+            request_items BLOB NOT NULL,
             status TEXT DEFAULT 'pending',
             created_at REAL NOT NULL,
             completed_at REAL,
@@ -437,6 +650,11 @@ def init_database():
         )
         """)
         
+        # sweep انقضا و فهرست پیشنهادهای هر کاربر بدون اسکن جدول
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_trade_pending ON trade_offers (status, created_at)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_trade_to ON trade_offers (to_user, status)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_trade_from ON trade_offers (from_user, status)")
+        
         cursor.execute("""
         CREATE TABLE IF NOT EXISTS bosses (
             boss_id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -458,12 +676,31 @@ def init_database():
             attacks INTEGER DEFAULT 0,
             attacked_at REAL,
             rewards_claimed INTEGER DEFAULT 0,
+            chat_id INTEGER,
             PRIMARY KEY(boss_id, user_id),
             FOREIGN KEY (boss_id) REFERENCES bosses(boss_id),
             FOREIGN KEY (user_id) REFERENCES users(user_id)
         )
         """)
         
+        # Migration: چت آخرین ضربه هر شرکت‌کننده (اعلام کشته شدن در همه گروه‌ها)
+        try:
+            cursor.execute("ALTER TABLE boss_participants ADD COLUMN chat_id INTEGER")
+            logger.info("Added chat_id column to boss_participants table")
+        except Exception:
+            pass
+        
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_boss_damage ON boss_participants (boss_id, damage_dealt)")
+        
+        # cooldown ضربه به باس، مشترک بین worker ها
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS raid_cooldowns (
+            user_id INTEGER PRIMARY KEY,
+            last_hit REAL DEFAULT 0,
+            FOREIGN KEY (user_id) REFERENCES users(user_id)
+        )
+        """)
+        
         cursor.execute("""
         CREATE TABLE IF NOT EXISTS campaign_progress (
             user_id INTEGER PRIMARY KEY,
@@ -491,5 +728,21 @@ def init_database():
             value TEXT DEFAULT ''
         )
         """)
+        
+        # کارهای persistent زمان‌بند (ادامه بعد از ری‌استارت)
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS scheduled_jobs (
+            job_id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            next_run REAL NOT NULL,
+            repeat_seconds REAL DEFAULT 0,
+            misfire TEXT DEFAULT 'run',
+            payload TEXT DEFAULT '{}',
+            runs INTEGER DEFAULT 0,
+            failures INTEGER DEFAULT 0,
+            last_run REAL DEFAULT 0,
+            last_duration REAL DEFAULT 0
+        )
+        """)
     
     logger.info("Database tables initialized successfully")
@@ -0,0 +1,50 @@
+# utils/events.py
+"""
+گذرگاه رویداد درون پروسسی (publish / subscribe همگام)
+
+handler ها بعد از یک عمل موفق (خرید، استخراج، حمله، انتقال، کمک به کلن) رویداد منتشر می‌کنند و
+موتورهایی مثل ماموریت‌ها فقط برای نوع رویدادهایی که به آن وابسته‌اند subscribe می‌کنند.
+خطای یک subscriber به handler اصلی و بقیه subscriber ها نمی‌رسد.
+"""
+
+from typing import Any, Callable, Dict, List, NamedTuple
+
+from utils.logger import logger
+
+PURCHASE = "purchase"
+MINE = "mine"
+ATTACK = "attack"
+TRANSFER = "transfer"
+DONATE = "donate"
+
+
+class Event(NamedTuple):
+    type: str
+    user_id: int
+    amount: int
+    data: Dict[str, Any]
+
+
+class EventBus:
+    """فهرست subscriber ها برای هر نوع رویداد"""
+    
+    def __init__(self):
+        self._subscribers: Dict[str, List[Callable[[Event], None]]] = {}
+    
+    def subscribe(self, event_type: str, callback: Callable[[Event], None]):
+        self._subscribers.setdefault(event_type, []).append(callback)
+    
+    def publish(self, event_type: str, user_id: int, amount: int = 1, **data):
+        callbacks = self._subscribers.get(event_type)
+        if not callbacks:
+            return
+        event = Event(event_type, user_id, amount, data)
+        for callback in callbacks:
+            try:
+                callback(event)
+            except Exception as e:
+                logger.exception("Event subscriber %s failed on %s: %s", callback.__qualname__, event_type, e)
+
+
+# نمونه سینگلتون
+event_bus = EventBus()
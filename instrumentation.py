@@ -0,0 +1,69 @@
+# utils/instrumentation.py
+"""
+اتصال metrics به Application تلگرام (handler ها و درخواست‌های Bot API)
+"""
+
+import functools
+import time
+
+from telegram.ext import Application, ConversationHandler
+from telegram.request import HTTPXRequest
+
+from utils.metrics import metrics, RequestStats, _current
+
+
+def instrument_callback(callback, name: str):
+    """پوشاندن callback یک handler برای ثبت زمان کل، DB و API"""
+    if getattr(callback, "__instrumented__", False):
+        return callback
+    
+    @functools.wraps(callback)
+    async def wrapper(update, context, *args, **kwargs):
+        metrics.ensure_server()
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            return await callback(update, context, *args, **kwargs)
+        except Exception:
+            metrics.handler_errors[name] += 1
+            raise
+        finally:
+            _current.reset(token)
+            metrics.record_handler(name, time.perf_counter() - start, stats)
+    
+    wrapper.__instrumented__ = True
+    return wrapper
+
+
+def _instrument_handler(handler):
+    if isinstance(handler, ConversationHandler):
+        children = list(handler.entry_points) + list(handler.fallbacks)
+        for state_handlers in handler.states.values():
+            children.extend(state_handlers)
+        for child in children:
+            _instrument_handler(child)
+        return
+    callback = getattr(handler, "callback", None)
+    if callback is not None:
+        handler.callback = instrument_callback(callback, f"{callback.__module__.rsplit('.', 1)[-1]}.{callback.__name__}")
+
+
+def instrument_application(application: Application):
+    """اندازه‌گیری همه handler های ثبت‌شده روی Application"""
+    if not metrics.enabled:
+        return
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            _instrument_handler(handler)
+
+
+class InstrumentedRequest(HTTPXRequest):
+    """HTTPXRequest با ثبت زمان هر متد Bot API"""
+    
+    async def do_request(self, url: str, method: str, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await super().do_request(url, method, *args, **kwargs)
+        finally:
+            metrics.record_api(url.rsplit("/", 1)[-1], time.perf_counter() - start)
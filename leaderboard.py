@@ -0,0 +1,105 @@
+# handlers/leaderboard.py
+"""
+لیدربرد بازیکنان
+"""
+
+from typing import Dict, Iterable
+
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import ContextTypes, CallbackQueryHandler
+
+from database.db import db
+from utils.leaderboard_service import leaderboards
+from utils.pvp_rating import rating_engine
+from utils.logger import logger
+
+LEADERBOARD_SIZE = 10
+
+METRIC_TITLES = {
+    "coins": "💰 ثروتمندترین‌ها",
+    "wins": "⚔️ بیشترین برد",
+    "power": "🔋 قدرتمندترین زرادخانه",
+    "rating": "🏅 امتیاز PvP",
+}
+
+
+def _get_usernames(user_ids: Iterable[int]) -> Dict[int, str]:
+    user_ids = list(user_ids)
+    if not user_ids:
+        return {}
+    placeholders = ",".join("?" * len(user_ids))
+    rows = db.fetchall(
+        f"SELECT user_id, username FROM users WHERE user_id IN ({placeholders})",
+        user_ids
+    )
+    return {row['user_id']: row['username'] for row in rows}
+
+
+def _build_leaderboard(metric: str, user_id: int):
+    if metric == "rating":
+        top = rating_engine.top(LEADERBOARD_SIZE)
+        my_rank = rating_engine.rank(user_id)
+        my_score = rating_engine.get_rating(user_id)
+        total = rating_engine.total_players()
+    else:
+        top = leaderboards.top(metric, LEADERBOARD_SIZE)
+        my_rank = leaderboards.rank(metric, user_id)
+        my_score = leaderboards.score(metric, user_id)
+        total = leaderboards.total(metric)
+    
+    usernames = _get_usernames(uid for uid, _ in top)
+    
+    text = (
+        f"{METRIC_TITLES[metric]}\n"
+        "━━━━━━━━━━━━━━━━━━\n\n"
+    )
+    
+    medals = ["🥇", "🥈", "🥉"]
+    for i, (uid, score) in enumerate(top, start=1):
+        medal = medals[i-1] if i <= 3 else f"{i}."
+        username = f"@{usernames[uid]}" if usernames.get(uid) else f"User {uid}"
+        text += f"{medal} {username} — <code>{score:,}</code>\n"
+    
+    if not top:
+        text += "هنوز کسی در این لیدربرد نیست.\n"
+    
+    if my_rank:
+        text += f"\n📍 رتبه شما: <b>{my_rank:,}</b> از {total:,} (<code>{my_score:,}</code>)"
+    else:
+        text += "\n📍 شما هنوز در این لیدربرد رتبه‌ای ندارید."
+    
+    keyboard = [
+        [
+            InlineKeyboardButton("💰 سکه", callback_data="lb_coins"),
+            InlineKeyboardButton("⚔️ برد", callback_data="lb_wins")
+        ],
+        [
+            InlineKeyboardButton("🔋 قدرت", callback_data="lb_power"),
+            InlineKeyboardButton("🏅 امتیاز PvP", callback_data="lb_rating")
+        ]
+    ]
+    
+    return text, InlineKeyboardMarkup(keyboard)
+
+
+async def show_leaderboard(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_user.id
+    text, markup = _build_leaderboard("coins", user_id)
+    await update.message.reply_text(text, reply_markup=markup, parse_mode="HTML")
+    logger.info("User %s viewed leaderboard", user_id)
+
+
+async def leaderboard_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    
+    metric = query.data.replace("lb_", "")
+    if metric not in METRIC_TITLES:
+        return
+    
+    text, markup = _build_leaderboard(metric, query.from_user.id)
+    await query.edit_message_text(text, reply_markup=markup, parse_mode="HTML")
+
+
+# Handler برای تغییر معیار لیدربرد
+leaderboard_handler = CallbackQueryHandler(leaderboard_callback, pattern="^lb_")
@@ -0,0 +1,175 @@
+# utils/leaderboard_service.py
+"""
+لیدربرد سکه، برد و قدرت با ایندکس‌های رتبه‌بندی افزایشی در حافظه
+"""
+
+import asyncio
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from database.db import db
+from config.settings import LEADERBOARD_MAX_AGE
+from config.weapons import WEAPON_STATS
+from utils.ranked_index import RankedIndex
+from utils.scheduler import scheduler
+from utils.logger import logger
+
+METRICS = ("coins", "wins", "power")
+
+
+def weapon_power(weapon_name: str) -> int:
+    """قدرت یک عدد سلاح (حمله + دفاع)"""
+    stats = WEAPON_STATS.get(weapon_name)
+    if not stats:
+        return 0
+    return stats.get("attack", 0) + stats.get("defense", 0)
+
+
+class LeaderboardService:
+    """ایندکس‌های top-K/rank برای هر معیار
+    
+    تا اولین خواندن چیزی بارگذاری نمی‌شود؛ بعد از آن مسیرهای تغییر
+    (models، بانک، نبردها) تغییرات را به‌صورت افزایشی اعمال می‌کنند. همین مسیرها
+    subscriber ها را (مثل دستاوردهای سکه و قدرت) از تغییر هر کاربر باخبر می‌کنند.
+    
+    در حالت چندپروسسی اسکن دوباره هر LEADERBOARD_MAX_AGE ثانیه در thread جدا اجرا
+    می‌شود؛ کاربرانی که در طول اسکن تغییر کرده‌اند بعد از آن تک‌تک دوباره خوانده می‌شوند.
+    """
+    
+    def __init__(self):
+        self.indices: Dict[str, RankedIndex] = {metric: RankedIndex() for metric in METRICS}
+        self.loaded = False
+        self.loaded_at = 0.0
+        self.subscribers: List[Callable[[str, int], None]] = []
+        self.dirty: Optional[Set[int]] = None  # کاربران تغییر کرده در طول refresh
+    
+    @staticmethod
+    def _scan(where: str = "", params: tuple = ()) -> Tuple[int, Dict[str, Dict[int, int]]]:
+        """امتیاز همه معیارها از resources و armory (بدون دست زدن به وضعیت حافظه)"""
+        rows = db.fetchall(f"SELECT user_id, coins, wins FROM resources {where}", params)
+        power = {row['user_id']: 0 for row in rows}
+        for row in db.fetchall(f"SELECT user_id, weapon_name, count FROM armory {where}", params):
+            power[row['user_id']] = power.get(row['user_id'], 0) + weapon_power(row['weapon_name']) * row['count']
+        return len(rows), {
+            "coins": {row['user_id']: row['coins'] or 0 for row in rows},
+            "wins": {row['user_id']: row['wins'] or 0 for row in rows},
+            "power": power,
+        }
+    
+    def _build(self) -> Tuple[int, Dict[str, RankedIndex]]:
+        users, scores = self._scan()
+        return users, {metric: RankedIndex(values.items()) for metric, values in scores.items()}
+    
+    def load(self):
+        """ساخت همه ایندکس‌ها با یک اسکن از resources و armory"""
+        users, self.indices = self._build()
+        self.loaded = True
+        self.loaded_at = time.monotonic()
+        logger.info("Leaderboards loaded: %s users", users)
+    
+    async def refresh(self):
+        """اسکن دوباره در thread جدا تا handler های event loop منتظر آن نمانند"""
+        if self.dirty is not None:
+            return
+        self.dirty = set()
+        try:
+            users, indices = await asyncio.to_thread(self._build)
+        finally:
+            dirty, self.dirty = self.dirty, None
+        if not self.loaded:
+            return  # در این فاصله invalidate شد
+        self.indices = indices
+        self._reload_users(sorted(dirty))
+        self.loaded_at = time.monotonic()
+        logger.debug("Leaderboards refreshed: %s users, %s changed during scan", users, len(dirty))
+    
+    def _reload_users(self, user_ids: List[int], chunk: int = 500):
+        # تغییرات commit شده در طول اسکن ممکن است در آن نباشند؛ مقدار فعلی دیتابیس جایگزین می‌شود
+        for i in range(0, len(user_ids), chunk):
+            part = user_ids[i:i + chunk]
+            _, scores = self._scan(f"WHERE user_id IN ({','.join('?' * len(part))})", tuple(part))
+            for user_id in part:
+                if user_id not in scores["coins"]:
+                    self.remove_user(user_id)
+                    continue
+                for metric, values in scores.items():
+                    self.indices[metric].set(user_id, values.get(user_id, 0))
+    
+    def invalidate(self):
+        """بعد از تغییرات گروهی (مثل پاداش همگانی) در خواندن بعدی دوباره ساخته می‌شود"""
+        self.loaded = False
+        for index in self.indices.values():
+            index.clear()
+    
+    def _ensure_loaded(self):
+        if not self.loaded:
+            self.load()
+    
+    # ==================== بروزرسانی ====================
+    
+    def subscribe(self, callback: Callable[[str, int], None]):
+        """callback(metric, user_id) بعد از هر adjust/set (تغییر در دیتابیس commit شده است)"""
+        self.subscribers.append(callback)
+    
+    def _changed(self, metric: str, user_id: int):
+        if self.dirty is not None:
+            self.dirty.add(user_id)
+        for callback in self.subscribers:
+            try:
+                callback(metric, user_id)
+            except Exception as e:
+                logger.exception("Leaderboard subscriber %s failed on %s: %s", callback.__qualname__, metric, e)
+    
+    def adjust(self, metric: str, user_id: int, delta: int):
+        if not delta:
+            return
+        if self.loaded:
+            self.indices[metric].add(user_id, delta)
+        self._changed(metric, user_id)
+    
+    def set(self, metric: str, user_id: int, value: int):
+        if self.loaded:
+            self.indices[metric].set(user_id, value)
+        self._changed(metric, user_id)
+    
+    def add_user(self, user_id: int):
+        if self.dirty is not None:
+            self.dirty.add(user_id)
+        if self.loaded:
+            for index in self.indices.values():
+                if user_id not in index:
+                    index.set(user_id, 0)
+    
+    def remove_user(self, user_id: int):
+        for index in self.indices.values():
+            index.remove(user_id)
+    
+    def adjust_armory(self, deltas: Iterable[Tuple[Tuple[int, str], int]]):
+        """اعمال تغییرات زرادخانه روی معیار قدرت"""
+        for (user_id, weapon), delta in deltas:
+            self.adjust("power", user_id, weapon_power(weapon) * delta)
+    
+    # ==================== خواندن ====================
+    
+    def top(self, metric: str, n: int = 10) -> List[Tuple[int, int]]:
+        self._ensure_loaded()
+        return [(user_id, int(score)) for user_id, score in self.indices[metric].top(n)]
+    
+    def rank(self, metric: str, user_id: int) -> Optional[int]:
+        self._ensure_loaded()
+        return self.indices[metric].rank(user_id)
+    
+    def score(self, metric: str, user_id: int) -> int:
+        self._ensure_loaded()
+        return int(self.indices[metric].get(user_id, 0))
+    
+    def total(self, metric: str) -> int:
+        self._ensure_loaded()
+        return len(self.indices[metric])
+
+
+# نمونه سینگلتون
+leaderboards = LeaderboardService()
+
+# در حالت چندپروسسی تغییرات worker های دیگر فقط با بارگذاری مجدد دیده می‌شوند
+scheduler.reload_every("leaderboards_reload", LEADERBOARD_MAX_AGE, leaderboards, leaderboards.refresh)
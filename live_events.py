@@ -0,0 +1,50 @@
+# handlers/live_events.py
+"""
+رویدادهای زمان‌دار: /event برای رویدادهای جاری، جدول نفرات برتر و امتیاز شما
+"""
+
+import time
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from database.models import add_user
+from config.settings import TIMED_EVENT_REWARDS
+from handlers.leaderboard import _get_usernames
+from utils.timed_events import timed_events, TimedEvent
+
+TOP = 5
+MEDALS = ("🥇", "🥈", "🥉")
+
+
+def format_event(event: TimedEvent, user_id: int) -> str:
+    now = time.time()
+    lines = [f"<b>{event.spec.title}</b>", f"🎯 {event.spec.description}"]
+    if now < event.start_time:
+        hours, rest = divmod(int(event.start_time - now), 3600)
+        lines.append(f"🕒 شروع تا {hours} ساعت و {rest // 60} دقیقه دیگر")
+        return "\n".join(lines)
+    
+    hours, rest = divmod(max(0, int(event.end_time - now)), 3600)
+    lines.append(f"⏳ {hours} ساعت و {rest // 60} دقیقه مانده")
+    top, score = timed_events.standings(event.event_id, user_id, TOP)
+    usernames = _get_usernames(uid for uid, _ in top)
+    for i, (uid, points) in enumerate(top, start=1):
+        icon = MEDALS[i - 1] if i <= len(MEDALS) else f"{i}."
+        name = f"@{usernames[uid]}" if usernames.get(uid) else f"User {uid}"
+        lines.append(f"{icon} {name} — <code>{points:,}</code>")
+    lines.append(f"📍 امتیاز شما: {score:,}")
+    return "\n".join(lines)
+
+
+async def event_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_user.id
+    add_user(user_id, update.effective_user.username)
+    events = timed_events.current()
+    if not events:
+        await update.message.reply_text("🎪 در حال حاضر رویدادی برگزار نمی‌شود.")
+        return
+    prizes = "، ".join(f"{reward:,}" for reward in TIMED_EVENT_REWARDS)
+    sections = ["🎪 <b>رویدادها</b>"] + [format_event(event, user_id) for event in events]
+    sections.append(f"🎁 جایزه نفرات برتر: {prizes} سکه")
+    await update.message.reply_text("\n\n".join(sections), parse_mode="HTML")
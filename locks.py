@@ -0,0 +1,63 @@
+# utils/locks.py
+"""
+قفل‌های async برای هر کاربر با lock striping (حافظه ثابت برای هر تعداد کاربر)
+"""
+
+import asyncio
+import functools
+from contextlib import asynccontextmanager
+from typing import Hashable, List
+
+from config.settings import USER_LOCK_STRIPES
+
+
+class KeyedLocks:
+    """تعداد ثابتی asyncio.Lock؛ هر کلید به یک قفل نگاشت می‌شود
+    
+    دو کلید ممکن است قفل مشترک داشته باشند (فقط کمی انتظار بیشتر، نه خطا). hold
+    قفل چند کلید را به ترتیب اندیس می‌گیرد تا دو handler با کلیدهای برعکس
+    (مثلا مهاجم/مدافع) به بن‌بست نخورند. قفل‌ها reentrant نیستند؛ handler ای که
+    قفل کاربر را گرفته نباید handler دیگری را که همان قفل را می‌گیرد صدا بزند.
+    """
+    
+    def __init__(self, stripes: int = USER_LOCK_STRIPES):
+        self._locks: List[asyncio.Lock] = [asyncio.Lock() for _ in range(max(1, stripes))]
+    
+    def _index(self, key: Hashable) -> int:
+        return hash(key) % len(self._locks)
+    
+    def lock(self, key: Hashable) -> asyncio.Lock:
+        return self._locks[self._index(key)]
+    
+    def locked(self, key: Hashable) -> bool:
+        return self.lock(key).locked()
+    
+    @asynccontextmanager
+    async def hold(self, *keys: Hashable):
+        indices = sorted({self._index(key) for key in keys})
+        acquired = []
+        try:
+            for index in indices:
+                await self._locks[index].acquire()
+                acquired.append(self._locks[index])
+            yield
+        finally:
+            for lock in reversed(acquired):
+                lock.release()
+
+
+user_locks = KeyedLocks()
+
+
+def serialized_per_user(callback):
+    """اجرای handler زیر قفل effective_user (برای مراحل ConversationHandler)"""
+    
+    @functools.wraps(callback)
+    async def wrapper(update, context, *args, **kwargs):
+        user = update.effective_user
+        if user is None:
+            return await callback(update, context, *args, **kwargs)
+        async with user_locks.hold(user.id):
+            return await callback(update, context, *args, **kwargs)
+    
+    return wrapper
@@ -3,6 +3,7 @@
 مدیریت لاگینگ به گروه تلگرام با Topic
 """
 
+import asyncio
 import json
 import os
 from datetime import datetime
@@ -27,7 +28,7 @@ class LogManager:
                 with open(TOPICS_FILE, 'r', encoding='utf-8') as f:
                     return json.load(f)
             except Exception as e:
-                logger.error(f"Error loading topics: {e}")
+                logger.error("Error loading topics: %s", e)
         return {}
     
     def _save_topics(self):
@@ -37,7 +38,7 @@ class LogManager:
             with open(TOPICS_FILE, 'w', encoding='utf-8') as f:
                 json.dump(self.topics, f, ensure_ascii=False, indent=2)
         except Exception as e:
-            logger.error(f"Error saving topics: {e}")
+            logger.error("Error saving topics: %s", e)
     
     async def ensure_topics(self):
         """ایجاد یا بازیابی Topic‌ها"""
@@ -57,35 +58,30 @@ class LogManager:
             "security": f"{TOPIC_EMOJIS['security']} امنیت",
         }
         
-        for topic_key, topic_name in topic_configs.items():
-            # اگه Topic از قبل وجود داره، چک کن هنوز معتبره
-            if topic_key in self.topics:
-                topic_id = self.topics[topic_key]
-                # تست ارسال پیام برای اطمینان از معتبر بودن
-                try:
-                    # فقط در صورت نیاز تست کن (برای اولین بار)
-                    continue
-                except TelegramError:
-                    logger.warning(f"Topic {topic_key} invalid, recreating...")
-                    del self.topics[topic_key]
-            
-            # ایجاد Topic جدید
-            if topic_key not in self.topics:
-                try:
-                    result = await self.bot.create_forum_topic(
-                        chat_id=self.log_group_id,
-                        name=topic_name
-                    )
-                    self.topics[topic_key] = result.message_thread_id
-                    self._save_topics()
-                    logger.info(f"Created topic: {topic_name} (ID: {result.message_thread_id})")
-                except TelegramError as e:
-                    logger.error(f"Failed to create topic {topic_name}: {e}")
+        missing = {key: name for key, name in topic_configs.items() if key not in self.topics}
+        if not missing:
+            return
+        
+        # ساخت همزمان Topic های جدید و یک بار ذخیره در پایان
+        results = await asyncio.gather(
+            *(self.bot.create_forum_topic(chat_id=self.log_group_id, name=name) for name in missing.values()),
+            return_exceptions=True
+        )
+        for (topic_key, topic_name), result in zip(missing.items(), results):
+            if isinstance(result, Exception):
+                logger.error("Failed to create topic %s: %s", topic_name, result)
+                continue
+            self.topics[topic_key] = result.message_thread_id
+            logger.info("Created topic: %s (ID: %s)", topic_name, result.message_thread_id)
+        self._save_topics()
     
     async def log(self, topic: str, message: str, parse_mode: Optional[str] = None):
         """ارسال لاگ به Topic مشخص"""
+        if topic not in self.topics:
+            # Topic ها ممکن است توسط پروسس دیگری ساخته شده باشند
+            self.topics = self._load_topics()
         if not self.log_group_id or topic not in self.topics:
-            logger.warning(f"Cannot log to topic '{topic}' - not configured")
+            logger.warning("Cannot log to topic '%s' - not configured", topic)
             return
         
         try:
@@ -99,7 +95,7 @@ class LogManager:
                 parse_mode=parse_mode
             )
         except TelegramError as e:
-            logger.error(f"Failed to send log to topic {topic}: {e}")
+            logger.error("Failed to send log to topic %s: %s", topic, e)
     
     async def log_system(self, message: str):
         """لاگ سیستم"""
@@ -159,9 +155,9 @@ class LogManager:
                     document=f,
                     caption=caption or "💾 بکاپ خودکار دیتابیس"
                 )
-            logger.info(f"Backup sent: {file_path}")
+            logger.info("Backup sent: %s", file_path)
         except Exception as e:
-            logger.error(f"Failed to send backup: {e}")
+            logger.error("Failed to send backup: %s", e)
 
 
 # نمونه سینگلتون
@@ -1,5 +1,18 @@
 import sys
+import json
+import atexit
 import logging
+import logging.handlers
+import os
+import queue
+import time
+from typing import Dict, Optional, Tuple
+
+from config.settings import (
+    LOG_LEVEL, LOG_LEVELS, LOG_CONSOLE, LOG_FILE, LOG_FILE_MAX_MB, LOG_FILE_BACKUPS, LOG_QUEUE_SIZE
+)
+
+ROOT_LOGGER = "telegram_bot"
 
 
 class ColorFormatter(logging.Formatter):
@@ -11,25 +24,179 @@ class ColorFormatter(logging.Formatter):
         'CRITICAL': '\033[95m'
     }
     RESET = '\033[0m'
-
+    
     def format(self, record):
         color = self.COLORS.get(record.levelname, self.RESET)
         timestamp = self.formatTime(record, "%Y-%m-%d %H:%M:%S")
         formatted = f"{timestamp} | {record.levelname:<7} | {record.name:<15} | {record.getMessage()}"
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            formatted += f" (+{suppressed} suppressed)"
+        if record.exc_info:
+            formatted += "\n" + self.formatException(record.exc_info)
         return f"{color}{formatted}{self.RESET}"
 
 
-def setup_logger(name: str = "telegram_bot", level=logging.DEBUG):
+class JsonFormatter(logging.Formatter):
+    """یک شیء JSON در هر خط (برای jq و جمع‌آوری لاگ)"""
+    
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            entry["suppressed"] = suppressed
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """رکورد را بدون قالب‌بندی در صف می‌گذارد
+    
+    QueueHandler پیش‌فرض پیام را در thread فراخواننده می‌سازد؛ اینجا getMessage و
+    traceback در thread شنونده ساخته می‌شوند و فراخواننده فقط یک put انجام می‌دهد.
+    اگر صف پر باشد رکورد دور ریخته و شمرده می‌شود تا event loop هرگز بلاک نشود.
+    """
+    
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+    
+    def prepare(self, record):
+        return record
+    
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class RateLimitFilter(logging.Filter):
+    """token bucket برای هر قالب پیام؛ تعداد رکوردهای حذف شده روی رکورد بعدی ثبت می‌شود"""
+    
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self._buckets: Dict[Tuple[str, object], list] = {}  # کلید -> [توکن، آخرین زمان، حذف شده]
+    
+    def filter(self, record):
+        if self.rate <= 0:
+            return True
+        now = time.monotonic()
+        key = (record.name, record.msg)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [float(self.burst), now, 0]
+        bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if bucket[0] < 1:
+            bucket[2] += 1
+            return False
+        bucket[0] -= 1
+        if bucket[2]:
+            record.suppressed = bucket[2]
+            bucket[2] = 0
+        return True
+
+
+class SampleFilter(logging.Filter):
+    """فقط یکی از هر every رکورد (خطاها همیشه عبور می‌کنند)"""
+    
+    def __init__(self, every: int):
+        super().__init__()
+        self.every = max(1, every)
+        self._seen = 0
+    
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.every == 1:
+            return True
+        self._seen += 1
+        return self._seen % self.every == 1
+
+
+def _parse_levels(spec: str) -> Dict[str, str]:
+    """"mining=WARNING,db=INFO" -> {"mining": "WARNING", "db": "INFO"}"""
+    levels = {}
+    for item in spec.split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+SUBSYSTEM_LEVELS = _parse_levels(LOG_LEVELS)
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def _build_sinks():
+    handlers = []
+    if LOG_CONSOLE:
+        console = logging.StreamHandler(sys.stdout)
+        console.setFormatter(ColorFormatter())
+        handlers.append(console)
+    if LOG_FILE:
+        directory = os.path.dirname(LOG_FILE)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        sink = logging.handlers.RotatingFileHandler(
+            LOG_FILE, maxBytes=int(LOG_FILE_MAX_MB * 1024 * 1024),
+            backupCount=LOG_FILE_BACKUPS, encoding="utf-8", delay=True
+        )
+        sink.setFormatter(JsonFormatter())
+        handlers.append(sink)
+    return handlers
+
+
+def stop_logging():
+    """خالی کردن صف و بستن فایل‌ها (در خاموش شدن)"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def setup_logger(name: str = ROOT_LOGGER, level=LOG_LEVEL):
+    """لاگر اصلی: صف در thread فراخواننده، قالب‌بندی و نوشتن در thread شنونده"""
+    global _listener
     logger = logging.getLogger(name)
     logger.setLevel(level)
+    logger.propagate = False
     
     logger.handlers.clear()
+    stop_logging()
     
-    ch = logging.StreamHandler(sys.stdout)
-    ch.setFormatter(ColorFormatter())
-    logger.addHandler(ch)
+    log_queue: queue.Queue = queue.Queue(LOG_QUEUE_SIZE)
+    logger.addHandler(LazyQueueHandler(log_queue))
+    _listener = logging.handlers.QueueListener(log_queue, *_build_sinks(), respect_handler_level=True)
+    _listener.start()
     
     return logger
 
 
+def get_logger(subsystem: str, rate: float = 0, sample_every: int = 1) -> logging.Logger:
+    """لاگر فرزند telegram_bot.<subsystem> با سطح جدا از LOG_LEVELS
+    
+    rate: حداکثر رکورد در ثانیه برای هر قالب پیام؛ sample_every: نمونه‌برداری ۱ از n.
+    """
+    child = logging.getLogger(f"{ROOT_LOGGER}.{subsystem}")
+    if subsystem in SUBSYSTEM_LEVELS:
+        child.setLevel(SUBSYSTEM_LEVELS[subsystem])
+    if not child.filters:
+        if sample_every > 1:
+            child.addFilter(SampleFilter(sample_every))
+        if rate > 0:
+            child.addFilter(RateLimitFilter(rate))
+    return child
+
+
 logger = setup_logger()
+atexit.register(stop_logging)
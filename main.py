@@ -53,7 +53,7 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             ),
             parse_mode="HTML"
         )
-        logger.info(f"Bot added to group {chat.id}")
+        logger.info("Bot added to group %s", chat.id)
     else:
         # کیبورد بر اساس نقش کاربر
         keyboard = get_main_keyboard(is_admin=is_admin(user_id))
@@ -62,7 +62,7 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "🌟 خوش‌آمدید به ربات بازی اقتصادی!\nاز دکمه‌ها استفاده کنید:",
             reply_markup=keyboard
         )
-        logger.info(f"/start by user {user_id} in private chat")
+        logger.info("/start by user %s in private chat", user_id)
 
 
 async def welcome_group(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -94,4 +94,4 @@ async def show_inventory(update: Update, context: ContextTypes.DEFAULT_TYPE):
         f"💵 سکه: {coins}",
         reply_markup=main_markup
     )
-    logger.info(f"User {user_id} viewed inventory")
+    logger.info("User %s viewed inventory", user_id)
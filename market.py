@@ -0,0 +1,160 @@
+# handlers/market.py
+"""
+بازار بازیکنان (فقط پیوی):
+    /market [سلاح]                     ارزان‌ترین آگهی‌ها
+    /sell <سلاح> <تعداد> <قیمت واحد>   ثبت آگهی فروش
+    /buy <سلاح> <تعداد> [حداکثر قیمت]  خرید از ارزان‌ترین آگهی‌ها
+    /mylistings                         آگهی‌های من
+    /unlist <شماره آگهی>               لغو آگهی
+"""
+
+from typing import List, Optional, Tuple
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from database.models import add_user
+from utils.order_book import market
+from utils.weapon_aliases import weapon_aliases
+from utils.logger import logger
+from utils.locks import serialized_per_user
+
+DEPTH_LEVELS = 5
+
+ERRORS = {
+    "empty": "📭 آگهی فعالی برای این سلاح نیست.",
+    "price": "💲 آگهی‌ای با این حداکثر قیمت پیدا نشد.",
+    "coins": "💸 سکه کافی ندارید.",
+    "capacity": "📦 ظرفیت زرادخانه کافی نیست.",
+    "stock": "❌ این تعداد سلاح در زرادخانه ندارید.",
+    "limit": "⛔ تعداد آگهی‌های فعال شما به حداکثر رسیده است.",
+    "invalid": "❌ درخواست نامعتبر است.",
+    "error": "⚠️ خطا در انجام معامله، دوباره تلاش کنید.",
+}
+
+
+def _parse(args: List[str], numbers: int, optional: int = 0) -> Tuple[Optional[str], List[int]]:
+    """جدا کردن نام سلاح (ممکن است چند کلمه باشد) از اعداد انتهای دستور"""
+    values: List[int] = []
+    tokens = list(args)
+    while tokens and tokens[-1].isdigit() and len(values) < numbers + optional:
+        values.insert(0, int(tokens.pop()))
+    if len(values) < numbers or not tokens:
+        return None, values
+    return weapon_aliases.resolve(" ".join(tokens)), values
+
+
+async def _private(update: Update) -> bool:
+    if update.effective_chat.type != "private":
+        return False
+    add_user(update.effective_user.id, update.effective_user.username)
+    return True
+
+
+async def market_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not await _private(update):
+        return
+    
+    if context.args:
+        weapon = weapon_aliases.resolve(" ".join(context.args))
+        if not weapon:
+            await update.message.reply_text("❌ سلاح پیدا نشد.")
+            return
+        levels = market.depth(weapon, DEPTH_LEVELS)
+        if not levels:
+            await update.message.reply_text(ERRORS["empty"])
+            return
+        text = f"🏬 <b>بازار {weapon}</b>\n━━━━━━━━━━━━━━━━━━\n\n"
+        for price, quantity in levels:
+            text += f"💰 <code>{price:,}</code> × {quantity:,}\n"
+        await update.message.reply_text(text, parse_mode="HTML")
+        return
+    
+    summary = market.summary()
+    text = "🏬 <b>بازار بازیکنان</b>\n━━━━━━━━━━━━━━━━━━\n\n"
+    for weapon, price, quantity in summary:
+        text += f"{weapon} — از <code>{price:,}</code> ({quantity:,} عدد)\n"
+    if not summary:
+        text += "هنوز آگهی‌ای ثبت نشده است.\n"
+    text += (
+        "\n📝 فروش: <code>/sell نور 5 70</code>\n"
+        "🛒 خرید: <code>/buy نور 3</code> یا <code>/buy نور 3 80</code>"
+    )
+    await update.message.reply_text(text, parse_mode="HTML")
+
+
+@serialized_per_user
+async def sell_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not await _private(update):
+        return
+    
+    weapon, values = _parse(context.args, 2)
+    if not weapon:
+        await update.message.reply_text("❌ فرمت: <code>/sell نام‌سلاح تعداد قیمت‌واحد</code>", parse_mode="HTML")
+        return
+    
+    quantity, price = values
+    result = market.list_item(update.effective_user.id, weapon, quantity, price)
+    if result.status != "ok":
+        await update.message.reply_text(ERRORS.get(result.status, ERRORS["error"]))
+        return
+    await update.message.reply_text(
+        f"✅ آگهی <b>#{result.listing_id}</b> ثبت شد: {quantity:,} × {weapon} به قیمت <code>{price:,}</code>",
+        parse_mode="HTML"
+    )
+
+
+@serialized_per_user
+async def buy_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not await _private(update):
+        return
+    
+    weapon, values = _parse(context.args, 1, optional=1)
+    if not weapon:
+        await update.message.reply_text("❌ فرمت: <code>/buy نام‌سلاح تعداد [حداکثر قیمت]</code>", parse_mode="HTML")
+        return
+    
+    quantity = values[0]
+    max_price = values[1] if len(values) > 1 else None
+    result = market.buy(update.effective_user.id, weapon, quantity, max_price)
+    if result.status != "ok":
+        await update.message.reply_text(ERRORS.get(result.status, ERRORS["error"]))
+        return
+    
+    text = f"✅ {result.quantity:,} × {weapon} به مبلغ <code>{result.cost:,}</code> سکه خریداری شد."
+    if result.quantity < quantity:
+        text += f"\nℹ️ فقط {result.quantity:,} عدد در بازار موجود بود."
+    await update.message.reply_text(text, parse_mode="HTML")
+
+
+async def my_listings_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not await _private(update):
+        return
+    
+    listings = market.user_listings(update.effective_user.id)
+    if not listings:
+        await update.message.reply_text("📭 آگهی فعالی ندارید.")
+        return
+    text = "📋 <b>آگهی‌های من</b>\n━━━━━━━━━━━━━━━━━━\n\n"
+    for listing in listings:
+        text += f"#{listing.listing_id} — {listing.item_name} × {listing.quantity:,} به <code>{listing.price:,}</code>\n"
+    text += "\n❌ لغو: <code>/unlist شماره</code>"
+    await update.message.reply_text(text, parse_mode="HTML")
+
+
+@serialized_per_user
+async def unlist_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not await _private(update):
+        return
+    
+    if len(context.args) != 1 or not context.args[0].lstrip("#").isdigit():
+        await update.message.reply_text("❌ فرمت: <code>/unlist شماره</code>", parse_mode="HTML")
+        return
+    
+    listing_id = int(context.args[0].lstrip("#"))
+    result = market.cancel(update.effective_user.id, listing_id)
+    if result.status != "ok":
+        await update.message.reply_text("❌ آگهی فعالی با این شماره ندارید.")
+        return
+    await update.message.reply_text(f"✅ آگهی #{listing_id} لغو شد و {result.quantity:,} سلاح به زرادخانه برگشت.")
+    logger.debug("User %s unlisted #%s", update.effective_user.id, listing_id)
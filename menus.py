@@ -4,9 +4,9 @@ from telegram import ReplyKeyboardMarkup
 # 🏠 منوی اصلی
 main_keyboard = [
     ["👤 پروفایل من", "🏪 فروشگاه"],
-    ["⛏️ معدن", "👥 کلن"],
+    ["⛏️ معدن", "👥 کلن", "🍀 گردونه"],
     ["🏛️ بانک", "🎁 جایزه روزانه"],
-    ["🧰 زرادخانه"]
+    ["🧰 زرادخانه", "🏅 لیدربرد"]
 ]
 main_markup = ReplyKeyboardMarkup(main_keyboard, resize_keyboard=True)
 
@@ -15,9 +15,9 @@ def get_main_keyboard(is_admin: bool = False):
     """دریافت کیبورد اصلی با/بدون دکمه ادمین"""
     keyboard = [
         ["👤 پروفایل من", "🏪 فروشگاه"],
-        ["⛏️ معدن", "👥 کلن"],
+        ["⛏️ معدن", "👥 کلن", "🍀 گردونه"],
         ["🏛️ بانک", "🎁 جایزه روزانه"],
-        ["🧰 زرادخانه"]
+        ["🧰 زرادخانه", "🏅 لیدربرد"]
     ]
     
     if is_admin:
@@ -0,0 +1,245 @@
+# utils/metrics.py
+"""
+هیستوگرام‌های HDR در حافظه برای زمان handler ها، دیتابیس و Bot API
+"""
+
+import asyncio
+import contextvars
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from config.settings import METRICS_ENABLED, METRICS_HOST, METRICS_PORT
+from utils.logger import logger
+
+SUB_BUCKET_BITS = 7  # دقت حدود ۱٪ (۷ بیت با ارزش)
+SUB_BUCKET_HALF = 1 << (SUB_BUCKET_BITS - 1)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """هیستوگرام لگاریتمی-خطی به سبک HDR روی مقادیر صحیح (میکروثانیه یا تعداد)
+    
+    مقادیر کوچک‌تر از 128 دقیق ذخیره می‌شوند و بزرگ‌ترها با ۷ بیت با ارزش؛
+    حافظه ثابت و record در O(1).
+    """
+    
+    __slots__ = ("counts", "count", "total", "max")
+    
+    def __init__(self):
+        self.counts: List[int] = []
+        self.count = 0
+        self.total = 0
+        self.max = 0
+    
+    @staticmethod
+    def _index(value: int) -> int:
+        shift = value.bit_length() - SUB_BUCKET_BITS
+        if shift <= 0:
+            return value
+        return (shift * SUB_BUCKET_HALF) + (value >> shift)
+    
+    @staticmethod
+    def _value(index: int) -> int:
+        if index < 2 * SUB_BUCKET_HALF:
+            return index
+        shift = index // SUB_BUCKET_HALF - 1
+        sub = index - shift * SUB_BUCKET_HALF
+        # نقطه وسط bucket
+        return (sub << shift) + (1 << (shift - 1))
+    
+    def record(self, value: int):
+        value = max(0, int(value))
+        index = self._index(value)
+        if index >= len(self.counts):
+            self.counts.extend([0] * (index + 1 - len(self.counts)))
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+    
+    def percentile(self, p: float) -> int:
+        if not self.count:
+            return 0
+        target = max(1, int(self.count * p + 0.5))
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return min(self._value(index), self.max)
+        return self.max
+    
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class RequestStats:
+    """آمار یک فراخوانی handler (از طریق contextvar به DB و API می‌رسد)"""
+    
+    __slots__ = ("db_queries", "db_us", "api_calls", "api_us")
+    
+    def __init__(self):
+        self.db_queries = 0
+        self.db_us = 0
+        self.api_calls = 0
+        self.api_us = 0
+
+
+_current: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("request_stats", default=None)
+
+
+class Metrics:
+    """رجیستری هیستوگرام‌ها"""
+    
+    def __init__(self):
+        self.enabled = METRICS_ENABLED
+        self.started_at = time.time()
+        self.handler_us: Dict[str, Histogram] = defaultdict(Histogram)
+        self.handler_db_us: Dict[str, Histogram] = defaultdict(Histogram)
+        self.handler_db_queries: Dict[str, Histogram] = defaultdict(Histogram)
+        self.handler_api_us: Dict[str, Histogram] = defaultdict(Histogram)
+        self.handler_errors: Dict[str, int] = defaultdict(int)
+        self.db_query_us = Histogram()
+        self.api_us: Dict[str, Histogram] = defaultdict(Histogram)
+        self.job_us: Dict[str, Histogram] = defaultdict(Histogram)
+        self.job_lag_us: Dict[str, Histogram] = defaultdict(Histogram)
+        self.job_errors: Dict[str, int] = defaultdict(int)
+        self.job_misfires: Dict[str, int] = defaultdict(int)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._server_task: Optional[asyncio.Task] = None
+    
+    def reset(self):
+        self.__init__()
+    
+    # ==================== ثبت ====================
+    
+    def record_db(self, seconds: float, statements: int = 1):
+        """statements=0 برای commit (فقط به زمان DB handler اضافه می‌شود)"""
+        us = int(seconds * 1e6)
+        if statements:
+            self.db_query_us.record(us)
+        stats = _current.get()
+        if stats is not None:
+            stats.db_queries += statements
+            stats.db_us += us
+    
+    def record_api(self, method: str, seconds: float):
+        us = int(seconds * 1e6)
+        self.api_us[method].record(us)
+        stats = _current.get()
+        if stats is not None:
+            stats.api_calls += 1
+            stats.api_us += us
+    
+    def record_handler(self, name: str, seconds: float, stats: RequestStats):
+        self.handler_us[name].record(int(seconds * 1e6))
+        self.handler_db_us[name].record(stats.db_us)
+        self.handler_db_queries[name].record(stats.db_queries)
+        self.handler_api_us[name].record(stats.api_us)
+    
+    def record_job(self, name: str, seconds: float, lag: float, failed: bool):
+        """زمان اجرا و تاخیر شروع (نسبت به نوبت) یک کار زمان‌بند"""
+        self.job_us[name].record(int(seconds * 1e6))
+        self.job_lag_us[name].record(int(lag * 1e6))
+        if failed:
+            self.job_errors[name] += 1
+    
+    def record_job_misfire(self, name: str):
+        self.job_misfires[name] += 1
+    
+    # ==================== گزارش ====================
+    
+    def handler_summary(self) -> List[Tuple[str, Histogram, float, float, float]]:
+        """(نام، هیستوگرام زمان، میانگین کوئری، میانگین DB ms، میانگین API ms) به ترتیب کل زمان"""
+        rows = []
+        for name, hist in self.handler_us.items():
+            rows.append((
+                name, hist,
+                self.handler_db_queries[name].mean,
+                self.handler_db_us[name].mean / 1000,
+                self.handler_api_us[name].mean / 1000,
+            ))
+        rows.sort(key=lambda row: row[1].total, reverse=True)
+        return rows
+    
+    def render_prometheus(self) -> str:
+        lines: List[str] = []
+        
+        def summary(family: str, help_text: str, series: Dict[str, Histogram], label: str, scale: float):
+            lines.append(f"# HELP {family} {help_text}")
+            lines.append(f"# TYPE {family} summary")
+            for key, hist in sorted(series.items()):
+                labels = f'{label}="{key}"'
+                for q in QUANTILES:
+                    lines.append(f'{family}{{{labels},quantile="{q}"}} {hist.percentile(q) * scale:.6g}')
+                lines.append(f"{family}_sum{{{labels}}} {hist.total * scale:.6g}")
+                lines.append(f"{family}_count{{{labels}}} {hist.count}")
+        
+        summary("bot_handler_seconds", "Handler wall time", self.handler_us, "handler", 1e-6)
+        summary("bot_handler_db_seconds", "DB time per handler call", self.handler_db_us, "handler", 1e-6)
+        summary("bot_handler_db_queries", "DB statements per handler call", self.handler_db_queries, "handler", 1)
+        summary("bot_handler_api_seconds", "Bot API time per handler call", self.handler_api_us, "handler", 1e-6)
+        summary("bot_telegram_api_seconds", "Bot API request time", self.api_us, "method", 1e-6)
+        summary("bot_db_query_seconds", "DB statement time", {"all": self.db_query_us}, "scope", 1e-6)
+        summary("bot_job_seconds", "Scheduled job run time", self.job_us, "job", 1e-6)
+        summary("bot_job_lag_seconds", "Scheduled job start delay", self.job_lag_us, "job", 1e-6)
+        
+        lines.append("# HELP bot_handler_errors_total Handler exceptions")
+        lines.append("# TYPE bot_handler_errors_total counter")
+        for name, n in sorted(self.handler_errors.items()):
+            lines.append(f'bot_handler_errors_total{{handler="{name}"}} {n}')
+        for family, help_text, counts in (
+            ("bot_job_errors_total", "Scheduled job exceptions", self.job_errors),
+            ("bot_job_misfires_total", "Scheduled job runs skipped by misfire policy", self.job_misfires),
+        ):
+            lines.append(f"# HELP {family} {help_text}")
+            lines.append(f"# TYPE {family} counter")
+            for name, n in sorted(counts.items()):
+                lines.append(f'{family}{{job="{name}"}} {n}')
+        lines.append(f"bot_uptime_seconds {time.time() - self.started_at:.0f}")
+        return "\n".join(lines) + "\n"
+    
+    # ==================== endpoint ====================
+    
+    async def _handle_http(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), 5)
+            while (await asyncio.wait_for(reader.readline(), 5)) not in (b"\r\n", b"\n", b""):
+                pass
+            path = request_line.split()[1].decode() if len(request_line.split()) > 1 else "/"
+            if path.startswith("/metrics"):
+                body, status = self.render_prometheus().encode(), "200 OK"
+            else:
+                body, status = b"not found\n", "404 Not Found"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+    
+    async def start_server(self, host: str = METRICS_HOST, port: int = METRICS_PORT):
+        """endpoint متنی Prometheus روی /metrics (فقط localhost)"""
+        if self._server or not port:
+            return
+        try:
+            self._server = await asyncio.start_server(self._handle_http, host, port)
+            logger.info("Metrics endpoint on http://%s:%s/metrics", host, port)
+        except OSError as e:
+            logger.error("Metrics endpoint failed to start: %s", e)
+    
+    def ensure_server(self):
+        if self._server_task is not None or not METRICS_PORT:
+            return
+        try:
+            self._server_task = asyncio.get_running_loop().create_task(self.start_server())
+        except RuntimeError:
+            pass
+
+
+metrics = Metrics()
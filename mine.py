@@ -8,7 +8,9 @@ from database.models import (
 )
 from keyboards.menus import mine_markup, sell_markup, main_markup
 from config.settings import IRON_SELL_PRICE, SILVER_SELL_PRICE
+from utils.events import event_bus, MINE
 from utils.logger import logger
+from utils.locks import serialized_per_user
 
 
 SELL_IRON, SELL_SILVER = range(2)
@@ -27,12 +29,13 @@ async def enter_mine(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not is_mining_active(user_id):
         start_mining(user_id)
         add_resources(user_id, iron=1, silver=1)
+        event_bus.publish(MINE, user_id, 2, iron=1, silver=1)
         await update.message.reply_text(
             "⛏️ شما وارد معدن شدید! +1 آهن و +1 نقره\n"
             "منابع به‌صورت خودکار اضافه خواهند شد.",
             reply_markup=mine_markup
         )
-        logger.info(f"User {user_id} entered mine")
+        logger.info("User %s entered mine", user_id)
     else:
         await update.message.reply_text(
             "⛏️ معدن شما در حال فعالیت است.",
@@ -70,6 +73,7 @@ async def start_sell_iron(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return SELL_IRON
 
 
+@serialized_per_user
 async def sell_iron_step(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     text = update.message.text.strip()
@@ -110,7 +114,7 @@ async def sell_iron_step(update: Update, context: ContextTypes.DEFAULT_TYPE):
         f"✅ {amount} آهن فروخته شد و {coins_earned} سکه دریافت کردید.",
         reply_markup=mine_markup
     )
-    logger.info(f"User {user_id} sold {amount} iron for {coins_earned} coins")
+    logger.info("User %s sold %s iron for %s coins", user_id, amount, coins_earned)
     
     return ConversationHandler.END
 
@@ -131,6 +135,7 @@ async def start_sell_silver(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return SELL_SILVER
 
 
+@serialized_per_user
 async def sell_silver_step(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     text = update.message.text.strip()
@@ -171,6 +176,6 @@ async def sell_silver_step(update: Update, context: ContextTypes.DEFAULT_TYPE):
         f"✅ {amount} نقره فروخته شد و {coins_earned} سکه دریافت کردید.",
         reply_markup=mine_markup
     )
-    logger.info(f"User {user_id} sold {amount} silver for {coins_earned} coins")
+    logger.info("User %s sold %s silver for %s coins", user_id, amount, coins_earned)
     
     return ConversationHandler.END
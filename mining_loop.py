@@ -1,77 +1,90 @@
 import time
-import asyncio
 
-from database.models import get_mining_users, add_resources, update_mining_times
+from database.models import get_mining_users, apply_mining
 from config.settings import (
     IRON_MINING_INTERVAL,
     SILVER_MINING_INTERVAL,
-    MINING_LOOP_INTERVAL
+    MINING_LOOP_INTERVAL,
+    MINING_JITTER,
+    LOG_MINING_SAMPLE,
+    LOG_RATE_LIMIT
 )
-from utils.logger import logger
+from utils.events import event_bus, MINE
+from utils.scheduler import scheduler, Job, MISFIRE_SKIP
+from utils.logger import logger, get_logger
+
+# هر کاربر در هر دور یک رکورد دارد؛ نمونه‌برداری و محدودیت نرخ جلوی سیل لاگ را می‌گیرد
+mining_logger = get_logger("mining", rate=LOG_RATE_LIMIT, sample_every=LOG_MINING_SAMPLE)
 
 
 class MiningLoop:
+    """تیک استخراج به صورت کار تکراری زمان‌بند مرکزی
+    
+    تیک‌های جا مانده (مثلا بعد از یک اجرای طولانی) رد می‌شوند و جبران نمی‌شوند: هر
+    تیک حداکثر 1 آهن و 1 نقره می‌دهد (اگر از last_iron/last_silver یک بازه گذشته باشد)
+    و زمان آخر استخراج را به اکنون می‌برد.
+    """
     
     def __init__(self):
         self.is_running = False
-        self.task = None
     
-    async def start(self):
+    def start(self):
         if self.is_running:
             logger.warning("Mining loop already running. Skipping duplicate start.")
             return
         
         self.is_running = True
+        scheduler.every(
+            "mining", MINING_LOOP_INTERVAL, self._tick,
+            jitter=MINING_JITTER, misfire=MISFIRE_SKIP, first_run=time.time()
+        )
         logger.info("Mining loop started.")
-        
-        try:
-            while self.is_running:
-                await self._process_mining()
-                await asyncio.sleep(MINING_LOOP_INTERVAL)
-        except asyncio.CancelledError:
-            logger.info("Mining loop cancelled.")
-        except Exception as e:
-            logger.exception(f"Mining loop crashed: {e}")
-        finally:
-            self.is_running = False
-            logger.info("Mining loop stopped.")
+    
+    async def _tick(self, job: Job):
+        await self._process_mining()
     
     async def _process_mining(self):
         try:
             users = get_mining_users()
             now = time.time()
             
+            # (آهن، نقره، last_iron، last_silver، user_id) برای یک UPDATE دسته‌ای در کل تیک
+            updates = []
             for user_id, last_iron, last_silver in users:
-                try:
-                    last_iron = last_iron or now
-                    last_silver = last_silver or now
-                    
-                    iron_add = 0
-                    silver_add = 0
-                    
-                    if now - last_iron >= IRON_MINING_INTERVAL:
-                        iron_add = 1
-                        last_iron = now
-                    
-                    if now - last_silver >= SILVER_MINING_INTERVAL:
-                        silver_add = 1
-                        last_silver = now
-                    
-                    if iron_add or silver_add:
-                        add_resources(user_id, iron=iron_add, silver=silver_add)
-                        update_mining_times(user_id, last_iron, last_silver)
-                        logger.info(f"Mining: user {user_id} +{iron_add} iron +{silver_add} silver")
+                last_iron = last_iron or now
+                last_silver = last_silver or now
                 
-                except Exception as e:
-                    logger.exception(f"Error processing mining for user {user_id}: {e}")
-        
+                iron_add = 0
+                silver_add = 0
+                
+                if now - last_iron >= IRON_MINING_INTERVAL:
+                    iron_add = 1
+                    last_iron = now
+                
+                if now - last_silver >= SILVER_MINING_INTERVAL:
+                    silver_add = 1
+                    last_silver = now
+                
+                if iron_add or silver_add:
+                    updates.append((iron_add, silver_add, last_iron, last_silver, user_id))
+            
+            apply_mining(updates)
         except Exception as e:
-            logger.exception(f"Error in mining loop iteration: {e}")
+            logger.exception("Error in mining loop iteration: %s", e)
+            return
+        
+        for iron_add, silver_add, _, _, user_id in updates:
+            try:
+                event_bus.publish(MINE, user_id, iron_add + silver_add, iron=iron_add, silver=silver_add)
+                mining_logger.info("Mining: user %s +%s iron +%s silver", user_id, iron_add, silver_add)
+            except Exception as e:
+                mining_logger.exception("Error processing mining for user %s: %s", user_id, e)
     
     def stop(self):
-        self.is_running = False
-        if self.task:
-            self.task.cancel()
+        if self.is_running:
+            scheduler.cancel("mining", persisted=False)
+            self.is_running = False
+            logger.info("Mining loop stopped.")
 
 
 mining_loop = MiningLoop()
@@ -0,0 +1,306 @@
+# utils/mission_engine.py
+"""
+ماموریت روزانه (missions) و ماموریت کلن (clan_missions) بر اساس رویدادها
+
+ماموریت‌ها بر اساس نوع رویداد ایندکس می‌شوند و موتور فقط به همان نوع‌ها subscribe
+می‌کند. برای هر رویداد وضعیت کاربر (ماموریت امروز + کلن) از کش حافظه خوانده
+می‌شود؛ فقط اولین رویداد روز هر کاربر یک SELECT روی کلید اصلی دارد. پیشرفت در
+حافظه برای هر (کاربر، ماموریت) جمع می‌شود و BatchWriter کلیدهای تغییرکرده را
+دوره‌ای با UPDATE افزایشی می‌نویسد. فقط وقتی پیشرفت از هدف عبور کند همان کلید
+بلافاصله نوشته می‌شود (write-through) تا تکمیل و پاداش کلن معطل نماند؛ بعد از آن
+رویدادهای همان ماموریت دیگر جمع و نوشته نمی‌شوند.
+"""
+
+import time
+import zlib
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from database.db import db
+from config.settings import MISSION_FLUSH_MS
+from utils.batch_writer import BatchWriter
+from utils.events import event_bus, Event, PURCHASE, MINE, ATTACK, TRANSFER
+from utils.leaderboard_service import leaderboards
+from utils.logger import logger
+
+
+def _victories(event: Event) -> int:
+    return 1 if event.data.get("won") else 0
+
+
+class MissionSpec(NamedTuple):
+    key: str
+    event: str
+    title: str
+    target: int
+    reward: int
+    counter: Optional[Callable[[Event], int]] = None  # پیش‌فرض: event.amount
+    
+    def count(self, event: Event) -> int:
+        return self.counter(event) if self.counter else event.amount
+    
+    def describe(self, target: Optional[int] = None) -> str:
+        return self.title.format(target=f"{target or self.target:,}")
+
+
+# پاداش روزانه به سکه کاربر، پاداش کلن به خزانه کلن
+DAILY_MISSIONS: Dict[str, MissionSpec] = {spec.key: spec for spec in (
+    MissionSpec("buy_weapons", PURCHASE, "خرید {target} موشک یا پدافند", 5, 500),
+    MissionSpec("mine", MINE, "استخراج {target} آهن یا نقره", 30, 400),
+    MissionSpec("attacks", ATTACK, "انجام {target} حمله", 3, 600),
+    MissionSpec("victories", ATTACK, "{target} حمله پیروز", 2, 800, _victories),
+    MissionSpec("transfer", TRANSFER, "انتقال {target} سکه به دیگران", 500, 300),
+)}
+
+CLAN_MISSIONS: Dict[str, MissionSpec] = {spec.key: spec for spec in (
+    MissionSpec("clan_attacks", ATTACK, "{target} حمله توسط اعضا", 100, 20_000),
+    MissionSpec("clan_victories", ATTACK, "{target} پیروزی اعضا", 50, 30_000, _victories),
+    MissionSpec("clan_purchases", PURCHASE, "خرید {target} سلاح توسط اعضا", 200, 15_000),
+    MissionSpec("clan_mining", MINE, "استخراج {target} منبع توسط اعضا", 2_000, 15_000),
+)}
+
+DAILY_KEYS = sorted(DAILY_MISSIONS)
+CLAN_KEYS = sorted(CLAN_MISSIONS)
+
+# ایندکس نوع رویداد -> ماموریت‌هایی که می‌تواند رویشان اثر بگذارد
+MISSIONS_BY_EVENT: Dict[str, List[MissionSpec]] = {}
+for _spec in (*DAILY_MISSIONS.values(), *CLAN_MISSIONS.values()):
+    MISSIONS_BY_EVENT.setdefault(_spec.event, []).append(_spec)
+
+
+class Progress:
+    """پیشرفت یک ماموریت؛ progress آخرین مقدار نوشته‌شده در دیتابیس است"""
+    __slots__ = ("spec", "target", "progress", "done", "mission_id")
+    
+    def __init__(self, spec: MissionSpec, target: int, progress: int, done: bool, mission_id: int = 0):
+        self.spec = spec
+        self.target = target
+        self.progress = progress
+        self.done = done  # روزانه: پاداش گرفته شده / کلن: تکمیل شده
+        self.mission_id = mission_id
+
+
+class UserState:
+    __slots__ = ("daily", "clan_id")
+    
+    def __init__(self, daily: Optional[Progress], clan_id: Optional[int]):
+        self.daily = daily
+        self.clan_id = clan_id
+
+
+class MissionEngine:
+    """کش وضعیت روزانه کاربران و ماموریت فعال کلن‌ها + جمع پیشرفت در حافظه"""
+    
+    def __init__(self):
+        self.date = ""
+        self.users: Dict[int, UserState] = {}
+        self.clans: Dict[int, Progress] = {}
+        self.pending: Dict[Tuple, int] = {}  # ("daily", user_id, date) یا ("clan", mission_id) -> مقدار
+        self.writer = BatchWriter("mission_progress", self._flush, max_rows=5000, interval_ms=MISSION_FLUSH_MS)
+        for event_type in MISSIONS_BY_EVENT:
+            event_bus.subscribe(event_type, self.on_event)
+    
+    def _today(self) -> str:
+        today = time.strftime("%Y-%m-%d")
+        if today != self.date:
+            self.date = today
+            self.users.clear()
+        return today
+    
+    # ==================== بارگذاری / تخصیص ====================
+    
+    def user_state(self, user_id: int) -> UserState:
+        date = self._today()
+        state = self.users.get(user_id)
+        if state is not None:
+            return state
+        
+        row = db.fetchone(
+            "SELECT m.mission_type, m.target, m.progress, m.claimed, cm.clan_id "
+            "FROM (SELECT CAST(? AS BIGINT) AS user_id) u "
+            "LEFT JOIN missions m ON m.user_id = u.user_id AND m.date = ? "
+            "LEFT JOIN clan_members cm ON cm.user_id = u.user_id",
+            (user_id, date)
+        )
+        daily = None
+        if row['mission_type'] in DAILY_MISSIONS:
+            daily = Progress(DAILY_MISSIONS[row['mission_type']], row['target'], row['progress'], bool(row['claimed']))
+        elif row['mission_type'] is None:
+            daily = self._assign_daily(user_id, date)
+        state = UserState(daily, row['clan_id'])
+        self.users[user_id] = state
+        return state
+    
+    @staticmethod
+    def _assign_daily(user_id: int, date: str) -> Progress:
+        # انتخاب قطعی (یکسان در همه worker ها) برای هر کاربر و روز
+        spec = DAILY_MISSIONS[DAILY_KEYS[zlib.crc32(f"{user_id}:{date}".encode()) % len(DAILY_KEYS)]]
+        with db.get_cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO missions (user_id, mission_type, target, progress, claimed, date) "
+                "VALUES (?, ?, ?, 0, 0, ?) ON CONFLICT(user_id, date) DO NOTHING",
+                (user_id, spec.key, spec.target, date)
+            )
+            row = cursor.execute(
+                "SELECT mission_type, target, progress, claimed FROM missions WHERE user_id = ? AND date = ?",
+                (user_id, date)
+            ).fetchone()
+        spec = DAILY_MISSIONS.get(row['mission_type'], spec)
+        return Progress(spec, row['target'], row['progress'], bool(row['claimed']))
+    
+    def clan_mission(self, clan_id: int) -> Progress:
+        mission = self.clans.get(clan_id)
+        if mission is not None:
+            return mission
+        
+        row = db.fetchone(
+            "SELECT mission_id, mission_type, target, progress FROM clan_missions "
+            "WHERE clan_id = ? AND completed = 0 ORDER BY mission_id LIMIT 1",
+            (clan_id,)
+        )
+        if row is None or row['mission_type'] not in CLAN_MISSIONS:
+            row = self._assign_clan(clan_id)
+        mission = Progress(CLAN_MISSIONS[row['mission_type']], row['target'], row['progress'], False, row['mission_id'])
+        self.clans[clan_id] = mission
+        return mission
+    
+    @staticmethod
+    def _assign_clan(clan_id: int):
+        """ماموریت بعدی کلن به نوبت از CLAN_KEYS"""
+        with db.get_cursor() as cursor:
+            done = cursor.execute(
+                "SELECT COUNT(*) AS done FROM clan_missions WHERE clan_id = ? AND completed = 1", (clan_id,)
+            ).fetchone()['done']
+            spec = CLAN_MISSIONS[CLAN_KEYS[done % len(CLAN_KEYS)]]
+            return cursor.execute(
+                "INSERT INTO clan_missions (clan_id, mission_type, description, target, progress, reward, created_at) "
+                "VALUES (?, ?, ?, ?, 0, ?, ?) RETURNING mission_id, mission_type, target, progress",
+                (clan_id, spec.key, spec.describe(), spec.target, spec.reward, time.time())
+            ).fetchone()
+    
+    def member_changed(self, user_id: int):
+        """بعد از عضویت/خروج کلن وضعیت کاربر دوباره خوانده شود"""
+        self.users.pop(user_id, None)
+    
+    def pending_for(self, key: Tuple) -> int:
+        return self.pending.get(key, 0)
+    
+    # ==================== رویدادها ====================
+    
+    def on_event(self, event: Event):
+        state = self.user_state(event.user_id)
+        daily = state.daily
+        if daily is not None and not daily.done and daily.spec.event == event.type:
+            amount = daily.spec.count(event)
+            if amount:
+                self._progress(("daily", event.user_id, self.date), daily, amount)
+        
+        if state.clan_id is not None:
+            mission = self.clan_mission(state.clan_id)
+            if mission.spec.event == event.type:
+                amount = mission.spec.count(event)
+                if amount:
+                    self._progress(("clan", mission.mission_id), mission, amount)
+    
+    def _progress(self, key: Tuple, mission: Progress, amount: int):
+        if mission.progress >= mission.target:
+            return  # هدف قبلا نوشته شده (روزانه تا دریافت پاداش همین‌جا می‌ماند)
+        pending = self.pending.get(key, 0) + amount
+        if mission.progress + pending < mission.target:
+            if key not in self.pending:
+                self.writer.add(key)  # بافر فقط کلیدهای تغییرکرده را نگه می‌دارد
+            self.pending[key] = pending
+            return
+        # عبور از هدف: همین کلید بلافاصله نوشته می‌شود
+        self.pending.pop(key, None)
+        try:
+            self._write({key: pending})
+        except Exception:
+            self.pending[key] = self.pending.get(key, 0) + pending
+            self.writer.add(key)
+            raise
+    
+    def _flush(self, batch: List[Tuple]):
+        amounts = {key: self.pending.pop(key) for key in set(batch) if key in self.pending}
+        if not amounts:
+            return
+        try:
+            self._write(amounts)
+        except Exception:
+            for key, amount in amounts.items():
+                self.pending[key] = self.pending.get(key, 0) + amount
+            raise
+        logger.debug("Flushed mission progress for %s keys", len(amounts))
+    
+    def _write(self, amounts: Dict[Tuple, int]):
+        """نوشتن پیشرفت‌ها در یک تراکنش؛ تکمیل ماموریت کلن و پاداش خزانه در همان تراکنش"""
+        daily = [(amount, key[1], key[2]) for key, amount in amounts.items() if key[0] == "daily"]
+        clan_results: Dict[int, Tuple[int, bool]] = {}
+        with db.get_cursor() as cursor:
+            if daily:
+                cursor.executemany(
+                    "UPDATE missions SET progress = progress + ? WHERE user_id = ? AND date = ?", daily
+                )
+            for key, amount in amounts.items():
+                if key[0] != "clan":
+                    continue
+                row = cursor.execute(
+                    "UPDATE clan_missions SET progress = progress + ?, "
+                    "completed = CASE WHEN progress + ? >= target THEN 1 ELSE 0 END "
+                    "WHERE mission_id = ? AND completed = 0 RETURNING clan_id, progress, completed, reward",
+                    (amount, amount, key[1])
+                ).fetchone()
+                if row is None:
+                    clan_results[key[1]] = (0, True)  # قبلا (در worker دیگر) تکمیل شده
+                    continue
+                if row['completed']:
+                    cursor.execute(
+                        "UPDATE clans SET treasury_coins = treasury_coins + ? WHERE clan_id = ?",
+                        (row['reward'], row['clan_id'])
+                    )
+                    logger.info("Clan #%s completed mission #%s (+%s coins)", row['clan_id'], key[1], row['reward'])
+                clan_results[key[1]] = (row['progress'], bool(row['completed']))
+        
+        # کش فقط بعد از commit
+        for amount, user_id, date in daily:
+            state = self.users.get(user_id)
+            if state is not None and state.daily is not None and date == self.date:
+                state.daily.progress += amount
+        for clan_id, mission in list(self.clans.items()):
+            result = clan_results.get(mission.mission_id)
+            if result is None:
+                continue
+            if result[1]:
+                del self.clans[clan_id]  # رویداد بعدی ماموریت جدید می‌گیرد
+            else:
+                mission.progress = result[0]
+    
+    # ==================== پاداش روزانه ====================
+    
+    def claim_daily(self, user_id: int) -> Tuple[str, int]:
+        state = self.user_state(user_id)
+        daily = state.daily
+        if daily is None:
+            return "none", 0
+        key = ("daily", user_id, self.date)
+        if key in self.pending:
+            self._flush([key])
+        
+        with db.get_cursor() as cursor:
+            row = cursor.execute(
+                "UPDATE missions SET claimed = 1 "
+                "WHERE user_id = ? AND date = ? AND claimed = 0 AND progress >= target RETURNING mission_type",
+                (user_id, self.date)
+            ).fetchone()
+            if row is not None:
+                cursor.execute(
+                    "UPDATE resources SET coins = coins + ? WHERE user_id = ?", (daily.spec.reward, user_id)
+                )
+        if row is None:
+            return ("claimed" if daily.done else "not_done"), 0
+        daily.done = True
+        leaderboards.adjust("coins", user_id, daily.spec.reward)
+        return "ok", daily.spec.reward
+
+
+# نمونه سینگلتون
+missions = MissionEngine()
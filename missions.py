@@ -0,0 +1,73 @@
+# handlers/missions.py
+"""
+ماموریت‌ها: /missions برای ماموریت روزانه و ماموریت کلن، دکمه دریافت پاداش روزانه
+"""
+
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import ContextTypes, CallbackQueryHandler
+
+from database.models import add_user
+from utils.mission_engine import missions, Progress
+from utils.locks import user_locks
+
+BAR_WIDTH = 10
+
+
+def progress_line(mission: Progress, pending: int) -> str:
+    progress = min(mission.target, mission.progress + pending)
+    filled = BAR_WIDTH * progress // mission.target if mission.target else BAR_WIDTH
+    return f"{'🟩' * filled}{'⬜' * (BAR_WIDTH - filled)} {progress:,}/{mission.target:,}"
+
+
+def format_clan_mission(clan_id: int) -> str:
+    mission = missions.clan_mission(clan_id)
+    pending = missions.pending_for(("clan", mission.mission_id))
+    return (
+        f"🎯 ماموریت کلن: {mission.spec.describe(mission.target)}\n"
+        f"{progress_line(mission, pending)}\n"
+        f"🎁 پاداش خزانه: {mission.spec.reward:,} سکه"
+    )
+
+
+def _build(user_id: int):
+    state = missions.user_state(user_id)
+    daily = state.daily
+    lines = ["📋 <b>ماموریت‌ها</b>", ""]
+    markup = None
+    if daily is not None:
+        pending = missions.pending_for(("daily", user_id, missions.date))
+        lines += [
+            f"📅 ماموریت امروز: {daily.spec.describe(daily.target)}",
+            progress_line(daily, pending),
+            f"🎁 پاداش: {daily.spec.reward:,} سکه" + (" ✅ دریافت شد" if daily.done else ""),
+        ]
+        if not daily.done and daily.progress + pending >= daily.target:
+            markup = InlineKeyboardMarkup([[InlineKeyboardButton("🎁 دریافت پاداش", callback_data="mission_claim")]])
+    if state.clan_id is not None:
+        lines += ["", format_clan_mission(state.clan_id)]
+    return "\n".join(lines), markup
+
+
+async def missions_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_user.id
+    add_user(user_id, update.effective_user.username)
+    text, markup = _build(user_id)
+    await update.message.reply_text(text, reply_markup=markup, parse_mode="HTML")
+
+
+async def mission_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    user_id = query.from_user.id
+    async with user_locks.hold(user_id):
+        status, reward = missions.claim_daily(user_id)
+    if status == "ok":
+        await query.answer(f"🎉 {reward:,} سکه دریافت کردید!")
+    elif status == "claimed":
+        await query.answer("✅ پاداش امروز را قبلا گرفته‌اید.")
+    else:
+        await query.answer("⏳ ماموریت هنوز کامل نشده است.")
+    text, markup = _build(user_id)
+    await query.edit_message_text(text, reply_markup=markup, parse_mode="HTML")
+
+
+mission_callback_handler = CallbackQueryHandler(mission_callback, pattern="^mission_claim$")
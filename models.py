@@ -1,7 +1,7 @@
 import time
-from typing import Tuple, List, Optional
+from typing import Dict, Tuple, List, Optional
 
-from database.db import db
+from database.db import db, Rollback
 from config.settings import (
     ARMORY_INITIAL_CAPACITY,
     ARMORY_UPGRADE_BASE_PRICE,
@@ -11,6 +11,7 @@ from config.settings import (
     SILVER_SELL_PRICE
 )
 from utils.logger import logger
+from utils.leaderboard_service import leaderboards
 
 
 def user_exists(user_id: int) -> bool:
@@ -26,7 +27,7 @@ def add_user(user_id: int, username: str = None) -> bool:
                 with db.get_cursor() as cursor:
                     cursor.execute("UPDATE users SET username=? WHERE user_id=?", (username, user_id))
             except Exception as e:
-                logger.error(f"Error updating username for {user_id}: {e}")
+                logger.error("Error updating username for %s: %s", user_id, e)
         return False
     
     try:
@@ -37,10 +38,11 @@ def add_user(user_id: int, username: str = None) -> bool:
                 "INSERT INTO armory_meta (user_id, level, capacity) VALUES (?, ?, ?)",
                 (user_id, 1, ARMORY_INITIAL_CAPACITY)
             )
-        logger.info(f"New user added: {user_id} (@{username})")
+        leaderboards.add_user(user_id)
+        logger.info("New user added: %s (@%s)", user_id, username)
         return True
     except Exception as e:
-        logger.error(f"Error adding user {user_id}: {e}")
+        logger.error("Error adding user %s: %s", user_id, e)
         return False
 
 
@@ -71,9 +73,68 @@ def update_user_money(user_id: int, amount: int):
                 "UPDATE resources SET coins = coins + ? WHERE user_id = ?",
                 (amount, user_id)
             )
-        logger.info(f"User {user_id} coins updated: {amount:+d}")
+        leaderboards.adjust("coins", user_id, amount)
+        logger.info("User %s coins updated: %+d", user_id, amount)
     except Exception as e:
-        logger.error(f"Error updating coins for user {user_id}: {e}")
+        logger.error("Error updating coins for user %s: %s", user_id, e)
+
+
+def _transfer_day(timestamp: float) -> str:
+    return time.strftime("%Y-%m-%d", time.gmtime(timestamp))
+
+
+def get_transferred_today(user_id: int) -> int:
+    """مجموع انتقال‌های بانکی امروز (UTC) کاربر از جدول transfers"""
+    row = db.fetchone(
+        "SELECT COALESCE(SUM(amount), 0) AS total FROM transfers WHERE sender_id = ? AND date = ?",
+        (user_id, _transfer_day(time.time()))
+    )
+    return int(row['total']) if row else 0
+
+
+def transfer_coins(from_user: int, to_user: int, amount: int, daily_limit: Optional[int] = None) -> bool:
+    """انتقال سکه بین دو کاربر در یک تراکنش (فقط اگر موجودی کافی باشد)
+    
+    با daily_limit انتقال بانکی است: در جدول transfers ثبت می‌شود و مجموع امروز فرستنده
+    نباید از سقف بگذرد. جمع بعد از کسر سکه خوانده می‌شود تا قفل ردیف فرستنده انتقال‌های
+    همزمان او را (حتی در worker های مختلف) پشت سر هم بگذارد.
+    """
+    now = time.time()
+    try:
+        with db.get_cursor() as cursor:
+            cursor.execute(
+                "UPDATE resources SET coins = coins - ? WHERE user_id = ? AND coins >= ?",
+                (amount, from_user, amount)
+            )
+            if cursor.rowcount == 0:
+                return False
+            cursor.execute(
+                "UPDATE resources SET coins = coins + ? WHERE user_id = ?",
+                (amount, to_user)
+            )
+            if daily_limit is not None:
+                day = _transfer_day(now)
+                row = cursor.execute(
+                    "SELECT COALESCE(SUM(amount), 0) AS total FROM transfers WHERE sender_id = ? AND date = ?",
+                    (from_user, day)
+                ).fetchone()
+                if row['total'] + amount > daily_limit:
+                    raise Rollback("daily limit")
+                cursor.execute(
+                    "INSERT INTO transfers (sender_id, receiver_id, amount, date, timestamp) VALUES (?, ?, ?, ?, ?)",
+                    (from_user, to_user, amount, day, now)
+                )
+    except Rollback:
+        logger.info("User %s daily transfer limit reached (%s)", from_user, daily_limit)
+        return False
+    except Exception as e:
+        logger.error("Error transferring coins %s -> %s: %s", from_user, to_user, e)
+        return False
+    
+    leaderboards.adjust("coins", from_user, -amount)
+    leaderboards.adjust("coins", to_user, amount)
+    logger.info("Transferred %s coins: %s -> %s", amount, from_user, to_user)
+    return True
 
 
 def add_resources(user_id: int, iron: int = 0, silver: int = 0, coins: int = 0):
@@ -87,9 +148,10 @@ def add_resources(user_id: int, iron: int = 0, silver: int = 0, coins: int = 0):
                 """,
                 (iron, silver, coins, user_id)
             )
-        logger.info(f"User {user_id} resources updated: iron{iron:+d}, silver{silver:+d}, coins{coins:+d}")
+        leaderboards.adjust("coins", user_id, coins)
+        logger.debug("User %s resources updated: iron%+d, silver%+d, coins%+d", user_id, iron, silver, coins)
     except Exception as e:
-        logger.error(f"Error updating resources for user {user_id}: {e}")
+        logger.error("Error updating resources for user %s: %s", user_id, e)
 
 
 def start_mining(user_id: int):
@@ -104,9 +166,9 @@ def start_mining(user_id: int):
                 """,
                 (now, now, user_id)
             )
-        logger.info(f"Mining started for user {user_id}")
+        logger.info("Mining started for user %s", user_id)
     except Exception as e:
-        logger.error(f"Error starting mining for user {user_id}: {e}")
+        logger.error("Error starting mining for user %s: %s", user_id, e)
 
 
 def is_mining_active(user_id: int) -> bool:
@@ -124,6 +186,21 @@ def get_mining_users() -> List[Tuple[int, float, float]]:
     return [(row['user_id'], row['last_iron'], row['last_silver']) for row in rows]
 
 
+def apply_mining(updates: List[Tuple[int, int, float, float, int]]):
+    """اعتبار و زمان آخر استخراج همه کاربران یک تیک در یک UPDATE دسته‌ای
+    
+    هر ردیف: (آهن، نقره، last_iron، last_silver، user_id)
+    """
+    if not updates:
+        return
+    with db.get_cursor() as cursor:
+        cursor.executemany(
+            "UPDATE resources SET iron = iron + ?, silver = silver + ?, last_iron = ?, last_silver = ? "
+            "WHERE user_id = ?",
+            updates
+        )
+
+
 def update_mining_times(user_id: int, last_iron: float, last_silver: float):
     with db.get_cursor() as cursor:
         cursor.execute(
@@ -140,6 +217,88 @@ def get_last_daily(user_id: int) -> float:
     return row['last_daily'] if row else 0
 
 
+def get_last_attack(user_id: int) -> float:
+    row = db.fetchone(
+        "SELECT last_battle FROM pvp_cooldowns WHERE user_id=?",
+        (user_id,)
+    )
+    return row['last_battle'] if row else 0
+
+
+# UPSERT شرطی: زمان حمله فقط وقتی ثبت می‌شود که cooldown قبلی تمام شده باشد
+CLAIM_ATTACK_SQL = """
+    INSERT INTO pvp_cooldowns (user_id, last_battle) VALUES (?, ?)
+    ON CONFLICT(user_id) DO UPDATE SET last_battle = excluded.last_battle
+    WHERE pvp_cooldowns.last_battle <= ?
+"""
+
+
+def claim_attack(user_id: int, when: float, cooldown: float) -> bool:
+    """ثبت زمان حمله فقط اگر cooldown قبلی تمام شده باشد (اتمیک بین worker ها)"""
+    with db.get_cursor() as cursor:
+        cursor.execute(CLAIM_ATTACK_SQL, (user_id, when, when - cooldown))
+        return cursor.rowcount > 0
+
+
+class _AttackRollback(Rollback):
+    def __init__(self, status: str):
+        super().__init__(status)
+        self.status = status
+
+
+def settle_attack(attacker_id: int, target_id: int, missile: str, stolen: int,
+                  losses: Dict[str, int], when: float, cooldown: Optional[float] = None) -> str:
+    """ثبت کامل یک حمله در یک تراکنش: cooldown، مصرف موشک، غنیمت و تلفات مدافع
+    
+    cooldown=None یعنی زمان حمله در دیتابیس ثبت نمی‌شود (فقط یک worker).
+    خروجی: "ok" | "cooldown" | "missile" | "coins" | "error"
+    """
+    deltas = {(target_id, weapon): -lost for weapon, lost in losses.items() if lost}
+    try:
+        with db.get_cursor() as cursor:
+            if cooldown is not None:
+                cursor.execute(CLAIM_ATTACK_SQL, (attacker_id, when, when - cooldown))
+                if cursor.rowcount == 0:
+                    raise _AttackRollback("cooldown")
+            
+            cursor.execute(
+                "UPDATE armory SET count = count - 1 WHERE user_id = ? AND weapon_name = ? AND count >= 1",
+                (attacker_id, missile)
+            )
+            if cursor.rowcount == 0:
+                raise _AttackRollback("missile")
+            cursor.execute(
+                "DELETE FROM armory WHERE user_id = ? AND weapon_name = ? AND count <= 0",
+                (attacker_id, missile)
+            )
+            
+            if stolen > 0:
+                cursor.execute(
+                    "UPDATE resources SET coins = coins - ? WHERE user_id = ? AND coins >= ?",
+                    (stolen, target_id, stolen)
+                )
+                if cursor.rowcount == 0:
+                    raise _AttackRollback("coins")
+                cursor.execute(
+                    "UPDATE resources SET coins = coins + ? WHERE user_id = ?",
+                    (stolen, attacker_id)
+                )
+            
+            _apply_armory_deltas(cursor, deltas)
+    except _AttackRollback as e:
+        return e.status
+    except Exception as e:
+        logger.error("Error settling attack %s -> %s: %s", attacker_id, target_id, e)
+        return "error"
+    
+    deltas[(attacker_id, missile)] = -1
+    leaderboards.adjust("coins", target_id, -stolen)
+    leaderboards.adjust("coins", attacker_id, stolen)
+    leaderboards.adjust_armory(deltas.items())
+    logger.info("User %s attacked %s with %s: loot %s, defender losses %s", attacker_id, target_id, missile, stolen, losses)
+    return "ok"
+
+
 def claim_daily_reward(user_id: int, coins: int) -> bool:
     now = time.time()
     try:
@@ -148,10 +307,11 @@ def claim_daily_reward(user_id: int, coins: int) -> bool:
                 "UPDATE resources SET coins=coins+?, last_daily=? WHERE user_id=?",
                 (coins, now, user_id)
             )
-        logger.info(f"User {user_id} claimed daily reward: +{coins} coins")
+        leaderboards.adjust("coins", user_id, coins)
+        logger.info("User %s claimed daily reward: +%s coins", user_id, coins)
         return True
     except Exception as e:
-        logger.error(f"Error claiming daily reward for user {user_id}: {e}")
+        logger.error("Error claiming daily reward for user %s: %s", user_id, e)
         return False
 
 
@@ -166,19 +326,21 @@ def get_armory_meta(user_id: int) -> Tuple[int, int]:
     try:
         with db.get_cursor() as cursor:
             cursor.execute(
-                "INSERT OR IGNORE INTO armory_meta (user_id, level, capacity) VALUES (?, ?, ?)",
+                "INSERT INTO armory_meta (user_id, level, capacity) VALUES (?, ?, ?) "
+                "ON CONFLICT(user_id) DO NOTHING",
                 (user_id, 1, ARMORY_INITIAL_CAPACITY)
             )
         return 1, ARMORY_INITIAL_CAPACITY
     except Exception as e:
-        logger.error(f"Error initializing armory_meta for user {user_id}: {e}")
+        logger.error("Error initializing armory_meta for user %s: %s", user_id, e)
         return 1, ARMORY_INITIAL_CAPACITY
 
 
 def set_armory_meta(user_id: int, level: int, capacity: int):
     with db.get_cursor() as cursor:
         cursor.execute(
-            "INSERT OR REPLACE INTO armory_meta (user_id, level, capacity) VALUES (?, ?, ?)",
+            "INSERT INTO armory_meta (user_id, level, capacity) VALUES (?, ?, ?) "
+            "ON CONFLICT(user_id) DO UPDATE SET level=excluded.level, capacity=excluded.capacity",
             (user_id, level, capacity)
         )
 
@@ -191,37 +353,90 @@ def get_armory_count(user_id: int) -> int:
     return int(row['total']) if (row and row['total']) else 0
 
 
+# UPSERT یک‌جا برای کل تغییرات زرادخانه (مثبت = اضافه، منفی = کم)
+ARMORY_UPSERT_SQL = """
+    INSERT INTO armory (user_id, weapon_name, count) VALUES (?, ?, ?)
+    ON CONFLICT(user_id, weapon_name) DO UPDATE SET count = armory.count + excluded.count
+"""
+
+
+def _apply_armory_deltas(cursor, deltas: Dict[Tuple[int, str], int]):
+    """اعمال تغییرات زرادخانه روی cursor جاری (بدون commit)"""
+    rows = [(user_id, weapon, delta) for (user_id, weapon), delta in deltas.items() if delta]
+    if not rows:
+        return
+    
+    cursor.executemany(ARMORY_UPSERT_SQL, rows)
+    
+    user_ids = sorted({row[0] for row in rows})
+    placeholders = ",".join("?" * len(user_ids))
+    cursor.execute(
+        f"DELETE FROM armory WHERE user_id IN ({placeholders}) AND count <= 0",
+        user_ids
+    )
+
+
+def apply_armory_deltas(deltas: Dict[Tuple[int, str], int]) -> bool:
+    """اعمال چند تغییر زرادخانه در یک تراکنش
+    
+    کلید: (user_id, weapon_name)، مقدار: تغییر تعداد
+    """
+    try:
+        with db.get_cursor() as cursor:
+            _apply_armory_deltas(cursor, deltas)
+        leaderboards.adjust_armory(deltas.items())
+        return True
+    except Exception as e:
+        logger.error("Error applying armory deltas %s: %s", deltas, e)
+        return False
+
+
 def add_weapon(user_id: int, weapon: str, amount: int = 1) -> bool:
     level, capacity = get_armory_meta(user_id)
     current = get_armory_count(user_id)
     
     if current + amount > capacity:
-        logger.info(f"User {user_id} armory full ({current}/{capacity})")
+        logger.info("User %s armory full (%s/%s)", user_id, current, capacity)
         return False
     
+    if not apply_armory_deltas({(user_id, weapon): amount}):
+        return False
+    
+    logger.info("User %s added %sx %s to armory (%s/%s)", user_id, amount, weapon, current+amount, capacity)
+    return True
+
+
+def purchase_weapon(user_id: int, weapon: str, amount: int, total_cost: int) -> bool:
+    """خرید سلاح: بررسی ظرفیت، کسر سکه و افزودن به زرادخانه در یک تراکنش"""
     try:
         with db.get_cursor() as cursor:
             row = cursor.execute(
-                "SELECT count FROM armory WHERE user_id=? AND weapon_name=?",
-                (user_id, weapon)
+                "SELECT "
+                "(SELECT capacity FROM armory_meta WHERE user_id = ?) AS capacity, "
+                "(SELECT COALESCE(SUM(count), 0) FROM armory WHERE user_id = ?) AS total",
+                (user_id, user_id)
             ).fetchone()
+            capacity = row['capacity'] if row['capacity'] is not None else ARMORY_INITIAL_CAPACITY
+            if row['total'] + amount > capacity:
+                logger.info("User %s armory full (%s/%s)", user_id, row['total'], capacity)
+                return False
             
-            if row:
-                new_amount = row['count'] + amount
-                cursor.execute(
-                    "UPDATE armory SET count=? WHERE user_id=? AND weapon_name=?",
-                    (new_amount, user_id, weapon)
-                )
-            else:
-                cursor.execute(
-                    "INSERT INTO armory (user_id, weapon_name, count) VALUES (?, ?, ?)",
-                    (user_id, weapon, amount)
-                )
+            cursor.execute(
+                "UPDATE resources SET coins = coins - ? WHERE user_id = ? AND coins >= ?",
+                (total_cost, user_id, total_cost)
+            )
+            if cursor.rowcount == 0:
+                logger.info("User %s insufficient coins for %sx %s (%s)", user_id, amount, weapon, total_cost)
+                return False
+            
+            _apply_armory_deltas(cursor, {(user_id, weapon): amount})
         
-        logger.info(f"User {user_id} added {amount}x {weapon} to armory ({current+amount}/{capacity})")
+        leaderboards.adjust("coins", user_id, -total_cost)
+        leaderboards.adjust_armory([((user_id, weapon), amount)])
+        logger.info("User %s purchased %sx %s for %s coins", user_id, amount, weapon, total_cost)
         return True
     except Exception as e:
-        logger.error(f"Error adding weapon to armory for user {user_id}: {e}")
+        logger.error("Error purchasing weapon for user %s: %s", user_id, e)
         return False
 
 
@@ -247,7 +462,7 @@ def upgrade_armory(user_id: int) -> Tuple[bool, int, int]:
     
     iron, silver, coins = get_resources(user_id)
     if coins < price:
-        logger.info(f"User {user_id} insufficient coins for armory upgrade: has {coins}, needs {price}")
+        logger.info("User %s insufficient coins for armory upgrade: has %s, needs %s", user_id, coins, price)
         return False, level, capacity
     
     try:
@@ -257,8 +472,8 @@ def upgrade_armory(user_id: int) -> Tuple[bool, int, int]:
         add_resources(user_id, coins=-price)
         set_armory_meta(user_id, new_level, new_capacity)
         
-        logger.info(f"User {user_id} upgraded armory to level {new_level}, capacity {new_capacity}, paid {price} coins")
+        logger.info("User %s upgraded armory to level %s, capacity %s, paid %s coins", user_id, new_level, new_capacity, price)
         return True, new_level, new_capacity
     except Exception as e:
-        logger.error(f"Error upgrading armory for user {user_id}: {e}")
+        logger.error("Error upgrading armory for user %s: %s", user_id, e)
         return False, level, capacity
@@ -0,0 +1,402 @@
+# utils/order_book.py
+"""
+بازار بازیکنان: دفتر سفارش (order book) فروش برای هر سلاح روی market_listings
+
+آگهی‌های فعال هر آیتم در یک heap با اولویت قیمت-زمان (ارزان‌ترین، سپس قدیمی‌ترین)
+نگه داشته می‌شوند؛ خرید بدون اسکن جدول و با هزینه O(log n) برای هر آگهی مصرف شده
+انجام می‌شود. سلاح‌های آگهی شده هنگام ثبت از زرادخانه فروشنده برداشته می‌شوند
+(امانت) و با لغو آگهی برمی‌گردند.
+"""
+
+import heapq
+import time
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from database.db import db, Rollback
+from database.models import ARMORY_INITIAL_CAPACITY, _apply_armory_deltas
+from config.settings import MARKET_MAX_LISTINGS, MARKET_MAX_PRICE, MARKET_BOOK_MAX_AGE
+from config.weapons import WEAPON_STATS
+from utils.leaderboard_service import leaderboards
+from utils.scheduler import scheduler
+from utils.logger import logger
+
+
+class Listing:
+    __slots__ = ("listing_id", "seller_id", "item_name", "quantity", "price", "listed_at")
+    
+    def __init__(self, listing_id: int, seller_id: int, item_name: str, quantity: int, price: int, listed_at: float):
+        self.listing_id = listing_id
+        self.seller_id = seller_id
+        self.item_name = item_name
+        self.quantity = quantity
+        self.price = price
+        self.listed_at = listed_at
+
+
+class TradeResult(NamedTuple):
+    status: str  # ok, empty, price, coins, capacity, stock, limit, invalid, error
+    quantity: int = 0
+    cost: int = 0
+    listing_id: Optional[int] = None
+
+
+# سکه BIGINT است؛ مبلغ بزرگ‌تر به SQL نمی‌رسد
+MAX_COINS = 2 ** 63 - 1
+
+
+class _StaleListing(Rollback):
+    """آگهی در دیتابیس دیگر با دفتر حافظه یکی نیست (worker دیگر آن را فروخته/لغو کرده)"""
+
+
+class OrderBook:
+    """heap آگهی‌های فروش یک آیتم با کلید (قیمت، شناسه آگهی)
+    
+    شناسه آگهی افزایشی است و ترتیب زمانی را در قیمت برابر حفظ می‌کند. آگهی‌های لغو
+    شده در heap می‌مانند و هنگام رسیدن به بالای heap دور ریخته می‌شوند (lazy deletion).
+    """
+    
+    def __init__(self, item_name: str):
+        self.item_name = item_name
+        self.heap: List[Tuple[int, int]] = []
+        self.quantity = 0
+        self.count = 0
+    
+    def push(self, listing: Listing):
+        heapq.heappush(self.heap, (listing.price, listing.listing_id))
+        self.quantity += listing.quantity
+        self.count += 1
+    
+    def stale(self) -> int:
+        return len(self.heap) - self.count
+    
+    def compact(self, listings: Dict[int, Listing]):
+        self.heap = [entry for entry in self.heap if entry[1] in listings]
+        heapq.heapify(self.heap)
+    
+    def best(self, listings: Dict[int, Listing]) -> Optional[Listing]:
+        while self.heap:
+            listing = listings.get(self.heap[0][1])
+            if listing is not None:
+                return listing
+            heapq.heappop(self.heap)
+        return None
+    
+    def levels(self, listings: Dict[int, Listing], n: int) -> List[Tuple[int, int]]:
+        """n سطح قیمت اول (قیمت، تعداد کل) بدون مرتب کردن کل heap
+        
+        پیمایش heap با یک heap کمکی از اندیس‌ها: هزینه O(k log k) برای k آگهی خوانده شده.
+        """
+        heap = self.heap
+        result: List[Tuple[int, int]] = []
+        frontier = [(heap[0], 0)] if heap else []
+        while frontier:
+            (price, listing_id), i = heapq.heappop(frontier)
+            listing = listings.get(listing_id)
+            if listing is not None:
+                if result and result[-1][0] == price:
+                    result[-1] = (price, result[-1][1] + listing.quantity)
+                elif len(result) == n:
+                    break
+                else:
+                    result.append((price, listing.quantity))
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+        return result
+
+
+class MarketEngine:
+    """دفترهای سفارش همه آیتم‌ها + تسویه اتمیک در دیتابیس
+    
+    همه عملیات sync هستند و در event loop بین آن‌ها await ای نیست؛ بنابراین دفتر
+    حافظه بین دو handler همیشه سازگار است. در حالت چندپروسسی UPDATE های شرطی
+    تسویه جلوی فروش دوباره یک آگهی را می‌گیرند و دفتر دوباره بارگذاری می‌شود.
+    """
+    
+    def __init__(self):
+        self.books: Dict[str, OrderBook] = {}
+        self.listings: Dict[int, Listing] = {}
+        self.by_seller: Dict[int, Set[int]] = {}
+        self.loaded = False
+        self.loaded_at = 0.0
+    
+    def load(self):
+        """ساخت همه دفترها با یک اسکن روی ایندکس (status, item_name, price, listing_id)
+        
+        ردیف‌ها به ترتیب کلید heap خوانده می‌شوند و لیست مرتب خودش یک heap معتبر است.
+        """
+        rows = db.fetchall(
+            "SELECT listing_id, seller_id, item_name, quantity, price, listed_at FROM market_listings "
+            "WHERE status = 'active' ORDER BY item_name, price, listing_id"
+        )
+        self.books = {}
+        self.listings = {}
+        self.by_seller = {}
+        for row in rows:
+            listing = Listing(row['listing_id'], row['seller_id'], row['item_name'],
+                              row['quantity'], row['price'], row['listed_at'])
+            book = self.books.get(listing.item_name)
+            if book is None:
+                book = self.books[listing.item_name] = OrderBook(listing.item_name)
+            book.heap.append((listing.price, listing.listing_id))
+            book.quantity += listing.quantity
+            book.count += 1
+            self._index(listing)
+        
+        self.loaded = True
+        self.loaded_at = time.monotonic()
+        logger.info("Market loaded: %s listings in %s books", len(rows), len(self.books))
+    
+    def _ensure_loaded(self):
+        if not self.loaded:
+            self.load()
+    
+    def _index(self, listing: Listing):
+        self.listings[listing.listing_id] = listing
+        self.by_seller.setdefault(listing.seller_id, set()).add(listing.listing_id)
+    
+    def _book(self, item_name: str) -> OrderBook:
+        book = self.books.get(item_name)
+        if book is None:
+            book = self.books[item_name] = OrderBook(item_name)
+        return book
+    
+    def _remove(self, listing: Listing):
+        """حذف از ایندکس‌ها؛ ورودی heap بعدا دور ریخته می‌شود"""
+        del self.listings[listing.listing_id]
+        seller_listings = self.by_seller.get(listing.seller_id)
+        if seller_listings is not None:
+            seller_listings.discard(listing.listing_id)
+            if not seller_listings:
+                del self.by_seller[listing.seller_id]
+        book = self.books[listing.item_name]
+        book.quantity -= listing.quantity
+        book.count -= 1
+        if book.stale() > 64 and book.stale() > book.count:
+            book.compact(self.listings)
+    
+    # ==================== خواندن ====================
+    
+    def best_ask(self, item_name: str) -> Optional[Listing]:
+        self._ensure_loaded()
+        book = self.books.get(item_name)
+        return book.best(self.listings) if book else None
+    
+    def depth(self, item_name: str, levels: int = 5) -> List[Tuple[int, int]]:
+        self._ensure_loaded()
+        book = self.books.get(item_name)
+        return book.levels(self.listings, levels) if book else []
+    
+    def summary(self) -> List[Tuple[str, int, int]]:
+        """(آیتم، ارزان‌ترین قیمت، تعداد کل) برای آیتم‌های دارای آگهی"""
+        self._ensure_loaded()
+        result = []
+        for item_name, book in self.books.items():
+            best = book.best(self.listings)
+            if best is not None:
+                result.append((item_name, best.price, book.quantity))
+        return sorted(result)
+    
+    def user_listings(self, user_id: int) -> List[Listing]:
+        self._ensure_loaded()
+        return sorted(
+            (self.listings[listing_id] for listing_id in self.by_seller.get(user_id, ())),
+            key=lambda listing: listing.listing_id
+        )
+    
+    # ==================== ثبت و لغو ====================
+    
+    def list_item(self, seller_id: int, item_name: str, quantity: int, price: int) -> TradeResult:
+        """ثبت آگهی فروش: برداشتن سلاح از زرادخانه و درج آگهی در یک تراکنش"""
+        self._ensure_loaded()
+        if item_name not in WEAPON_STATS or quantity <= 0 or not 0 < price <= MARKET_MAX_PRICE:
+            return TradeResult("invalid")
+        if price * quantity > MAX_COINS:
+            return TradeResult("invalid")
+        if len(self.by_seller.get(seller_id, ())) >= MARKET_MAX_LISTINGS:
+            return TradeResult("limit")
+        
+        now = time.time()
+        try:
+            with db.get_cursor() as cursor:
+                cursor.execute(
+                    "UPDATE armory SET count = count - ? WHERE user_id = ? AND weapon_name = ? AND count >= ?",
+                    (quantity, seller_id, item_name, quantity)
+                )
+                if cursor.rowcount == 0:
+                    return TradeResult("stock")
+                cursor.execute(
+                    "DELETE FROM armory WHERE user_id = ? AND weapon_name = ? AND count <= 0",
+                    (seller_id, item_name)
+                )
+                row = cursor.execute(
+                    "INSERT INTO market_listings (seller_id, item_type, item_name, quantity, price, status, listed_at) "
+                    "VALUES (?, 'weapon', ?, ?, ?, 'active', ?) RETURNING listing_id",
+                    (seller_id, item_name, quantity, price, now)
+                ).fetchone()
+        except Exception as e:
+            logger.error("Error listing %sx %s for user %s: %s", quantity, item_name, seller_id, e)
+            return TradeResult("error")
+        
+        listing = Listing(row['listing_id'], seller_id, item_name, quantity, price, now)
+        self._index(listing)
+        self._book(item_name).push(listing)
+        leaderboards.adjust_armory([((seller_id, item_name), -quantity)])
+        logger.info("User %s listed %sx %s at %s (#%s)", seller_id, quantity, item_name, price, listing.listing_id)
+        return TradeResult("ok", quantity, 0, listing.listing_id)
+    
+    def cancel(self, seller_id: int, listing_id: int) -> TradeResult:
+        """لغو آگهی و برگرداندن باقی‌مانده به زرادخانه (بدون بررسی ظرفیت)"""
+        self._ensure_loaded()
+        try:
+            with db.get_cursor() as cursor:
+                row = cursor.execute(
+                    "UPDATE market_listings SET status = 'cancelled' "
+                    "WHERE listing_id = ? AND seller_id = ? AND status = 'active' "
+                    "RETURNING item_name, quantity",
+                    (listing_id, seller_id)
+                ).fetchone()
+                if row is None:
+                    return TradeResult("invalid")
+                _apply_armory_deltas(cursor, {(seller_id, row['item_name']): row['quantity']})
+        except Exception as e:
+            logger.error("Error cancelling listing #%s for user %s: %s", listing_id, seller_id, e)
+            return TradeResult("error")
+        
+        listing = self.listings.get(listing_id)
+        if listing is not None:
+            self._remove(listing)
+        leaderboards.adjust_armory([((seller_id, row['item_name']), row['quantity'])])
+        logger.info("User %s cancelled listing #%s", seller_id, listing_id)
+        return TradeResult("ok", row['quantity'], 0, listing_id)
+    
+    # ==================== خرید ====================
+    
+    def _match(self, book: OrderBook, buyer_id: int, quantity: int,
+               max_price: Optional[int]) -> Tuple[List[Tuple[Listing, int]], List[Tuple[int, int]]]:
+        """برداشتن آگهی‌ها به ترتیب قیمت-زمان تا پر شدن تعداد
+        
+        خروجی: (آگهی، تعداد پر شده) و ورودی‌های برداشته شده از heap که بعد از تسویه
+        (یا شکست آن) برگردانده می‌شوند.
+        """
+        fills: List[Tuple[Listing, int]] = []
+        popped: List[Tuple[int, int]] = []
+        remaining = quantity
+        while remaining > 0 and book.heap:
+            price, listing_id = book.heap[0]
+            listing = self.listings.get(listing_id)
+            if listing is None:
+                heapq.heappop(book.heap)
+                continue
+            if max_price is not None and price > max_price:
+                break
+            popped.append(heapq.heappop(book.heap))
+            if listing.seller_id == buyer_id:
+                continue
+            take = min(remaining, listing.quantity)
+            fills.append((listing, take))
+            remaining -= take
+        return fills, popped
+    
+    def _settle(self, buyer_id: int, item_name: str, fills: List[Tuple[Listing, int]], cost: int) -> str:
+        """کسر سکه خریدار، واریز به فروشنده‌ها، کم کردن آگهی‌ها و افزودن سلاح در یک تراکنش"""
+        quantity = sum(take for _, take in fills)
+        now = time.time()
+        with db.get_cursor() as cursor:
+            row = cursor.execute(
+                "SELECT "
+                "(SELECT capacity FROM armory_meta WHERE user_id = ?) AS capacity, "
+                "(SELECT COALESCE(SUM(count), 0) FROM armory WHERE user_id = ?) AS total",
+                (buyer_id, buyer_id)
+            ).fetchone()
+            capacity = row['capacity'] if row['capacity'] is not None else ARMORY_INITIAL_CAPACITY
+            if row['total'] + quantity > capacity:
+                return "capacity"
+            
+            cursor.execute(
+                "UPDATE resources SET coins = coins - ? WHERE user_id = ? AND coins >= ?",
+                (cost, buyer_id, cost)
+            )
+            if cursor.rowcount == 0:
+                return "coins"
+            
+            for listing, take in fills:
+                cursor.execute(
+                    "UPDATE market_listings SET quantity = quantity - ?, "
+                    "status = CASE WHEN quantity = ? THEN 'sold' ELSE 'active' END, buyer_id = ?, sold_at = ? "
+                    "WHERE listing_id = ? AND status = 'active' AND quantity >= ?",
+                    (take, take, buyer_id, now, listing.listing_id, take)
+                )
+                if cursor.rowcount == 0:
+                    raise _StaleListing(listing.listing_id)
+            
+            proceeds: Dict[int, int] = {}
+            for listing, take in fills:
+                proceeds[listing.seller_id] = proceeds.get(listing.seller_id, 0) + take * listing.price
+            cursor.executemany(
+                "UPDATE resources SET coins = coins + ? WHERE user_id = ?",
+                [(amount, seller_id) for seller_id, amount in proceeds.items()]
+            )
+            _apply_armory_deltas(cursor, {(buyer_id, item_name): quantity})
+        
+        leaderboards.adjust("coins", buyer_id, -cost)
+        for seller_id, amount in proceeds.items():
+            leaderboards.adjust("coins", seller_id, amount)
+        leaderboards.adjust_armory([((buyer_id, item_name), quantity)])
+        return "ok"
+    
+    def buy(self, buyer_id: int, item_name: str, quantity: int, max_price: Optional[int] = None) -> TradeResult:
+        """خرید تا quantity عدد از ارزان‌ترین آگهی‌ها (پر شدن جزئی مجاز)"""
+        self._ensure_loaded()
+        if quantity <= 0:
+            return TradeResult("invalid")
+        
+        for attempt in range(2):
+            book = self.books.get(item_name)
+            if book is None:
+                return TradeResult("empty")
+            
+            fills, popped = self._match(book, buyer_id, quantity, max_price)
+            if not fills:
+                for entry in popped:
+                    heapq.heappush(book.heap, entry)
+                best = book.best(self.listings)
+                return TradeResult("price" if best is not None and best.seller_id != buyer_id else "empty")
+            
+            cost = sum(take * listing.price for listing, take in fills)
+            try:
+                # هیچ موجودی به این مبلغ نمی‌رسد (جمع چند آگهی)
+                status = "coins" if cost > MAX_COINS else self._settle(buyer_id, item_name, fills, cost)
+            except _StaleListing as e:
+                logger.warning("Market listing #%s is stale, reloading order books", e)
+                self.load()
+                continue
+            except Exception as e:
+                status = "error"
+                logger.error("Error settling market buy for user %s: %s", buyer_id, e)
+            
+            if status == "ok":
+                for listing, take in fills:
+                    listing.quantity -= take
+                    book.quantity -= take
+                    if listing.quantity == 0:
+                        # از by_seller و شمارنده کتاب هم حذف شود (quantity صفر است)
+                        self._remove(listing)
+            for entry in popped:
+                if entry[1] in self.listings:
+                    heapq.heappush(book.heap, entry)
+            
+            if status != "ok":
+                return TradeResult(status)
+            filled = sum(take for _, take in fills)
+            logger.info("User %s bought %sx %s for %s coins (%s listings)", buyer_id, filled, item_name, cost, len(fills))
+            return TradeResult("ok", filled, cost)
+        
+        return TradeResult("error")
+
+
+# نمونه سینگلتون
+market = MarketEngine()
+
+# آگهی‌های worker های دیگر
+scheduler.reload_every("market_reload", MARKET_BOOK_MAX_AGE, market)
@@ -42,4 +42,4 @@ async def show_profile(update: Update, context: ContextTypes.DEFAULT_TYPE):
         reply_markup=main_markup
     )
 
-    logger.info(f"User {user_id} viewed profile.")
+    logger.info("User %s viewed profile.", user_id)
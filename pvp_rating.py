@@ -0,0 +1,142 @@
+# utils/pvp_rating.py
+"""
+امتیاز PvP بر اساس Elo با رتبه‌بندی در حافظه
+
+تغییر امتیازها به صورت افزایشی (delta) در pvp_ratings نوشته می‌شود، پس worker ها امتیاز
+همدیگر را بازنویسی نمی‌کنند. در حالت چندپروسسی هر PVP_RATING_MAX_AGE ثانیه فقط ردیف‌هایی
+که از آخرین بارگذاری flush شده‌اند (ایندکس updated_at) خوانده می‌شوند و تغییرات flush نشده
+همین پروسس دوباره روی آن‌ها اعمال می‌شوند.
+"""
+
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from database.db import db
+from config.settings import PVP_RATING_MAX_AGE
+from utils.ranked_index import RankedIndex
+from utils.scheduler import scheduler
+from utils.logger import logger
+
+DEFAULT_RATING = 1000
+MIN_RATING = 100
+
+# K بیشتر برای بازیکنان تازه‌وارد تا سریع‌تر به امتیاز واقعی برسند
+K_FACTOR_NEW = 40
+K_FACTOR = 20
+PROVISIONAL_FIGHTS = 30
+
+# flush هایی که زودتر از watermark شروع و دیرتر commit شده‌اند هم دوباره خوانده شوند
+REFRESH_OVERLAP = 60
+
+
+def expected_score(rating: float, opponent: float) -> float:
+    return 1 / (1 + 10 ** ((opponent - rating) / 400))
+
+
+class RatingChange(NamedTuple):
+    winner_rating: int
+    loser_rating: int
+    gain: int
+    loss: int  # کاهش واقعی بازنده (بعد از اعمال MIN_RATING)
+
+
+class RatingEngine:
+
+    def __init__(self):
+        self.ratings = RankedIndex()
+        self.fights: Dict[int, int] = {}
+        self.pending: Dict[int, List[int]] = {}  # user_id -> [تغییر امتیاز، نبرد] نوشته نشده
+        self.loaded = False
+        self.loaded_at = 0.0
+        self.watermark = 0.0  # بیشترین updated_at خوانده شده
+    
+    def load(self):
+        """بارگذاری همه امتیازها با یک اسکن از pvp_ratings"""
+        rows = db.fetchall("SELECT user_id, rating, total_fights, updated_at FROM pvp_ratings")
+        self.watermark = max((row['updated_at'] or 0 for row in rows), default=0.0)
+        ratings = {row['user_id']: row['rating'] for row in rows}
+        self.fights = {row['user_id']: row['total_fights'] for row in rows}
+        for user_id, (delta, fights) in self.pending.items():
+            ratings[user_id] = max(MIN_RATING, ratings.get(user_id, DEFAULT_RATING) + delta)
+            self.fights[user_id] = self.fights.get(user_id, 0) + fights
+        self.ratings = RankedIndex(ratings.items())
+        self.loaded = True
+        self.loaded_at = time.monotonic()
+        logger.info("PvP ratings loaded: %s players", len(self.ratings))
+    
+    def refresh(self):
+        """خواندن فقط امتیازهای flush شده از آخرین بارگذاری (worker های دیگر)"""
+        rows = db.fetchall(
+            "SELECT user_id, rating, total_fights, updated_at FROM pvp_ratings WHERE updated_at > ?",
+            (self.watermark - REFRESH_OVERLAP,)
+        )
+        for row in rows:
+            delta, fights = self.pending.get(row['user_id'], (0, 0))
+            self.ratings.set(row['user_id'], max(MIN_RATING, row['rating'] + delta))
+            self.fights[row['user_id']] = row['total_fights'] + fights
+            self.watermark = max(self.watermark, row['updated_at'])
+        self.loaded_at = time.monotonic()
+    
+    def _ensure_loaded(self):
+        if not self.loaded:
+            self.load()
+    
+    def _k_factor(self, user_id: int) -> int:
+        return K_FACTOR_NEW if self.fights.get(user_id, 0) < PROVISIONAL_FIGHTS else K_FACTOR
+    
+    def get_rating(self, user_id: int) -> int:
+        self._ensure_loaded()
+        return int(self.ratings.get(user_id, DEFAULT_RATING))
+    
+    def record_result(self, winner_id: int, loser_id: int) -> RatingChange:
+        """بروزرسانی امتیاز پس از نبرد (در حافظه؛ battle_log همان تغییر را در دیتابیس می‌نویسد)"""
+        self._ensure_loaded()
+        winner = self.ratings.get(winner_id, DEFAULT_RATING)
+        loser = self.ratings.get(loser_id, DEFAULT_RATING)
+        
+        gain = round(self._k_factor(winner_id) * (1 - expected_score(winner, loser)))
+        loss = round(self._k_factor(loser_id) * expected_score(loser, winner))
+        
+        new_winner = int(winner + gain)
+        new_loser = int(max(MIN_RATING, loser - loss))
+        self.ratings.set(winner_id, new_winner)
+        self.ratings.set(loser_id, new_loser)
+        self.fights[winner_id] = self.fights.get(winner_id, 0) + 1
+        self.fights[loser_id] = self.fights.get(loser_id, 0) + 1
+        
+        loss = int(loser) - new_loser
+        for user_id, delta in ((winner_id, gain), (loser_id, -loss)):
+            pending = self.pending.setdefault(user_id, [0, 0])
+            pending[0] += delta
+            pending[1] += 1
+        return RatingChange(new_winner, new_loser, gain, loss)
+    
+    def flushed(self, changes: Dict[int, Tuple[int, int]]):
+        """تغییرات نوشته شده در دیتابیس از pending کم می‌شوند"""
+        for user_id, (delta, fights) in changes.items():
+            pending = self.pending.get(user_id)
+            if pending is None:
+                continue
+            pending[0] -= delta
+            pending[1] -= fights
+            if pending[1] <= 0:
+                del self.pending[user_id]
+    
+    def rank(self, user_id: int) -> Optional[int]:
+        """رتبه بازیکن بین همه بازیکنان دارای امتیاز"""
+        self._ensure_loaded()
+        return self.ratings.rank(user_id)
+    
+    def top(self, n: int = 100) -> List[Tuple[int, int]]:
+        self._ensure_loaded()
+        return [(user_id, int(rating)) for user_id, rating in self.ratings.top(n)]
+    
+    def total_players(self) -> int:
+        self._ensure_loaded()
+        return len(self.ratings)
+
+
+# نمونه سینگلتون
+rating_engine = RatingEngine()
+
+scheduler.reload_every("pvp_ratings_reload", PVP_RATING_MAX_AGE, rating_engine, rating_engine.refresh)
@@ -0,0 +1,99 @@
+# handlers/raid.py
+"""
+باس جهانی: /boss برای وضعیت، "ضربه" در گروه برای حمله به باس
+"""
+
+from typing import List
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from database.models import add_user, get_armory_list
+from handlers.leaderboard import _get_usernames
+from utils.battle_engine import battle_engine
+from utils.raid_engine import raid_engine, Boss, Kill
+from utils.logger import logger
+
+HP_BAR_WIDTH = 12
+
+
+def hp_bar(boss: Boss) -> str:
+    filled = round(HP_BAR_WIDTH * boss.hp / boss.max_hp) if boss.max_hp else 0
+    return "🟥" * filled + "⬜" * (HP_BAR_WIDTH - filled)
+
+
+def format_kill(kill: Kill) -> str:
+    top = kill.rewards[:5]
+    usernames = _get_usernames(user_id for user_id, _, _ in top)
+    lines = [
+        f"☠️ <b>{kill.name} نابود شد!</b>",
+        "━━━━━━━━━━━━━━━━━━",
+        f"👥 {len(kill.rewards):,} نفر در نبرد شرکت کردند.",
+        "",
+    ]
+    for i, (user_id, damage, reward) in enumerate(top, start=1):
+        name = f"@{usernames[user_id]}" if usernames.get(user_id) else f"User {user_id}"
+        lines.append(f"{i}. {name} — 💥 {damage:,} | 💰 {reward:,}")
+    return "\n".join(lines)
+
+
+async def _announce_kills(update: Update, context: ContextTypes.DEFAULT_TYPE, kills: List[Kill]):
+    """اعلام در همه گروه‌هایی که شرکت‌کننده‌ها از آن‌ها ضربه زده‌اند، نه فقط چت فعلی"""
+    for kill in kills:
+        text = format_kill(kill)
+        for chat_id in kill.chats or [update.effective_chat.id]:
+            try:
+                await context.bot.send_message(chat_id, text, parse_mode="HTML")
+            except Exception as e:
+                logger.warning("Could not announce boss #%s kill in chat %s: %s", kill.boss_id, chat_id, e)
+
+
+async def boss_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    boss = raid_engine.active_boss()
+    await _announce_kills(update, context, raid_engine.pop_kills())
+    if boss is None:
+        await update.message.reply_text("😴 فعلا باسی در میدان نیست.")
+        return
+    
+    top = raid_engine.top_damage(boss.boss_id, 5)
+    usernames = _get_usernames(user_id for user_id, _ in top)
+    text = (
+        f"👹 <b>{boss.name}</b>\n"
+        f"{hp_bar(boss)}\n"
+        f"❤️ {boss.hp:,} / {boss.max_hp:,}\n\n"
+        "⚔️ برای حمله در گروه بنویس: <b>ضربه</b>\n"
+    )
+    if top:
+        text += "\n🏅 بیشترین خسارت:\n"
+        for i, (user_id, damage) in enumerate(top, start=1):
+            name = f"@{usernames[user_id]}" if usernames.get(user_id) else f"User {user_id}"
+            text += f"{i}. {name} — <code>{damage:,}</code>\n"
+    await update.message.reply_text(text, parse_mode="HTML")
+
+
+async def raid_attack_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    msg = update.message
+    user = msg.from_user
+    add_user(user.id, user.username)
+    
+    boss = raid_engine.active_boss()
+    if boss is None:
+        await _announce_kills(update, context, raid_engine.pop_kills())
+        return
+    
+    attack, _ = battle_engine.armory_power(get_armory_list(user.id))
+    if attack <= 0:
+        await msg.reply_text("❌ برای ضربه زدن به باس به موشک نیاز داری!")
+        return
+    
+    wait = raid_engine.claim_hit(user.id)
+    if wait:
+        await msg.reply_text(f"⏳ {wait} ثانیه تا ضربه بعدی.")
+        return
+    
+    damage = raid_engine.hit(boss, user.id, attack, msg.chat_id)
+    await msg.reply_text(
+        f"💥 {damage:,} خسارت به {boss.name}\n{hp_bar(boss)} ❤️ {boss.hp:,}"
+    )
+    await _announce_kills(update, context, raid_engine.pop_kills())
+    logger.debug("User %s hit boss #%s for %s", user.id, boss.boss_id, damage)
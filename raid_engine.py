@@ -0,0 +1,296 @@
+# utils/raid_engine.py
+"""
+باس جهانی (bosses / boss_participants) با جمع کردن ضربه‌ها در حافظه
+
+هر ضربه فقط شمارنده‌های حافظه را زیاد می‌کند؛ BatchWriter هر RAID_FLUSH_MS میلی‌ثانیه
+ضربه‌های جمع شده را با یک UPDATE برای هر باس و یک UPSERT دسته‌ای برای شرکت‌کننده‌ها
+می‌نویسد. در حالت چندپروسسی هر worker تغییرات خودش را به صورت افزایشی flush می‌کند.
+کشته شدن باس با یک UPDATE شرطی روی status تشخیص داده می‌شود و فقط یک بار (در یک
+پروسس) پاداش پخش می‌شود؛ اعلام آن به همه چت‌هایی می‌رود که شرکت‌کننده‌ها از آن‌ها ضربه
+زده‌اند. cooldown ضربه در حالت چندپروسسی با UPSERT شرطی روی raid_cooldowns بین worker ها
+مشترک است.
+"""
+
+import random
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from database.db import db
+from config.settings import RAID_FLUSH_MS, RAID_ATTACK_COOLDOWN, RAID_BOSS_MAX_AGE, SHARD_WORKERS
+from utils.batch_writer import BatchWriter
+from utils.leaderboard_service import leaderboards
+from utils.scheduler import scheduler
+from utils.logger import logger
+
+# نوع باس: (نام، HP، مدت زنده ماندن به ثانیه، جایزه کل به سکه)
+BOSS_TYPES: Dict[str, Tuple[str, int, int, int]] = {
+    "drone": ("🛸 پهپاد مادر", 50_000, 3600, 20_000),
+    "titan": ("🤖 تایتان آهنین", 500_000, 3 * 3600, 150_000),
+    "leviathan": ("🐉 لویاتان", 5_000_000, 12 * 3600, 1_000_000),
+}
+
+
+class Hit(NamedTuple):
+    boss_id: int
+    user_id: int
+    damage: int
+    timestamp: float
+    chat_id: int
+
+
+class Boss:
+    __slots__ = ("boss_id", "boss_type", "name", "max_hp", "current_hp", "end_time", "pending_damage")
+    
+    def __init__(self, boss_id: int, boss_type: str, name: str, max_hp: int, current_hp: int, end_time: float):
+        self.boss_id = boss_id
+        self.boss_type = boss_type
+        self.name = name
+        self.max_hp = max_hp
+        self.current_hp = current_hp  # آخرین مقدار flush شده
+        self.end_time = end_time
+        self.pending_damage = 0  # ضربه‌های این پروسس که هنوز نوشته نشده‌اند
+    
+    @property
+    def hp(self) -> int:
+        return max(0, self.current_hp - self.pending_damage)
+
+
+class Kill(NamedTuple):
+    boss_id: int
+    name: str
+    rewards: List[Tuple[int, int, int]]  # (user_id, damage, reward)
+    chats: List[int]  # چت‌هایی که از آن‌ها به این باس ضربه زده شده
+
+
+class RaidEngine:
+    """ضربه، flush دسته‌ای، تشخیص کشته شدن و پخش پاداش"""
+    
+    def __init__(self):
+        self.bosses: Dict[int, Boss] = {}
+        self.loaded = False
+        self.loaded_at = 0.0
+        self.rng = random.Random()
+        self._last_hit: Dict[int, float] = {}
+        self._kills: List[Kill] = []
+        self.writer = BatchWriter("raid_hits", self._flush, max_rows=5000, interval_ms=RAID_FLUSH_MS)
+    
+    def load(self):
+        rows = db.fetchall(
+            "SELECT boss_id, boss_type, name, max_hp, current_hp, end_time FROM bosses WHERE status = 'active'"
+        )
+        bosses = {}
+        for row in rows:
+            boss = Boss(row['boss_id'], row['boss_type'], row['name'], row['max_hp'], row['current_hp'], row['end_time'])
+            previous = self.bosses.get(boss.boss_id)
+            if previous is not None:
+                boss.pending_damage = previous.pending_damage
+            bosses[boss.boss_id] = boss
+        self.bosses = bosses
+        self.loaded = True
+        self.loaded_at = time.monotonic()
+    
+    def _ensure_loaded(self):
+        if not self.loaded:
+            self.load()
+    
+    def active_boss(self) -> Optional[Boss]:
+        """باس فعال (اولین باسی که هنوز زمانش تمام نشده)"""
+        self._ensure_loaded()
+        now = time.time()
+        if any(boss.end_time <= now for boss in self.bosses.values()):
+            self.expire(now)
+        for boss in sorted(self.bosses.values(), key=lambda b: b.boss_id):
+            if boss.end_time > now and boss.hp > 0:
+                return boss
+        return None
+    
+    # ==================== ادمین ====================
+    
+    def spawn(self, boss_type: str) -> Optional[Boss]:
+        if boss_type not in BOSS_TYPES:
+            return None
+        self._ensure_loaded()
+        name, hp, duration, _ = BOSS_TYPES[boss_type]
+        now = time.time()
+        with db.get_cursor() as cursor:
+            row = cursor.execute(
+                "INSERT INTO bosses (boss_type, name, max_hp, current_hp, spawn_time, end_time, status) "
+                "VALUES (?, ?, ?, ?, ?, ?, 'active') RETURNING boss_id",
+                (boss_type, name, hp, hp, now, now + duration)
+            ).fetchone()
+        boss = Boss(row['boss_id'], boss_type, name, hp, hp, now + duration)
+        self.bosses[boss.boss_id] = boss
+        logger.info("Boss #%s spawned: %s (%s HP)", boss.boss_id, name, hp)
+        return boss
+    
+    # ==================== ضربه ====================
+    
+    def claim_hit(self, user_id: int) -> int:
+        """بررسی cooldown و ثبت زمان ضربه در یک قدم؛ ثانیه انتظار (0 = مجاز)"""
+        now = time.time()
+        elapsed = now - self._last_hit.get(user_id, 0)
+        if elapsed < RAID_ATTACK_COOLDOWN:
+            return max(1, int(RAID_ATTACK_COOLDOWN - elapsed))
+        # ضربه از گروه‌های مختلف ممکن است به worker های مختلف برسد؛ UPSERT شرطی فقط یکی را می‌پذیرد
+        if SHARD_WORKERS > 1:
+            with db.get_cursor() as cursor:
+                cursor.execute(
+                    "INSERT INTO raid_cooldowns (user_id, last_hit) VALUES (?, ?) "
+                    "ON CONFLICT(user_id) DO UPDATE SET last_hit = excluded.last_hit "
+                    "WHERE raid_cooldowns.last_hit <= ?",
+                    (user_id, now, now - RAID_ATTACK_COOLDOWN)
+                )
+                if cursor.rowcount == 0:
+                    last = cursor.execute(
+                        "SELECT last_hit FROM raid_cooldowns WHERE user_id = ?", (user_id,)
+                    ).fetchone()['last_hit']
+                    self._last_hit[user_id] = last
+                    return max(1, int(RAID_ATTACK_COOLDOWN - (now - last)))
+        self._last_hit[user_id] = now
+        return 0
+    
+    def hit(self, boss: Boss, user_id: int, attack_power: int, chat_id: int) -> int:
+        """ثبت یک ضربه در حافظه؛ خسارت واقعی را برمی‌گرداند (بدون نوشتن در دیتابیس)"""
+        now = time.time()
+        damage = min(boss.hp, max(1, int(attack_power * self.rng.uniform(0.9, 1.1))))
+        boss.pending_damage += damage
+        self.writer.add(Hit(boss.boss_id, user_id, damage, now, chat_id))
+        if boss.hp <= 0:
+            # ضربه آخر همین حالا نوشته شود تا کشته شدن بدون تاخیر اعلام شود
+            self.writer.flush()
+        return damage
+    
+    def pop_kills(self) -> List[Kill]:
+        kills, self._kills = self._kills, []
+        return kills
+    
+    # ==================== flush ====================
+    
+    def _flush(self, batch: List[Hit]):
+        """یک تراکنش: کم کردن HP هر باس، UPSERT شرکت‌کننده‌ها، تشخیص و پاداش کشته شدن"""
+        per_boss: Dict[int, Dict[int, List[float]]] = {}
+        for hit in batch:
+            users = per_boss.setdefault(hit.boss_id, {})
+            entry = users.get(hit.user_id)
+            if entry is None:
+                users[hit.user_id] = [hit.damage, 1, hit.timestamp, hit.chat_id]
+            else:
+                entry[0] += hit.damage
+                entry[1] += 1
+                entry[2] = hit.timestamp
+                entry[3] = hit.chat_id
+        
+        kills: List[Kill] = []
+        flushed: Dict[int, int] = {}
+        remaining: Dict[int, int] = {}
+        now = time.time()
+        with db.get_cursor() as cursor:
+            for boss_id, users in per_boss.items():
+                total = int(sum(entry[0] for entry in users.values()))
+                row = cursor.execute(
+                    "UPDATE bosses SET current_hp = CASE WHEN current_hp > ? THEN current_hp - ? ELSE 0 END "
+                    "WHERE boss_id = ? AND status = 'active' RETURNING current_hp",
+                    (total, total, boss_id)
+                ).fetchone()
+                flushed[boss_id] = total
+                if row is None:
+                    # باس قبلا کشته شده یا فرار کرده؛ ضربه‌های دیرهنگام حساب نمی‌شوند
+                    continue
+                cursor.executemany(
+                    """
+                    INSERT INTO boss_participants (boss_id, user_id, damage_dealt, attacks, attacked_at, chat_id)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(boss_id, user_id) DO UPDATE SET
+                        damage_dealt = boss_participants.damage_dealt + excluded.damage_dealt,
+                        attacks = boss_participants.attacks + excluded.attacks,
+                        attacked_at = excluded.attacked_at,
+                        chat_id = excluded.chat_id
+                    """,
+                    [(boss_id, user_id, int(d), a, t, c) for user_id, (d, a, t, c) in users.items()]
+                )
+                remaining[boss_id] = row['current_hp']
+                if row['current_hp'] <= 0:
+                    kill = self._settle_kill(cursor, boss_id, now)
+                    if kill is not None:
+                        kills.append(kill)
+        
+        # حالت حافظه فقط بعد از commit تغییر می‌کند (در خطا ضربه‌ها به بافر برمی‌گردند)
+        for boss_id, total in flushed.items():
+            boss = self.bosses.get(boss_id)
+            if boss is not None:
+                boss.pending_damage = max(0, boss.pending_damage - total)
+                boss.current_hp = remaining.get(boss_id, 0)
+        for kill in kills:
+            self.bosses.pop(kill.boss_id, None)
+            for user_id, _, reward in kill.rewards:
+                leaderboards.adjust("coins", user_id, reward)
+            self._kills.append(kill)
+        logger.debug("Flushed %s raid hits for %s bosses", len(batch), len(per_boss))
+    
+    @staticmethod
+    def _settle_kill(cursor, boss_id: int, now: float) -> Optional[Kill]:
+        """status از active به defeated؛ فقط تراکنشی که این UPDATE را برنده شود پاداش می‌دهد"""
+        row = cursor.execute(
+            "UPDATE bosses SET status = 'defeated', end_time = ? "
+            "WHERE boss_id = ? AND status = 'active' AND current_hp <= 0 RETURNING boss_type, name",
+            (now, boss_id)
+        ).fetchone()
+        if row is None:
+            return None
+        
+        pool = BOSS_TYPES.get(row['boss_type'], (None, 0, 0, 0))[3]
+        total = cursor.execute(
+            "SELECT COALESCE(SUM(damage_dealt), 0) AS total FROM boss_participants WHERE boss_id = ?",
+            (boss_id,)
+        ).fetchone()['total']
+        if total > 0 and pool > 0:
+            # پاداش هر نفر به نسبت خسارت، با یک UPDATE برای همه شرکت‌کننده‌ها
+            cursor.execute(
+                "UPDATE resources SET coins = coins + ("
+                "    SELECT p.damage_dealt * ? / ? FROM boss_participants p "
+                "    WHERE p.boss_id = ? AND p.user_id = resources.user_id"
+                ") WHERE user_id IN (SELECT user_id FROM boss_participants WHERE boss_id = ?)",
+                (pool, total, boss_id, boss_id)
+            )
+        cursor.execute("UPDATE boss_participants SET rewards_claimed = 1 WHERE boss_id = ?", (boss_id,))
+        rows = cursor.execute(
+            "SELECT user_id, damage_dealt, chat_id FROM boss_participants WHERE boss_id = ? ORDER BY damage_dealt DESC",
+            (boss_id,)
+        ).fetchall()
+        rewards = [
+            (r['user_id'], r['damage_dealt'], r['damage_dealt'] * pool // total if total else 0)
+            for r in rows
+        ]
+        chats = list(dict.fromkeys(r['chat_id'] for r in rows if r['chat_id'] is not None))
+        logger.info("Boss #%s defeated by %s players, %s coins distributed", boss_id, len(rewards), pool)
+        return Kill(boss_id, row['name'], rewards, chats)
+    
+    # ==================== خواندن ====================
+    
+    def top_damage(self, boss_id: int, n: int = 10) -> List[Tuple[int, int]]:
+        rows = db.fetchall(
+            "SELECT user_id, damage_dealt FROM boss_participants WHERE boss_id = ? "
+            "ORDER BY damage_dealt DESC LIMIT ?",
+            (boss_id, n)
+        )
+        return [(row['user_id'], row['damage_dealt']) for row in rows]
+    
+    def expire(self, now: Optional[float] = None) -> int:
+        """باس‌هایی که زمانشان تمام شده و کشته نشده‌اند (بدون پاداش)"""
+        now = now or time.time()
+        self.writer.flush()
+        with db.get_cursor() as cursor:
+            cursor.execute(
+                "UPDATE bosses SET status = 'escaped' WHERE status = 'active' AND end_time <= ?", (now,)
+            )
+            escaped = cursor.rowcount
+        for boss_id in [b.boss_id for b in self.bosses.values() if b.end_time <= now]:
+            self.bosses.pop(boss_id, None)
+        return escaped
+
+
+# نمونه سینگلتون
+raid_engine = RaidEngine()
+
+# باس‌ها و hp ثبت شده در worker های دیگر
+scheduler.reload_every("raid_bosses_reload", RAID_BOSS_MAX_AGE, raid_engine)
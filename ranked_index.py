@@ -0,0 +1,67 @@
+# utils/ranked_index.py
+"""
+ایندکس رتبه‌بندی در حافظه (rank و top-K در O(log N))
+"""
+
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+from sortedcontainers import SortedList
+
+
+class RankedIndex:
+    """نگه‌داری امتیاز کلیدها به ترتیب نزولی
+    
+    امتیازهای برابر بر اساس کلید (صعودی) مرتب می‌شوند تا رتبه‌ها پایدار باشند.
+    """
+    
+    def __init__(self, items: Iterable[Tuple[Hashable, float]] = ()):
+        self._scores: Dict[Hashable, float] = dict(items)
+        self._sorted = SortedList((-score, key) for key, score in self._scores.items())
+    
+    def __len__(self) -> int:
+        return len(self._scores)
+    
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._scores
+    
+    def get(self, key: Hashable, default: Optional[float] = None) -> Optional[float]:
+        return self._scores.get(key, default)
+    
+    def set(self, key: Hashable, score: float):
+        """تنظیم امتیاز یک کلید"""
+        old = self._scores.get(key)
+        if old == score:
+            return
+        if old is not None:
+            self._sorted.remove((-old, key))
+        self._scores[key] = score
+        self._sorted.add((-score, key))
+    
+    def add(self, key: Hashable, delta: float) -> float:
+        """افزودن delta به امتیاز (کلید جدید از صفر شروع می‌شود)"""
+        score = self._scores.get(key, 0) + delta
+        self.set(key, score)
+        return score
+    
+    def remove(self, key: Hashable):
+        old = self._scores.pop(key, None)
+        if old is not None:
+            self._sorted.remove((-old, key))
+    
+    def clear(self):
+        self._scores.clear()
+        self._sorted.clear()
+    
+    def rank(self, key: Hashable) -> Optional[int]:
+        """رتبه (از 1) یا None اگر کلید وجود نداشته باشد"""
+        score = self._scores.get(key)
+        if score is None:
+            return None
+        return self._sorted.index((-score, key)) + 1
+    
+    def page(self, offset: int, limit: int) -> List[Tuple[Hashable, float]]:
+        """بخشی از رتبه‌بندی از offset به تعداد limit"""
+        return [(key, -neg) for neg, key in self._sorted.islice(offset, offset + limit)]
+    
+    def top(self, n: int) -> List[Tuple[Hashable, float]]:
+        return self.page(0, n)
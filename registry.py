@@ -0,0 +1,143 @@
+# handlers/registry.py
+"""
+ثبت همه handler ها روی Application (مشترک بین اجرای بات و تست بار)
+"""
+
+from telegram.ext import (
+    Application, CallbackQueryHandler, ChatMemberHandler, CommandHandler,
+    ConversationHandler, MessageHandler, filters
+)
+
+from handlers import admin
+from handlers.main import start_command, welcome_group
+from handlers.mine import (
+    start_sell_iron, sell_iron_step, start_sell_silver, sell_silver_step,
+    SELL_IRON, SELL_SILVER
+)
+from handlers.bank import bank_conversation, bank_menu_handler, cancel
+from handlers.leaderboard import leaderboard_handler
+from handlers.market import (
+    market_command, sell_command, buy_command, my_listings_command, unlist_command
+)
+from handlers.raid import boss_command, raid_attack_handler
+from handlers.missions import missions_command, mission_callback_handler
+from handlers.achievements import achievements_command
+from handlers.tournament import tournament_command, tournament_callback_handler
+from handlers.live_events import event_command
+from handlers.wheel import wheel_callback_handler
+from handlers.clan import (
+    show_clan_menu, new_clan_command, join_clan_command, donate_command, clan_war_command,
+    clan_callback_handler
+)
+from handlers.trade import trade_command, offers_command, trade_callback_handler
+from handlers.war import attack_text_handler
+from handlers.router import handle_messages
+from utils.instrumentation import instrument_application
+
+PRIVATE_TEXT = filters.TEXT & ~filters.COMMAND & filters.ChatType.PRIVATE
+
+
+def _admin_conversation(entry: str, callback, states: dict) -> ConversationHandler:
+    return ConversationHandler(
+        entry_points=[CallbackQueryHandler(callback, pattern=f"^{entry}$")],
+        states=states,
+        fallbacks=[
+            CommandHandler("cancel", cancel),
+            CallbackQueryHandler(admin.admin_callback_handler, pattern="^admin_"),
+        ],
+    )
+
+
+def build_admin_conversations():
+    """ConversationHandler های پنل ادمین"""
+    return [
+        _admin_conversation("admin_search_user", admin.start_search_user, {
+            admin.ASK_SEARCH_QUERY: [MessageHandler(PRIVATE_TEXT, admin.process_search_query)],
+        }),
+        _admin_conversation("admin_broadcast", admin.start_broadcast, {
+            admin.ASK_BROADCAST_MESSAGE: [MessageHandler(PRIVATE_TEXT, admin.process_broadcast)],
+        }),
+        _admin_conversation("admin_broadcast_reward", admin.start_broadcast_reward, {
+            admin.ASK_REWARD_AMOUNT: [MessageHandler(PRIVATE_TEXT, admin.process_broadcast_reward)],
+        }),
+        _admin_conversation("admin_direct_edit", admin.start_direct_edit, {
+            admin.ASK_USER_ID_EDIT: [MessageHandler(PRIVATE_TEXT, admin.ask_edit_type)],
+            admin.ASK_EDIT_TYPE: [CallbackQueryHandler(admin.ask_edit_amount, pattern="^edit_")],
+            admin.ASK_EDIT_AMOUNT: [MessageHandler(PRIVATE_TEXT, admin.process_edit_amount)],
+        }),
+        _admin_conversation("admin_add_admin", admin.start_add_admin, {
+            admin.ASK_ADMIN_ID: [MessageHandler(PRIVATE_TEXT, admin.receive_admin_id)],
+        }),
+        _admin_conversation("admin_set_log_group", admin.start_set_log_group, {
+            admin.ASK_GROUP_ID: [MessageHandler(PRIVATE_TEXT, admin.receive_group_id)],
+        }),
+    ]
+
+
+def build_mine_conversation() -> ConversationHandler:
+    """فروش آهن و نقره"""
+    return ConversationHandler(
+        entry_points=[
+            MessageHandler(filters.TEXT & filters.Regex("^🛠️ فروش آهن$"), start_sell_iron),
+            MessageHandler(filters.TEXT & filters.Regex("^⚪ فروش نقره$"), start_sell_silver),
+        ],
+        states={
+            SELL_IRON: [MessageHandler(PRIVATE_TEXT, sell_iron_step)],
+            SELL_SILVER: [MessageHandler(PRIVATE_TEXT, sell_silver_step)],
+        },
+        fallbacks=[CommandHandler("cancel", cancel)],
+    )
+
+
+def register_handlers(application: Application):
+    """ثبت handler ها به ترتیب اولویت (و پوشاندن آن‌ها برای metrics)"""
+    application.add_handler(ChatMemberHandler(welcome_group, ChatMemberHandler.MY_CHAT_MEMBER))
+    application.add_handler(CommandHandler("start", start_command))
+    application.add_handler(CommandHandler("admin", admin.admin_panel))
+    application.add_handler(CommandHandler("market", market_command))
+    application.add_handler(CommandHandler("sell", sell_command))
+    application.add_handler(CommandHandler("buy", buy_command))
+    application.add_handler(CommandHandler("mylistings", my_listings_command))
+    application.add_handler(CommandHandler("unlist", unlist_command))
+    application.add_handler(CommandHandler("trade", trade_command))
+    application.add_handler(CommandHandler("offers", offers_command))
+    application.add_handler(CommandHandler("boss", boss_command))
+    application.add_handler(CommandHandler("clan", show_clan_menu))
+    application.add_handler(CommandHandler("newclan", new_clan_command))
+    application.add_handler(CommandHandler("joinclan", join_clan_command))
+    application.add_handler(CommandHandler("donate", donate_command))
+    application.add_handler(CommandHandler("clanwar", clan_war_command))
+    application.add_handler(CommandHandler("missions", missions_command))
+    application.add_handler(CommandHandler("achievements", achievements_command))
+    application.add_handler(CommandHandler("tournament", tournament_command))
+    application.add_handler(CommandHandler("event", event_command))
+    
+    for conversation in build_admin_conversations():
+        application.add_handler(conversation)
+    application.add_handler(build_mine_conversation())
+    application.add_handler(bank_conversation)
+    
+    application.add_handler(bank_menu_handler)
+    application.add_handler(leaderboard_handler)
+    application.add_handler(trade_callback_handler)
+    application.add_handler(clan_callback_handler)
+    application.add_handler(mission_callback_handler)
+    application.add_handler(tournament_callback_handler)
+    application.add_handler(wheel_callback_handler)
+    application.add_handler(CallbackQueryHandler(
+        admin.admin_callback_handler, pattern="^(admin_|usermng_|confirm_delete_|edit_)"
+    ))
+    
+    # حمله در گروه با ریپلای
+    application.add_handler(MessageHandler(
+        filters.TEXT & filters.ChatType.GROUPS & filters.Regex("^حمله"), attack_text_handler
+    ))
+    application.add_handler(MessageHandler(
+        filters.TEXT & filters.ChatType.GROUPS & filters.Regex("^ضربه$"), raid_attack_handler
+    ))
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_messages))
+    
+    # ورودی ویرایش دارایی از صفحه جستجوی کاربر
+    application.add_handler(MessageHandler(PRIVATE_TEXT, admin.handle_user_edit_input), group=1)
+    
+    instrument_application(application)
@@ -18,7 +18,11 @@ from handlers.mine import show_mine_menu, enter_mine, show_sell_menu
 from handlers.armory import show_armory_menu, view_armory, upgrade_armory
 from handlers.bank import bank_menu
 from utils.logger import logger
+from utils.locks import user_locks
 from handlers.profile import show_profile
+from handlers.leaderboard import show_leaderboard
+from handlers.clan import show_clan_menu
+from handlers.wheel import show_wheel
 
 
 # 🧩 پاک‌سازی متن از فاصله‌ها و کاراکترهای مخفی
@@ -48,6 +52,15 @@ async def handle_messages(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if chat.type != "private":
         return
 
+    # با concurrent_updates پیام‌های یک کاربر پشت سر هم اجرا می‌شوند (مثلا دو خرید همزمان)
+    async with user_locks.hold(user_id):
+        await _route_private(update, context, user_id, text)
+
+
+async def _route_private(update: Update, context: ContextTypes.DEFAULT_TYPE, user_id: int, text: str):
+    """مسیریابی پیام‌های پیوی؛ زیر قفل کاربر اجرا می‌شود"""
+    msg = update.message
+    
     # 🚫 چک کردن بن
     from database.db import db
     try:
@@ -81,6 +94,15 @@ async def handle_messages(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if text == "🏛️ بانک":
         await bank_menu(update, context); return
 
+    if text == "🏅 لیدربرد":
+        await show_leaderboard(update, context); return
+
+    if text == "👥 کلن":
+        await show_clan_menu(update, context); return
+
+    if text == "🍀 گردونه":
+        await show_wheel(update, context); return
+
     if text == "🔐 پنل ادمین":
         await admin_panel(update, context); return
 
@@ -161,4 +183,4 @@ async def handle_messages(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "⚠️ دستور ناشناخته. لطفاً از دکمه‌ها استفاده کنید.",
         reply_markup=main_markup
     )
-    logger.warning(f"Unknown command from user {user_id}: {text}")
+    logger.warning("Unknown command from user %s: %s", user_id, text)
@@ -0,0 +1,370 @@
+# utils/scheduler.py
+"""
+زمان‌بند مرکزی: یک min-heap روی event loop برای همه کارهای زمان‌دار
+
+به جای یک حلقه while/sleep برای هر زیرسیستم، همه کارها (تیک استخراج، بکاپ، flush
+writer ها، پایان جنگ‌ها و تورنمنت‌ها، رویدادهای زمان‌دار، پیام همگانی) در یک heap
+هستند و یک task فقط تا نزدیک‌ترین زمان اجرا می‌خوابد. هر اجرا task جدای خودش را
+دارد تا یک کار کند بقیه را عقب نیندازد و تا تمام نشده دوباره زمان‌بندی نمی‌شود.
+حذف و جابه‌جایی کارها تنبل است (نسخه هر کار در ورودی heap).
+
+کارهای persistent در جدول scheduled_jobs (نوع، زمان بعدی، payload) ذخیره می‌شوند و
+بعد از ری‌استارت روی پروسس اصلی ادامه پیدا می‌کنند. poll پروسس اصلی تغییر زمان یا حذف
+ردیف‌ها توسط worker های دیگر را هم روی کارهای در حافظه اعمال می‌کند. کارهای یک‌باره
+ناموفق تا SCHEDULER_MAX_RETRIES بار دوباره اجرا و بعد حذف می‌شوند، به جز کارهای تسویه
+(settlement) که با فاصله بیشتر تا موفقیت تکرار می‌شوند. سیاست misfire برای اجرای دیرتر
+از SCHEDULER_MISFIRE_GRACE:
+    run   یک بار اجرا شود (نوبت‌های از دست رفته با هم یکی می‌شوند)
+    skip  این نوبت رد شود و کار تکراری به نوبت بعدی برود
+jitter تصادفی به کارهای تکراری اضافه می‌شود تا worker ها و کارها هم‌زمان بیدار نشوند.
+
+تابع هر کار Job را می‌گیرد (sync یا async) و می‌تواند payload را تغییر دهد؛ اگر عدد
+برگرداند کار بعد از همان تعداد ثانیه دوباره اجرا می‌شود (برای کارهای تکه‌تکه).
+"""
+
+import asyncio
+import heapq
+import inspect
+import itertools
+import json
+import math
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple, Union
+
+from database.db import db
+from config.settings import (
+    SCHEDULER_MISFIRE_GRACE, SCHEDULER_RETRY_DELAY, SCHEDULER_MAX_RETRIES, SCHEDULER_POLL_INTERVAL
+)
+from utils.metrics import metrics
+from utils.logger import logger
+
+MISFIRE_RUN = "run"
+MISFIRE_SKIP = "skip"
+
+
+class Job:
+    __slots__ = ("job_id", "name", "kind", "fn", "due", "interval", "jitter", "misfire",
+                 "payload", "persistent", "settlement", "version", "running", "runs", "failures", "last_duration")
+    
+    def __init__(self, job_id: str, fn: "JobFn", due: float, interval: float = 0.0, jitter: float = 0.0,
+                 misfire: str = MISFIRE_RUN, payload: Optional[Dict[str, Any]] = None,
+                 kind: Optional[str] = None, name: Optional[str] = None, persistent: bool = False,
+                 settlement: bool = False):
+        self.job_id = job_id
+        self.name = name or kind or job_id  # برچسب متریک‌ها (بدون شناسه‌های یکتا)
+        self.kind = kind
+        self.fn = fn
+        self.due = due  # زمان نوبت بدون jitter
+        self.interval = interval  # 0 = یک بار
+        self.jitter = jitter
+        self.misfire = misfire
+        self.payload = payload if payload is not None else {}
+        self.persistent = persistent
+        self.settlement = settlement  # هرگز بعد از خطاهای پیاپی حذف نمی‌شود
+        self.version = -1  # ترتیب آخرین ورودی heap
+        self.running = False
+        self.runs = 0
+        self.failures = 0
+        self.last_duration = 0.0
+
+
+JobFn = Callable[[Job], Union[None, float, Awaitable[Optional[float]]]]
+
+
+class Scheduler:
+    """heap زمان اجرا + یک task بیدارشونده"""
+    
+    def __init__(self):
+        self.jobs: Dict[str, Job] = {}
+        self.kinds: Dict[str, JobFn] = {}
+        self.settlement_kinds: Set[str] = set()
+        self.bot = None
+        self.primary = True
+        self.task: Optional[asyncio.Task] = None
+        self._heap: List[Tuple[float, int, str]] = []  # (زمان، ترتیب، job_id)
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._running: Set[asyncio.Task] = set()
+    
+    # ==================== ثبت کارها ====================
+    
+    def register(self, kind: str, fn: JobFn, settlement: bool = False):
+        """تابع یک نوع کار persistent (قبل از load_persistent)
+        
+        settlement: تغییر وضعیتی که نباید گم شود (پایان رویداد، پرداخت جوایز)؛ بعد از
+        SCHEDULER_MAX_RETRIES حذف نمی‌شود و با فاصله بیشتر دوباره اجرا می‌شود.
+        """
+        self.kinds[kind] = fn
+        if settlement:
+            self.settlement_kinds.add(kind)
+    
+    def every(self, job_id: str, interval: float, fn: Optional[JobFn] = None, *, kind: Optional[str] = None,
+              jitter: float = 0.0, misfire: str = MISFIRE_SKIP, persistent: bool = False,
+              first_run: Optional[float] = None, name: Optional[str] = None) -> Job:
+        """کار تکراری؛ کار persistent زمان نوبت ذخیره شده قبلی را ادامه می‌دهد"""
+        due = first_run if first_run is not None else time.time() + interval
+        payload = None
+        if persistent:
+            row = db.fetchone("SELECT next_run, payload FROM scheduled_jobs WHERE job_id = ?", (job_id,))
+            if row is not None:
+                due, payload = row['next_run'], json.loads(row['payload'] or "{}")
+        job = Job(job_id, fn or self.kinds[kind], due, interval, jitter, misfire, payload, kind, name, persistent)
+        self._add(job)
+        if persistent:
+            self._save(job)
+        return job
+    
+    def reload_every(self, job_id: str, max_age: float, cache: Any,
+                     reload: Optional[Callable[[], Any]] = None) -> Optional[Job]:
+        """بارگذاری دوباره دوره‌ای کش یک موتور (حالت چندپروسسی) به جای بارگذاری در مسیر درخواست
+        
+        فقط کشی که قبلا بارگذاری شده دوباره خوانده می‌شود؛ reload پیش‌فرض cache.load است و
+        می‌تواند async باشد. max_age=0 (تک‌پروسسی) کاری زمان‌بندی نمی‌کند.
+        """
+        if not max_age:
+            return None
+        reload = reload or cache.load
+        
+        def run(job: Job):
+            if cache.loaded:
+                return reload()
+        
+        return self.every(job_id, max_age, run, jitter=max_age / 10)
+    
+    def at(self, job_id: str, when: float, fn: Optional[JobFn] = None, *, kind: Optional[str] = None,
+           payload: Optional[Dict[str, Any]] = None, misfire: str = MISFIRE_RUN, persistent: bool = False,
+           name: Optional[str] = None, settlement: bool = False) -> Job:
+        """کار یک‌باره (همان job_id کار قبلی را جایگزین می‌کند)"""
+        job = Job(job_id, fn or self.kinds[kind], when, 0.0, 0.0, misfire, payload, kind, name, persistent,
+                  settlement or kind in self.settlement_kinds)
+        if persistent:
+            self._save(job)
+            if not self.primary:
+                # فقط پروسس اصلی کارهای persistent را اجرا می‌کند (در poll بعدی برمی‌دارد)
+                return job
+        self._add(job)
+        return job
+    
+    def cancel(self, job_id: str, persisted: bool = True):
+        job = self.jobs.pop(job_id, None)
+        if job is not None:
+            job.version = -1
+        if persisted and (job is None or job.persistent):
+            db.execute("DELETE FROM scheduled_jobs WHERE job_id = ?", (job_id,))
+    
+    def _add(self, job: Job):
+        previous = self.jobs.get(job.job_id)
+        self.jobs[job.job_id] = job
+        if previous is not None:
+            previous.version = -1
+            if previous.running:
+                return  # بعد از پایان اجرای قبلی در _finish زمان‌بندی می‌شود
+        self._push(job)
+    
+    def _push(self, job: Job):
+        when = job.due + (random.uniform(0, job.jitter) if job.jitter else 0.0)
+        job.version = next(self._seq)
+        heapq.heappush(self._heap, (when, job.version, job.job_id))
+        self._ensure_task()
+        if self._wakeup is not None:
+            self._wakeup.set()
+    
+    # ==================== persistence ====================
+    
+    @staticmethod
+    def _save(job: Job):
+        db.execute(
+            "INSERT INTO scheduled_jobs "
+            "(job_id, kind, next_run, repeat_seconds, misfire, payload, runs, failures, last_run, last_duration) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(job_id) DO UPDATE SET next_run = excluded.next_run, repeat_seconds = excluded.repeat_seconds, "
+            "misfire = excluded.misfire, payload = excluded.payload, runs = excluded.runs, "
+            "failures = excluded.failures, last_run = excluded.last_run, last_duration = excluded.last_duration",
+            (job.job_id, job.kind or job.name, job.due, job.interval, job.misfire,
+             json.dumps(job.payload, ensure_ascii=False), job.runs, job.failures,
+             time.time() if job.runs else 0, job.last_duration)
+        )
+    
+    def load_persistent(self) -> int:
+        """هماهنگ‌سازی کارهای persistent با جدول؛ تعداد کارهای جدید
+        
+        کار جدید بارگذاری می‌شود، کار در حافظه‌ای که worker دیگری زمانش را عوض کرده
+        (مثل end_now) جابه‌جا می‌شود و کاری که ردیفش حذف شده (cancel) لغو می‌شود.
+        """
+        loaded = 0
+        stored: Set[str] = set()
+        for row in db.fetchall(
+            "SELECT job_id, kind, next_run, repeat_seconds, misfire, payload, runs, failures FROM scheduled_jobs"
+        ):
+            stored.add(row['job_id'])
+            current = self.jobs.get(row['job_id'])
+            if current is not None:
+                if current.persistent and not current.running:
+                    self._reconcile(current, row)
+                continue
+            fn = self.kinds.get(row['kind'])
+            if fn is None:
+                continue  # کار تکراری که هنوز ثبت نشده یا نوع ناشناخته
+            job = Job(row['job_id'], fn, row['next_run'], row['repeat_seconds'], 0.0, row['misfire'],
+                      json.loads(row['payload'] or "{}"), row['kind'], persistent=True,
+                      settlement=row['kind'] in self.settlement_kinds)
+            job.runs, job.failures = row['runs'], row['failures']
+            self._add(job)
+            loaded += 1
+        
+        for job_id, job in list(self.jobs.items()):
+            if job.persistent and not job.running and job_id not in stored:
+                logger.info("Scheduled job '%s' was cancelled by another worker", job_id)
+                self.cancel(job_id, persisted=False)
+        return loaded
+    
+    def _reconcile(self, job: Job, row):
+        """اعمال تغییر زمان/payload ردیف ذخیره شده روی کار در حافظه"""
+        if row['next_run'] == job.due and row['payload'] == json.dumps(job.payload, ensure_ascii=False):
+            return
+        logger.info("Scheduled job '%s' rescheduled by another worker (%.0fs -> %.0fs)",
+                    job.job_id, job.due - time.time(), row['next_run'] - time.time())
+        job.due, job.payload = row['next_run'], json.loads(row['payload'] or "{}")
+        job.interval, job.misfire = row['repeat_seconds'], row['misfire']
+        self._push(job)
+    
+    # ==================== اجرا ====================
+    
+    def start(self, bot=None, primary: bool = True):
+        self.bot = bot
+        self.primary = primary
+        self._ensure_task()
+        if primary:
+            loaded = self.load_persistent()
+            if loaded:
+                logger.info("Scheduler resumed %s persistent jobs", loaded)
+            if SCHEDULER_POLL_INTERVAL:
+                # کارهای persistent که worker های دیگر ثبت کرده‌اند
+                self.every("scheduler_poll", SCHEDULER_POLL_INTERVAL, self._poll)
+    
+    def _poll(self, job: Job):
+        self.load_persistent()
+    
+    def stop(self):
+        if self.task and not self.task.done():
+            self.task.cancel()
+        for task in list(self._running):
+            task.cancel()
+    
+    def _ensure_task(self):
+        if self.task is not None and not self.task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # بیرون از event loop؛ کارها در heap می‌مانند تا start
+            return
+        self._wakeup = asyncio.Event()
+        self.task = loop.create_task(self._run())
+    
+    async def _run(self):
+        logger.info("Scheduler started.")
+        try:
+            while True:
+                now = time.time()
+                while self._heap and self._heap[0][0] <= now:
+                    when, version, job_id = heapq.heappop(self._heap)
+                    job = self.jobs.get(job_id)
+                    if job is None or job.version != version or job.running:
+                        continue  # لغو یا جابه‌جا شده
+                    self._launch(job, when, now)
+                
+                timeout = max(0.0, self._heap[0][0] - time.time()) if self._heap else None
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        except asyncio.CancelledError:
+            logger.info("Scheduler stopped.")
+    
+    def _launch(self, job: Job, when: float, now: float):
+        if job.misfire == MISFIRE_SKIP and now - when > SCHEDULER_MISFIRE_GRACE:
+            metrics.record_job_misfire(job.name)
+            logger.warning("Scheduled job '%s' misfired by %.0fs, skipping", job.job_id, now - when)
+            self._finish(job, None, failed=False, ran=False)
+            return
+        job.running = True
+        task = asyncio.get_running_loop().create_task(self._execute(job, when))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+    
+    async def _execute(self, job: Job, when: float):
+        started = time.time()
+        start = time.perf_counter()
+        delay = None
+        failed = False
+        try:
+            result = job.fn(job)
+            if inspect.isawaitable(result):
+                result = await result
+            delay = result
+        except asyncio.CancelledError:
+            job.running = False
+            raise
+        except Exception as e:
+            failed = True
+            logger.exception("Scheduled job '%s' failed: %s", job.job_id, e)
+        job.running = False
+        job.last_duration = time.perf_counter() - start
+        metrics.record_job(job.name, job.last_duration, started - when, failed)
+        self._finish(job, delay, failed, ran=True)
+    
+    def _finish(self, job: Job, delay: Optional[float], failed: bool, ran: bool):
+        if ran:
+            job.runs += 1
+            job.failures = job.failures + 1 if failed else 0
+        current = self.jobs.get(job.job_id)
+        if current is not job:
+            # در حین اجرا لغو یا با کار جدیدی جایگزین شد
+            if current is not None:
+                self._push(current)
+            return
+        
+        now = time.time()
+        if delay is not None:
+            job.due = now + delay
+        elif job.interval:
+            job.due += job.interval
+            if job.due <= now:
+                # نوبت‌های از دست رفته: skip به نوبت بعدی می‌رود، run یک بار اجرا می‌کند
+                missed = math.ceil((now - job.due) / job.interval)
+                job.due = job.due + missed * job.interval if job.misfire == MISFIRE_SKIP else now
+        elif failed and job.failures <= SCHEDULER_MAX_RETRIES:
+            job.due = now + SCHEDULER_RETRY_DELAY
+        elif failed and job.settlement:
+            # تسویه حذف نمی‌شود (رویداد فعال یا جایزه پرداخت نشده می‌ماند)؛ فاصله تا 64 برابر بیشتر می‌شود
+            backoff = 2 ** min(job.failures - SCHEDULER_MAX_RETRIES, 6)
+            logger.error("Settlement job '%s' failed %s times, retrying in %.0fs",
+                         job.job_id, job.failures, SCHEDULER_RETRY_DELAY * backoff)
+            job.due = now + SCHEDULER_RETRY_DELAY * backoff
+        else:
+            if failed:
+                logger.error("Scheduled job '%s' dropped after %s failures", job.job_id, job.failures)
+            self.cancel(job.job_id, persisted=job.persistent)
+            return
+        
+        if job.persistent:
+            try:
+                self._save(job)
+            except Exception as e:
+                logger.error("Could not persist scheduled job '%s': %s", job.job_id, e)
+        self._push(job)
+    
+    def summary(self) -> List[Tuple[str, float, int, int, float]]:
+        """(job_id، ثانیه تا اجرای بعد، تعداد اجرا، خطاهای پیاپی، مدت آخرین اجرا)"""
+        now = time.time()
+        return sorted(
+            (job.job_id, job.due - now, job.runs, job.failures, job.last_duration)
+            for job in self.jobs.values()
+        )
+
+
+# نمونه سینگلتون
+scheduler = Scheduler()
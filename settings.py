@@ -21,3 +21,109 @@ ARMORY_UPGRADE_MULTIPLIER = float(os.getenv("ARMORY_UPGRADE_MULTIPLIER", "1.3"))
 ARMORY_CAPACITY_INCREMENT = int(os.getenv("ARMORY_CAPACITY_INCREMENT", "2"))
 
 MINING_LOOP_INTERVAL = int(os.getenv("MINING_LOOP_INTERVAL", "60"))
+
+BATTLE_LOG_BATCH_SIZE = int(os.getenv("BATTLE_LOG_BATCH_SIZE", "50"))
+BATTLE_LOG_FLUSH_MS = int(os.getenv("BATTLE_LOG_FLUSH_MS", "1000"))
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))  # 0 = بدون endpoint
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))  # 0 = بدون لاگ کوئری کند
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")  # سطح هر زیرسیستم (mining، db)، مثلا "mining=WARNING,db=ERROR"
+LOG_CONSOLE = os.getenv("LOG_CONSOLE", "1") == "1"
+LOG_FILE = os.getenv("LOG_FILE", "logs/bot.jsonl")  # خالی = بدون فایل JSON
+LOG_FILE_MAX_MB = float(os.getenv("LOG_FILE_MAX_MB", "20"))
+LOG_FILE_BACKUPS = int(os.getenv("LOG_FILE_BACKUPS", "5"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_MINING_SAMPLE = int(os.getenv("LOG_MINING_SAMPLE", "100"))  # لاگ ۱ از n استخراج هر کاربر
+LOG_RATE_LIMIT = float(os.getenv("LOG_RATE_LIMIT", "5"))  # رکورد در ثانیه برای هر پیام پرتکرار
+
+SHARD_WORKERS = int(os.getenv("SHARD_WORKERS", "1"))  # بیشتر از 1 = حالت webhook چندپروسسی
+SHARD_QUEUE_SIZE = int(os.getenv("SHARD_QUEUE_SIZE", "10000"))
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")  # آدرس عمومی، مثلا https://example.com/telegram
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+BOT_API_URL = os.getenv("BOT_API_URL", "")  # سرور Bot API محلی، مثلا http://127.0.0.1:8081/bot
+DB_WAL = os.getenv("DB_WAL", "1" if SHARD_WORKERS > 1 else "0") == "1"
+
+
+def _max_age(name: str, sharded_default: str = "30") -> float:
+    """فاصله بارگذاری دوباره کش‌های حافظه از دیتابیس (ثانیه)؛ تک‌پروسسی پیش‌فرض 0 = بدون انقضا"""
+    return float(os.getenv(name, sharded_default if SHARD_WORKERS > 1 else "0"))
+
+
+LEADERBOARD_MAX_AGE = _max_age("LEADERBOARD_MAX_AGE")
+PVP_RATING_MAX_AGE = _max_age("PVP_RATING_MAX_AGE")
+
+CONCURRENT_UPDATES = int(os.getenv("CONCURRENT_UPDATES", "1"))  # بیشتر از 1 = پردازش همزمان آپدیت‌ها
+USER_LOCK_STRIPES = int(os.getenv("USER_LOCK_STRIPES", "1024"))
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "sqlite")  # sqlite یا postgres
+DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://bot@127.0.0.1:5432/bot")
+PG_POOL_MIN = int(os.getenv("PG_POOL_MIN", "1"))
+PG_POOL_MAX = int(os.getenv("PG_POOL_MAX", "4"))  # اتصال برای هر thread همزمان، نه هر handler
+
+MARKET_MAX_LISTINGS = int(os.getenv("MARKET_MAX_LISTINGS", "20"))  # آگهی فعال برای هر کاربر
+MARKET_MAX_PRICE = int(os.getenv("MARKET_MAX_PRICE", "1000000000000"))  # حداکثر قیمت هر عدد
+MARKET_BOOK_MAX_AGE = _max_age("MARKET_BOOK_MAX_AGE")
+
+TRADE_OFFER_TTL = int(os.getenv("TRADE_OFFER_TTL", "86400"))  # ثانیه تا انقضای پیشنهاد معامله
+TRADE_MAX_PENDING = int(os.getenv("TRADE_MAX_PENDING", "10"))  # پیشنهاد در انتظار برای هر کاربر
+TRADE_SWEEP_INTERVAL = int(os.getenv("TRADE_SWEEP_INTERVAL", "300"))
+
+RAID_FLUSH_MS = int(os.getenv("RAID_FLUSH_MS", "300"))  # فاصله نوشتن ضربه‌های باس
+RAID_ATTACK_COOLDOWN = int(os.getenv("RAID_ATTACK_COOLDOWN", "30"))
+RAID_BOSS_MAX_AGE = _max_age("RAID_BOSS_MAX_AGE", "10")
+
+CLAN_CREATE_COST = int(os.getenv("CLAN_CREATE_COST", "5000"))
+CLAN_MEMBERS_PAGE = int(os.getenv("CLAN_MEMBERS_PAGE", "20"))
+CLAN_RANKING_MAX_AGE = _max_age("CLAN_RANKING_MAX_AGE")
+
+CLAN_WAR_DURATION = int(os.getenv("CLAN_WAR_DURATION", "86400"))
+CLAN_WAR_ATTACK_POINTS = int(os.getenv("CLAN_WAR_ATTACK_POINTS", "3"))  # حمله موفق
+CLAN_WAR_DEFENSE_POINTS = int(os.getenv("CLAN_WAR_DEFENSE_POINTS", "1"))  # دفاع موفق
+CLAN_WAR_WIN_POINTS = int(os.getenv("CLAN_WAR_WIN_POINTS", "1000"))  # امتیاز کلن برنده
+CLAN_WAR_REWARD = int(os.getenv("CLAN_WAR_REWARD", "20000"))  # سکه به خزانه کلن برنده
+CLAN_WAR_FLUSH_MS = int(os.getenv("CLAN_WAR_FLUSH_MS", "1000"))
+CLAN_WAR_SETTLE_DELAY = int(os.getenv("CLAN_WAR_SETTLE_DELAY", "5"))  # فرصت flush امتیازهای worker ها بعد از end_time
+CLAN_WAR_MAX_AGE = _max_age("CLAN_WAR_MAX_AGE")
+
+MISSION_FLUSH_MS = int(os.getenv("MISSION_FLUSH_MS", "2000"))  # فاصله نوشتن پیشرفت ماموریت‌ها
+
+ACHIEVEMENT_CACHE_SIZE = int(os.getenv("ACHIEVEMENT_CACHE_SIZE", "50000"))  # کاربران با آمار در حافظه
+ACHIEVEMENT_STATS_MAX_AGE = _max_age("ACHIEVEMENT_STATS_MAX_AGE")
+ACHIEVEMENT_BACKFILL_CHUNK = int(os.getenv("ACHIEVEMENT_BACKFILL_CHUNK", "500"))
+ACHIEVEMENT_FLUSH_MS = int(os.getenv("ACHIEVEMENT_FLUSH_MS", "1000"))
+
+TOURNAMENT_WIN_POINTS = int(os.getenv("TOURNAMENT_WIN_POINTS", "3"))  # حمله موفق
+TOURNAMENT_DEFENSE_POINTS = int(os.getenv("TOURNAMENT_DEFENSE_POINTS", "1"))  # دفاع موفق
+TOURNAMENT_PRIZES = [int(p) for p in os.getenv("TOURNAMENT_PRIZES", "50000,25000,10000").split(",")]  # جایزه نفرات برتر
+TOURNAMENT_FLUSH_MS = int(os.getenv("TOURNAMENT_FLUSH_MS", "1000"))
+TOURNAMENT_SETTLE_DELAY = int(os.getenv("TOURNAMENT_SETTLE_DELAY", "5"))  # فرصت flush امتیازهای worker ها بعد از end_time
+TOURNAMENT_MAX_AGE = _max_age("TOURNAMENT_MAX_AGE")
+
+SCHEDULER_MISFIRE_GRACE = float(os.getenv("SCHEDULER_MISFIRE_GRACE", "30"))  # تاخیر مجاز قبل از اعمال سیاست misfire
+SCHEDULER_RETRY_DELAY = float(os.getenv("SCHEDULER_RETRY_DELAY", "60"))  # تلاش دوباره کار یک‌باره ناموفق
+SCHEDULER_MAX_RETRIES = int(os.getenv("SCHEDULER_MAX_RETRIES", "5"))
+SCHEDULER_POLL_INTERVAL = float(os.getenv("SCHEDULER_POLL_INTERVAL", "30" if SHARD_WORKERS > 1 else "0"))  # کارهای worker ها
+MINING_JITTER = float(os.getenv("MINING_JITTER", "5"))
+
+TIMED_EVENT_DURATION = int(os.getenv("TIMED_EVENT_DURATION", "86400"))
+TIMED_EVENT_REWARDS = [int(r) for r in os.getenv("TIMED_EVENT_REWARDS", "30000,15000,5000").split(",")]  # جایزه نفرات برتر
+TIMED_EVENT_FLUSH_MS = int(os.getenv("TIMED_EVENT_FLUSH_MS", "2000"))
+TIMED_EVENT_SETTLE_DELAY = int(os.getenv("TIMED_EVENT_SETTLE_DELAY", "5"))  # فرصت flush امتیازهای worker ها
+TIMED_EVENT_MAX_AGE = _max_age("TIMED_EVENT_MAX_AGE")
+BROADCAST_CHUNK = int(os.getenv("BROADCAST_CHUNK", "25"))  # پیام در هر نوبت (محدودیت نرخ تلگرام)
+BROADCAST_PAUSE = float(os.getenv("BROADCAST_PAUSE", "1.0"))
+
+WHEEL_FREE_SPINS = int(os.getenv("WHEEL_FREE_SPINS", "1"))  # چرخش رایگان در روز
+WHEEL_SPIN_COST = int(os.getenv("WHEEL_SPIN_COST", "500"))  # سکه برای هر چرخش اضافه
+WHEEL_STREAK_BONUS = float(os.getenv("WHEEL_STREAK_BONUS", "0.1"))  # افزایش جایزه برای هر روز پیاپی
+WHEEL_STREAK_CAP = int(os.getenv("WHEEL_STREAK_CAP", "7"))
+WHEEL_HISTORY_FLUSH_MS = int(os.getenv("WHEEL_HISTORY_FLUSH_MS", "2000"))
+WHEEL_HISTORY_RETENTION_DAYS = int(os.getenv("WHEEL_HISTORY_RETENTION_DAYS", "30"))
+WHEEL_HISTORY_PRUNE_INTERVAL = int(os.getenv("WHEEL_HISTORY_PRUNE_INTERVAL", "3600"))
+WHEEL_HISTORY_PRUNE_CHUNK = int(os.getenv("WHEEL_HISTORY_PRUNE_CHUNK", "5000"))  # ردیف در هر DELETE
@@ -3,15 +3,16 @@ from telegram import Update, ReplyKeyboardMarkup
 from telegram.ext import ContextTypes
 
 from database.models import (
-    add_user, add_weapon, get_armory_meta, get_armory_count,
-    get_user_money, update_user_money
+    add_user, purchase_weapon, get_armory_meta, get_armory_count,
+    get_user_money
 )
 from keyboards.menus import (
     store_markup, missile_category_markup,
     cruise_markup, ballistic_markup, hypersonic_markup, nuclear_markup,
     defense_markup, main_markup
 )
-from utils.logger import logger
+from utils.events import event_bus, PURCHASE
+from handlers.achievements import unlock_lines
 from utils.log_manager import get_log_manager
 
 
@@ -198,22 +199,23 @@ async def handle_purchase_quantity(update: Update, context: ContextTypes.DEFAULT
         await update.message.reply_text("⚠️ ظرفیت زرادخانه کافی نیست.")
         return
 
-    # کم کردن پول از حساب
-    update_user_money(user_id, -total_cost)
-    add_weapon(user_id, weapon_name, qty)
+    # کسر سکه و افزودن به زرادخانه در یک تراکنش
+    if not purchase_weapon(user_id, weapon_name, qty, total_cost):
+        await update.message.reply_text("❌ خرید انجام نشد. موجودی یا ظرفیت را بررسی کن.")
+        return
     context.user_data.pop("pending_purchase", None)
+    event_bus.publish(PURCHASE, user_id, qty, weapon=weapon_name, cost=total_cost)
+    unlocked = "".join(f"\n{line}" for line in unlock_lines(user_id))
 
     await update.message.reply_text(
         f"✅ <b>خرید با موفقیت انجام شد!</b>\n\n"
         f"🚀 {qty}× {weapon_name}\n"
         f"💰 هزینه کل: {total_cost} سکه\n"
-        f"🏦 مانده حساب: {get_user_money(user_id)} سکه",
+        f"🏦 مانده حساب: {get_user_money(user_id)} سکه{unlocked}",
         parse_mode="HTML",
         reply_markup=main_markup
     )
 
-    logger.info(f"User {user_id} purchased {qty}x {weapon_name} for {total_cost} coins")
-    
     # لاگ خرید
     log_manager = get_log_manager()
     if log_manager:
@@ -0,0 +1,207 @@
+# utils/startup.py
+"""
+راه‌اندازی مرحله‌ای بات: مراحل ضروری قبل از polling، بقیه همزمان در پس‌زمینه
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+from telegram.ext import Application, ApplicationBuilder
+
+from config.admin_config import LOG_GROUP_ID, BACKUP_INTERVAL, BACKUP_PATH
+from config.settings import BOT_API_URL, BOT_TOKEN, CONCURRENT_UPDATES, DB_PATH, SHARD_WORKERS
+from utils.logger import logger
+
+
+class StartupPipeline:
+    """post_init / post_shutdown برای ApplicationBuilder
+    
+    فقط ساخت جداول قبل از polling انجام می‌شود. دیتابیس ادمین، Topic های گروه لاگ،
+    بکاپ خودکار و import های سنگین بعد از بالا آمدن polling و به صورت همزمان
+    اجرا می‌شوند و زمان هر مرحله در timings ثبت و در پایان لاگ می‌شود.
+    
+    در حالت چندپروسسی فقط پروسس primary حلقه استخراج، بکاپ و ساخت Topic ها را اجرا می‌کند.
+    """
+    
+    def __init__(self):
+        self.primary = True
+        self.timings: Dict[str, float] = {}
+        self.started_at = time.perf_counter()
+        self._deferred: Optional[asyncio.Task] = None
+    
+    def _run_stage(self, name: str, fn: Callable[[], object]):
+        start = time.perf_counter()
+        try:
+            return fn()
+        finally:
+            self.timings[name] = time.perf_counter() - start
+    
+    async def _run_async_stage(self, name: str, fn: Callable[[], Awaitable[object]]):
+        start = time.perf_counter()
+        try:
+            return await fn()
+        except Exception as e:
+            # مراحل پس‌زمینه نباید بات را از کار بیندازند
+            logger.error("Startup stage '%s' failed: %s", name, e)
+        finally:
+            self.timings[name] = time.perf_counter() - start
+    
+    # ==================== مراحل ====================
+    
+    @staticmethod
+    def _init_database():
+        from database.db import init_database
+        init_database()
+    
+    async def _init_admin_and_topics(self, application: Application):
+        """دیتابیس ادمین (گروه لاگ از تنظیمات آن خوانده می‌شود) و سپس Topic ها"""
+        from database.admin_db import get_admin_db
+        from utils.log_manager import init_log_manager
+        
+        admin_db = await self._run_async_stage("admin_db", self._async(get_admin_db))
+        group_id = (admin_db.get_log_group() if admin_db else None) or LOG_GROUP_ID
+        log_manager = init_log_manager(application.bot, int(group_id) if group_id else None)
+        if self.primary:
+            await self._run_async_stage("log_topics", log_manager.ensure_topics)
+    
+    @staticmethod
+    async def _start_backups():
+        from utils.backup_manager import init_backup_manager
+        init_backup_manager(DB_PATH, BACKUP_PATH, BACKUP_INTERVAL).start()
+    
+    @staticmethod
+    async def _load_market():
+        # دفترهای سفارش بازار با یک اسکن ایندکس‌شده (خرید اول منتظر آن نماند)
+        from utils.order_book import market
+        market.load()
+    
+    @staticmethod
+    async def _backfill_achievements():
+        # ارزیابی تاریخچه در تکه‌های کوچک؛ بعد از ری‌استارت از آخرین تکه ادامه می‌دهد
+        from utils.achievement_engine import achievements
+        await achievements.backfill()
+    
+    @staticmethod
+    async def _warm_imports():
+        # psutil برای وضعیت سیستم؛ اولین cpu_percent نمونه پایه را می‌سازد
+        import psutil
+        import platform
+        psutil.cpu_percent(interval=None)
+        platform.release()
+    
+    @staticmethod
+    def _async(fn: Callable[[], object]) -> Callable[[], Awaitable[object]]:
+        async def wrapper():
+            return fn()
+        return wrapper
+    
+    # ==================== hook های Application ====================
+    
+    async def post_init(self, application: Application):
+        self._run_stage("database", self._init_database)
+        
+        # یک زمان‌بند برای همه کارهای زمان‌دار؛ نوع کارهای persistent قبل از start ثبت می‌شوند
+        from utils.scheduler import scheduler
+        from utils.timed_events import timed_events  # noqa: F401
+        if self.primary:
+            from utils.mining_loop import mining_loop
+            mining_loop.start()
+            from utils.clan_war_engine import clan_wars
+            clan_wars.start(application.bot)
+            from utils.tournament_engine import tournaments
+            tournaments.start(application.bot)
+            from utils.wheel_engine import wheel
+            wheel.start()
+        scheduler.start(application.bot, primary=self.primary)
+        self._deferred = asyncio.get_running_loop().create_task(self._run_deferred(application))
+        self.timings["ready"] = time.perf_counter() - self.started_at
+        logger.info("Startup: polling ready after %.0fms", self.timings["ready"] * 1000)
+    
+    async def _run_deferred(self, application: Application):
+        # اجازه بده polling اول شروع شود
+        await asyncio.sleep(0)
+        start = time.perf_counter()
+        stages = [
+            self._init_admin_and_topics(application),
+            self._run_async_stage("imports", self._warm_imports),
+            self._run_async_stage("market", self._load_market),
+        ]
+        if self.primary:
+            stages.append(self._run_async_stage("backups", self._start_backups))
+            stages.append(self._run_async_stage("achievements", self._backfill_achievements))
+        await asyncio.gather(*stages)
+        self.timings["deferred"] = time.perf_counter() - start
+        logger.info("Startup stages: %s", self.report())
+    
+    async def post_shutdown(self, application: Application):
+        from database.db import db
+        from utils.backup_manager import get_backup_manager
+        from utils.batch_writer import stop_all_writers
+        from utils.mining_loop import mining_loop
+        from utils.clan_war_engine import clan_wars
+        from utils.tournament_engine import tournaments
+        from utils.scheduler import scheduler
+        
+        if self._deferred and not self._deferred.done():
+            self._deferred.cancel()
+        mining_loop.stop()
+        clan_wars.stop()
+        tournaments.stop()
+        backup_manager = get_backup_manager()
+        if backup_manager:
+            backup_manager.stop()
+        scheduler.stop()
+        flushed = stop_all_writers()
+        db.close_all()
+        logger.info("Shutdown complete (%s buffered rows flushed)", flushed)
+    
+    def report(self) -> str:
+        return ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in self.timings.items())
+
+
+startup = StartupPipeline()
+
+
+def build_application(token: str = BOT_TOKEN, polling: bool = True) -> Application:
+    """Application با handler ها و hook های راه‌اندازی؛ اجرا با run_polling()
+    
+    polling=False برای worker های webhook (آپدیت‌ها از پروسس جلو می‌رسند و Updater لازم نیست).
+    """
+    from handlers.registry import register_handlers
+    from utils.instrumentation import InstrumentedRequest
+    
+    builder = (
+        ApplicationBuilder()
+        .token(token)
+        .request(InstrumentedRequest(connection_pool_size=max(8, CONCURRENT_UPDATES * 2)))
+        # ترتیب پیام‌های هر کاربر با utils.locks حفظ می‌شود
+        .concurrent_updates(CONCURRENT_UPDATES if CONCURRENT_UPDATES > 1 else False)
+        .post_init(startup.post_init)
+        .post_shutdown(startup.post_shutdown)
+    )
+    if BOT_API_URL:
+        builder.base_url(BOT_API_URL)
+    if not polling:
+        builder.updater(None)
+    application = builder.build()
+    register_handlers(application)
+    return application
+
+
+def run():
+    """نقطه ورود بات: long polling در حالت تک‌پروسسی، webhook چندپروسسی با SHARD_WORKERS > 1
+    
+    هر دو حالت از build_application استفاده می‌کنند تا مراحل راه‌اندازی، زمان‌بند و flush
+    هنگام خاموش شدن در هر دو اجرا شوند.
+    """
+    if SHARD_WORKERS > 1:
+        from utils.webhook import run_sharded
+        run_sharded()
+        return
+    logger.info("Bot starting (polling)...")
+    build_application().run_polling()
+
+
+if __name__ == "__main__":
+    run()
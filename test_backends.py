@@ -0,0 +1,256 @@
+# tests/test_backends.py
+"""
+آزمون مشترک backend ها: همان SQL لایه مدل روی SQLite و PostgreSQL
+
+SQLite همیشه اجرا می‌شود؛ Postgres فقط وقتی TEST_DATABASE_URL تنظیم شده باشد
+(اسکیمای public آن پاک و دوباره ساخته می‌شود، پس فقط دیتابیس آزمایشی بدهید):
+
+    TEST_DATABASE_URL=postgresql://postgres@localhost/bot_test python -m pytest tests
+"""
+
+import os
+import time
+
+import pytest
+
+from database.backends import SQLiteBackend, PostgresBackend
+from database.db import db, init_database
+from database import models
+from database.battle_log import BattleRecord, _flush_battles
+from utils.pvp_rating import RatingEngine, DEFAULT_RATING, MIN_RATING
+from utils.wheel_engine import wheel
+from config.settings import WHEEL_FREE_SPINS
+
+
+@pytest.fixture(params=["sqlite", "postgres"])
+def backend(request, tmp_path):
+    if request.param == "sqlite":
+        backend = SQLiteBackend(str(tmp_path / "test.db"))
+    else:
+        dsn = os.environ.get("TEST_DATABASE_URL")
+        if not dsn:
+            pytest.skip("TEST_DATABASE_URL not set")
+        backend = PostgresBackend(dsn, min_size=1, max_size=4)
+        with backend.transaction() as cursor:
+            cursor.execute("DROP SCHEMA public CASCADE")
+            cursor.execute("CREATE SCHEMA public")
+    
+    saved = db.backend, db.dialect
+    db.backend, db.dialect = backend, backend.dialect
+    try:
+        init_database()
+        yield backend
+    finally:
+        db.backend, db.dialect = saved
+        backend.close()
+
+
+def _coins(user_id: int) -> int:
+    return models.get_resources(user_id)[2]
+
+
+def _set_coins(user_id: int, coins: int):
+    with db.get_cursor() as cursor:
+        cursor.execute("UPDATE resources SET coins = ? WHERE user_id = ?", (coins, user_id))
+
+
+def _tables() -> set:
+    if db.dialect == "postgres":
+        rows = db.fetchall("SELECT table_name AS name FROM information_schema.tables WHERE table_schema = 'public'")
+    else:
+        rows = db.fetchall("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")
+    return {row['name'] for row in rows}
+
+
+def test_schema_has_every_sqlite_table(backend, tmp_path):
+    tables = _tables()
+    reference = SQLiteBackend(str(tmp_path / "reference.db"))
+    db.backend, db.dialect = reference, reference.dialect
+    try:
+        init_database()
+        expected = _tables()
+    finally:
+        db.backend, db.dialect = backend, backend.dialect
+        reference.close()
+    assert expected - tables == set()
+
+
+def test_add_user(backend):
+    assert models.add_user(1001, "alice") is True
+    assert models.add_user(1001, "alice2") is False
+    assert models.get_resources(1001) == (0, 0, 0)
+    assert db.fetchone("SELECT username FROM users WHERE user_id = ?", (1001,))['username'] == "alice2"
+
+
+def test_transfer_coins_is_conditional(backend):
+    models.add_user(1, "a")
+    models.add_user(2, "b")
+    _set_coins(1, 100)
+    
+    assert models.transfer_coins(1, 2, 60) is True
+    assert models.transfer_coins(1, 2, 60) is False
+    assert (_coins(1), _coins(2)) == (40, 60)
+
+
+def test_bank_transfer_daily_limit(backend):
+    models.add_user(1, "a")
+    models.add_user(2, "b")
+    _set_coins(1, 1000)
+    
+    assert models.transfer_coins(1, 2, 300, daily_limit=500) is True
+    assert models.transfer_coins(1, 2, 300, daily_limit=500) is False
+    assert models.transfer_coins(1, 2, 200, daily_limit=500) is True
+    assert models.get_transferred_today(1) == 500
+    assert (_coins(1), _coins(2)) == (500, 500)
+
+
+def test_armory_deltas_upsert_and_delete(backend):
+    models.add_user(1, "a")
+    assert models.apply_armory_deltas({(1, "sword"): 3})
+    assert models.apply_armory_deltas({(1, "sword"): 2})
+    assert db.fetchone("SELECT count FROM armory WHERE user_id = ? AND weapon_name = ?", (1, "sword"))['count'] == 5
+    
+    assert models.apply_armory_deltas({(1, "sword"): -5})
+    assert db.fetchone("SELECT count FROM armory WHERE user_id = ? AND weapon_name = ?", (1, "sword")) is None
+
+
+def test_apply_mining_batch(backend):
+    models.add_user(1, "a")
+    models.add_user(2, "b")
+    models.apply_mining([(1, 0, 50.0, 10.0, 1), (1, 1, 60.0, 60.0, 2)])
+    assert models.get_resources(1)[:2] == (1, 0)
+    assert models.get_resources(2)[:2] == (1, 1)
+    row = db.fetchone("SELECT last_iron, last_silver FROM resources WHERE user_id = ?", (2,))
+    assert (row['last_iron'], row['last_silver']) == (60.0, 60.0)
+
+
+def test_returning(backend):
+    models.add_user(1, "a")
+    _set_coins(1, 10)
+    with db.get_cursor() as cursor:
+        row = cursor.execute(
+            "UPDATE resources SET coins = coins + ? WHERE user_id = ? RETURNING coins", (5, 1)
+        ).fetchone()
+    assert row['coins'] == 15
+
+
+def test_rollback_on_error(backend):
+    models.add_user(1, "a")
+    with pytest.raises(RuntimeError):
+        with db.get_cursor() as cursor:
+            cursor.execute("UPDATE resources SET coins = ? WHERE user_id = ?", (500, 1))
+            raise RuntimeError("boom")
+    assert _coins(1) == 0
+
+
+def test_nested_cursor_sees_outer_writes(backend):
+    models.add_user(1, "a")
+    with db.get_cursor() as cursor:
+        cursor.execute("UPDATE resources SET coins = ? WHERE user_id = ?", (70, 1))
+        # روی همان اتصال: تغییر commit نشده بیرونی دیده می‌شود و قفل خودش را منتظر نمی‌ماند
+        assert _coins(1) == 70
+        _set_coins(1, 80)
+    assert _coins(1) == 80
+
+
+def test_nested_rollback_keeps_outer_work(backend):
+    models.add_user(1, "a")
+    with db.get_cursor() as cursor:
+        cursor.execute("UPDATE resources SET coins = ? WHERE user_id = ?", (70, 1))
+        with pytest.raises(RuntimeError):
+            with db.get_cursor() as inner:
+                inner.execute("UPDATE resources SET iron = ? WHERE user_id = ?", (9, 1))
+                raise RuntimeError("boom")
+    assert models.get_resources(1) == (0, 0, 70)
+
+
+def test_outer_rollback_discards_nested_work(backend):
+    models.add_user(1, "a")
+    with pytest.raises(RuntimeError):
+        with db.get_cursor():
+            _set_coins(1, 70)
+            raise RuntimeError("boom")
+    assert _coins(1) == 0
+
+
+def test_claim_attack(backend):
+    models.add_user(1, "a")
+    now = time.time()
+    assert models.claim_attack(1, now, 60) is True
+    assert models.claim_attack(1, now + 10, 60) is False
+    assert models.claim_attack(1, now + 61, 60) is True
+
+
+def test_settle_attack_is_atomic(backend):
+    models.add_user(1, "a")
+    models.add_user(2, "b")
+    models.apply_armory_deltas({(1, "nuke"): 1, (2, "shield"): 2})
+    _set_coins(2, 50)
+    now = time.time()
+    
+    # غنیمت بیشتر از موجودی: موشک و cooldown هم برگردانده می‌شوند
+    assert models.settle_attack(1, 2, "nuke", 80, {"shield": 1}, now, 60) == "coins"
+    assert models.get_armory_list(1) == [("nuke", 1)]
+    assert models.claim_attack(1, now, 60) is True
+    
+    assert models.settle_attack(1, 2, "nuke", 30, {"shield": 1}, now + 61, 60) == "ok"
+    assert (_coins(1), _coins(2)) == (30, 20)
+    assert models.get_armory_list(1) == []
+    assert models.get_armory_list(2) == [("shield", 1)]
+    
+    assert models.settle_attack(1, 2, "nuke", 0, {}, now + 200, 60) == "missile"
+    assert models.settle_attack(1, 2, "nuke", 0, {}, now + 90, 60) == "cooldown"
+
+
+def test_rating_deltas_accumulate_and_clamp(backend):
+    models.add_user(1, "a")
+    models.add_user(2, "b")
+    now = time.time()
+    # دو worker جدا: هر دو تغییر حفظ می‌شود
+    _flush_battles([BattleRecord(1, 2, 1, 10, 5, 0, now, 20, -20)])
+    _flush_battles([BattleRecord(1, 2, 1, 10, 5, 0, now, 15, -2000)])
+    
+    rows = {row['user_id']: row for row in db.fetchall("SELECT user_id, rating, wins, losses FROM pvp_ratings")}
+    assert rows[1]['rating'] == DEFAULT_RATING + 35
+    assert rows[2]['rating'] == MIN_RATING
+    assert (rows[1]['wins'], rows[2]['losses']) == (2, 2)
+
+
+def test_rating_refresh_reads_only_flushed_rows(backend):
+    models.add_user(1, "a")
+    models.add_user(2, "b")
+    engine = RatingEngine()
+    engine.load()
+    # flush یک worker دیگر بعد از بارگذاری
+    _flush_battles([BattleRecord(1, 2, 1, 10, 5, 0, time.time(), 20, -20)])
+    assert engine.get_rating(1) == DEFAULT_RATING
+    
+    engine.refresh()
+    assert (engine.get_rating(1), engine.get_rating(2)) == (DEFAULT_RATING + 20, DEFAULT_RATING - 20)
+    assert engine.fights[1] == 1
+
+
+def test_wheel_spin_counts_and_charges(backend):
+    models.add_user(1, "a")
+    _set_coins(1, 10 ** 6)
+    for _ in range(WHEEL_FREE_SPINS + 1):
+        status, result = wheel.spin(1)
+        assert status == "ok"
+    row = db.fetchone("SELECT total_spins, free_spins_used FROM wheel_spins WHERE user_id = ?", (1,))
+    assert (row['total_spins'], row['free_spins_used']) == (WHEEL_FREE_SPINS + 1, WHEEL_FREE_SPINS + 1)
+
+
+def test_clan_contribution_trigger(backend):
+    models.add_user(1, "a")
+    with db.get_cursor() as cursor:
+        clan_id = cursor.execute(
+            "INSERT INTO clans (name, leader_id) VALUES (?, ?) RETURNING clan_id", ("c", 1)
+        ).fetchone()['clan_id']
+        cursor.execute("INSERT INTO clan_members (user_id, clan_id, role) VALUES (?, ?, ?)", (1, clan_id, "leader"))
+        cursor.execute(
+            "UPDATE clan_members SET contribution_coins = contribution_coins + ?, "
+            "contribution_points = contribution_points + ? WHERE user_id = ?",
+            (300, 3, 1)
+        )
+    row = db.fetchone("SELECT treasury_coins, points FROM clans WHERE clan_id = ?", (clan_id,))
+    assert (row['treasury_coins'], row['points']) == (300, 3)
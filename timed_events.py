@@ -0,0 +1,278 @@
+# utils/timed_events.py
+"""
+رویدادهای زمان‌دار (events / event_participants)
+
+هر نوع رویداد به یک نوع رویداد گذرگاه (استخراج، حمله، خرید) وصل است؛ امتیاز شرکت‌کنندگان
+در حافظه جمع و با UPSERT دسته‌ای نوشته می‌شود. شروع، پایان و پرداخت جایزه کارهای
+persistent زمان‌بند مرکزی هستند و بعد از ری‌استارت ادامه پیدا می‌کنند. پرداخت جایزه
+با UPDATE شرطی rewards_claimed انجام می‌شود پس اجرای دوباره آن دو بار جایزه نمی‌دهد.
+"""
+
+import time
+from html import escape
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from database.db import db
+from config.settings import (
+    TIMED_EVENT_DURATION, TIMED_EVENT_REWARDS, TIMED_EVENT_FLUSH_MS,
+    TIMED_EVENT_SETTLE_DELAY, TIMED_EVENT_MAX_AGE
+)
+from utils.batch_writer import BatchWriter
+from utils.broadcaster import schedule_broadcast
+from utils.events import event_bus, Event, MINE, ATTACK, PURCHASE
+from utils.leaderboard_service import leaderboards
+from utils.scheduler import scheduler, Job
+from utils.logger import logger
+
+
+class EventType(NamedTuple):
+    title: str
+    description: str
+    source: str  # نوع رویداد گذرگاه
+    points: Callable[[Event], int]
+
+
+EVENT_TYPES: Dict[str, EventType] = {
+    "mining_rush": EventType(
+        "⛏️ جشنواره استخراج", "هر واحد آهن یا نقره استخراج شده یک امتیاز", MINE,
+        lambda event: event.amount
+    ),
+    "war_frenzy": EventType(
+        "⚔️ جنون جنگ", "هر حمله موفق یک امتیاز", ATTACK,
+        lambda event: 1 if event.data.get("won") else 0
+    ),
+    "shopping": EventType(
+        "🛒 جشنواره خرید", "هر سلاح خریداری شده یک امتیاز", PURCHASE,
+        lambda event: event.amount
+    ),
+}
+
+
+class TimedEvent(NamedTuple):
+    event_id: int
+    event_type: str
+    start_time: float
+    end_time: float
+    status: str
+    
+    @property
+    def spec(self) -> EventType:
+        return EVENT_TYPES[self.event_type]
+
+
+class ScoreEvent(NamedTuple):
+    event_id: int
+    user_id: int
+    points: int
+
+
+class TimedEventEngine:
+    """رویدادهای جاری در حافظه، امتیاز دسته‌ای و کارهای شروع/پایان/جایزه"""
+    
+    def __init__(self):
+        self.events: Dict[int, TimedEvent] = {}
+        self.pending: Dict[Tuple[int, int], int] = {}  # (event_id, user_id) -> امتیاز نوشته نشده
+        self.loaded = False
+        self.loaded_at = 0.0
+        self.writer = BatchWriter("event_scores", self._flush, max_rows=1000, interval_ms=TIMED_EVENT_FLUSH_MS)
+        for source in {spec.source for spec in EVENT_TYPES.values()}:
+            event_bus.subscribe(source, self.on_event)
+        scheduler.register("event_start", self._start_job, settlement=True)
+        scheduler.register("event_end", self._end_job, settlement=True)
+        scheduler.register("event_rewards", self._rewards_job, settlement=True)
+    
+    def load(self):
+        rows = db.fetchall(
+            "SELECT event_id, event_type, start_time, end_time, status FROM events "
+            "WHERE status IN ('scheduled', 'active')"
+        )
+        self.events = {
+            row['event_id']: TimedEvent(row['event_id'], row['event_type'], row['start_time'],
+                                        row['end_time'], row['status'])
+            for row in rows if row['event_type'] in EVENT_TYPES
+        }
+        self.loaded = True
+        self.loaded_at = time.monotonic()
+    
+    def _ensure_loaded(self):
+        if not self.loaded:
+            self.load()
+    
+    def current(self) -> List[TimedEvent]:
+        self._ensure_loaded()
+        return sorted(self.events.values(), key=lambda event: event.start_time)
+    
+    # ==================== ساخت و پایان ====================
+    
+    def create(self, event_type: str, delay: int = 0, duration: int = TIMED_EVENT_DURATION) -> Optional[TimedEvent]:
+        if event_type not in EVENT_TYPES:
+            return None
+        self._ensure_loaded()
+        start_time = time.time() + delay
+        status = 'scheduled' if delay else 'active'
+        with db.get_cursor() as cursor:
+            row = cursor.execute(
+                "INSERT INTO events (event_type, start_time, end_time, status) VALUES (?, ?, ?, ?) "
+                "RETURNING event_id",
+                (event_type, start_time, start_time + duration, status)
+            ).fetchone()
+        event = TimedEvent(row['event_id'], event_type, start_time, start_time + duration, status)
+        self.events[event.event_id] = event
+        
+        payload = {"event_id": event.event_id}
+        if delay:
+            scheduler.at(f"event_start:{event.event_id}", start_time, kind="event_start",
+                         payload=payload, persistent=True)
+        else:
+            self._announce_start(event)
+        scheduler.at(f"event_end:{event.event_id}", event.end_time + TIMED_EVENT_SETTLE_DELAY,
+                     kind="event_end", payload=payload, persistent=True)
+        logger.info("Timed event #%s (%s) created, starts in %ss", event.event_id, event_type, delay)
+        return event
+    
+    def end_now(self, event_id: int) -> bool:
+        """پایان زودهنگام: کار پایان همین حالا اجرا می‌شود"""
+        self._ensure_loaded()
+        if event_id not in self.events:
+            return False
+        scheduler.cancel(f"event_start:{event_id}")
+        scheduler.at(f"event_end:{event_id}", time.time(), kind="event_end",
+                     payload={"event_id": event_id}, persistent=True)
+        return True
+    
+    @staticmethod
+    def _announce_start(event: TimedEvent):
+        hours = int(event.end_time - event.start_time) // 3600
+        schedule_broadcast(
+            f"🎉 <b>{escape(event.spec.title)}</b> شروع شد!\n\n"
+            f"🎯 {event.spec.description}\n⏳ مدت: {hours} ساعت\n"
+            f"🏆 نفرات برتر جایزه می‌گیرند. جدول: /event"
+        )
+    
+    # ==================== امتیاز ====================
+    
+    def on_event(self, event: Event):
+        self._ensure_loaded()
+        if not self.events:
+            return
+        now = time.time()
+        for timed in self.events.values():
+            spec = timed.spec
+            if spec.source != event.type or not timed.start_time <= now < timed.end_time:
+                continue
+            points = spec.points(event)
+            if points <= 0:
+                continue
+            key = (timed.event_id, event.user_id)
+            self.pending[key] = self.pending.get(key, 0) + points
+            self.writer.add(ScoreEvent(timed.event_id, event.user_id, points))
+    
+    def _flush(self, batch: List[ScoreEvent]):
+        totals: Dict[Tuple[int, int], int] = {}
+        for item in batch:
+            key = (item.event_id, item.user_id)
+            totals[key] = totals.get(key, 0) + item.points
+        
+        with db.get_cursor() as cursor:
+            cursor.executemany(
+                "INSERT INTO event_participants (event_id, user_id, score) VALUES (?, ?, ?) "
+                "ON CONFLICT(event_id, user_id) DO UPDATE SET score = event_participants.score + excluded.score",
+                [(event_id, user_id, points) for (event_id, user_id), points in totals.items()]
+            )
+        
+        for key, points in totals.items():
+            left = self.pending.get(key, 0) - points
+            if left > 0:
+                self.pending[key] = left
+            else:
+                self.pending.pop(key, None)
+        logger.debug("Flushed %s event score updates for %s participants", len(batch), len(totals))
+    
+    def standings(self, event_id: int, user_id: int, limit: int) -> Tuple[List[Tuple[int, int]], int]:
+        """(نفرات برتر، امتیاز کاربر) از امتیازهای نوشته شده + امتیازهای این پروسس"""
+        top = db.fetchall(
+            "SELECT user_id, score FROM event_participants WHERE event_id = ? "
+            "ORDER BY score DESC, user_id LIMIT ?",
+            (event_id, limit)
+        )
+        row = db.fetchone(
+            "SELECT score FROM event_participants WHERE event_id = ? AND user_id = ?", (event_id, user_id)
+        )
+        score = (row['score'] if row else 0) + self.pending.get((event_id, user_id), 0)
+        return [(entry['user_id'], entry['score']) for entry in top], score
+    
+    # ==================== کارهای زمان‌بند ====================
+    
+    def _start_job(self, job: Job):
+        event_id = job.payload["event_id"]
+        with db.get_cursor() as cursor:
+            row = cursor.execute(
+                "UPDATE events SET status = 'active' WHERE event_id = ? AND status = 'scheduled' "
+                "RETURNING event_id, event_type, start_time, end_time",
+                (event_id,)
+            ).fetchone()
+        if row is None:
+            return
+        event = TimedEvent(row['event_id'], row['event_type'], row['start_time'], row['end_time'], 'active')
+        self.events[event_id] = event
+        self._announce_start(event)
+        logger.info("Timed event #%s started", event_id)
+    
+    def _end_job(self, job: Job):
+        event_id = job.payload["event_id"]
+        self.writer.flush()
+        now = time.time()
+        with db.get_cursor() as cursor:
+            row = cursor.execute(
+                "UPDATE events SET status = 'finished', "
+                "end_time = CASE WHEN end_time > ? THEN ? ELSE end_time END "
+                "WHERE event_id = ? AND status IN ('scheduled', 'active') RETURNING event_type",
+                (now, now, event_id)
+            ).fetchone()
+        self.events.pop(event_id, None)
+        self.pending = {key: points for key, points in self.pending.items() if key[0] != event_id}
+        if row is None:
+            return
+        # جایزه کار جداگانه است تا تلاش دوباره‌اش پایان را تکرار نکند
+        scheduler.at(f"event_rewards:{event_id}", time.time(), kind="event_rewards",
+                     payload={"event_id": event_id, "event_type": row['event_type']}, persistent=True)
+        logger.info("Timed event #%s finished", event_id)
+    
+    async def _rewards_job(self, job: Job):
+        event_id = job.payload["event_id"]
+        spec = EVENT_TYPES.get(job.payload.get("event_type"))
+        title = spec.title if spec else "رویداد"
+        paid: List[Tuple[int, int, int]] = []
+        with db.get_cursor() as cursor:
+            winners = cursor.execute(
+                "SELECT user_id, score, rewards_claimed FROM event_participants "
+                "WHERE event_id = ? AND score > 0 ORDER BY score DESC, user_id LIMIT ?",
+                (event_id, len(TIMED_EVENT_REWARDS))
+            ).fetchall()
+            for rank, (entry, reward) in enumerate(zip(winners, TIMED_EVENT_REWARDS), start=1):
+                claimed = cursor.execute(
+                    "UPDATE event_participants SET rewards_claimed = 1 "
+                    "WHERE event_id = ? AND user_id = ? AND rewards_claimed = 0 RETURNING user_id",
+                    (event_id, entry['user_id'])
+                ).fetchone()
+                if claimed is None:
+                    continue  # در اجرای قبلی پرداخت شده
+                cursor.execute("UPDATE resources SET coins = coins + ? WHERE user_id = ?", (reward, entry['user_id']))
+                paid.append((rank, entry['user_id'], reward))
+        
+        for rank, user_id, reward in paid:
+            leaderboards.adjust("coins", user_id, reward)
+            try:
+                await scheduler.bot.send_message(
+                    user_id, f"🏆 شما در {title} رتبه {rank} را کسب کردید!\n🎁 جایزه: {reward:,} سکه"
+                )
+            except Exception as e:
+                logger.warning("Could not notify event winner %s (#%s): %s", user_id, event_id, e)
+        logger.info("Timed event #%s rewards paid to %s users", event_id, len(paid))
+
+
+# نمونه سینگلتون
+timed_events = TimedEventEngine()
+
+# رویدادهای ساخته شده در worker های دیگر
+scheduler.reload_every("timed_events_reload", TIMED_EVENT_MAX_AGE, timed_events)
@@ -0,0 +1,99 @@
+# handlers/tournament.py
+"""
+تورنمنت‌ها: /tournament برای تورنمنت‌های جاری، رتبه شما و ثبت‌نام
+"""
+
+import time
+from typing import Tuple
+
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import ContextTypes, CallbackQueryHandler
+
+from database.models import add_user
+from handlers.leaderboard import _get_usernames
+from utils.tournament_engine import tournaments, Tournament
+from utils.locks import user_locks
+
+TOP_SHORT = 5
+TOP_LONG = 20
+MEDALS = ("🥇", "🥈", "🥉")
+
+
+def _remaining(tournament: Tournament) -> str:
+    now = time.time()
+    if now < tournament.start_time:
+        hours, rest = divmod(int(tournament.start_time - now), 3600)
+        return f"🕒 شروع تا {hours} ساعت و {rest // 60} دقیقه دیگر"
+    hours, rest = divmod(max(0, int(tournament.end_time - now)), 3600)
+    return f"⏳ {hours} ساعت و {rest // 60} دقیقه مانده"
+
+
+def format_standings(tournament: Tournament, user_id: int, limit: int) -> str:
+    top = tournament.standings.top(limit)
+    usernames = _get_usernames(uid for uid, _ in top)
+    lines = [
+        f"<b>{tournament.name}</b> — {len(tournament.standings):,} شرکت‌کننده",
+        _remaining(tournament),
+    ]
+    for i, (uid, score) in enumerate(top, start=1):
+        icon = MEDALS[i - 1] if i <= len(MEDALS) else f"{i}."
+        name = f"@{usernames[uid]}" if usernames.get(uid) else f"User {uid}"
+        lines.append(f"{icon} {name} — <code>{int(score):,}</code>")
+    rank = tournament.standings.rank(user_id)
+    if rank is not None:
+        lines.append(f"📍 رتبه شما: {rank:,} (امتیاز {int(tournament.standings.get(user_id)):,})")
+    return "\n".join(lines)
+
+
+def _build(user_id: int) -> Tuple[str, InlineKeyboardMarkup]:
+    current = tournaments.current()
+    if not current:
+        return "🏆 در حال حاضر تورنمنتی برگزار نمی‌شود.", None
+    sections = ["🏆 <b>تورنمنت‌ها</b>"]
+    buttons = []
+    for tournament in current:
+        sections.append(format_standings(tournament, user_id, TOP_SHORT))
+        row = [InlineKeyboardButton("📊 جدول کامل", callback_data=f"tournament_top_{tournament.tournament_id}")]
+        if user_id not in tournament.standings:
+            row.insert(0, InlineKeyboardButton(
+                "✍️ ثبت‌نام", callback_data=f"tournament_join_{tournament.tournament_id}"
+            ))
+        buttons.append(row)
+    return "\n\n".join(sections), InlineKeyboardMarkup(buttons)
+
+
+async def tournament_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_user.id
+    add_user(user_id, update.effective_user.username)
+    text, markup = _build(user_id)
+    await update.message.reply_text(text, reply_markup=markup, parse_mode="HTML")
+
+
+async def tournament_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    user_id = query.from_user.id
+    _, action, tournament_id = query.data.split("_")
+    tournament_id = int(tournament_id)
+    
+    if action == "top":
+        await query.answer()
+        tournament = tournaments.get(tournament_id)
+        if tournament is None:
+            await query.edit_message_text("🏁 این تورنمنت تمام شده است.")
+            return
+        await query.edit_message_text(format_standings(tournament, user_id, TOP_LONG), parse_mode="HTML")
+        return
+    
+    async with user_locks.hold(user_id):
+        status = tournaments.join(tournament_id, user_id)
+    if status == "ok":
+        await query.answer("✅ ثبت‌نام شدید! هر حمله موفق امتیاز دارد.")
+    elif status == "joined":
+        await query.answer("✅ قبلا ثبت‌نام کرده‌اید.")
+    else:
+        await query.answer("🏁 ثبت‌نام این تورنمنت بسته است.", show_alert=True)
+    text, markup = _build(user_id)
+    await query.edit_message_text(text, reply_markup=markup, parse_mode="HTML")
+
+
+tournament_callback_handler = CallbackQueryHandler(tournament_callback, pattern=r"^tournament_(join|top)_\d+$")
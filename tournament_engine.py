@@ -0,0 +1,317 @@
+# utils/tournament_engine.py
+"""
+تورنمنت‌ها (tournaments / tournament_participants) با امتیاز از جریان نبردها
+
+نبردهای شرکت‌کنندگان داخل بازه تورنمنت فقط رتبه‌بندی حافظه (RankedIndex) را تغییر
+می‌دهند و BatchWriter مجموع امتیاز هر شرکت‌کننده را با یک UPDATE افزایشی می‌نویسد؛
+پس جدول زنده و رتبه هر کاربر O(log n) است. شروع و پایان هر تورنمنت کار یک‌باره
+زمان‌بند مرکزی است. پایان یک تراکنش است: UPDATE شرطی status، ثبت رتبه
+نهایی همه شرکت‌کنندگان در final_rank و جایزه نفرات برتر.
+"""
+
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from database.db import db
+from config.settings import (
+    TOURNAMENT_WIN_POINTS, TOURNAMENT_DEFENSE_POINTS, TOURNAMENT_PRIZES,
+    TOURNAMENT_FLUSH_MS, TOURNAMENT_SETTLE_DELAY, TOURNAMENT_MAX_AGE
+)
+from utils.batch_writer import BatchWriter
+from utils.leaderboard_service import leaderboards
+from utils.ranked_index import RankedIndex
+from utils.scheduler import scheduler, Job
+from utils.logger import logger
+
+# نوع -> (عنوان، تاخیر شروع، مدت) برای ساخت از پنل ادمین
+PRESETS: Dict[str, Tuple[str, int, int]] = {
+    "1h": ("⚡ تورنمنت سریع (1 ساعت)", 0, 3600),
+    "6h": ("🔥 تورنمنت 6 ساعته", 600, 6 * 3600),
+    "1d": ("🏆 تورنمنت روزانه", 3600, 86400),
+    "1w": ("👑 تورنمنت هفتگی", 3600, 7 * 86400),
+}
+
+
+class Tournament:
+    __slots__ = ("tournament_id", "name", "start_time", "end_time", "status", "standings")
+    
+    def __init__(self, tournament_id: int, name: str, start_time: float, end_time: float, status: str):
+        self.tournament_id = tournament_id
+        self.name = name
+        self.start_time = start_time
+        self.end_time = end_time
+        self.status = status
+        self.standings = RankedIndex()  # user_id -> امتیاز (شامل امتیازهای flush نشده)
+    
+    def is_open(self, timestamp: float) -> bool:
+        return self.start_time <= timestamp < self.end_time
+
+
+class ScoreEvent(NamedTuple):
+    tournament_id: int
+    user_id: int
+    points: int
+
+
+class FinalResult(NamedTuple):
+    tournament_id: int
+    name: str
+    participants: int
+    winners: List[Tuple[int, int, int]]  # (user_id، امتیاز، جایزه)
+
+
+class TournamentEngine:
+    """جدول امتیاز در حافظه، flush دسته‌ای و شروع/پایان تورنمنت‌ها در مهلتشان"""
+    
+    def __init__(self):
+        self.tournaments: Dict[int, Tournament] = {}
+        self.pending: Dict[Tuple[int, int], int] = {}  # (tournament_id, user_id) -> امتیاز نوشته نشده
+        self.loaded = False
+        self.loaded_at = 0.0
+        self.bot = None
+        self.scheduling = False  # فقط پروسس اصلی شروع و پایان را اجرا می‌کند
+        self.writer = BatchWriter("tournament_scores", self._flush, max_rows=1000, interval_ms=TOURNAMENT_FLUSH_MS)
+    
+    def load(self):
+        rows = db.fetchall(
+            "SELECT tournament_id, name, start_time, end_time, status FROM tournaments "
+            "WHERE status IN ('scheduled', 'active')"
+        )
+        tournaments = {
+            row['tournament_id']: Tournament(
+                row['tournament_id'], row['name'], row['start_time'], row['end_time'], row['status']
+            )
+            for row in rows
+        }
+        if tournaments:
+            placeholders = ", ".join("?" * len(tournaments))
+            for row in db.fetchall(
+                f"SELECT tournament_id, user_id, score FROM tournament_participants "
+                f"WHERE tournament_id IN ({placeholders})",
+                tuple(tournaments)
+            ):
+                score = row['score'] + self.pending.get((row['tournament_id'], row['user_id']), 0)
+                tournaments[row['tournament_id']].standings.set(row['user_id'], score)
+        
+        self.tournaments = tournaments
+        self.loaded = True
+        self.loaded_at = time.monotonic()
+        if self.scheduling:
+            for tournament in tournaments.values():
+                self._schedule(tournament)
+    
+    def _ensure_loaded(self):
+        if not self.loaded:
+            self.load()
+    
+    def current(self) -> List[Tournament]:
+        """تورنمنت‌های در حال اجرا و زمان‌بندی شده به ترتیب پایان"""
+        self._ensure_loaded()
+        return sorted(self.tournaments.values(), key=lambda t: t.end_time)
+    
+    def get(self, tournament_id: int) -> Optional[Tournament]:
+        self._ensure_loaded()
+        return self.tournaments.get(tournament_id)
+    
+    # ==================== ساخت و ثبت‌نام ====================
+    
+    def create(self, preset: str) -> Optional[Tournament]:
+        if preset not in PRESETS:
+            return None
+        self._ensure_loaded()
+        name, delay, duration = PRESETS[preset]
+        now = time.time()
+        start_time = now + delay
+        status = 'active' if delay == 0 else 'scheduled'
+        with db.get_cursor() as cursor:
+            row = cursor.execute(
+                "INSERT INTO tournaments (name, start_time, end_time, status) VALUES (?, ?, ?, ?) "
+                "RETURNING tournament_id",
+                (name, start_time, start_time + duration, status)
+            ).fetchone()
+        
+        tournament = Tournament(row['tournament_id'], name, start_time, start_time + duration, status)
+        self.tournaments[tournament.tournament_id] = tournament
+        if self.scheduling:
+            self._schedule(tournament)
+        logger.info("Tournament #%s created (%s)", tournament.tournament_id, preset)
+        return tournament
+    
+    def join(self, tournament_id: int, user_id: int) -> str:
+        tournament = self.get(tournament_id)
+        if tournament is None or time.time() >= tournament.end_time:
+            return "closed"
+        if user_id in tournament.standings:
+            return "joined"
+        with db.get_cursor() as cursor:
+            row = cursor.execute(
+                "INSERT INTO tournament_participants (tournament_id, user_id, score) "
+                "SELECT ?, ?, 0 WHERE EXISTS ("
+                "    SELECT 1 FROM tournaments WHERE tournament_id = ? AND status IN ('scheduled', 'active')"
+                ") ON CONFLICT(tournament_id, user_id) DO NOTHING RETURNING user_id",
+                (tournament_id, user_id, tournament_id)
+            ).fetchone()
+        if row is None:
+            # ثبت‌نام قبلی در worker دیگر یا تورنمنت تمام شده
+            self.load()
+            tournament = self.tournaments.get(tournament_id)
+            return "joined" if tournament is not None and user_id in tournament.standings else "closed"
+        tournament.standings.set(user_id, 0)
+        return "ok"
+    
+    # ==================== امتیاز از نبردها ====================
+    
+    def on_battle(self, attacker_id: int, defender_id: int, winner_id: int, timestamp: float):
+        """یک نبرد از جریان battle_logs؛ برنده اگر در تورنمنت باز ثبت‌نام کرده باشد امتیاز می‌گیرد"""
+        self._ensure_loaded()
+        if not self.tournaments:
+            return
+        points = TOURNAMENT_WIN_POINTS if winner_id == attacker_id else TOURNAMENT_DEFENSE_POINTS
+        for tournament in self.tournaments.values():
+            if winner_id not in tournament.standings or not tournament.is_open(timestamp):
+                continue
+            tournament.standings.add(winner_id, points)
+            key = (tournament.tournament_id, winner_id)
+            self.pending[key] = self.pending.get(key, 0) + points
+            self.writer.add(ScoreEvent(tournament.tournament_id, winner_id, points))
+    
+    def _flush(self, batch: List[ScoreEvent]):
+        """یک UPDATE افزایشی برای هر شرکت‌کننده؛ امتیاز تورنمنت‌های تمام شده دور ریخته می‌شود"""
+        totals: Dict[Tuple[int, int], int] = {}
+        for event in batch:
+            key = (event.tournament_id, event.user_id)
+            totals[key] = totals.get(key, 0) + event.points
+        
+        with db.get_cursor() as cursor:
+            cursor.executemany(
+                "UPDATE tournament_participants SET score = score + ? "
+                "WHERE tournament_id = ? AND user_id = ? AND EXISTS ("
+                "    SELECT 1 FROM tournaments t WHERE t.tournament_id = tournament_participants.tournament_id "
+                "    AND t.status IN ('scheduled', 'active'))",
+                [(points, tournament_id, user_id) for (tournament_id, user_id), points in totals.items()]
+            )
+        
+        # حالت حافظه فقط بعد از commit تغییر می‌کند
+        for key, points in totals.items():
+            left = self.pending.get(key, 0) - points
+            if left > 0:
+                self.pending[key] = left
+            else:
+                self.pending.pop(key, None)
+        logger.debug("Flushed %s tournament score events for %s participants", len(batch), len(totals))
+    
+    # ==================== شروع و پایان ====================
+    
+    def start_tournament(self, tournament_id: int) -> bool:
+        with db.get_cursor() as cursor:
+            row = cursor.execute(
+                "UPDATE tournaments SET status = 'active' "
+                "WHERE tournament_id = ? AND status = 'scheduled' RETURNING tournament_id",
+                (tournament_id,)
+            ).fetchone()
+        tournament = self.tournaments.get(tournament_id)
+        if tournament is not None:
+            tournament.status = 'active'
+        if row is not None:
+            logger.info("Tournament #%s started", tournament_id)
+        return row is not None
+    
+    def finish(self, tournament_id: int) -> Optional[FinalResult]:
+        """پایان تورنمنت، ثبت رتبه نهایی و جایزه؛ فقط تراکنشی که status را عوض کند اجرا می‌شود"""
+        self.writer.flush()
+        winners = []
+        with db.get_cursor() as cursor:
+            row = cursor.execute(
+                "UPDATE tournaments SET status = 'finished' "
+                "WHERE tournament_id = ? AND status IN ('scheduled', 'active') RETURNING name",
+                (tournament_id,)
+            ).fetchone()
+            if row is not None:
+                # رتبه‌ها از امتیازهای commit شده همه worker ها (همان ترتیب RankedIndex)
+                standings = cursor.execute(
+                    "SELECT user_id, score FROM tournament_participants "
+                    "WHERE tournament_id = ? ORDER BY score DESC, user_id",
+                    (tournament_id,)
+                ).fetchall()
+                cursor.executemany(
+                    "UPDATE tournament_participants SET final_rank = ? WHERE tournament_id = ? AND user_id = ?",
+                    [(rank, tournament_id, entry['user_id']) for rank, entry in enumerate(standings, start=1)]
+                )
+                for entry, prize in zip(standings, TOURNAMENT_PRIZES):
+                    if entry['score'] <= 0:
+                        break
+                    winners.append((entry['user_id'], entry['score'], prize))
+                cursor.executemany(
+                    "UPDATE resources SET coins = coins + ? WHERE user_id = ?",
+                    [(prize, user_id) for user_id, _, prize in winners]
+                )
+        
+        self.tournaments.pop(tournament_id, None)
+        self.pending = {key: points for key, points in self.pending.items() if key[0] != tournament_id}
+        if row is None:
+            # قبلا (در پروسس دیگر یا قبل از ری‌استارت) تمام شده است
+            return None
+        
+        for user_id, _, prize in winners:
+            leaderboards.adjust("coins", user_id, prize)
+        logger.info("Tournament #%s finished: %s participants, winners %s",
+                    tournament_id, len(standings), [user_id for user_id, _, _ in winners])
+        return FinalResult(tournament_id, row['name'], len(standings), winners)
+    
+    # ==================== زمان‌بندی شروع و پایان ====================
+    
+    def start(self, bot=None):
+        self.bot = bot
+        self.scheduling = True
+        self.load()
+        logger.info("Tournament deadlines scheduled for %s tournaments.", len(self.tournaments))
+    
+    def stop(self):
+        self.scheduling = False
+        for tournament_id in list(self.tournaments):
+            scheduler.cancel(f"tournament_start:{tournament_id}", persisted=False)
+            scheduler.cancel(f"tournament_end:{tournament_id}", persisted=False)
+    
+    def _schedule(self, tournament: Tournament):
+        payload = {"tournament_id": tournament.tournament_id}
+        if tournament.status == 'scheduled':
+            scheduler.at(f"tournament_start:{tournament.tournament_id}", tournament.start_time,
+                         self._start_job, payload=payload, name="tournament_start")
+        # پایان با تاخیر اجرا می‌شود تا امتیازهای worker ها flush شوند
+        scheduler.at(f"tournament_end:{tournament.tournament_id}", tournament.end_time + TOURNAMENT_SETTLE_DELAY,
+                     self._finish_job, payload=payload, name="tournament_end", settlement=True)
+    
+    def _start_job(self, job: Job):
+        if job.payload["tournament_id"] in self.tournaments:
+            self.start_tournament(job.payload["tournament_id"])
+    
+    async def _finish_job(self, job: Job):
+        tournament_id = job.payload["tournament_id"]
+        if tournament_id not in self.tournaments:
+            return  # قبلا تمام شده
+        result = self.finish(tournament_id)
+        if result is not None:
+            await self._announce(result)
+    
+    async def _announce(self, result: FinalResult):
+        if self.bot is None:
+            return
+        medals = ("🥇", "🥈", "🥉")
+        for rank, (user_id, score, prize) in enumerate(result.winners):
+            medal = medals[rank] if rank < len(medals) else f"#{rank + 1}"
+            try:
+                await self.bot.send_message(
+                    user_id,
+                    f"{medal} {result.name} تمام شد!\n"
+                    f"رتبه شما: {rank + 1} از {result.participants:,} (امتیاز {score:,})\n"
+                    f"🎁 جایزه: {prize:,} سکه"
+                )
+            except Exception as e:
+                logger.warning("Could not notify tournament winner %s (#%s): %s", user_id, result.tournament_id, e)
+
+
+# نمونه سینگلتون
+tournaments = TournamentEngine()
+
+# تورنمنت‌های ساخته شده در worker های دیگر (پروسس اصلی آن‌ها را زمان‌بندی هم می‌کند)
+scheduler.reload_every("tournaments_reload", TOURNAMENT_MAX_AGE, tournaments)
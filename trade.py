@@ -0,0 +1,170 @@
+# handlers/trade.py
+"""
+معامله مستقیم بین بازیکنان (فقط پیوی):
+    /trade <آیدی یا @یوزرنیم> <آیتم‌های پیشنهادی> = <آیتم‌های درخواستی>
+    مثال: /trade @ali نور 5، سکه 1000 = شهاب 2
+    /offers   پیشنهادهای در انتظار (پذیرش / رد / لغو)
+"""
+
+import re
+from typing import Dict, Optional
+
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import ContextTypes, CallbackQueryHandler
+
+from database.db import db
+from database.models import add_user
+from utils.trade_engine import trade_engine, TradeOffer, COINS, MAX_QUANTITY
+from utils.weapon_aliases import weapon_aliases
+from utils.logger import logger
+from utils.locks import user_locks
+
+COIN_NAMES = ("سکه", "coin", "coins")
+
+ERRORS = {
+    "invalid": "❌ پیشنهاد نامعتبر است یا دیگر در انتظار نیست.",
+    "stock": "❌ پیشنهاددهنده دیگر آیتم‌های پیشنهادی را ندارد.",
+    "wanted": "❌ آیتم‌های درخواستی را ندارید.",
+    "capacity": "📦 ظرفیت زرادخانه یکی از طرفین کافی نیست.",
+    "limit": "⛔ تعداد پیشنهادهای در انتظار شما به حداکثر رسیده است.",
+    "error": "⚠️ خطا در انجام معامله، دوباره تلاش کنید.",
+}
+
+
+def parse_items(text: str) -> Optional[Dict[str, int]]:
+    """"نور 5، سکه 1000" -> {"💥 نور": 5, "coins": 1000}"""
+    items: Dict[str, int] = {}
+    for part in re.split(r"[,،]", text):
+        tokens = part.split()
+        if not tokens:
+            continue
+        if len(tokens) < 2 or not tokens[-1].isdigit() or not 0 < int(tokens[-1]) <= MAX_QUANTITY:
+            return None
+        name = " ".join(tokens[:-1])
+        key = COINS if name.casefold() in COIN_NAMES else weapon_aliases.resolve(name)
+        if not key:
+            return None
+        items[key] = items.get(key, 0) + int(tokens[-1])
+        if items[key] > MAX_QUANTITY:
+            return None
+    return items
+
+
+def format_items(items: Dict[str, int]) -> str:
+    if not items:
+        return "—"
+    return "، ".join(
+        f"💰 {qty:,} سکه" if name == COINS else f"{name} × {qty:,}"
+        for name, qty in items.items()
+    )
+
+
+def format_offer(offer: TradeOffer) -> str:
+    return (
+        f"🤝 <b>پیشنهاد #{offer.offer_id}</b>\n"
+        f"از <code>{offer.from_user}</code> به <code>{offer.to_user}</code>\n"
+        f"📤 می‌دهد: {format_items(offer.offer_items)}\n"
+        f"📥 می‌خواهد: {format_items(offer.request_items)}"
+    )
+
+
+def _resolve_user(text: str) -> Optional[int]:
+    if text.isdigit():
+        return int(text)
+    row = db.fetchone("SELECT user_id FROM users WHERE username = ?", (text.lstrip("@"),))
+    return row['user_id'] if row else None
+
+
+async def trade_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if update.effective_chat.type != "private":
+        return
+    user_id = update.effective_user.id
+    add_user(user_id, update.effective_user.username)
+    
+    usage = "❌ فرمت: <code>/trade @یوزرنیم نور 5، سکه 100 = شهاب 2</code>"
+    if not context.args or "=" not in " ".join(context.args[1:]):
+        await update.message.reply_text(usage, parse_mode="HTML")
+        return
+    
+    to_user = _resolve_user(context.args[0])
+    offer_text, _, request_text = " ".join(context.args[1:]).partition("=")
+    offer_items, request_items = parse_items(offer_text), parse_items(request_text)
+    if to_user is None or offer_items is None or request_items is None:
+        await update.message.reply_text(usage, parse_mode="HTML")
+        return
+    
+    status, offer_id = trade_engine.create_offer(user_id, to_user, offer_items, request_items)
+    if status != "ok":
+        await update.message.reply_text(ERRORS.get(status, ERRORS["error"]))
+        return
+    
+    offer = TradeOffer(offer_id, user_id, to_user, offer_items, request_items, 0)
+    await update.message.reply_text(f"✅ پیشنهاد ثبت شد.\n\n{format_offer(offer)}", parse_mode="HTML")
+    try:
+        await context.bot.send_message(
+            to_user, f"📨 پیشنهاد معامله جدید!\n\n{format_offer(offer)}",
+            reply_markup=_offer_markup(offer, to_user), parse_mode="HTML"
+        )
+    except Exception as e:
+        logger.warning("Could not notify user %s about trade #%s: %s", to_user, offer_id, e)
+
+
+def _offer_markup(offer: TradeOffer, viewer_id: int) -> InlineKeyboardMarkup:
+    if viewer_id == offer.to_user:
+        return InlineKeyboardMarkup([[
+            InlineKeyboardButton("✅ پذیرش", callback_data=f"trade_accept_{offer.offer_id}"),
+            InlineKeyboardButton("❌ رد", callback_data=f"trade_reject_{offer.offer_id}"),
+        ]])
+    return InlineKeyboardMarkup([[
+        InlineKeyboardButton("🗑️ لغو", callback_data=f"trade_cancel_{offer.offer_id}"),
+    ]])
+
+
+async def offers_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if update.effective_chat.type != "private":
+        return
+    user_id = update.effective_user.id
+    incoming, outgoing = trade_engine.pending_for(user_id)
+    if not incoming and not outgoing:
+        await update.message.reply_text("📭 پیشنهاد معامله در انتظاری ندارید.")
+        return
+    for offer in incoming + outgoing:
+        await update.message.reply_text(
+            format_offer(offer), reply_markup=_offer_markup(offer, user_id), parse_mode="HTML"
+        )
+
+
+async def trade_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    _, action, offer_id = query.data.split("_")
+    offer_id = int(offer_id)
+    user_id = query.from_user.id
+    
+    if action in ("reject", "cancel"):
+        if trade_engine.close(offer_id, user_id):
+            await query.edit_message_text(f"🚫 پیشنهاد #{offer_id} بسته شد.")
+        else:
+            await query.edit_message_text(ERRORS["invalid"])
+        return
+    
+    offer = trade_engine.get_offer(offer_id)
+    if offer is None or offer.to_user != user_id:
+        await query.edit_message_text(ERRORS["invalid"])
+        return
+    
+    # خرید/حمله همزمان هیچ‌کدام از دو طرف وسط تسویه اجرا نشود
+    async with user_locks.hold(offer.from_user, offer.to_user):
+        status, offer = trade_engine.accept(offer_id, user_id)
+    
+    if status != "ok":
+        await query.edit_message_text(ERRORS.get(status, ERRORS["error"]))
+        return
+    await query.edit_message_text(f"✅ معامله انجام شد.\n\n{format_offer(offer)}", parse_mode="HTML")
+    try:
+        await context.bot.send_message(offer.from_user, f"✅ پیشنهاد #{offer_id} شما پذیرفته شد.")
+    except Exception as e:
+        logger.warning("Could not notify user %s about trade #%s: %s", offer.from_user, offer_id, e)
+
+
+trade_callback_handler = CallbackQueryHandler(trade_callback, pattern=r"^trade_(accept|reject|cancel)_\d+$")
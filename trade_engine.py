@@ -0,0 +1,307 @@
+# utils/trade_engine.py
+"""
+پیشنهاد معامله بین دو بازیکن (trade_offers)
+
+هر بسته آیتم به صورت آرایه فشرده (weapon_id, تعداد) ذخیره می‌شود: ۶ بایت برای هر
+قلم (uint16 + uint32، little-endian) با شناسه‌های ثابت utils.weapon_aliases.WEAPON_IDS؛
+سکه شناسه رزرو شده COINS_ID را دارد. خواندن یک بسته فقط struct.iter_unpack است و
+نیازی به parse کردن JSON نیست.
+"""
+
+import struct
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from database.db import db, Rollback
+from database.models import ARMORY_INITIAL_CAPACITY, _apply_armory_deltas
+from config.settings import TRADE_OFFER_TTL, TRADE_MAX_PENDING, TRADE_SWEEP_INTERVAL
+from utils.weapon_aliases import WEAPON_IDS, WEAPON_BY_ID
+from utils.leaderboard_service import leaderboards
+from utils.logger import logger
+
+COINS = "coins"
+COINS_ID = 0xFFFF
+_ITEM = struct.Struct("<HI")
+MAX_QUANTITY = 2 ** 32 - 1  # سقف uint32 هر قلم
+
+
+def encode_items(items: Dict[str, int]) -> bytes:
+    """{"💥 نور": 5, "coins": 100} -> بایت‌های فشرده (مرتب بر اساس شناسه)"""
+    pairs = sorted(
+        (COINS_ID if name == COINS else WEAPON_IDS[name], qty)
+        for name, qty in items.items() if qty > 0
+    )
+    return b"".join(_ITEM.pack(item_id, qty) for item_id, qty in pairs)
+
+
+def decode_items(blob: bytes) -> Dict[str, int]:
+    return {
+        COINS if item_id == COINS_ID else WEAPON_BY_ID[item_id]: qty
+        for item_id, qty in _ITEM.iter_unpack(bytes(blob))
+    }
+
+
+class TradeOffer(NamedTuple):
+    offer_id: int
+    from_user: int
+    to_user: int
+    offer_items: Dict[str, int]
+    request_items: Dict[str, int]
+    created_at: float
+
+
+class _TradeRace(Rollback):
+    """دارایی‌ها بین بررسی و تسویه تغییر کرد (پروسس دیگر)"""
+
+
+def _row_to_offer(row) -> TradeOffer:
+    return TradeOffer(
+        row['offer_id'], row['from_user'], row['to_user'],
+        decode_items(row['offer_items']), decode_items(row['request_items']), row['created_at']
+    )
+
+
+class TradeEngine:
+    """ثبت، پذیرش، رد و انقضای پیشنهادها
+    
+    هنگام ثبت فقط دارایی پیشنهاددهنده بررسی می‌شود و چیزی قفل نمی‌شود؛ هنگام پذیرش
+    دارایی و ظرفیت هر دو طرف با یک کوئری خوانده و کل جابه‌جایی در یک تراکنش انجام
+    می‌شود. پیشنهادهای قدیمی با یک UPDATE روی ایندکس (status, created_at) منقضی می‌شوند.
+    """
+    
+    def __init__(self):
+        self.last_sweep = 0.0
+    
+    # ==================== دارایی‌ها ====================
+    
+    @staticmethod
+    def _holdings(cursor, user_ids: Tuple[int, ...], weapons: List[str]) -> Dict[int, Dict[str, int]]:
+        """سلاح‌های مورد نیاز، سکه، جمع زرادخانه و ظرفیت هر کاربر با یک کوئری
+        
+        کلیدهای ویژه: "coins"، "#total"، "#capacity"
+        """
+        users = ",".join("?" * len(user_ids))
+        query = (
+            f"SELECT user_id, '{COINS}' AS item, coins AS qty FROM resources WHERE user_id IN ({users}) "
+            f"UNION ALL SELECT user_id, '#capacity', capacity FROM armory_meta WHERE user_id IN ({users}) "
+            f"UNION ALL SELECT user_id, '#total', SUM(count) FROM armory WHERE user_id IN ({users}) GROUP BY user_id"
+        )
+        params: List[object] = list(user_ids) * 3
+        if weapons:
+            query += (
+                f" UNION ALL SELECT user_id, weapon_name, count FROM armory "
+                f"WHERE user_id IN ({users}) AND weapon_name IN ({','.join('?' * len(weapons))})"
+            )
+            params += list(user_ids) + weapons
+        holdings: Dict[int, Dict[str, int]] = {user_id: {} for user_id in user_ids}
+        for row in cursor.execute(query, params).fetchall():
+            holdings[row['user_id']][row['item']] = row['qty'] or 0
+        return holdings
+    
+    @staticmethod
+    def _has(holding: Dict[str, int], items: Dict[str, int]) -> bool:
+        return all(holding.get(name, 0) >= qty for name, qty in items.items())
+    
+    @staticmethod
+    def _fits(holding: Dict[str, int], gained: Dict[str, int], lost: Dict[str, int]) -> bool:
+        """ظرفیت زرادخانه بعد از معامله (فقط اگر تعداد سلاح‌ها بیشتر شود)"""
+        net = sum(q for n, q in gained.items() if n != COINS) - sum(q for n, q in lost.items() if n != COINS)
+        if net <= 0:
+            return True
+        capacity = holding.get("#capacity", ARMORY_INITIAL_CAPACITY)
+        return holding.get("#total", 0) + net <= capacity
+    
+    # ==================== ثبت ====================
+    
+    def create_offer(self, from_user: int, to_user: int,
+                     offer_items: Dict[str, int], request_items: Dict[str, int]) -> Tuple[str, Optional[int]]:
+        """status: ok, invalid, stock, limit, error"""
+        self.maybe_sweep()
+        if from_user == to_user or not (offer_items or request_items):
+            return "invalid", None
+        if any(qty > MAX_QUANTITY for items in (offer_items, request_items) for qty in items.values()):
+            return "invalid", None
+        try:
+            offer_blob = encode_items(offer_items)
+            request_blob = encode_items(request_items)
+        except (KeyError, struct.error):
+            return "invalid", None
+        
+        try:
+            with db.get_cursor() as cursor:
+                pending = cursor.execute(
+                    "SELECT COUNT(*) AS count FROM trade_offers WHERE from_user = ? AND status = 'pending'",
+                    (from_user,)
+                ).fetchone()['count']
+                if pending >= TRADE_MAX_PENDING:
+                    return "limit", None
+                if not cursor.execute("SELECT 1 FROM users WHERE user_id = ?", (to_user,)).fetchone():
+                    return "invalid", None
+                holdings = self._holdings(cursor, (from_user,), [n for n in offer_items if n != COINS])
+                if not self._has(holdings[from_user], offer_items):
+                    return "stock", None
+                row = cursor.execute(
+                    "INSERT INTO trade_offers (from_user, to_user, offer_items, request_items, status, created_at) "
+                    "VALUES (?, ?, ?, ?, 'pending', ?) RETURNING offer_id",
+                    (from_user, to_user, offer_blob, request_blob, time.time())
+                ).fetchone()
+        except Exception as e:
+            logger.error("Error creating trade offer %s -> %s: %s", from_user, to_user, e)
+            return "error", None
+        
+        logger.info("Trade offer #%s: %s -> %s", row['offer_id'], from_user, to_user)
+        return "ok", row['offer_id']
+    
+    # ==================== خواندن ====================
+    
+    def get_offer(self, offer_id: int) -> Optional[TradeOffer]:
+        row = db.fetchone(
+            "SELECT offer_id, from_user, to_user, offer_items, request_items, created_at "
+            "FROM trade_offers WHERE offer_id = ? AND status = 'pending' AND created_at >= ?",
+            (offer_id, time.time() - TRADE_OFFER_TTL)
+        )
+        return _row_to_offer(row) if row else None
+    
+    def pending_for(self, user_id: int) -> Tuple[List[TradeOffer], List[TradeOffer]]:
+        """(پیشنهادهای دریافتی، پیشنهادهای ارسالی) در انتظار"""
+        self.maybe_sweep()
+        rows = db.fetchall(
+            "SELECT offer_id, from_user, to_user, offer_items, request_items, created_at FROM trade_offers "
+            "WHERE to_user = ? AND status = 'pending' "
+            "UNION ALL "
+            "SELECT offer_id, from_user, to_user, offer_items, request_items, created_at FROM trade_offers "
+            "WHERE from_user = ? AND status = 'pending' "
+            "ORDER BY offer_id",
+            (user_id, user_id)
+        )
+        offers = [_row_to_offer(row) for row in rows]
+        return [o for o in offers if o.to_user == user_id], [o for o in offers if o.from_user == user_id]
+    
+    # ==================== پذیرش ====================
+    
+    def accept(self, offer_id: int, user_id: int) -> Tuple[str, Optional[TradeOffer]]:
+        """status: ok, invalid, stock, wanted, capacity, error
+        
+        stock: پیشنهاددهنده دیگر آیتم‌ها را ندارد؛ wanted: پذیرنده آیتم‌های درخواستی را ندارد.
+        """
+        try:
+            with db.get_cursor() as cursor:
+                row = cursor.execute(
+                    "SELECT offer_id, from_user, to_user, offer_items, request_items, created_at FROM trade_offers "
+                    "WHERE offer_id = ? AND to_user = ? AND status = 'pending' AND created_at >= ?",
+                    (offer_id, user_id, time.time() - TRADE_OFFER_TTL)
+                ).fetchone()
+                if row is None:
+                    return "invalid", None
+                offer = _row_to_offer(row)
+                status = self._settle(cursor, offer)
+                if status != "ok":
+                    return status, offer
+        except _TradeRace as e:
+            logger.warning("Trade offer #%s changed during settlement: %s", offer_id, e)
+            return "stock", None
+        except Exception as e:
+            logger.error("Error accepting trade offer #%s: %s", offer_id, e)
+            return "error", None
+        
+        self._update_leaderboards(offer)
+        logger.info("Trade offer #%s completed: %s <-> %s", offer_id, offer.from_user, offer.to_user)
+        return "ok", offer
+    
+    def _settle(self, cursor, offer: TradeOffer) -> str:
+        sender, receiver = offer.from_user, offer.to_user
+        weapons = sorted({n for n in (*offer.offer_items, *offer.request_items) if n != COINS})
+        holdings = self._holdings(cursor, (sender, receiver), weapons)
+        if not self._has(holdings[sender], offer.offer_items):
+            return "stock"
+        if not self._has(holdings[receiver], offer.request_items):
+            return "wanted"
+        if not (self._fits(holdings[sender], offer.request_items, offer.offer_items)
+                and self._fits(holdings[receiver], offer.offer_items, offer.request_items)):
+            return "capacity"
+        
+        # از اینجا به بعد همه چیز در همین تراکنش نوشته یا با _TradeRace برگردانده می‌شود
+        cursor.execute(
+            "UPDATE trade_offers SET status = 'completed', completed_at = ? "
+            "WHERE offer_id = ? AND status = 'pending'",
+            (time.time(), offer.offer_id)
+        )
+        if cursor.rowcount == 0:
+            raise _TradeRace(f"offer #{offer.offer_id} already closed")
+        
+        deltas: Dict[Tuple[int, str], int] = {}
+        for giver, taker, items in ((sender, receiver, offer.offer_items), (receiver, sender, offer.request_items)):
+            for name, qty in items.items():
+                if name == COINS:
+                    cursor.execute(
+                        "UPDATE resources SET coins = coins - ? WHERE user_id = ? AND coins >= ?",
+                        (qty, giver, qty)
+                    )
+                    if cursor.rowcount == 0:
+                        raise _TradeRace(f"user {giver} coins")
+                    cursor.execute("UPDATE resources SET coins = coins + ? WHERE user_id = ?", (qty, taker))
+                else:
+                    cursor.execute(
+                        "UPDATE armory SET count = count - ? WHERE user_id = ? AND weapon_name = ? AND count >= ?",
+                        (qty, giver, name, qty)
+                    )
+                    if cursor.rowcount == 0:
+                        raise _TradeRace(f"user {giver} {name}")
+                    deltas[(taker, name)] = deltas.get((taker, name), 0) + qty
+        _apply_armory_deltas(cursor, deltas)
+        # ردیف‌هایی که با دادن سلاح صفر شدند
+        cursor.execute("DELETE FROM armory WHERE user_id IN (?, ?) AND count <= 0", (sender, receiver))
+        return "ok"
+    
+    @staticmethod
+    def _update_leaderboards(offer: TradeOffer):
+        for giver, taker, items in ((offer.from_user, offer.to_user, offer.offer_items),
+                                    (offer.to_user, offer.from_user, offer.request_items)):
+            for name, qty in items.items():
+                if name == COINS:
+                    leaderboards.adjust("coins", giver, -qty)
+                    leaderboards.adjust("coins", taker, qty)
+                else:
+                    leaderboards.adjust_armory([((giver, name), -qty), ((taker, name), qty)])
+    
+    # ==================== رد، لغو و انقضا ====================
+    
+    def close(self, offer_id: int, user_id: int) -> bool:
+        """رد (گیرنده) یا لغو (فرستنده) پیشنهاد"""
+        try:
+            with db.get_cursor() as cursor:
+                cursor.execute(
+                    "UPDATE trade_offers SET status = CASE WHEN to_user = ? THEN 'rejected' ELSE 'cancelled' END, "
+                    "completed_at = ? WHERE offer_id = ? AND status = 'pending' AND (to_user = ? OR from_user = ?)",
+                    (user_id, time.time(), offer_id, user_id, user_id)
+                )
+                return cursor.rowcount > 0
+        except Exception as e:
+            logger.error("Error closing trade offer #%s: %s", offer_id, e)
+            return False
+    
+    def sweep(self, now: Optional[float] = None) -> int:
+        """منقضی کردن پیشنهادهای در انتظار قدیمی‌تر از TRADE_OFFER_TTL (اسکن بازه ایندکس)"""
+        now = now or time.time()
+        self.last_sweep = now
+        with db.get_cursor() as cursor:
+            cursor.execute(
+                "UPDATE trade_offers SET status = 'expired' WHERE status = 'pending' AND created_at < ?",
+                (now - TRADE_OFFER_TTL,)
+            )
+            expired = cursor.rowcount
+        if expired:
+            logger.info("Expired %s trade offers", expired)
+        return expired
+    
+    def maybe_sweep(self):
+        # پذیرش خودش انقضا را بررسی می‌کند؛ sweep فقط وضعیت جدول را مرتب نگه می‌دارد
+        if time.time() - self.last_sweep >= TRADE_SWEEP_INTERVAL:
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error("Trade offer sweep failed: %s", e)
+
+
+# نمونه سینگلتون
+trade_engine = TradeEngine()
@@ -1,126 +1,67 @@
 # handlers/war.py
 import time
-import random
 from typing import Dict, List, Tuple
 
 from telegram import Update
 from telegram.ext import ContextTypes
 
 from database.models import (
-    add_user, get_armory_list, get_user_money, update_user_money
+    add_user, get_armory_list, get_user_money,
+    apply_armory_deltas, get_last_attack, settle_attack
 )
-from database.db import db
+from database.battle_log import record_battle
+from utils.pvp_rating import rating_engine
+from config.weapons import WEAPON_STATS
+from config.settings import SHARD_WORKERS
+from utils.battle_engine import battle_engine
+from utils.weapon_aliases import weapon_aliases
+from utils.events import event_bus, ATTACK
+from handlers.achievements import unlock_lines
 from utils.logger import logger
 from utils.log_manager import get_log_manager
+from utils.locks import user_locks
+from utils.scheduler import scheduler, Job
 
 # Cooldown (ثانیه)
 ATTACK_COOLDOWN = 300  # 5 دقیقه
 _last_attack_time: Dict[int, float] = {}
 
-WEAPON_STATS = {
-    # موشک‌ها
-    "💥 نور": {"attack": 50, "defense": 0},
-    "💥 قدر": {"attack": 65, "defense": 0},
-    "💥 سومار": {"attack": 78, "defense": 0},
-    "💥 کالیبر": {"attack": 90, "defense": 0},
-    "💥 زیرکان": {"attack": 120, "defense": 0},
-    "💥 تاماهاک": {"attack": 110, "defense": 0},
-    "🎯 شهاب": {"attack": 140, "defense": 0},
-    "🎯 سجیل": {"attack": 160, "defense": 0},
-    "🎯 خرمشهر": {"attack": 180, "defense": 0},
-    "🎯 فاتح-۱۱۰": {"attack": 400, "defense": 0},
-    "🎯 خیبر شکن": {"attack": 450, "defense": 0},
-    "🎯 ذوالفقار": {"attack": 500, "defense": 0},
-    "🎯 واردن": {"attack": 550, "defense": 0},
-    "🎯 یارس": {"attack": 600, "defense": 0},
-    "🎯 شیطان": {"attack": 700, "defense": 0},
-    "⚡ فتاح": {"attack": 800, "defense": 0},
-    "⚡ وانگارد": {"attack": 900, "defense": 0},
-    "⚡ دانگ فنگ": {"attack": 1000, "defense": 0},
-    "⚡ هایپر۱": {"attack": 1100, "defense": 0},
-    "⚡ هایپر۲": {"attack": 1200, "defense": 0},
-    "⚡ هایپر۳": {"attack": 1300, "defense": 0},
-    "⚡ هایپر۴": {"attack": 1400, "defense": 0},
-    "⚡ هایپر۵": {"attack": 1500, "defense": 0},
-    "⚡ هایپر۶": {"attack": 1600, "defense": 0},
-    "☢️ تزار": {"attack": 2000, "defense": 0},
-    "☢️ موشک۲": {"attack": 2200, "defense": 0},
-    "☢️ موشک۳": {"attack": 2400, "defense": 0},
-    "☢️ موشک۴": {"attack": 2600, "defense": 0},
-    "☢️ موشک۵": {"attack": 2800, "defense": 0},
-    "☢️ موشک۶": {"attack": 3000, "defense": 0},
-    "☢️ موشک۷": {"attack": 3200, "defense": 0},
-    "☢️ موشک۸": {"attack": 3400, "defense": 0},
-    "☢️ موشک۹": {"attack": 4000, "defense": 0},
-    # پدافند
-    "🪖 مرصاد": {"attack": 0, "defense": 100},
-    "🛰️ باور-۳۷۳": {"attack": 0, "defense": 180},
-    "☢️ S-300": {"attack": 0, "defense": 160},
-    "🛡️ گنبد آهنین": {"attack": 0, "defense": 80},
-    "🧨 باراک": {"attack": 0, "defense": 100},
-    "🧱 تاد": {"attack": 0, "defense": 150},
-    "⚙️ فلاخان داوود": {"attack": 0, "defense": 70},
-    "🪖 S-400": {"attack": 0, "defense": 200},
-}
-
-STEAL_RATIO = 0.08
-
 
 def get_now() -> float:
     return time.time()
 
 
-def can_attack(user_id: int) -> Tuple[bool, int]:
-    last = _last_attack_time.get(user_id, 0)
-    elapsed = get_now() - last
-    if elapsed >= ATTACK_COOLDOWN:
-        return True, 0
-    return False, int(ATTACK_COOLDOWN - elapsed)
+def attack_wait(user_id: int) -> int:
+    """ثانیه‌های باقی‌مانده از cooldown محلی (0 = مجاز)؛ ثبت زمان بعد از commit حمله انجام می‌شود"""
+    elapsed = get_now() - _last_attack_time.get(user_id, 0)
+    return max(0, int(ATTACK_COOLDOWN - elapsed))
+
+
+def shared_attack_wait(user_id: int) -> int:
+    """ثانیه‌های باقی‌مانده وقتی worker دیگری زودتر حمله را ثبت کرده است"""
+    elapsed = get_now() - get_last_attack(user_id)
+    return max(1, int(ATTACK_COOLDOWN - elapsed))
+
 
+def _expire_cooldowns(job: Job):
+    """حذف cooldown های تمام شده تا دیکشنری با تعداد کل مهاجم‌ها بزرگ نشود"""
+    cutoff = get_now() - ATTACK_COOLDOWN
+    expired = [user_id for user_id, last in _last_attack_time.items() if last < cutoff]
+    for user_id in expired:
+        del _last_attack_time[user_id]
 
-def set_attack_time(user_id: int):
-    _last_attack_time[user_id] = get_now()
+
+scheduler.every("attack_cooldowns", ATTACK_COOLDOWN, _expire_cooldowns, jitter=ATTACK_COOLDOWN / 10)
 
 
 def compute_power_from_armory(armory: List[Tuple[str, int]]) -> Tuple[int, int]:
-    atk = 0
-    dfs = 0
-    for name, qty in armory:
-        stats = WEAPON_STATS.get(name)
-        if not stats:
-            continue
-        atk += stats.get("attack", 0) * qty
-        dfs += stats.get("defense", 0) * qty
-    return int(atk), int(dfs)
+    return battle_engine.armory_power(armory)
 
 
 def remove_weapons_from_armory(user_id: int, weapon_losses: Dict[str, int]):
-    try:
-        with db.get_cursor() as cursor:
-            for w, lost in weapon_losses.items():
-                if lost <= 0:
-                    continue
-                row = cursor.execute(
-                    "SELECT count FROM armory WHERE user_id=? AND weapon_name=?",
-                    (user_id, w)
-                ).fetchone()
-                if not row:
-                    continue
-                cur = row["count"]
-                new_amount = max(0, cur - lost)
-                if new_amount == 0:
-                    cursor.execute(
-                        "DELETE FROM armory WHERE user_id=? AND weapon_name=?",
-                        (user_id, w)
-                    )
-                else:
-                    cursor.execute(
-                        "UPDATE armory SET count=? WHERE user_id=? AND weapon_name=?",
-                        (new_amount, user_id, w)
-                    )
-        logger.info(f"Removed weapons from user {user_id}: {weapon_losses}")
-    except Exception as e:
-        logger.error(f"Error removing weapons for user {user_id}: {e}")
+    deltas = {(user_id, w): -lost for w, lost in weapon_losses.items() if lost > 0}
+    if apply_armory_deltas(deltas):
+        logger.info("Removed weapons from user %s: %s", user_id, weapon_losses)
 
 
 # 🎯 هندلر دستور "حمله [موشک]"
@@ -162,118 +103,66 @@ async def attack_text_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
     
     missile_name = parts[1].strip()
     
-    # بررسی موشک در زرادخانه مهاجم
-    attacker_armory = get_armory_list(attacker_id)
-    
-    if not attacker_armory:
-        await msg.reply_text("❌ تو هیچ سلاحی نداری که حمله کنی.")
-        return
-    
-    # پیدا کردن موشک مورد نظر در زرادخانه
-    missile_found = None
-    missile_qty = 0
-    
-    # نرمال‌سازی نام موشک (حذف فاصله‌های اضافی)
-    missile_name_clean = missile_name.strip().lower()
-    
-    # چک کردن با emoji و بدون emoji
-    for weapon, qty in attacker_armory:
-        weapon_clean = weapon.lower()
+    # مهاجم و مدافع قفل می‌شوند تا دو حمله همزمان هر دو از cooldown و موجودی عبور نکنند
+    async with user_locks.hold(attacker_id, target_id):
+        # بررسی موشک در زرادخانه مهاجم
+        attacker_armory = get_armory_list(attacker_id)
         
-        # بررسی نام کامل
-        if missile_name_clean == weapon_clean:
-            missile_found = weapon
-            missile_qty = qty
-            break
+        if not attacker_armory:
+            await msg.reply_text("❌ تو هیچ سلاحی نداری که حمله کنی.")
+            return
         
-        # بررسی نام بدون emoji (مثلاً "نور" در "💥 نور")
-        weapon_without_emoji = weapon.split()[-1].lower()  # آخرین کلمه
-        if missile_name_clean == weapon_without_emoji:
-            missile_found = weapon
-            missile_qty = qty
-            break
+        # پیدا کردن موشک مورد نظر (یک lookup در ایندکس نام‌ها + بررسی موجودی)
+        missile_found = weapon_aliases.resolve(missile_name)
         
-        # بررسی اینکه نام موشک در نام سلاح وجود دارد
-        if missile_name_clean in weapon_clean:
-            missile_found = weapon
-            missile_qty = qty
-            break
-    
-    if not missile_found:
-        await msg.reply_text(f"❌ موشک '{missile_name}' در زرادخانه‌ات پیدا نشد!\n\nبرای مشاهده موشک‌هایت به زرادخانه برو.")
-        return
-    
-    # بررسی اینکه موشک انتخابی یک سلاح تهاجمی است (نه پدافند)
-    stats = WEAPON_STATS.get(missile_found)
-    if not stats or stats.get("attack", 0) <= 0:
-        await msg.reply_text(f"❌ {missile_found} یک موشک تهاجمی نیست!")
-        return
-
-    # Cooldown
-    ok, wait = can_attack(attacker_id)
-    if not ok:
-        await msg.reply_text(f"⏳ باید {wait} ثانیه صبر کنی تا دوباره حمله کنی.")
-        return
-
-    target_username = target_user.username
-    add_user(target_id, target_username)
-    target_armory = get_armory_list(target_id)
-
-    # محاسبه قدرت حمله فقط بر اساس موشک انتخابی
-    atk_power = stats.get("attack", 0)
-    _, def_power = compute_power_from_armory(target_armory)
-
-    variance_atk = random.uniform(0.9, 1.1)
-    variance_def = random.uniform(0.9, 1.1)
-    final_atk = int(atk_power * variance_atk)
-    final_def = int(def_power * variance_def)
-    damage = max(0, final_atk - final_def)
-
-    target_balance = get_user_money(target_id)
-    stolen = min(target_balance, max(0, int(damage * STEAL_RATIO)))
-
-    try:
-        if stolen > 0:
-            update_user_money(target_id, target_balance - stolen)
-            attacker_balance = get_user_money(attacker_id)
-            update_user_money(attacker_id, attacker_balance + stolen)
-    except Exception as e:
-        logger.error(f"Transaction failed: {e}")
-        await msg.reply_text("❌ خطا در محاسبه‌ی غنیمت.")
-        return
-
-    # استفاده از موشک (کاهش 1 عدد از زرادخانه مهاجم)
-    try:
-        with db.get_cursor() as cursor:
-            new_qty = missile_qty - 1
-            if new_qty <= 0:
-                cursor.execute(
-                    "DELETE FROM armory WHERE user_id=? AND weapon_name=?",
-                    (attacker_id, missile_found)
-                )
+        if not missile_found:
+            candidates = weapon_aliases.ambiguous(missile_name)
+            if candidates:
+                await msg.reply_text(f"❓ نام '{missile_name}' مبهم است. یکی را دقیق بنویس: {'، '.join(candidates)}")
             else:
-                cursor.execute(
-                    "UPDATE armory SET count=? WHERE user_id=? AND weapon_name=?",
-                    (new_qty, attacker_id, missile_found)
-                )
-        logger.info(f"User {attacker_id} used 1x {missile_found} in attack")
-    except Exception as e:
-        logger.error(f"Error using missile: {e}")
-
-    weapon_losses = {}
-    if damage > 0:
-        for w_name, qty in target_armory:
-            stats_def = WEAPON_STATS.get(w_name)
-            if not stats_def:
-                continue
-            if stats_def.get("defense", 0) > 0 and qty > 0:
-                loss = random.randint(0, min(2, qty))
-                if loss > 0:
-                    weapon_losses[w_name] = weapon_losses.get(w_name, 0) + loss
-        if weapon_losses:
-            remove_weapons_from_armory(target_id, weapon_losses)
-
-    set_attack_time(attacker_id)
+                await msg.reply_text(f"❌ موشکی با نام '{missile_name}' وجود ندارد!")
+            return
+        
+        if missile_found not in dict(attacker_armory):
+            await msg.reply_text(f"❌ موشک '{missile_name}' در زرادخانه‌ات پیدا نشد!\n\nبرای مشاهده موشک‌هایت به زرادخانه برو.")
+            return
+        
+        # بررسی اینکه موشک انتخابی یک سلاح تهاجمی است (نه پدافند)
+        stats = WEAPON_STATS.get(missile_found)
+        if not stats or stats.get("attack", 0) <= 0:
+            await msg.reply_text(f"❌ {missile_found} یک موشک تهاجمی نیست!")
+            return
+        
+        wait = attack_wait(attacker_id)
+        if wait:
+            await msg.reply_text(f"⏳ باید {wait} ثانیه صبر کنی تا دوباره حمله کنی.")
+            return
+        
+        target_username = target_user.username
+        add_user(target_id, target_username)
+        target_armory = get_armory_list(target_id)
+        
+        # محاسبه نتیجه نبرد فقط بر اساس موشک انتخابی
+        outcome = battle_engine.resolve(missile_found, target_armory, get_user_money(target_id))
+        final_atk, final_def, damage, stolen, weapon_losses = outcome
+        
+        # cooldown، مصرف موشک، غنیمت و تلفات مدافع در یک تراکنش؛ حمله در گروه‌های مختلف ممکن است
+        # به worker های مختلف برسد و UPSERT شرطی cooldown فقط یکی را می‌پذیرد
+        now = get_now()
+        status = settle_attack(
+            attacker_id, target_id, missile_found, stolen, weapon_losses,
+            now, ATTACK_COOLDOWN if SHARD_WORKERS > 1 else None
+        )
+        if status == "cooldown":
+            await msg.reply_text(f"⏳ باید {shared_attack_wait(attacker_id)} ثانیه صبر کنی تا دوباره حمله کنی.")
+            return
+        if status == "missile":
+            await msg.reply_text(f"❌ موشک '{missile_name}' در زرادخانه‌ات پیدا نشد!\n\nبرای مشاهده موشک‌هایت به زرادخانه برو.")
+            return
+        if status != "ok":
+            await msg.reply_text("❌ خطا در محاسبه‌ی غنیمت.")
+            return
+        _last_attack_time[attacker_id] = now
 
     attacker_name = f"@{attacker.username}" if attacker.username else attacker.first_name
     target_name = f"@{target_user.username}" if target_user.username else target_user.first_name
@@ -294,12 +183,30 @@ async def attack_text_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
         losses_text = "، ".join([f"{v}× {k}" for k, v in weapon_losses.items()])
         result_lines.append(f"🧨 تلفات مدافع: {losses_text}")
 
-    if damage > 0 and stolen > 0:
+    if outcome.attacker_won:
         result_lines.append(f"🏆 نتیجه: پیروزی برای {attacker_name} 🎉")
         result_text = "پیروزی"
+        winner_id = attacker_id
     else:
         result_lines.append("🛡️ نتیجه: دفاع موفق — حمله ناکام ماند.")
         result_text = "دفاع موفق"
+        winner_id = target_id
+
+    loser_id = target_id if winner_id == attacker_id else attacker_id
+    change = rating_engine.record_result(winner_id, loser_id)
+    if winner_id == attacker_id:
+        attacker_delta, target_delta = change.gain, -change.loss
+        result_lines.append(f"📈 امتیاز {attacker_name}: {change.winner_rating} (+{change.gain})")
+    else:
+        attacker_delta, target_delta = -change.loss, change.gain
+        result_lines.append(f"📉 امتیاز {attacker_name}: {change.loser_rating}")
+
+    record_battle(
+        attacker_id, target_id, winner_id, final_atk, final_def, stolen,
+        attacker_delta, target_delta
+    )
+    event_bus.publish(ATTACK, attacker_id, won=winner_id == attacker_id, target=target_id, coins=stolen)
+    result_lines += unlock_lines(attacker_id)
 
     await msg.reply_text("\n".join(result_lines))
     
@@ -0,0 +1,194 @@
+# utils/weapon_aliases.py
+"""
+ایندکس نام‌های مستعار سلاح‌ها برای تشخیص سریع نام موشک در دستور حمله
+"""
+
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from config.weapons import WEAPON_STATS
+from utils.logger import logger
+
+# شناسه ثابت هر سلاح؛ در بسته‌های معامله (BLOB) ذخیره می‌شود، پس فقط اضافه کنید:
+# شناسه‌ها را عوض یا دوباره استفاده نکنید و سلاح حذف شده را از این جدول پاک نکنید.
+WEAPON_IDS: Dict[str, int] = {
+    "💥 نور": 0,
+    "💥 قدر": 1,
+    "💥 سومار": 2,
+    "💥 کالیبر": 3,
+    "💥 زیرکان": 4,
+    "💥 تاماهاک": 5,
+    "🎯 شهاب": 6,
+    "🎯 سجیل": 7,
+    "🎯 خرمشهر": 8,
+    "🎯 فاتح-۱۱۰": 9,
+    "🎯 خیبر شکن": 10,
+    "🎯 ذوالفقار": 11,
+    "🎯 واردن": 12,
+    "🎯 یارس": 13,
+    "🎯 شیطان": 14,
+    "⚡ فتاح": 15,
+    "⚡ وانگارد": 16,
+    "⚡ دانگ فنگ": 17,
+    "⚡ هایپر۱": 18,
+    "⚡ هایپر۲": 19,
+    "⚡ هایپر۳": 20,
+    "⚡ هایپر۴": 21,
+    "⚡ هایپر۵": 22,
+    "⚡ هایپر۶": 23,
+    "☢️ تزار": 24,
+    "☢️ موشک۲": 25,
+    "☢️ موشک۳": 26,
+    "☢️ موشک۴": 27,
+    "☢️ موشک۵": 28,
+    "☢️ موشک۶": 29,
+    "☢️ موشک۷": 30,
+    "☢️ موشک۸": 31,
+    "☢️ موشک۹": 32,
+    "🪖 مرصاد": 33,
+    "🛰️ باور-۳۷۳": 34,
+    "☢️ S-300": 35,
+    "🛡️ گنبد آهنین": 36,
+    "🧨 باراک": 37,
+    "🧱 تاد": 38,
+    "⚙️ فلاخان داوود": 39,
+    "🪖 S-400": 40,
+}
+WEAPON_BY_ID: Dict[int, str] = {weapon_id: name for name, weapon_id in WEAPON_IDS.items()}
+WEAPON_NAMES: List[str] = list(WEAPON_STATS)
+
+if len(WEAPON_BY_ID) != len(WEAPON_IDS):
+    raise ValueError("duplicate weapon ids in WEAPON_IDS")
+_untradable = [name for name in WEAPON_STATS if name not in WEAPON_IDS]
+if _untradable:
+    logger.warning("Weapons without a WEAPON_IDS entry cannot be traded or named in commands: %s", _untradable)
+
+# نگاشت حروف عربی به فارسی
+_CHAR_MAP = str.maketrans({
+    "ي": "ی", "ى": "ی", "ئ": "ی",
+    "ك": "ک",
+    "ة": "ه", "ۀ": "ه",
+    "أ": "ا", "إ": "ا", "آ": "ا",
+})
+
+# آوانویسی‌های رایج (لاتین و فینگلیش)
+TRANSLITERATIONS: Dict[str, Tuple[str, ...]] = {
+    "💥 نور": ("noor", "nour", "nur"),
+    "💥 قدر": ("ghadr", "qadr", "ghadar"),
+    "💥 سومار": ("soumar", "sumar", "somar"),
+    "💥 کالیبر": ("kalibr", "kalibar", "caliber", "kaliber"),
+    "💥 زیرکان": ("zircon", "zirkon", "zirkan"),
+    "💥 تاماهاک": ("tomahawk", "tomahak", "tamahak"),
+    "🎯 شهاب": ("shahab",),
+    "🎯 سجیل": ("sejjil", "sejil", "sajil"),
+    "🎯 خرمشهر": ("khorramshahr", "khoramshahr"),
+    "🎯 فاتح-۱۱۰": ("fateh-110", "fateh110"),
+    "🎯 خیبر شکن": ("kheibar shekan", "kheybar shekan", "kheibarshekan"),
+    "🎯 ذوالفقار": ("zolfaghar", "zulfiqar", "zolfaqar"),
+    "🎯 واردن": ("warden", "varden"),
+    "🎯 یارس": ("yars",),
+    "🎯 شیطان": ("satan", "sheytan", "sheitan"),
+    "⚡ فتاح": ("fattah", "fatah"),
+    "⚡ وانگارد": ("avangard", "vanguard", "vangard"),
+    "⚡ دانگ فنگ": ("dongfeng", "dong feng", "df"),
+    "⚡ هایپر۱": ("hyper1", "hyper 1"),
+    "⚡ هایپر۲": ("hyper2", "hyper 2"),
+    "⚡ هایپر۳": ("hyper3", "hyper 3"),
+    "⚡ هایپر۴": ("hyper4", "hyper 4"),
+    "⚡ هایپر۵": ("hyper5", "hyper 5"),
+    "⚡ هایپر۶": ("hyper6", "hyper 6"),
+    "☢️ تزار": ("tsar", "tzar", "tsar bomba"),
+    "☢️ موشک۲": ("moshak2", "missile2"),
+    "☢️ موشک۳": ("moshak3", "missile3"),
+    "☢️ موشک۴": ("moshak4", "missile4"),
+    "☢️ موشک۵": ("moshak5", "missile5"),
+    "☢️ موشک۶": ("moshak6", "missile6"),
+    "☢️ موشک۷": ("moshak7", "missile7"),
+    "☢️ موشک۸": ("moshak8", "missile8"),
+    "☢️ موشک۹": ("moshak9", "missile9"),
+    "🪖 مرصاد": ("mersad",),
+    "🛰️ باور-۳۷۳": ("bavar-373", "bavar373", "bavar"),
+    "☢️ S-300": ("اس۳۰۰", "اس-۳۰۰"),
+    "🛡️ گنبد آهنین": ("iron dome", "gonbad ahanin"),
+    "🧨 باراک": ("barak",),
+    "🧱 تاد": ("thaad", "tad", "تااد"),
+    "⚙️ فلاخان داوود": ("davids sling", "david's sling", "falakhan davood"),
+    "🪖 S-400": ("اس۴۰۰", "اس-۴۰۰"),
+}
+
+
+def normalize(text: str) -> str:
+    """کلید نرمال‌شده یک نام
+    
+    فقط حروف و اعداد نگه داشته می‌شوند (ایموجی، فاصله، خط تیره و نیم‌فاصله حذف)،
+    ارقام فارسی/عربی به لاتین و حروف عربی به فارسی تبدیل می‌شوند.
+    """
+    out = []
+    for ch in text.translate(_CHAR_MAP):
+        category = unicodedata.category(ch)
+        if category == "Nd":
+            out.append(str(unicodedata.digit(ch)))
+        elif category[0] in ("L", "N"):
+            out.append(ch)
+    return "".join(out).casefold()
+
+
+def strip_emoji(name: str) -> str:
+    """نام بدون ایموجی ابتدایی (مثلاً "نور" در "💥 نور")"""
+    parts = name.split(maxsplit=1)
+    if len(parts) == 2 and not any(ch.isalnum() for ch in parts[0]):
+        return parts[1]
+    return name
+
+
+def weapon_forms(name: str) -> Set[str]:
+    """همه شکل‌های نرمال‌شده یک نام سلاح"""
+    forms = {name, strip_emoji(name)}
+    forms.update(TRANSLITERATIONS.get(name, ()))
+    return {key for key in map(normalize, forms) if key}
+
+
+class WeaponAliasIndex:
+    """نگاشت نام مستعار نرمال‌شده -> شناسه ثابت سلاح (WEAPON_IDS)
+    
+    نام‌هایی که به بیش از یک سلاح می‌رسند هنگام ساخت ایندکس حذف و جداگانه نگه داشته می‌شوند.
+    """
+    
+    def __init__(self, names: Iterable[str] = WEAPON_NAMES):
+        candidates: Dict[str, Set[int]] = {}
+        for name in names:
+            weapon_id = WEAPON_IDS.get(name)
+            if weapon_id is None:
+                continue  # هنگام import هشدار داده شده است
+            for key in weapon_forms(name):
+                candidates.setdefault(key, set()).add(weapon_id)
+        
+        self._aliases: Dict[str, int] = {}
+        self._ambiguous: Dict[str, Tuple[int, ...]] = {}
+        for key, ids in candidates.items():
+            if len(ids) == 1:
+                self._aliases[key] = next(iter(ids))
+            else:
+                self._ambiguous[key] = tuple(sorted(ids))
+        
+        if self._ambiguous:
+            logger.warning("Ambiguous weapon aliases: %s", sorted(self._ambiguous))
+    
+    def __len__(self) -> int:
+        return len(self._aliases)
+    
+    def lookup(self, text: str) -> Optional[int]:
+        """شناسه سلاح برای متن ورودی یا None"""
+        return self._aliases.get(normalize(text))
+    
+    def resolve(self, text: str) -> Optional[str]:
+        """نام کامل سلاح برای متن ورودی یا None"""
+        weapon_id = self.lookup(text)
+        return WEAPON_BY_ID[weapon_id] if weapon_id is not None else None
+    
+    def ambiguous(self, text: str) -> List[str]:
+        """سلاح‌هایی که یک نام مبهم به آن‌ها اشاره دارد"""
+        return [WEAPON_BY_ID[weapon_id] for weapon_id in self._ambiguous.get(normalize(text), ())]
+
+
+weapon_aliases = WeaponAliasIndex()
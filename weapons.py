@@ -0,0 +1,50 @@
+# config/weapons.py
+"""
+مشخصات سلاح‌ها (قدرت حمله و دفاع)
+"""
+
+WEAPON_STATS = {
+    # موشک‌ها
+    "💥 نور": {"attack": 50, "defense": 0},
+    "💥 قدر": {"attack": 65, "defense": 0},
+    "💥 سومار": {"attack": 78, "defense": 0},
+    "💥 کالیبر": {"attack": 90, "defense": 0},
+    "💥 زیرکان": {"attack": 120, "defense": 0},
+    "💥 تاماهاک": {"attack": 110, "defense": 0},
+    "🎯 شهاب": {"attack": 140, "defense": 0},
+    "🎯 سجیل": {"attack": 160, "defense": 0},
+    "🎯 خرمشهر": {"attack": 180, "defense": 0},
+    "🎯 فاتح-۱۱۰": {"attack": 400, "defense": 0},
+    "🎯 خیبر شکن": {"attack": 450, "defense": 0},
+    "🎯 ذوالفقار": {"attack": 500, "defense": 0},
+    "🎯 واردن": {"attack": 550, "defense": 0},
+    "🎯 یارس": {"attack": 600, "defense": 0},
+    "🎯 شیطان": {"attack": 700, "defense": 0},
+    "⚡ فتاح": {"attack": 800, "defense": 0},
+    "⚡ وانگارد": {"attack": 900, "defense": 0},
+    "⚡ دانگ فنگ": {"attack": 1000, "defense": 0},
+    "⚡ هایپر۱": {"attack": 1100, "defense": 0},
+    "⚡ هایپر۲": {"attack": 1200, "defense": 0},
+    "⚡ هایپر۳": {"attack": 1300, "defense": 0},
+    "⚡ هایپر۴": {"attack": 1400, "defense": 0},
+    "⚡ هایپر۵": {"attack": 1500, "defense": 0},
+    "⚡ هایپر۶": {"attack": 1600, "defense": 0},
+    "☢️ تزار": {"attack": 2000, "defense": 0},
+    "☢️ موشک۲": {"attack": 2200, "defense": 0},
+    "☢️ موشک۳": {"attack": 2400, "defense": 0},
+    "☢️ موشک۴": {"attack": 2600, "defense": 0},
+    "☢️ موشک۵": {"attack": 2800, "defense": 0},
+    "☢️ موشک۶": {"attack": 3000, "defense": 0},
+    "☢️ موشک۷": {"attack": 3200, "defense": 0},
+    "☢️ موشک۸": {"attack": 3400, "defense": 0},
+    "☢️ موشک۹": {"attack": 4000, "defense": 0},
+    # پدافند
+    "🪖 مرصاد": {"attack": 0, "defense": 100},
+    "🛰️ باور-۳۷۳": {"attack": 0, "defense": 180},
+    "☢️ S-300": {"attack": 0, "defense": 160},
+    "🛡️ گنبد آهنین": {"attack": 0, "defense": 80},
+    "🧨 باراک": {"attack": 0, "defense": 100},
+    "🧱 تاد": {"attack": 0, "defense": 150},
+    "⚙️ فلاخان داوود": {"attack": 0, "defense": 70},
+    "🪖 S-400": {"attack": 0, "defense": 200},
+}
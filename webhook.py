@@ -0,0 +1,225 @@
+# utils/webhook.py
+"""
+حالت webhook چندپروسسی: پروسس جلو آپدیت‌ها را بر اساس user_id (و chat_id در گروه‌ها)
+بین N پروسس worker پخش می‌کند
+
+آپدیت‌های یک کاربر (و همه حمله‌های یک گروه) همیشه به یک worker می‌رسند و آنجا به
+ترتیب اجرا می‌شوند؛ هماهنگی بین worker ها فقط از طریق SQLite (WAL) و صف‌های
+multiprocessing است. اجرا:
+    SHARD_WORKERS=4 WEBHOOK_URL=https://example.com/telegram python -m utils.webhook
+"""
+
+import asyncio
+import hmac
+import json
+import multiprocessing
+import os
+import queue
+import signal
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+from config.settings import (
+    BOT_API_URL, BOT_TOKEN, SHARD_WORKERS, SHARD_QUEUE_SIZE, WEBHOOK_URL, WEBHOOK_HOST, WEBHOOK_PORT,
+    WEBHOOK_SECRET, LOG_FILE, METRICS_PORT
+)
+from utils.logger import logger
+
+GROUP_TYPES = ("group", "supergroup")
+
+
+def shard_key(update: Dict[str, Any]) -> int:
+    """chat_id برای گروه‌ها (جنگ گروهی)، user_id برای بقیه"""
+    payload = next((value for key, value in update.items() if key != "update_id" and isinstance(value, dict)), None)
+    if payload is None:
+        return 0
+    # callback_query پیام را داخل خودش دارد
+    message = payload.get("message") if isinstance(payload.get("message"), dict) else payload
+    chat = message.get("chat") or {}
+    if chat.get("type") in GROUP_TYPES:
+        return chat["id"]
+    user = payload.get("from") or {}
+    return user.get("id") or chat.get("id") or 0
+
+
+def shard_for(update: Dict[str, Any], workers: int) -> int:
+    return shard_key(update) % workers
+
+
+class WebhookFront:
+    """سرور HTTP سبک (بدون وابستگی) که بدنه خام آپدیت را در صف worker مربوطه می‌گذارد
+    
+    پاسخ 503 در صورت پر بودن صف باعث می‌شود تلگرام همان آپدیت را دوباره بفرستد.
+    """
+    
+    def __init__(self, queues: List[multiprocessing.Queue], path: str, secret: str = ""):
+        self.queues = queues
+        self.path = path or "/"
+        self.secret = secret
+        self.accepted = 0
+        self.rejected = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+    
+    def _accept(self, request_line: bytes, headers: Dict[str, str], body: bytes) -> str:
+        parts = request_line.split()
+        if len(parts) < 2 or parts[0] != b"POST" or parts[1].decode("latin-1").split("?")[0] != self.path:
+            return "404 Not Found"
+        if self.secret and not hmac.compare_digest(
+                headers.get("x-telegram-bot-api-secret-token", ""), self.secret):
+            return "403 Forbidden"
+        try:
+            update = json.loads(body)
+        except ValueError:
+            return "400 Bad Request"
+        try:
+            # بدنه خام ارسال می‌شود تا worker خودش آن را parse کند (pickle ارزان‌تر)
+            self.queues[shard_for(update, len(self.queues))].put_nowait(body)
+        except queue.Full:
+            self.rejected += 1
+            return "503 Service Unavailable"
+        self.accepted += 1
+        return "200 OK"
+    
+    async def _handle_http(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            # تلگرام اتصال را باز نگه می‌دارد؛ چند درخواست پشت سر هم روی یک اتصال
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                status = self._accept(request_line, headers, body)
+                writer.write(f"HTTP/1.1 {status}\r\nContent-Length: 0\r\n\r\n".encode())
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+    
+    async def start(self, host: str, port: int):
+        self._server = await asyncio.start_server(self._handle_http, host, port)
+        logger.info("Webhook front listening on %s:%s%s (%s workers)", host, port, self.path, len(self.queues))
+    
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+
+# ==================== Worker ====================
+
+def _worker_env(index: int) -> Dict[str, str]:
+    """فایل لاگ و پورت metrics جدا برای هر worker"""
+    env = {}
+    if LOG_FILE:
+        root, ext = os.path.splitext(LOG_FILE)
+        env["LOG_FILE"] = f"{root}.worker{index}{ext}"
+    if METRICS_PORT:
+        env["METRICS_PORT"] = str(METRICS_PORT + 1 + index)
+    return env
+
+
+async def _run_worker(index: int, updates: multiprocessing.Queue):
+    from telegram import Update
+    from utils.startup import build_application, startup
+    
+    startup.primary = index == 0
+    application = build_application(polling=False)
+    await application.initialize()
+    await startup.post_init(application)
+    await application.start()
+    logger.info("Worker %s ready (primary=%s)", index, startup.primary)
+    
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            body = await loop.run_in_executor(None, updates.get)
+            if body is None:
+                break
+            try:
+                update = Update.de_json(json.loads(body), application.bot)
+            except ValueError as e:
+                logger.error("Worker %s got an invalid update: %s", index, e)
+                continue
+            # پردازش ترتیبی در همین حلقه: ترتیب هر کاربر حفظ می‌شود و صف محدود پشت آن پر
+            # می‌شود (backpressure تا پروسس جلو و 503)
+            await application.process_update(update)
+    finally:
+        await application.stop()
+        await application.shutdown()
+        await startup.post_shutdown(application)
+
+
+def worker_main(index: int, updates: multiprocessing.Queue):
+    """نقطه ورود پروسس worker (spawn)"""
+    # توقف از طریق sentinel پروسس جلو انجام می‌شود
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_run_worker(index, updates))
+
+
+# ==================== Front ====================
+
+async def _set_webhook(url: str, secret: str):
+    from telegram import Bot, Update
+    
+    async with Bot(BOT_TOKEN, base_url=BOT_API_URL or "https://api.telegram.org/bot") as bot:
+        await bot.set_webhook(url, secret_token=secret or None, allowed_updates=Update.ALL_TYPES)
+    logger.info("Webhook set to %s", url)
+
+
+async def _run_front(queues: List[multiprocessing.Queue]):
+    front = WebhookFront(queues, urlparse(WEBHOOK_URL).path, WEBHOOK_SECRET)
+    await front.start(WEBHOOK_HOST, WEBHOOK_PORT)
+    await _set_webhook(WEBHOOK_URL, WEBHOOK_SECRET)
+    
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+    await front.stop()
+    logger.info("Webhook front stopped (accepted=%s, rejected=%s)", front.accepted, front.rejected)
+
+
+def run_sharded(workers: int = SHARD_WORKERS):
+    """اجرای پروسس جلو و N worker تا SIGINT/SIGTERM"""
+    if not WEBHOOK_URL:
+        raise RuntimeError("WEBHOOK_URL is not set")
+    
+    context = multiprocessing.get_context("spawn")
+    queues = [context.Queue(SHARD_QUEUE_SIZE) for _ in range(workers)]
+    processes = []
+    for index, updates in enumerate(queues):
+        # محیط پروسس spawn هنگام start از os.environ گرفته می‌شود
+        saved = dict(os.environ)
+        os.environ.update(_worker_env(index))
+        try:
+            process = context.Process(target=worker_main, args=(index, updates), name=f"bot-worker-{index}")
+            process.start()
+        finally:
+            os.environ.clear()
+            os.environ.update(saved)
+        processes.append(process)
+    
+    try:
+        asyncio.run(_run_front(queues))
+    finally:
+        for updates in queues:
+            updates.put(None)
+        for process in processes:
+            process.join(timeout=30)
+            if process.is_alive():
+                process.terminate()
+
+
+if __name__ == "__main__":
+    run_sharded()
@@ -0,0 +1,77 @@
+# handlers/wheel.py
+"""
+گردونه شانس: دکمه «🍀 گردونه» در منوی اصلی و دکمه شیشه‌ای چرخش
+"""
+
+import time
+
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import ContextTypes, CallbackQueryHandler
+
+from config.settings import WHEEL_SPIN_COST, WHEEL_STREAK_BONUS, WHEEL_STREAK_CAP
+from utils.wheel_engine import wheel, streak_multiplier
+from utils.locks import user_locks
+
+SPIN_MARKUP = InlineKeyboardMarkup([[InlineKeyboardButton("🎡 بچرخان!", callback_data="wheel_spin")]])
+
+
+def _spin_cost(free_left: int) -> str:
+    if free_left:
+        return f"🎁 چرخش رایگان امروز: {free_left}"
+    return f"💰 هزینه چرخش: {WHEEL_SPIN_COST:,} سکه (رایگان بعدی فردا)"
+
+
+def _menu_text(user_id: int) -> str:
+    status = wheel.status(user_id)
+    lines = ["🍀 <b>گردونه شانس</b>", "", _spin_cost(status.free_left)]
+    if status.streak:
+        bonus = round((streak_multiplier(status.streak) - 1) * 100)
+        lines.append(f"🔥 روزهای پیاپی: {status.streak} (جایزه +{bonus}٪)")
+    else:
+        lines.append(f"🔥 هر روز بچرخانید: هر روز پیاپی +{round(WHEEL_STREAK_BONUS * 100)}٪ تا {WHEEL_STREAK_CAP} روز")
+    
+    lines += ["", "🎯 <b>جوایز:</b>"]
+    for reward in wheel.rewards:
+        name = reward.label if reward.resource in (None, "spin") else f"{reward.amount:,} {reward.label}"
+        lines.append(f"{reward.emoji} {name} — {wheel.chance(reward):.0%}")
+    
+    recent = wheel.recent(user_id)
+    if recent:
+        lines += ["", "📜 <b>آخرین جوایز شما:</b>"]
+        now = time.time()
+        for record in recent:
+            minutes = int(now - record.timestamp) // 60
+            ago = f"{minutes // 60} ساعت پیش" if minutes >= 60 else f"{minutes} دقیقه پیش"
+            lines.append(f"{record.reward_emoji} {record.reward_description} ({ago})")
+    return "\n".join(lines)
+
+
+async def show_wheel(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_user.id
+    await update.message.reply_text(_menu_text(user_id), reply_markup=SPIN_MARKUP, parse_mode="HTML")
+
+
+async def wheel_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    user_id = query.from_user.id
+    
+    async with user_locks.hold(user_id):
+        status, result = wheel.spin(user_id)
+    if status == "coins":
+        await query.answer(f"❌ برای چرخش اضافه {WHEEL_SPIN_COST:,} سکه لازم است.", show_alert=True)
+        return
+    await query.answer()
+    
+    lines = ["🎡 <b>گردونه چرخید...</b>", "", f"{result.reward.emoji} <b>{result.description}</b>"]
+    if result.reward.resource is None:
+        lines.append("این بار شانس با شما نبود!")
+    elif result.reward.resource != "spin" and result.streak > 1:
+        bonus = round((streak_multiplier(result.streak) - 1) * 100)
+        lines.append(f"🔥 {result.streak} روز پیاپی: +{bonus}٪ جایزه")
+    if result.paid:
+        lines.append(f"💸 {WHEEL_SPIN_COST:,} سکه پرداخت شد")
+    lines += ["", _spin_cost(result.free_left)]
+    await query.edit_message_text("\n".join(lines), reply_markup=SPIN_MARKUP, parse_mode="HTML")
+
+
+wheel_callback_handler = CallbackQueryHandler(wheel_callback, pattern=r"^wheel_spin$")
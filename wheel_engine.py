@@ -0,0 +1,268 @@
+# utils/wheel_engine.py
+"""
+گردونه شانس (wheel_spins / wheel_history)
+
+جایزه هر چرخش با روش alias (Walker/Vose) انتخاب می‌شود: جدول یک بار در O(n) ساخته
+می‌شود و هر نمونه‌گیری فقط یک اندیس تصادفی و یک مقایسه است، مستقل از تعداد جوایز.
+شمارنده چرخش‌های امروز، روزهای پیاپی و کل چرخش‌ها با یک UPSERT روی wheel_spins بروز
+می‌شوند. چرخش‌های برنده شده در bonus_spins جمع می‌شوند و بعد از تمام شدن سهمیه رایگان
+روزانه (قبل از پرداخت سکه) مصرف می‌شوند. سوابق جوایز با BatchWriter نوشته می‌شوند و کار تکراری زمان‌بند سوابق
+قدیمی‌تر از WHEEL_HISTORY_RETENTION_DAYS را تکه تکه پاک می‌کند.
+"""
+
+import random
+import time
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+from database.db import db, Rollback
+from config.settings import (
+    WHEEL_FREE_SPINS, WHEEL_SPIN_COST, WHEEL_STREAK_BONUS, WHEEL_STREAK_CAP,
+    WHEEL_HISTORY_FLUSH_MS, WHEEL_HISTORY_RETENTION_DAYS,
+    WHEEL_HISTORY_PRUNE_INTERVAL, WHEEL_HISTORY_PRUNE_CHUNK
+)
+from utils.batch_writer import BatchWriter
+from utils.leaderboard_service import leaderboards
+from utils.scheduler import scheduler, Job, MISFIRE_SKIP
+from utils.logger import logger
+
+
+class Reward(NamedTuple):
+    reward_type: str
+    emoji: str
+    label: str
+    weight: float
+    resource: Optional[str]  # ستون resources، "spin" برای چرخش رایگان یا None برای پوچ
+    amount: int
+
+
+WHEEL_REWARDS: Tuple[Reward, ...] = (
+    Reward("coins_small", "💰", "سکه", 30, "coins", 500),
+    Reward("coins_medium", "💰", "سکه", 15, "coins", 2000),
+    Reward("coins_jackpot", "💎", "سکه (جکپات)", 1, "coins", 25000),
+    Reward("iron", "🛠️", "آهن", 20, "iron", 50),
+    Reward("silver", "⚪", "نقره", 12, "silver", 20),
+    Reward("free_spin", "🔁", "چرخش رایگان", 7, "spin", 1),
+    Reward("empty", "🍂", "پوچ", 15, None, 0),
+)
+
+
+class AliasTable:
+    """نمونه‌گیری وزن‌دار با روش alias؛ ساخت O(n) و هر نمونه O(1)"""
+    
+    __slots__ = ("prob", "alias")
+    
+    def __init__(self, weights: Sequence[float]):
+        n = len(weights)
+        total = float(sum(weights))
+        if n == 0 or total <= 0 or min(weights) < 0:
+            raise ValueError("alias table needs non-negative weights with a positive sum")
+        
+        scaled = [weight * n / total for weight in weights]
+        self.prob = [1.0] * n
+        self.alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.prob[less] = scaled[less]
+            self.alias[less] = more
+            # بخش خالی ستون less با ستون more پر می‌شود
+            scaled[more] -= 1.0 - scaled[less]
+            (small if scaled[more] < 1.0 else large).append(more)
+        # باقی‌مانده‌ها (فقط به خاطر خطای ممیز شناور) احتمال کامل می‌گیرند
+    
+    def __len__(self) -> int:
+        return len(self.prob)
+    
+    def sample(self, rng: random.Random) -> int:
+        column = rng.randrange(len(self.prob))
+        return column if rng.random() < self.prob[column] else self.alias[column]
+
+
+class HistoryRecord(NamedTuple):
+    user_id: int
+    reward_type: str
+    reward_emoji: str
+    reward_description: str
+    timestamp: float
+
+
+class SpinResult(NamedTuple):
+    reward: Reward
+    amount: int
+    description: str
+    paid: bool
+    streak: int
+    free_left: int  # سهمیه رایگان امروز + چرخش‌های جایزه
+
+
+class WheelStatus(NamedTuple):
+    free_left: int  # سهمیه رایگان امروز + چرخش‌های جایزه
+    streak: int
+    total_spins: int
+
+
+class _Rollback(Rollback):
+    def __init__(self, status: str):
+        super().__init__(status)
+        self.status = status
+
+
+def streak_multiplier(streak: int) -> float:
+    return 1.0 + max(0, min(streak, WHEEL_STREAK_CAP) - 1) * WHEEL_STREAK_BONUS
+
+
+def _day(timestamp: float) -> str:
+    return time.strftime("%Y-%m-%d", time.localtime(timestamp))
+
+
+class WheelEngine:
+    """جدول alias جوایز، چرخش در یک تراکنش و سوابق دسته‌ای"""
+    
+    def __init__(self, rewards: Sequence[Reward] = WHEEL_REWARDS):
+        self.rewards = tuple(rewards)
+        self.table = AliasTable([reward.weight for reward in self.rewards])
+        self.total_weight = float(sum(reward.weight for reward in self.rewards))
+        self.rng = random.Random()
+        self.history = BatchWriter("wheel_history", self._flush_history, interval_ms=WHEEL_HISTORY_FLUSH_MS)
+    
+    def start(self):
+        """پاک‌سازی دوره‌ای سوابق (فقط پروسس اصلی)"""
+        if WHEEL_HISTORY_RETENTION_DAYS > 0:
+            scheduler.every(
+                "wheel_history_prune", WHEEL_HISTORY_PRUNE_INTERVAL, self._prune_job,
+                jitter=WHEEL_HISTORY_PRUNE_INTERVAL / 10, misfire=MISFIRE_SKIP
+            )
+    
+    def chance(self, reward: Reward) -> float:
+        return reward.weight / self.total_weight
+    
+    # ==================== چرخش ====================
+    
+    def spin(self, user_id: int) -> Tuple[str, Optional[SpinResult]]:
+        now = time.time()
+        today, yesterday = _day(now), _day(now - 86400)
+        reward = self.rewards[self.table.sample(self.rng)]
+        
+        try:
+            with db.get_cursor() as cursor:
+                # شمارنده چرخش‌های امروز، روزهای پیاپی و کل چرخش‌ها در یک دستور
+                state = cursor.execute(
+                    """
+                    INSERT INTO wheel_spins
+                        (user_id, last_spin, total_spins, free_spins_used, last_free_spin_date, streak_days, last_streak_date)
+                    VALUES (?, ?, 1, 1, ?, 1, ?)
+                    ON CONFLICT(user_id) DO UPDATE SET
+                        last_spin = excluded.last_spin,
+                        total_spins = wheel_spins.total_spins + 1,
+                        free_spins_used = CASE WHEN wheel_spins.last_free_spin_date = excluded.last_free_spin_date
+                            THEN wheel_spins.free_spins_used ELSE 0 END + 1,
+                        last_free_spin_date = excluded.last_free_spin_date,
+                        streak_days = CASE
+                            WHEN wheel_spins.last_streak_date = excluded.last_streak_date THEN wheel_spins.streak_days
+                            WHEN wheel_spins.last_streak_date = ? THEN wheel_spins.streak_days + 1
+                            ELSE 1 END,
+                        last_streak_date = excluded.last_streak_date
+                    RETURNING free_spins_used, streak_days, bonus_spins
+                    """,
+                    (user_id, now, today, today, yesterday)
+                ).fetchone()
+                
+                used, streak, bonus = state['free_spins_used'], state['streak_days'], state['bonus_spins'] or 0
+                paid = False
+                if used > WHEEL_FREE_SPINS:
+                    # سهمیه امروز تمام شده: اول چرخش جایزه، بعد سکه
+                    if bonus > 0:
+                        cursor.execute(
+                            "UPDATE wheel_spins SET bonus_spins = bonus_spins - 1 WHERE user_id = ? AND bonus_spins > 0",
+                            (user_id,)
+                        )
+                    if bonus > 0 and cursor.rowcount > 0:
+                        bonus -= 1
+                    else:
+                        paid = True
+                        cursor.execute(
+                            "UPDATE resources SET coins = coins - ? WHERE user_id = ? AND coins >= ?",
+                            (WHEEL_SPIN_COST, user_id, WHEEL_SPIN_COST)
+                        )
+                        if cursor.rowcount == 0:
+                            raise _Rollback("coins")
+                
+                amount = reward.amount
+                if reward.resource == "spin":
+                    cursor.execute(
+                        "UPDATE wheel_spins SET bonus_spins = bonus_spins + ? WHERE user_id = ?", (amount, user_id)
+                    )
+                    bonus += amount
+                elif reward.resource is not None:
+                    amount = int(reward.amount * streak_multiplier(streak))
+                    cursor.execute(
+                        f"UPDATE resources SET {reward.resource} = {reward.resource} + ? WHERE user_id = ?",
+                        (amount, user_id)
+                    )
+        except _Rollback as e:
+            return e.status, None
+        
+        coins = (amount if reward.resource == "coins" else 0) - (WHEEL_SPIN_COST if paid else 0)
+        leaderboards.adjust("coins", user_id, coins)
+        description = reward.label if reward.resource is None else f"{amount:,} {reward.label}"
+        self.history.add(HistoryRecord(user_id, reward.reward_type, reward.emoji, description, now))
+        logger.info("User %s spun the wheel: %s (%s)%s", user_id, reward.reward_type, amount, " paid" if paid else "")
+        return "ok", SpinResult(reward, amount, description, paid, streak, max(0, WHEEL_FREE_SPINS - used) + bonus)
+    
+    def status(self, user_id: int) -> WheelStatus:
+        row = db.fetchone(
+            "SELECT total_spins, free_spins_used, last_free_spin_date, streak_days, last_streak_date, bonus_spins "
+            "FROM wheel_spins WHERE user_id = ?",
+            (user_id,)
+        )
+        if row is None:
+            return WheelStatus(WHEEL_FREE_SPINS, 0, 0)
+        now = time.time()
+        today = _day(now)
+        used = row['free_spins_used'] if row['last_free_spin_date'] == today else 0
+        streak = row['streak_days'] if row['last_streak_date'] in (today, _day(now - 86400)) else 0
+        free_left = max(0, WHEEL_FREE_SPINS - used) + (row['bonus_spins'] or 0)
+        return WheelStatus(free_left, streak, row['total_spins'])
+    
+    def recent(self, user_id: int, limit: int = 5) -> List[HistoryRecord]:
+        rows = db.fetchall(
+            "SELECT user_id, reward_type, reward_emoji, reward_description, timestamp FROM wheel_history "
+            "WHERE user_id = ? ORDER BY id DESC LIMIT ?",
+            (user_id, limit)
+        )
+        return [
+            HistoryRecord(row['user_id'], row['reward_type'], row['reward_emoji'],
+                          row['reward_description'], row['timestamp'])
+            for row in rows
+        ]
+    
+    # ==================== سوابق ====================
+    
+    def _flush_history(self, batch: List[HistoryRecord]):
+        with db.get_cursor() as cursor:
+            cursor.executemany(
+                "INSERT INTO wheel_history (user_id, reward_type, reward_emoji, reward_description, timestamp) "
+                "VALUES (?, ?, ?, ?, ?)",
+                batch
+            )
+        logger.debug("Flushed %s wheel history rows", len(batch))
+    
+    def _prune_job(self, job: Job) -> Optional[float]:
+        cutoff = time.time() - WHEEL_HISTORY_RETENTION_DAYS * 86400
+        with db.get_cursor() as cursor:
+            cursor.execute(
+                "DELETE FROM wheel_history WHERE id IN "
+                "(SELECT id FROM wheel_history WHERE timestamp < ? ORDER BY timestamp LIMIT ?)",
+                (cutoff, WHEEL_HISTORY_PRUNE_CHUNK)
+            )
+            deleted = cursor.rowcount
+        if deleted:
+            logger.info("Pruned %s wheel history rows older than %s days", deleted, WHEEL_HISTORY_RETENTION_DAYS)
+        if deleted >= WHEEL_HISTORY_PRUNE_CHUNK:
+            return 1.0  # تکه بعدی بدون قفل طولانی جدول
+        return None
+
+
+# نمونه سینگلتون
+wheel = WheelEngine()